@@ -1,8 +1,26 @@
-import time
 import psutil
 import csv
 import os
-from openpyxl import Workbook, load_workbook
+from perfmon.adaptive import COLUMN as ADAPTIVE_COLUMN, DEFAULT_MAX as ADAPTIVE_MAX, AdaptiveRate
+from perfmon.anomaly import AnomalyWatch, CommandHook, LogHook, parse_anomaly
+from perfmon.binlog import EXTENSION as LOG_EXTENSION, open_log, read_log
+from perfmon.breakdown import ThreadBreakdown
+from perfmon.columnar import export_columnar
+from perfmon.detector import get_detector
+from perfmon.markers import LINE_KINDS, MarkerListener, marker_rows, place as place_markers
+from perfmon.metrics import DEFAULT_PORT as METRICS_PORT, MetricsServer, MetricsSnapshot
+from perfmon.overhead import DEFAULT_BUDGET, Overhead
+from perfmon.registry import REGISTRY, ExtraSampler, parse_metrics
+from perfmon.rollup import Rollup, TIER_NAMES, tier_index
+from perfmon.sampler import open_sampler
+from perfmon.store import SampleStore, COLUMNS, MULTI_COLUMNS
+from perfmon.targets import TargetSet, find_training_processes
+from perfmon.scheduler import TickScheduler
+from perfmon.segments import FlushPolicy, check_compressor
+from perfmon.stats import SessionStats
+from perfmon.tree import ProcessTree, children_path
+from perfmon.writer import BackgroundWriter
+from perfmon.xlsx_sink import XlsxAppendSink, write_xlsx
 from datetime import datetime, timedelta
 import argparse
 import sys
@@ -29,24 +47,18 @@ def get_pid():
     except (FileNotFoundError, psutil.NoSuchProcess, ValueError, psutil.AccessDenied):
         pass # หากมีปัญหา ให้ข้ามไปหา Python
 
-    # --- หากไม่เจอ MATLAB ให้ตรวจสอบ Python ---
-    current_pid = psutil.Process().pid
-    for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-        try:
-            if proc.pid == current_pid:
-                continue
-
-            name = proc.info['name'].lower()
-            cmdline_list = proc.info.get('cmdline')
-            cmdline = ' '.join(cmdline_list or []).lower()
-
-            if ("python" in name or "python.exe" in name) and ".py" in cmdline:
-                return proc.pid, f"Python: {' '.join(proc.info.get('cmdline') or [])}"
-        except (psutil.NoSuchProcess, psutil.AccessDenied):
-            continue
+    # --- หากไม่เจอ MATLAB ให้ตรวจสอบ Python (detector ตรวจเฉพาะโปรเซสใหม่ ไม่ไล่ทั้งเครื่อง) ---
+    for pid, cmdline_list in get_detector(is_training_python).matches():
+        return pid, f"Python: {' '.join(cmdline_list)}"
 
     return None, None
 
+def is_training_python(name, cmdline_list):
+    """เงื่อนไขของโปรเซส Python ที่กำลังเทรน (ใช้กับ detector)"""
+    name = name.lower()
+    cmdline = ' '.join(cmdline_list).lower()
+    return ("python" in name or "python.exe" in name) and ".py" in cmdline
+
 def format_duration(seconds):
     """แปลงวินาทีเป็นรูปแบบ H:MM:SS.ms"""
     try:
@@ -82,8 +94,53 @@ def get_autosave_path(export_type, filename=None):
     os.makedirs(downloads_path, exist_ok=True)
     return os.path.join(downloads_path, full_filename)
 
+def open_run_log(path, data):
+    """เปิดไฟล์บันทึกหลัก (.pmlog) ตามโครงของ data -> writer หรือ None ถ้าเปิดไม่ได้"""
+    if not path:
+        return None
+    try:
+        log = open_log(path, data)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Binary log disabled: {e}")
+        return None
+    if log.dropped_bytes:
+        print(f"🩹 Recovered {os.path.basename(path)}: dropped {log.dropped_bytes} bytes of torn tail.")
+    print(f"📝 Recording to: {path}")
+    return log
+
+def open_marker_listener(enabled=True):
+    """เปิดช่องรับ marker (step/epoch/phase/scalar) จากสคริปต์เทรน (perfmon.markers) -> listener หรือ None"""
+    if not enabled:
+        return None
+    try:
+        listener = MarkerListener()
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Training markers disabled: {e}")
+        return None
+    print(f"📍 Listening for training markers on: {listener.address}")
+    return listener
+
+def collect_markers(listener, markers, elapsed, log, display_mode):
+    """รับ marker ที่ค้างอยู่ -> ต่อท้าย markers + เขียนลง .pmlog + แสดง epoch/phase/mark ใน console"""
+    events = listener.drain()
+    if not events:
+        return
+    placed = place_markers(events, elapsed)
+    markers.extend(placed)
+    if log:
+        log.write_markers(placed)
+    if display_mode:
+        for e, kind, label, value in placed:
+            if kind in LINE_KINDS:
+                text = label if kind == "phase" else f"{value:g} {label}".strip()
+                print(f"📍 {format_duration(e)} {kind}: {text}")
+
 def auto_save_to_file(data, source, path):
-    """บันทึกข้อมูล (Append) ลงในไฟล์ Excel หรือ CSV"""
+    """
+    บันทึกข้อมูล (Append) ลงในไฟล์ Excel หรือ CSV
+    - XLSX: เขียนเป็น segment ใหม่ (ต้นทุนคงที่ต่อครั้ง) แล้วค่อยรวมไฟล์ตอน finalize_autosave()
+    - โหมด -tree: series รายโปรเซสลูกจะถูกบันทึกต่อท้ายไฟล์ children_path(path) ด้วย
+    """
     
     write_header = False
     if not os.path.exists(path) or (os.path.exists(path) and os.path.getsize(path) == 0):
@@ -93,46 +150,276 @@ def auto_save_to_file(data, source, path):
     
     try:
         if path.lower().endswith('.xlsx'):
-            if write_header:
-                wb = Workbook()
-                ws = wb.active
-                # FIX: เปลี่ยนชื่อหัวตาราง
-                ws.append(["Time (H:MM:SS.ms)", "CPU (%)", "RAM (MB)", "Source"])
-                wb.save(path)
-                
-            wb = load_workbook(path)
-            ws = wb.active
-            for row_data in all_data_to_save:
-                formatted_row = [format_duration(row_data[0])] + list(row_data[1:])
-                ws.append(formatted_row)
-            wb.save(path)
+            XlsxAppendSink(path, header=data.header()).append(
+                [format_duration(row_data[0])] + list(row_data[1:]) for row_data in all_data_to_save
+            )
 
         elif path.lower().endswith('.csv'):
             with open(path, mode='a', newline='', encoding='utf-8') as file:
                 writer = csv.writer(file)
                 if write_header:
-                    # FIX: เปลี่ยนชื่อหัวตาราง
-                    writer.writerow(["Time (H:MM:SS.ms)", "CPU (%)", "RAM (MB)", "Source"])
+                    # หัวตารางตามคอลัมน์ของ store (โหมดหลายโปรเซสจะมีคอลัมน์ PID เพิ่ม)
+                    writer.writerow(data.header())
                 
                 for row_data in all_data_to_save:
                     formatted_row = [format_duration(row_data[0])] + list(row_data[1:])
                     writer.writerow(formatted_row)
         
+        if data.children:
+            return auto_save_to_file(data.children, source, children_path(path))
         return True
     except Exception as e:
         print(f"❌ Error saving data to {os.path.basename(path)}: {e}")
         return False
 
+def save_autosave_batch(data, source, path, policy=None, final=False):
+    """
+    บันทึก data 1 ก้อนตาม FlushPolicy
+    - ไม่หมุนไฟล์/ไม่บีบอัด: ต่อท้าย path เดียวแบบเดิม (final -> รวม segment XLSX)
+    - หมุนไฟล์/บีบอัด: ต่อท้าย segment ปัจจุบัน (<ชื่อ>_partNNN) + อัปเดต manifest
+      segment ใหญ่ถึง rotate_bytes หรือเป็นการบันทึกครั้งสุดท้าย -> ปิด segment (รวม XLSX / บีบอัด CSV)
+      รอบถัดไปเริ่ม segment ใหม่
+    """
+    segments = policy.segments(path) if policy else None
+    # ครั้งสุดท้าย: data เป็นก้อนท้ายของรอบ -> meta/สถิติของทั้งรอบอยู่ใน data.meta แล้ว
+    footer = export_footer(data, source) if final else None
+    if segments is None:
+        ok = auto_save_to_file(data, source, path)
+        if final:
+            ok = finalize_autosave(path, data.header(), footer) and ok
+        return ok
+    target = segments.active()
+    ok = auto_save_to_file(data, source, target)
+    segments.record(target, data)
+    if final or segments.full(target):
+        ok = finalize_autosave(target, data.header(), footer) and ok
+        target = segments.close(target)
+        print(f"🗂️ Closed auto-save segment: {os.path.basename(target)}")
+    return ok
+
+def queue_auto_save(writer, data, source, path, policy=None):
+    """
+    ส่ง data ทั้งก้อนให้ BackgroundWriter บันทึก (save_autosave_batch) แล้วคืน store ว่างสำหรับเก็บต่อ
+    - ไม่คัดลอกข้อมูล: store เดิมเป็นของ writer thread ตั้งแต่ตอนนี้
+    - การหมุน/บีบอัด segment ก็เกิดใน writer thread -> loop การ sample ไม่ต้องรอ
+    - คิวเต็ม (ดิสก์ช้ากว่าข้อมูลที่เข้ามา) -> ทิ้งก้อนนี้แทนการหยุดรอ (ถ้าเปิดไฟล์ .pmlog ไว้ ข้อมูลยังอยู่ในนั้น)
+    """
+    if not writer.submit(save_autosave_batch, data, source, path, policy, rows=len(data)):
+        print(f"⚠️ Auto-save queue full: dropped {len(data)} rows from {os.path.basename(path)} (disk slower than sampling).")
+    return data.empty_like()
+
+def get_log_path(args):
+    """path ของไฟล์บันทึกหลัก (.pmlog): -log ถ้าระบุ, ไม่งั้นตั้งชื่อตาม -n/เวลาใน Downloads, -nolog = ไม่บันทึก"""
+    if args.nolog:
+        return None
+    if args.log:
+        return args.log if args.log.lower().endswith(LOG_EXTENSION) else args.log + LOG_EXTENSION
+    return get_autosave_path(LOG_EXTENSION.lstrip('.'), args.n)
+
+def parse_thresholds(values):
+    """-threshold cpu=90 -threshold ram=8192 -> {"cpu": [90.0], "ram": [8192.0]} (None = ค่าเริ่มต้น CPU >= 90%)"""
+    if not values:
+        return None
+    thresholds = {}
+    for text in values:
+        metric, _, value = text.partition('=')
+        metric = metric.strip().lower()
+        try:
+            if metric not in ('cpu', 'ram') and metric not in REGISTRY:
+                raise ValueError
+            thresholds.setdefault(metric, []).append(float(value))
+        except ValueError:
+            raise ValueError(f"Invalid threshold '{text}' (expected cpu=VALUE, ram=VALUE or a -metrics name)") from None
+    return thresholds
+
+def parse_anomaly_options(args):
+    """-anomaly [KEY=VALUE,...], -onalert CMD (ซ้ำได้), -alertlog PATH -> kwargs ของ AnomalyWatch + hooks (None = ไม่ตรวจ)"""
+    if args.anomaly is None and not args.onalert and not args.alertlog:
+        return None
+    options = parse_anomaly(args.anomaly)
+    options["hooks"] = [CommandHook(command) for command in args.onalert or ()]
+    if args.alertlog:
+        options["hooks"].append(LogHook(args.alertlog))
+    return options
+
+def parse_flush_policy(args):
+    """
+    -flush rows=N / mb=N / s=N (ซ้ำได้), -rotate MB, -compress gzip|zstd -> FlushPolicy
+    ระบุ -flush แล้วจะใช้เฉพาะเงื่อนไขที่ระบุ (ไม่ระบุ = ทุก 1 ชม. แบบเดิม)
+    """
+    options = {}
+    if args.flush:
+        options["seconds"] = None
+        for text in args.flush:
+            key, _, value = text.partition('=')
+            key = key.strip().lower()
+            try:
+                if key == 'rows':
+                    options["rows"] = int(value)
+                elif key == 'mb':
+                    options["nbytes"] = int(float(value) * 2**20)
+                elif key == 's':
+                    options["seconds"] = float(value)
+                else:
+                    raise ValueError
+            except ValueError:
+                raise ValueError(f"Invalid flush condition '{text}' (expected rows=N, mb=N or s=N)") from None
+            if float(value) <= 0:
+                raise ValueError(f"Invalid flush condition '{text}' (value must be positive)")
+    if args.rotate is not None:
+        if args.rotate <= 0:
+            raise ValueError("-rotate must be a positive size in MB")
+        options["rotate_bytes"] = int(args.rotate * 2**20)
+    if args.compress:
+        check_compressor(args.compress)
+        options["compress"] = args.compress
+    return FlushPolicy(**options)
+
+def print_stats(stats, title="Stats"):
+    """แสดงสถิติของ session (mean/median/p95/p99/peak + เวลาเหนือ threshold)"""
+    print(f"📊 {title}:")
+    for label, value in stats.meta().items():
+        print(f"   {label} {value}")
+
+def report_overhead_level(overhead, display_mode):
+    """แจ้งเมื่อระดับการลดภาระเปลี่ยน (ต้นทุนของตัวมอนิเตอร์เกิน/กลับมาต่ำกว่า budget)"""
+    if not display_mode:
+        return
+    if overhead.level:
+        print(f"⚠️ Monitor overhead {overhead.cpu:.1f}% of a core exceeds budget {overhead.budget:g}%: "
+              f"showing 1 in {overhead.display_stride} update(s).")
+    else:
+        print(f"✅ Monitor overhead back under budget ({overhead.cpu:.1f}% of a core): full display rate.")
+
+def finish_overhead(data, overhead):
+    """เก็บ series ต้นทุนของตัวมอนิเตอร์ไว้ที่ data.overhead + สรุปท้ายไฟล์ส่งออก"""
+    overhead.close()
+    data.overhead = overhead.series
+    data.overhead.started_at = data.started_at
+    data.meta.update(overhead.meta())
+    print(f"🩺 Monitor overhead: {overhead.summary()}")
+    print(f"   Stages: {overhead.stages()}")
+
+def open_anomaly_watch(anomaly):
+    """kwargs จาก parse_anomaly_options -> AnomalyWatch (None = ไม่ตรวจ), alert พิมพ์ใน console ทุกโหมด (รวม -daemon)"""
+    if anomaly is None:
+        return None
+    options = dict(anomaly)
+    hooks = [lambda alert: print(f"🚨 {format_duration(alert.elapsed)} {alert}")] + options.pop("hooks", [])
+    watch = AnomalyWatch(hooks, **options)
+    print(f"🧭 Anomaly detection: {watch.describe()}")
+    return watch
+
+def record_alerts(alerts, markers, log):
+    """alert ที่เพิ่งเกิด -> marker kind "alert" (กราฟ/ไฟล์ส่งออก) + เขียนลง .pmlog ทันที"""
+    placed = [alert.marker() for alert in alerts]
+    markers.extend(placed)
+    if log:
+        log.write_markers(placed)
+
+def finish_anomaly(data, watch):
+    """ปิด hook + สรุปจำนวน alert ท้ายไฟล์ส่งออก"""
+    watch.close()
+    meta = watch.meta()
+    data.meta.update(meta)
+    print(f"🧭 Anomaly alerts: {meta['Anomaly alerts:']}")
+
+def finish_breakdown(data, breakdown):
+    """เก็บ series ราย thread/core ไว้ที่ data.threads / data.cores + สรุปท้ายไฟล์ส่งออก"""
+    breakdown.close()
+    data.threads = breakdown.threads
+    data.cores = breakdown.cores
+    for series in (data.threads, data.cores):
+        if series is not None:
+            series.started_at = data.started_at
+    meta = breakdown.meta()
+    data.meta.update(meta)
+    print("🧵 Thread breakdown:")
+    for label, value in meta.items():
+        print(f"   {label} {value}")
+
+def combine_stats(total, records):
+    """รวมสถิติของรอบล่าสุดเข้ากับรอบก่อนๆ (merge ไม่ต้องอ่านข้อมูลซ้ำ) และแสดงผลรวมเมื่อมีมากกว่า 1 รอบ"""
+    if not records.stats:
+        return total
+    if total is None:
+        # สำเนา เพื่อไม่ให้การ merge ไปแก้สถิติของ records ที่ยังส่งออกได้
+        return SessionStats.from_dict(records.stats.to_dict())
+    try:
+        total.merge(records.stats)
+    except ValueError:
+        return total
+    print_stats(total, "All runs")
+    return total
+
+def finalize_autosave(path, header=None, footer=None):
+    """
+    ปิดไฟล์ Auto-Save: ต่อ footer (source + meta/สถิติของรอบ แบบเดียวกับ export_csv/export_excel) ท้ายไฟล์
+    - XLSX: รวม segment ทั้งหมดเป็นไฟล์เดียว + footer
+    - CSV: แถวข้อมูลเขียนไปแล้วระหว่างทาง -> ต่อบรรทัดว่าง + footer
+    """
+    if not path:
+        return True
+    try:
+        if path.lower().endswith('.csv'):
+            if footer:
+                with open(path, mode='a', newline='', encoding='utf-8') as file:
+                    writer = csv.writer(file)
+                    writer.writerow([])
+                    writer.writerows(footer)
+            return True
+        if not path.lower().endswith('.xlsx'):
+            return True
+        sink = XlsxAppendSink(path, header=header) if header else XlsxAppendSink(path)
+        sink.finalize(footer=footer)
+        # series รายโปรเซสลูก (โหมด -tree) ถ้ามี segment ค้างอยู่
+        child_sink = XlsxAppendSink(children_path(path), header=SampleStore(columns=MULTI_COLUMNS).header())
+        if child_sink.has_pending():
+            child_sink.finalize()
+        return True
+    except Exception as e:
+        print(f"❌ Error finalizing {os.path.basename(path)}: {e}")
+        return False
+
 # ==============================================================================
 # 2. CORE MONITORING LOGIC
 # ==============================================================================
 
-def monitor(samrate, display_mode, auto_save_path=None, total_elapsed_time=0.0):
+def monitor(samrate, display_mode, auto_save_path=None, total_elapsed_time=0.0, multi=False, tree=False, log_path=None, thresholds=None, policy=None, metrics=None, listen_markers=True, budget=DEFAULT_BUDGET, extra_metrics=None, breakdown=False, adaptive=None, anomaly=None):
     """
     ฟังก์ชันหลักสำหรับติดตามและบันทึกข้อมูล CPU/RAM
+    - multi=True: ติดตามทุกโปรเซสที่เข้าเงื่อนไขพร้อมกัน (ดู monitor_many)
+    - tree=True: รวมค่าของโปรเซสลูกหลานทั้งหมด (DataLoader workers ฯลฯ)
+      และเก็บ series รายโปรเซสลูกไว้ที่ records.children
+    - log_path: ไฟล์บันทึกหลัก (.pmlog) เขียนต่อท้ายทุก tick (ลงดิสก์ต่อเนื่อง ไม่ต้องรอ Auto-Save)
+      path เดิมจากรอบก่อนจะถูกเขียนต่อเป็น session ใหม่
+    - thresholds: {metric: [ค่า]} สำหรับนับเวลาที่ค่าอยู่เหนือ threshold (ดู perfmon.stats)
+      สถิติของทั้ง run อยู่ที่ records.stats และท้ายไฟล์ส่งออก
+    - policy: FlushPolicy ของ Auto-Save (เวลา/จำนวนแถว/ขนาด, การหมุนไฟล์) None = ทุก 1 ชม.
+    - metrics: MetricsSnapshot ที่อัปเดตทุก tick (โหมด -daemon), display_mode=0 = ไม่พิมพ์รายแถว
+    - listen_markers: รับ marker จากสคริปต์เทรน (perfmon.markers) วางบนแกนเวลา -> records.markers
+    - budget: CPU ของตัวมอนิเตอร์เอง (% ของ 1 core) ที่ยอมให้ใช้ เกินแล้วลดอัตราการแสดงผลลง (perfmon.overhead)
+      series ต้นทุนของตัวมอนิเตอร์อยู่ที่ records.overhead และสรุปท้ายไฟล์ส่งออก
+    - extra_metrics: [(name, every)] จาก parse_metrics -> คอลัมน์เสริมต่อจาก cpu/ram (perfmon.registry)
+      อ่านใน oneshot() เดียวต่อ tick, metric ที่แพงอ่านทุก every tick (โหมดโปรเซสเดียว, โหมด tree = โปรเซสหลัก)
+    - breakdown=True: CPU ราย thread และราย core ของโปรเซสหลัก (perfmon.breakdown)
+      -> records.threads / records.cores + สรุป thread ที่ใช้ CPU มากที่สุดท้ายไฟล์ส่งออก
+    - adaptive: interval สูงสุด (วินาที) ของอัตราการ sample แบบปรับตัว (perfmon.adaptive) None = คงที่ที่ samrate
+      samrate เป็น interval ต่ำสุด, ทุกแถวมีคอลัมน์ interval ต่อท้าย (rollup/สถิติถ่วงน้ำหนักตามเวลา)
+    - anomaly: kwargs ของ AnomalyWatch + hooks (parse_anomaly_options) None = ไม่ตรวจ
+      RSS โตต่อเนื่อง / CPU เปลี่ยนระดับ -> alert เรียก hook ใน tick เดียวกัน + marker kind "alert" (perfmon.anomaly)
     
     :returns: (records, source, final_total_elapsed_time, final_auto_save_path)
     """
+    if multi:
+        if extra_metrics:
+            print("ℹ️ Extra metrics (-metrics) are recorded in single-process mode only.")
+        if breakdown:
+            print("ℹ️ Thread breakdown (-breakdown) is recorded in single-process mode only.")
+        if adaptive:
+            print("ℹ️ Adaptive sampling (-adaptive) is available in single-process mode only; using a fixed rate.")
+        return monitor_many(samrate, display_mode, auto_save_path, total_elapsed_time, tree=tree, log_path=log_path, thresholds=thresholds, policy=policy, metrics=metrics, listen_markers=listen_markers, budget=budget, anomaly=anomaly)
+
     print("🔍 Waiting for training process...")
     pid_file_path = "C:\\temp\\training_pid.txt"
 
@@ -140,7 +427,8 @@ def monitor(samrate, display_mode, auto_save_path=None, total_elapsed_time=0.0):
         pid, source = get_pid()
         if pid:
             break
-        time.sleep(1)
+        # รอ event โปรเซสใหม่ (ตื่นทันทีที่มีโปรเซสเข้าเงื่อนไข), ไฟล์ PID ของ MATLAB ยังตรวจทุก 1 วินาที
+        get_detector(is_training_python).wait(1.0)
 
     # ------------------------------------------------------------------
     # FIX: แยก Full Source และ Source สำหรับแสดงผลใน Terminal
@@ -156,121 +444,178 @@ def monitor(samrate, display_mode, auto_save_path=None, total_elapsed_time=0.0):
         
     print(f"\n✅ Detected training from: {full_source}")
     # FIX: เปลี่ยนชื่อหัวตารางเป็น Time (H:MM:SS.ms)
-    print(f"{'Time (H:MM:SS.ms)':<15} {'CPU (%)':<10} {'RAM (MB)':<12} {'Source':<45}") 
+    if display_mode:
+        print(f"{'Time (H:MM:SS.ms)':<15} {'CPU (%)':<10} {'RAM (MB)':<12} {'Source':<45}") 
     # ------------------------------------------------------------------
 
-    training_start = time.time()
-    last_display_time = training_start
-    data, buffer, samples = [], [], []
     is_matlab = "matlab" in source.lower()
     
-    proc = psutil.Process(pid)
+    sampler = ptree = extra = threads = None
     
     # --- เริ่มต้นการนับ CPU Counter ---
+    # sampler เปิด /proc/<pid>/stat ค้างไว้ (Linux) -> แต่ละ tick อ่านตรงโดยไม่ต้องผ่าน psutil หลายชั้น
     try:
-        proc.cpu_percent(interval=None)
-        time.sleep(0.1) 
+        if tree:
+            ptree = ProcessTree(pid)
+            print(f"🌳 Process-tree mode: tracking {ptree.child_count} child process(es) (new ones are picked up automatically).")
+        else:
+            sampler = open_sampler(pid)
+        if extra_metrics:
+            extra = ExtraSampler(pid, extra_metrics)
+        if breakdown:
+            threads = ThreadBreakdown(pid, full_source)
     except (psutil.NoSuchProcess, psutil.AccessDenied) as e:
+        if sampler is not None or ptree is not None:
+            (ptree or sampler).close()
         print(f"❌ Cannot access initial CPU stats. Error: {e}")
-        return [], full_source, 0.0, None 
+        return SampleStore(full_source), full_source, 0.0, None 
+    if extra is not None:
+        for name, reason in extra.unavailable.items():
+            print(f"⚠️ Metric {name} unavailable: {reason}")
+        if extra:
+            print(f"📐 Extra metrics: {extra.describe()}")
+    if threads is not None:
+        print(f"🧵 Thread breakdown: per-thread{' and per-core' if threads.cores is not None else ''} CPU ({threads.backend}).")
+
+    # อัตราการ sample แบบปรับตัว: samrate = interval ต่ำสุด, ขยายได้ถึง adaptive วินาทีเมื่อค่านิ่ง
+    rate = AdaptiveRate(samrate, adaptive) if adaptive else None
+    if rate is not None:
+        print(f"🎚️ Adaptive sampling: {samrate:g}-{rate.max_interval:g} s (fast on CPU/RAM change, backs off when steady).")
+
+    # เก็บแบบคอลัมน์ (elapsed, cpu, ram, [metric เสริม], [interval]) + source ครั้งเดียวต่อ session
+    data = SampleStore(full_source, COLUMNS + (extra.names if extra is not None else ()) + ((ADAPTIVE_COLUMN,) if rate is not None else ()))
+    if tree:
+        data.track_children()
+    buffer = data.empty_like()
 
-    # --- กำหนดค่าสำหรับการคำนวณ Samplerate ---
-    sample_interval = 0.1
-    required_samples = max(1, int(samrate / sample_interval)) 
-    samples_collected = 0
+    # --- จังหวะการ sample: deadline ทุก samrate วินาทีบนนาฬิกา monotonic ---
+    # อ่าน 1 ครั้งต่อ tick (CPU จาก sampler เป็นค่าเฉลี่ยตลอดช่วงตั้งแต่การอ่านครั้งก่อนอยู่แล้ว
+    # จึงไม่ต้อง sample ทุก 0.1 วิแล้วเฉลี่ยเหมือนเดิม)
+    scheduler = TickScheduler(samrate)
+    session_start = 0.0         # scheduler.elapsed() ตอนเริ่ม session ปัจจุบัน (ขยับหลัง Auto-Save)
+    last_display_time = 0.0
+    data.started_at = buffer.started_at = scheduler.wall_anchor
+    log = open_run_log(log_path, data)
+    # rollup 1 วิ/1 นาที/1 ชม. และสถิติของทั้ง run (ไม่ถูกล้างตอน Auto-Save) -> ส่งออกด้วย -tier / ท้ายไฟล์
+    rollup = Rollup.for_store(data)
+    stats = SessionStats.for_store(data, thresholds)
+    # Auto-Save เขียนไฟล์ใน thread แยก -> loop นี้ไม่ต้องรอ I/O
+    writer = BackgroundWriter()
+    policy = policy or FlushPolicy()
+    listener = open_marker_listener(listen_markers)
+    markers = []
+    watch = open_anomaly_watch(anomaly)
+    metric_sources = {pid: full_source}
+    # ต้นทุนของตัวมอนิเตอร์เอง: เวลาต่อ stage, CPU/RSS ทุก 10 วิ, ลดอัตราการแสดงผลเมื่อเกิน budget
+    overhead = Overhead(budget)
 
     while True:
+        scheduler.wait()
+        tick_start = mark = overhead.begin()
+
         # --- เงื่อนไขการหยุด Monitor ---
         if is_matlab and not os.path.exists(pid_file_path):
             break
-        if not psutil.pid_exists(pid):
-            print("\nℹ️ Process PID not found. Stopping.")
-            break
 
-        # --- เก็บข้อมูล CPU/RAM ---
+        # --- เก็บข้อมูล CPU/RAM (โปรเซสจบ -> sampler raise NoSuchProcess) ---
         try:
-            start_of_sample = time.time()
-            cpu = proc.cpu_percent(interval=None) / psutil.cpu_count()
-            ram = proc.memory_info().rss / (1024 * 1024)
+            if ptree is not None:
+                # pass เดียวครอบทั้ง tree: ค่ารวม + ค่ารายลูก
+                cpu, ram, child_rows = ptree.sample()
+            else:
+                cpu, ram = sampler.sample()
+            # metric เสริมต่อท้าย cpu/ram ตามลำดับคอลัมน์ของ store
+            values = (cpu, ram) + extra.sample() if extra else (cpu, ram)
         except psutil.NoSuchProcess:
+            print("\nℹ️ Process PID not found. Stopping.")
             break
         except Exception as e:
             break
 
         # --- ประมวลผลและแสดงข้อมูล ---
-        current_session_elapsed = time.time() - training_start
+        mark = overhead.lap("sample", mark)
+        now = scheduler.elapsed()
+        current_session_elapsed = now - session_start
         full_elapsed_seconds = total_elapsed_time + current_session_elapsed
+        if threads is not None:
+            try:
+                threads.sample(full_elapsed_seconds)
+            except psutil.NoSuchProcess:
+                pass    # โปรเซสจบระหว่าง tick -> sampler หยุด loop ใน tick ถัดไป
+        if rate is not None:
+            # ติด interval จริงของแถวนี้ไว้ท้ายสุด แล้วเลือกคาบของ tick ถัดไปตามการเปลี่ยนแปลงของ CPU/RAM
+            values += (rate.update(full_elapsed_seconds, cpu, ram),)
+            scheduler.set_interval(rate.interval)
         
-        # NOTE: ใช้ full_source ในการบันทึก
-        samples.append((full_elapsed_seconds, cpu, ram, full_source)) 
-        samples_collected += 1
+        # NOTE: full_source ถูกเก็บไว้ที่ store ครั้งเดียว ไม่ต้องพ่วงไปทุกแถว
+        if display_mode == 1: # Real-time
+            # FIX: ใช้ display_source สำหรับการแสดงผลใน Terminal
+            # เกิน budget -> พิมพ์ 1 ใน display_stride แถว (ข้อมูลยังเก็บครบทุกแถว)
+            if scheduler.ticks % overhead.display_stride == 0:
+                print(f"{format_duration(full_elapsed_seconds):<15} {cpu:<10.2f} {ram:<12.2f} {display_source:<45}") 
+            mark = overhead.lap("display", mark)
+            store = data
+        elif display_mode == 2: # Buffered
+            store = buffer
+        else: # Quiet (daemon)
+            store = data
+        store.append(full_elapsed_seconds, *values)
+        if metrics is not None:
+            metrics.update(((pid, cpu, ram),), scheduler, metric_sources, overhead)
+        rollup.add(full_elapsed_seconds, *values)
+        stats.add(full_elapsed_seconds, *values)
+        if log:
+            log.append(full_elapsed_seconds, *values)
+        if ptree is not None:
+            children = store.children
+            for child_pid, child_cpu, child_ram in child_rows:
+                if child_pid not in children.sources:
+                    children.register_source(child_pid, ptree.sources.get(child_pid, ""))
+                children.append(full_elapsed_seconds, child_pid, child_cpu, child_ram)
+                if log:
+                    log.children.register_source(child_pid, ptree.sources.get(child_pid, ""))
+                    log.children.append(full_elapsed_seconds, child_pid, child_cpu, child_ram)
+        if listener:
+            collect_markers(listener, markers, full_elapsed_seconds, log, display_mode)
+        if watch is not None:
+            alerts = watch.add(full_elapsed_seconds, None, cpu, ram)
+            if alerts:
+                record_alerts(alerts, markers, log)
+        mark = overhead.lap("aggregate", mark)
+
+        # เกิน budget -> ยืดช่วงการแสดงผลแบบ buffered ตาม display_stride
+        if display_mode == 2 and now - last_display_time >= get_update_interval(current_session_elapsed) * overhead.display_stride:
+            for b in buffer:
+                # FIX: ใช้ display_source สำหรับการแสดงผลใน Terminal
+                print(f"{format_duration(b[0]):<15} {b[1]:<10.2f} {b[2]:<12.2f} {display_source:<45}") 
+            data.extend(buffer)
+            buffer.clear()
+            last_display_time = now
+            mark = overhead.lap("display", mark)
         
-        # *** Auto-Save กลางทาง (ทุก 1 ชม. = 3600 วินาที) ***
-        if current_session_elapsed >= 3600.0:
+        # *** Auto-Save กลางทาง (ตาม FlushPolicy: ค่าเริ่มต้นทุก 1 ชม. = 3600 วินาที) ***
+        if policy.due(current_session_elapsed, data, buffer):
             
             # --- สร้างไฟล์อัตโนมัติถ้า auto_save_path เป็น None (คือเลือก 2) ---
             if auto_save_path is None:
                 auto_save_path = get_autosave_path('csv') # สร้างไฟล์ CSV อัตโนมัติ
                 print(f"\n🔔 Auto-save triggered! Auto-generating file: {os.path.basename(auto_save_path)}")
 
-            if auto_save_path and len(samples) > 0:
-                 # Flush samples และ buffer ก่อน auto-save
-                # Note: เนื่องจาก samples ตอนนี้มี 4 คอลัมน์แล้ว (รวม full_source)
-                if samples:
-                    avg_cpu = sum(x[1] for x in samples) / len(samples) if samples else 0
-                    avg_ram = sum(x[2] for x in samples) / len(samples) if samples else 0
-                    timestamp = samples[-1][0]
-                    # ใช้ full_source ในการสร้าง row สำหรับบันทึก/แสดงผล
-                    row = (timestamp, avg_cpu, avg_ram, full_source) 
-                    data.append(row)
-                    samples.clear()
-                    
-                data.extend(buffer)
-                buffer.clear()
-                
-                auto_save_to_file(data, full_source, auto_save_path)
-                
-                # รีเซ็ตค่าหลังจาก Auto-Save
-                total_elapsed_time = full_elapsed_seconds
-                training_start = time.time() # เริ่มนับเวลา session ใหม่
-                data.clear()
-                last_display_time = training_start
-                print("🚨 Auto-Save completed. Monitoring session reset to continue tracking...\n")
-                samples_collected = 0
-
-        # บันทึก/แสดงผลตาม Sampling Rate
-        if samples_collected >= required_samples:
+            data.extend(buffer)
+            buffer.clear()
             
-            # คำนวณค่าเฉลี่ยของ samples ที่รวบรวมได้
-            avg_cpu = sum(x[1] for x in samples) / len(samples) if samples else 0
-            avg_ram = sum(x[2] for x in samples) / len(samples) if samples else 0
-            current_full_elapsed = samples[-1][0] if samples else full_elapsed_seconds
-            samples.clear()
-            samples_collected = 0 # รีเซ็ตตัวนับ samples
+            # ส่ง store ทั้งก้อนให้ writer (ไม่คัดลอก) แล้วเก็บต่อใน store ใหม่
+            data = queue_auto_save(writer, data, full_source, auto_save_path, policy)
             
-            timestamp_str = format_duration(current_full_elapsed)
-            
-            # ใช้ full_source ในการสร้าง row สำหรับบันทึก/แสดงผล
-            row = (current_full_elapsed, avg_cpu, avg_ram, full_source) 
+            # รีเซ็ตค่าหลังจาก Auto-Save (นาฬิกาของ scheduler เดินต่อ ไม่เริ่มนับใหม่)
+            total_elapsed_time = full_elapsed_seconds
+            session_start = now # เริ่มนับเวลา session ใหม่
+            last_display_time = now
+            print("🚨 Auto-Save queued. Monitoring session reset to continue tracking...\n")
+            overhead.lap("flush", mark)
 
-            if display_mode == 1: # Real-time
-                # FIX: ใช้ display_source สำหรับการแสดงผลใน Terminal
-                print(f"{timestamp_str:<15} {avg_cpu:<10.2f} {avg_ram:<12.2f} {display_source:<45}") 
-                data.append(row)
-            else: # Buffered
-                buffer.append(row)
-                if time.time() - last_display_time >= get_update_interval(current_session_elapsed):
-                    for b in buffer:
-                        # FIX: ใช้ display_source สำหรับการแสดงผลใน Terminal
-                        print(f"{format_duration(b[0]):<15} {b[1]:<10.2f} {b[2]:<12.2f} {display_source:<45}") 
-                    data.extend(buffer)
-                    buffer.clear()
-                    last_display_time = time.time()
-        
-        # หน่วงเวลาที่เหลือ
-        time_spent = time.time() - start_of_sample
-        sleep_time = max(0, sample_interval - time_spent) # ใช้ sample_interval (0.1s) เป็นฐาน
-        time.sleep(sleep_time)
+        if overhead.end(full_elapsed_seconds, tick_start, writer.pending, len(buffer)):
+            report_overhead_level(overhead, display_mode)
 
     # Flush data ที่เหลือใน buffer
     if display_mode == 2 and buffer:
@@ -279,17 +624,231 @@ def monitor(samrate, display_mode, auto_save_path=None, total_elapsed_time=0.0):
             print(f"{format_duration(b[0]):<15} {b[1]:<10.2f} {b[2]:<12.2f} {display_source:<45}") 
         data.extend(buffer)
 
+    (ptree or sampler).close()
+    if extra is not None:
+        extra.close()
     print("\n⏹️ Training stopped.")
+    print(f"⏱️ Sampling: {scheduler.summary()}")
+    data.meta.update(scheduler.meta())
+    if rate is not None:
+        print(f"🎚️ Adaptive sampling: {rate.summary()}")
+        data.meta.update(rate.meta())
+    # รอ writer เขียนงานที่ค้างให้เสร็จก่อน (final save ต่อท้ายไฟล์เดียวกัน ต้องเรียงลำดับ)
+    writer.close()
+    if writer.submitted or writer.dropped:
+        print(f"💾 Auto-save writer: {writer.summary()}")
+        data.meta.update(writer.meta())
+    if listener:
+        listener.close()
+    rollup.flush()
+    data.rollup = rollup
+    data.stats = stats
+    data.markers = markers
+    finish_overhead(data, overhead)
+    if threads is not None:
+        finish_breakdown(data, threads)
+    if watch is not None:
+        finish_anomaly(data, watch)
+    if stats:
+        data.meta.update(stats.meta())
+        print_stats(stats)
+    if log:
+        log.write_meta(data.meta)
+        if stats:
+            log.write_stats(stats)
+        log.close()
     
-    final_total_elapsed_time = total_elapsed_time + (time.time() - training_start)
+    final_total_elapsed_time = total_elapsed_time + (scheduler.elapsed() - session_start)
     
     # คืนค่า auto_save_path ที่ถูกสร้างขึ้นอัตโนมัติกลับไปด้วย
     return data, full_source, final_total_elapsed_time, auto_save_path
 
+def monitor_many(samrate, display_mode, auto_save_path=None, total_elapsed_time=0.0, tree=False, log_path=None, thresholds=None, policy=None, metrics=None, listen_markers=True, budget=DEFAULT_BUDGET, anomaly=None):
+    """
+    ติดตามหลายโปรเซสพร้อมกันใน loop เดียว (ไม่มี thread ต่อโปรเซส)
+    - ค้นหาโปรเซสใหม่ทุก DISCOVERY_INTERVAL วินาที -> โปรเซสเข้า/ออกกลาง session ได้
+    - ทุกแถวมีคอลัมน์ PID และ source ของโปรเซสนั้น
+    - tree=True: ค่าของแต่ละ PID เป็นผลรวมทั้ง process tree, ค่ารายลูกอยู่ที่ records.children
+    - สถิติ (records.stats) แยกต่อ PID
+    - anomaly: ตรวจ RSS/CPU แยกต่อ PID (detector ของ PID ที่ออกไปแล้วถูกทิ้ง)
+    - จบ session เมื่อไม่มีโปรเซสเป้าหมายเหลืออยู่
+
+    :returns: (records, source, final_total_elapsed_time, final_auto_save_path)
+    """
+    DISCOVERY_INTERVAL = 2.0
+    MAX_DISPLAY_LEN = 45
+
+    print("🔍 Waiting for training processes (multi-target mode)...")
+    targets = TargetSet(tree=tree)
+    while not targets.sync(find_training_processes(), 0.0):
+        get_detector().wait(1.0)
+
+    summary_source = "Multiple training processes"
+    data = SampleStore(summary_source, columns=MULTI_COLUMNS)
+    if tree:
+        data.track_children()
+    buffer = data.empty_like()
+
+    def short(text):
+        return text[:MAX_DISPLAY_LEN-3] + "..." if len(text) > MAX_DISPLAY_LEN else text
+
+    def print_row(elapsed, pid, cpu, ram):
+        print(f"{format_duration(elapsed):<15} {pid:<8d} {cpu:<10.2f} {ram:<12.2f} {short(targets.targets[pid].source):<45}")
+
+    for t in targets.active.values():
+        data.register_source(t.pid, t.source)
+        print(f"\n✅ Detected training from: {t.source}")
+    if display_mode:
+        print(f"{'Time (H:MM:SS.ms)':<15} {'PID':<8} {'CPU (%)':<10} {'RAM (MB)':<12} {'Source':<45}")
+
+    # 1 tick = samrate สำหรับทุกโปรเซส (deadline บนนาฬิกา monotonic, ดู TickScheduler)
+    scheduler = TickScheduler(samrate)
+    session_start = 0.0
+    last_display_time = 0.0
+    last_discovery = 0.0
+    data.started_at = buffer.started_at = scheduler.wall_anchor
+    log = open_run_log(log_path, data)
+    rollup = Rollup.for_store(data)
+    stats = SessionStats.for_store(data, thresholds)
+    # Auto-Save เขียนไฟล์ใน thread แยก -> loop นี้ไม่ต้องรอ I/O
+    writer = BackgroundWriter()
+    policy = policy or FlushPolicy()
+    listener = open_marker_listener(listen_markers)
+    markers = []
+    watch = open_anomaly_watch(anomaly)
+    overhead = Overhead(budget)
+
+    while True:
+        scheduler.wait()
+        tick_start = mark = overhead.begin()
+        now = scheduler.elapsed()
+        current_session_elapsed = now - session_start
+        full_elapsed_seconds = total_elapsed_time + current_session_elapsed
+
+        # --- ค้นหาโปรเซสที่เพิ่งเริ่ม (เป็นระยะ ไม่ใช่ทุก tick) ---
+        if now - last_discovery >= DISCOVERY_INTERVAL:
+            last_discovery = now
+            for t in targets.sync(find_training_processes(), full_elapsed_seconds):
+                data.register_source(t.pid, t.source)
+                if log:
+                    log.register_source(t.pid, t.source)
+                print(f"➕ Joined PID {t.pid}: {short(t.source)}")
+
+        # --- อ่านค่าทุกโปรเซสในรอบเดียว ---
+        samples, left = targets.sample(full_elapsed_seconds)
+        mark = overhead.lap("sample", mark)
+        show_rows = scheduler.ticks % overhead.display_stride == 0
+        for t in left:
+            print(f"➖ Left PID {t.pid} after {format_duration(t.left - t.joined)}")
+            if watch is not None:
+                watch.discard(t.pid)
+        if not targets.active:
+            print("\nℹ️ No training process left. Stopping.")
+            break
+
+        for pid, cpu, ram in samples:
+            rollup.add(full_elapsed_seconds, pid, cpu, ram)
+            stats.add(full_elapsed_seconds, pid, cpu, ram)
+            if log:
+                log.append(full_elapsed_seconds, pid, cpu, ram)
+            if display_mode == 1: # Real-time
+                if show_rows:
+                    print_row(full_elapsed_seconds, pid, cpu, ram)
+                data.append(full_elapsed_seconds, pid, cpu, ram)
+            elif display_mode == 2: # Buffered
+                buffer.append(full_elapsed_seconds, pid, cpu, ram)
+            else: # Quiet (daemon)
+                data.append(full_elapsed_seconds, pid, cpu, ram)
+            if watch is not None:
+                alerts = watch.add(full_elapsed_seconds, pid, cpu, ram)
+                if alerts:
+                    record_alerts(alerts, markers, log)
+        if metrics is not None:
+            metrics.update(samples, scheduler, data.sources, overhead)
+
+        if tree:
+            children = (buffer if display_mode == 2 else data).children
+            for child_pid, child_cpu, child_ram in targets.children:
+                if child_pid not in children.sources:
+                    children.sources.update(targets.child_sources())
+                children.append(full_elapsed_seconds, child_pid, child_cpu, child_ram)
+                if log:
+                    log.children.register_source(child_pid, children.sources.get(child_pid, ""))
+                    log.children.append(full_elapsed_seconds, child_pid, child_cpu, child_ram)
+        if listener:
+            collect_markers(listener, markers, full_elapsed_seconds, log, display_mode)
+        mark = overhead.lap("aggregate", mark)
+
+        if display_mode == 2 and now - last_display_time >= get_update_interval(current_session_elapsed) * overhead.display_stride:
+            for b in buffer:
+                print_row(b[0], b[4], b[1], b[2])
+            data.extend(buffer)
+            buffer.clear()
+            last_display_time = now
+            mark = overhead.lap("display", mark)
+
+        # *** Auto-Save กลางทาง (ตาม FlushPolicy: ค่าเริ่มต้นทุก 1 ชม. = 3600 วินาที) ***
+        if policy.due(current_session_elapsed, data, buffer):
+            if auto_save_path is None:
+                auto_save_path = get_autosave_path('csv')
+                print(f"\n🔔 Auto-save triggered! Auto-generating file: {os.path.basename(auto_save_path)}")
+            data.extend(buffer)
+            buffer.clear()
+            data = queue_auto_save(writer, data, summary_source, auto_save_path, policy)
+            total_elapsed_time = full_elapsed_seconds
+            session_start = now
+            last_display_time = now
+            print("🚨 Auto-Save queued. Monitoring session reset to continue tracking...\n")
+            overhead.lap("flush", mark)
+
+        if overhead.end(full_elapsed_seconds, tick_start, writer.pending, len(buffer)):
+            report_overhead_level(overhead, display_mode)
+
+    # Flush data ที่เหลือใน buffer
+    if buffer:
+        for b in buffer:
+            print_row(b[0], b[4], b[1], b[2])
+        data.extend(buffer)
+
+    print("\n⏹️ Training stopped.")
+    print(f"⏱️ Sampling: {scheduler.summary()}")
+    data.meta.update(scheduler.meta())
+    # รอ writer เขียนงานที่ค้างให้เสร็จก่อน (final save ต่อท้ายไฟล์เดียวกัน ต้องเรียงลำดับ)
+    writer.close()
+    if writer.submitted or writer.dropped:
+        print(f"💾 Auto-save writer: {writer.summary()}")
+        data.meta.update(writer.meta())
+    if listener:
+        listener.close()
+    rollup.flush()
+    data.rollup = rollup
+    data.stats = stats
+    data.markers = markers
+    finish_overhead(data, overhead)
+    if watch is not None:
+        finish_anomaly(data, watch)
+    if stats:
+        data.meta.update(stats.meta())
+        print_stats(stats)
+    if log:
+        log.write_meta(data.meta)
+        if stats:
+            log.write_stats(stats)
+        log.close()
+    final_total_elapsed_time = total_elapsed_time + (scheduler.elapsed() - session_start)
+    return data, summary_source, final_total_elapsed_time, auto_save_path
+
 # ==============================================================================
 # 3. EXPORT FUNCTIONS (Non-Auto-Save)
 # ==============================================================================
 
+def export_footer(data, source):
+    """แถวท้ายไฟล์ส่งออก: source + meta ของรอบ (สถิติ, การ sample, writer, overhead, anomaly ฯลฯ) + marker"""
+    footer = [["Command/Source:", source]] + [[label, value] for label, value in data.meta.items()]
+    if data.markers:
+        footer += [[]] + marker_rows(data.markers, format_duration)
+    return footer
+
 def export_excel(data, source, filename=None):
     """ส่งออกข้อมูลเป็นไฟล์ Excel (เขียนใหม่ทั้งหมด)"""
     if not filename:
@@ -297,21 +856,16 @@ def export_excel(data, source, filename=None):
     if not filename:
         filename = f"monitor_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
     full_filename = f"{filename}.xlsx"
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Monitoring_Log"
-    # FIX: เปลี่ยนชื่อหัวตาราง
-    ws.append(["Time (H:MM:SS.ms)", "CPU (%)", "RAM (MB)", "Source"])
-    for row in data:
-        formatted_row = [format_duration(row[0])] + list(row[1:])
-        ws.append(formatted_row)
-    ws.append([])
-    ws.append(["Command/Source:", source])
+    rows = ([format_duration(row[0])] + list(row[1:]) for row in data)
     try:
-        wb.save(full_filename)
+        # write-only + ขึ้น sheet ใหม่อัตโนมัติเมื่อเกินขีดจำกัดแถวของ Excel
+        write_xlsx(full_filename, rows, header=data.header(), footer=export_footer(data, source))
         print(f"📁 Saved Excel to {os.path.abspath(full_filename)}")
     except Exception as e:
         print(f"❌ Error saving Excel file: {e}")
+        return
+    if data.children:
+        export_excel(data.children, source, f"{filename}_children")
 
 def export_csv(data, source, filename=None):
     """ส่งออกข้อมูลเป็นไฟล์ CSV (เขียนใหม่ทั้งหมด)"""
@@ -323,16 +877,108 @@ def export_csv(data, source, filename=None):
     try:
         with open(full_filename, mode='w', newline='', encoding='utf-8') as file:
             writer = csv.writer(file)
-            # FIX: เปลี่ยนชื่อหัวตาราง
-            writer.writerow(["Time (H:MM:SS.ms)", "CPU (%)", "RAM (MB)", "Source"])
+            writer.writerow(data.header())
             for row in data:
                 formatted_row = [format_duration(row[0])] + list(row[1:])
                 writer.writerow(formatted_row)
             writer.writerow([])
-            writer.writerow(["Command/Source:", source])
+            writer.writerows(export_footer(data, source))
         print(f"📁 Saved CSV to {os.path.abspath(full_filename)}")
     except Exception as e:
         print(f"❌ Error saving CSV file: {e}")
+        return
+    if data.children:
+        export_csv(data.children, source, f"{filename}_children")
+
+def export_columnar_file(data, extension, filename=None):
+    """
+    ส่งออกแบบคอลัมน์ (.parquet / .arrow) ต้องมี pyarrow
+    - เวลาเป็นวินาที (float) + เวลาเริ่มจริงใน metadata แทนข้อความ H:MM:SS.ms
+    """
+    if not filename:
+        filename = input(f"Enter {extension} filename (without extension): ").strip()
+    if not filename:
+        filename = f"monitor_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    full_filename = f"{filename}{extension}"
+    try:
+        export_columnar(full_filename, data)
+        print(f"📁 Saved {extension.lstrip('.').capitalize()} to {os.path.abspath(full_filename)}")
+    except ImportError:
+        print("❌ Parquet/Arrow export requires pyarrow (pip install pyarrow).")
+    except Exception as e:
+        print(f"❌ Error saving {extension} file: {e}")
+
+def select_tier(records, tier):
+    """
+    ข้อมูลที่จะส่งออกตาม -tier: "raw" = ทุก sample, "1s"/"1m"/"1h" = rollup (count + min/max/mean ต่อ bucket)
+    - ใช้ rollup ที่เก็บไว้ระหว่าง monitor (ครอบคลุมทั้ง run แม้ Auto-Save ล้างข้อมูลดิบไปแล้ว)
+      ถ้าไม่มี (เช่น -convert) จะคำนวณจากข้อมูลดิบ
+    - series รายโปรเซสลูก (-tree) ส่งออกเฉพาะแบบ raw
+    """
+    level = tier_index(tier)
+    if level is None:
+        return records
+    rollup = records.rollup or Rollup.from_store(records)
+    view = rollup.view(level)
+    view.stats = records.stats
+    view.markers = records.markers
+    return view
+
+def export_series(series, source, args, filename):
+    """series เสริมของ run -> ไฟล์แยกตามชนิดไฟล์ที่เลือก (ค่าเริ่มต้น CSV)"""
+    if args.excel:
+        export_excel(series, source, filename)
+    elif args.parquet or args.arrow:
+        export_columnar_file(series, '.parquet' if args.parquet else '.arrow', filename)
+    else:
+        export_csv(series, source, filename)
+
+def export_side_series(records, args, base):
+    """
+    series เสริมของ run เป็นไฟล์แยก <base>_<ชื่อ>:
+    - -overhead: ต้นทุนของตัวมอนิเตอร์เอง (ทุก 10 วิ) -> <base>_overhead
+    - -breakdown: CPU ราย thread (long format) -> <base>_threads, ราย core -> <base>_cores
+    """
+    base = base or 'monitor_' + datetime.now().strftime('%Y%m%d_%H%M%S')
+    if args.overhead and records.overhead:
+        export_series(records.overhead, "perfmon overhead", args, f"{base}_overhead")
+    if records.threads:
+        export_series(records.threads, records.threads.source, args, f"{base}_threads")
+    if records.cores:
+        export_series(records.cores, records.cores.source, args, f"{base}_cores")
+
+def export_records(records, source, args, filename=None):
+    """ส่งออกตาม flag ที่เลือก (-excel / -csv / -parquet / -arrow) -> False ถ้าไม่ได้เลือก"""
+    records = select_tier(records, args.tier)
+    if args.excel:
+        export_excel(records, source, filename)
+    elif args.csv:
+        export_csv(records, source, filename)
+    elif args.parquet:
+        export_columnar_file(records, '.parquet', filename)
+    elif args.arrow:
+        export_columnar_file(records, '.arrow', filename)
+    else:
+        return False
+    return True
+
+def convert_log(path, args):
+    """แปลงไฟล์บันทึกหลัก (.pmlog) ตาม flag ส่งออก (ค่าเริ่มต้น CSV) ส่วนท้ายที่เขียนไม่ครบหลังโปรแกรมล่มจะถูกข้าม"""
+    try:
+        records = read_log(path)
+    except (OSError, ValueError) as e:
+        print(f"❌ Cannot read {path}: {e}")
+        return
+    print(f"📖 Read {len(records)} rows from {os.path.basename(path)}")
+    # สถิติที่บันทึกไว้ (รวมทุก session ในไฟล์) หรือคำนวณจากข้อมูลดิบสำหรับไฟล์ที่ไม่มี
+    if not records.stats and records:
+        records.stats = SessionStats.from_store(records, parse_thresholds(args.threshold))
+    if records.stats:
+        records.meta.update(records.stats.meta())
+        print_stats(records.stats)
+    filename = args.n or os.path.splitext(path)[0]
+    if not export_records(records, records.source, args, filename):
+        export_csv(select_tier(records, args.tier), records.source, filename)
 
 
 # ==============================================================================
@@ -343,6 +989,11 @@ def main_cli(args):
     """ฟังก์ชันสำหรับโหมด CLI"""
     s = args.s
     mode = 1 if args.rt else 2
+    log_path = get_log_path(args)
+    thresholds = parse_thresholds(args.threshold)
+    policy = parse_flush_policy(args)
+    extra_metrics = parse_metrics(args.metrics)
+    anomaly = parse_anomaly_options(args)
 
     auto_save_path = None
     if args.autosave:
@@ -356,19 +1007,19 @@ def main_cli(args):
             export_type = 'csv'
             
         auto_save_path = get_autosave_path(export_type, args.n)
-        print(f"🛠️ Auto-Save mode enabled. Target file: {os.path.basename(auto_save_path)}")
+        print(f"🛠️ Auto-Save mode enabled. Target file: {os.path.basename(auto_save_path)} ({policy.describe()})")
         
     # รับค่า final_auto_save_path จาก monitor
-    records, source, final_total_elapsed_time, auto_save_path = monitor(s, mode, auto_save_path=auto_save_path)
+    records, source, final_total_elapsed_time, auto_save_path = monitor(s, mode, auto_save_path=auto_save_path, multi=args.multi, tree=args.tree, log_path=log_path, thresholds=thresholds, policy=policy, listen_markers=not args.nomarkers, budget=args.budget, extra_metrics=extra_metrics, breakdown=args.breakdown, adaptive=args.adaptive, anomaly=anomaly)
+    all_stats = combine_stats(None, records)
 
     # --- จัดการ Export (กรณีมีข้อมูลที่เหลือจากการ Auto-Save หรือเป็น Non-Auto-Save) ---
     if auto_save_path and (records or final_total_elapsed_time > 0.0):
         print(f"Saving final data to: {os.path.basename(auto_save_path)}")
-        auto_save_to_file(records, source, auto_save_path)
-    elif args.excel:
-        export_excel(records, source, args.n)
-    elif args.csv:
-        export_csv(records, source, args.n)
+        save_autosave_batch(records, source, auto_save_path, policy, final=True)
+    else:
+        export_records(records, source, args, args.n)
+    export_side_series(records, args, args.n or (auto_save_path and os.path.splitext(auto_save_path)[0]))
 
     # --- จบการทำงานถ้ามี -end ---
     if args.end:
@@ -387,12 +1038,13 @@ def main_cli(args):
         if post == '1':
             print("\n" + "-"*40 + "\n")
             # เมื่อรอเทรนใหม่ ให้ส่ง auto_save_path เดิมไปเพื่อให้บันทึกต่อเนื่องได้
-            records, source, final_total_elapsed_time, auto_save_path = monitor(s, mode, auto_save_path=auto_save_path, total_elapsed_time=0.0)
+            records, source, final_total_elapsed_time, auto_save_path = monitor(s, mode, auto_save_path=auto_save_path, total_elapsed_time=0.0, multi=args.multi, tree=args.tree, log_path=log_path, thresholds=thresholds, policy=policy, listen_markers=not args.nomarkers, budget=args.budget, extra_metrics=extra_metrics, breakdown=args.breakdown, adaptive=args.adaptive, anomaly=anomaly)
+            all_stats = combine_stats(all_stats, records)
             continue
         elif post == '2':
-            export_excel(records, source)
+            export_excel(select_tier(records, args.tier), source)
         elif post == '3':
-            export_csv(records, source)
+            export_csv(select_tier(records, args.tier), source)
         elif post == '4':
             print("\n" + "="*40 + "\n")
             main_interactive()
@@ -404,6 +1056,43 @@ def main_cli(args):
             print("❌ Invalid choice.")
 
 
+def main_daemon(args):
+    """
+    โหมด service (-daemon): ตรวจจับ + sample ต่อเนื่องไม่มีเมนู/input() และไม่พิมพ์รายแถว
+    - ค่าล่าสุดของทุกโปรเซส + counter ให้บริการที่ http://<bind>:<port>/metrics (Prometheus)
+    - จบรอบเทรนหนึ่ง -> บันทึกไฟล์ (ถ้าตั้งไว้) แล้วรอโปรเซสถัดไป, หยุดด้วย Ctrl+C
+    """
+    s = args.s or 1.0
+    log_path = get_log_path(args)
+    thresholds = parse_thresholds(args.threshold)
+    policy = parse_flush_policy(args)
+    extra_metrics = parse_metrics(args.metrics)
+    anomaly = parse_anomaly_options(args)
+    auto_save_path = get_autosave_path('xlsx' if args.excel else 'csv', args.n) if args.autosave else None
+    snapshot = MetricsSnapshot()
+    try:
+        server = MetricsServer(snapshot, args.bind, args.port)
+    except OSError as e:
+        print(f"❌ Cannot listen on {args.bind}:{args.port}: {e}")
+        return
+    print(f"📡 Daemon mode: serving metrics at {server.url} (Ctrl+C to stop)")
+    if auto_save_path:
+        print(f"🛠️ Auto-Save target file: {os.path.basename(auto_save_path)} ({policy.describe()})")
+    all_stats = None
+    try:
+        while True:
+            records, source, final_total_elapsed_time, auto_save_path = monitor(s, 0, auto_save_path=auto_save_path, multi=args.multi, tree=args.tree, log_path=log_path, thresholds=thresholds, policy=policy, metrics=snapshot, listen_markers=not args.nomarkers, budget=args.budget, extra_metrics=extra_metrics, breakdown=args.breakdown, adaptive=args.adaptive, anomaly=anomaly)
+            snapshot.idle()
+            all_stats = combine_stats(all_stats, records)
+            if auto_save_path and (records or final_total_elapsed_time > 0.0):
+                print(f"Saving final data to: {os.path.basename(auto_save_path)}")
+                save_autosave_batch(records, source, auto_save_path, policy, final=True)
+            print("\n" + "-"*40 + "\n")
+    except KeyboardInterrupt:
+        print("\n👋 Daemon stopped.")
+    finally:
+        server.close()
+
 def main_interactive(prefilled_s=None):
     """ฟังก์ชันสำหรับโหมด Interactive (โต้ตอบกับผู้ใช้)"""
     s = 0.0
@@ -475,6 +1164,9 @@ def main_interactive(prefilled_s=None):
         else:
             print("❌ Invalid choice.")
             
+    # --- ไฟล์บันทึกหลัก (.pmlog) บันทึกเสมอ แปลงเป็น CSV/XLSX ภายหลังด้วย -convert ---
+    log_path = get_autosave_path(LOG_EXTENSION.lstrip('.'))
+
     # --- Select Action ---
     while True: # Action loop
         print("\n▶️ Select action:")
@@ -488,13 +1180,14 @@ def main_interactive(prefilled_s=None):
 
         if action == '1':
             # รับค่า final_auto_save_path จาก monitor
-            records, source, final_total_elapsed_time, auto_save_path = monitor(s, mode, auto_save_path=auto_save_path)
+            records, source, final_total_elapsed_time, auto_save_path = monitor(s, mode, auto_save_path=auto_save_path, log_path=log_path)
+            all_stats = combine_stats(None, records)
             
             # จัดการบันทึกข้อมูลสุดท้าย
             # ใช้ auto_save_path ที่อาจถูกอัปเดตจาก monitor() แล้ว
             if auto_save_path and (records or final_total_elapsed_time > 0.0):
                 print(f"Saving final data to: {os.path.basename(auto_save_path)}")
-                auto_save_to_file(records, source, auto_save_path)
+                save_autosave_batch(records, source, auto_save_path, final=True)
                 
             # Post-monitoring loop
             while True: 
@@ -509,7 +1202,8 @@ def main_interactive(prefilled_s=None):
                 if post == '1':
                     print("\n" + "-"*40 + "\n")
                     # ส่ง auto_save_path ที่ถูกสร้างไปแล้ว
-                    records, source, final_total_elapsed_time, auto_save_path = monitor(s, mode, auto_save_path=auto_save_path, total_elapsed_time=0.0) 
+                    records, source, final_total_elapsed_time, auto_save_path = monitor(s, mode, auto_save_path=auto_save_path, total_elapsed_time=0.0, log_path=log_path)
+                    all_stats = combine_stats(all_stats, records)
                     continue
                 elif post == '2':
                     export_excel(records, source)
@@ -544,13 +1238,38 @@ def main():
     
     # --- Auto-Save Flag ---
     parser.add_argument("-autosave", action="store_true", help="Enable automatic saving every 1 hour. Requires an export type.")
+    parser.add_argument("-flush", action="append", metavar="COND=VALUE", help="Auto-save flush conditions instead of every 1 hour, whichever comes first, \ne.g. -flush rows=100000 -flush mb=64 -flush s=600 (repeatable).")
+    parser.add_argument("-rotate", type=float, metavar="MB", help="Start a new auto-save segment file (<name>_part001, _part002, ...) once the current one reaches MB. \nSegments are indexed by time range in <name>.manifest.json.")
+    parser.add_argument("-compress", choices=("gzip", "zstd"), help="Compress closed CSV auto-save segments in the background (zstd requires zstandard).")
     
     group_export = parser.add_mutually_exclusive_group()
     group_export.add_argument("-excel", action="store_true", help="For non-autosave: Export to Excel after monitoring. \nFor autosave: Select Excel (.xlsx) file type.")
     group_export.add_argument("-csv", action="store_true", help="For non-autosave: Export to CSV after monitoring. \nFor autosave: Select CSV (.csv) file type.")
+    group_export.add_argument("-parquet", action="store_true", help="Export to Parquet after monitoring (typed columns, requires pyarrow).")
+    group_export.add_argument("-arrow", action="store_true", help="Export to Arrow IPC (.arrow) after monitoring (typed columns, requires pyarrow).")
     
     parser.add_argument("-n", type=str, help="Filename for the export/autosave (without extension).")
     parser.add_argument("-end", action="store_true", help="End the program after monitoring and saving.")
+    parser.add_argument("-multi", action="store_true", help="Monitor all matching training processes concurrently (adds a PID column).")
+    parser.add_argument("-tree", action="store_true", help="Include child processes (e.g. DataLoader workers) in the totals and export per-child series to <name>_children.")
+    group_log = parser.add_mutually_exclusive_group()
+    group_log.add_argument("-log", type=str, help="Path of the crash-safe binary log (.pmlog) written every tick. \nDefault: Downloads/<-n or Data_timestamp>.pmlog. An existing log is recovered and appended to.")
+    group_log.add_argument("-nolog", action="store_true", help="Do not write the binary log.")
+    parser.add_argument("-convert", type=str, metavar="LOG", help="Convert a .pmlog file to CSV (or -excel/-parquet/-arrow) and exit. Use -n to set the output name.")
+    parser.add_argument("-threshold", action="append", metavar="METRIC=VALUE", help="Report time spent at or above a threshold, e.g. -threshold cpu=80 -threshold ram=8192 \n(repeatable; default: cpu=90).")
+    parser.add_argument("-nomarkers", action="store_true", help="Do not listen for step/epoch/phase markers from the training script (perfmon.markers).")
+    parser.add_argument("-daemon", action="store_true", help="Run as a service: detect and sample continuously without menus or per-row output, \nserving the latest CPU/RAM per process as Prometheus metrics on -bind:-port (default -s 1.0).")
+    parser.add_argument("-port", type=int, default=METRICS_PORT, help=f"Port of the -daemon metrics endpoint (default: {METRICS_PORT}).")
+    parser.add_argument("-bind", type=str, default="127.0.0.1", help="Address of the -daemon metrics endpoint (default: 127.0.0.1).")
+    parser.add_argument("-budget", type=float, default=DEFAULT_BUDGET, metavar="PCT", help=f"CPU budget of the monitor itself in percent of one core (default: {DEFAULT_BUDGET:g}). \nAbove it the display rate is lowered; 0 = measure only.")
+    parser.add_argument("-overhead", action="store_true", help="Also export the monitor's own overhead series (CPU, RSS, loop latency, queues every 10 s) to <name>_overhead.")
+    parser.add_argument("-metrics", action="append", metavar="NAME[,NAME]", help=f"Record extra per-process metrics as additional columns: {', '.join(REGISTRY)} \n(or io / mem / all). Expensive ones (uss, pss) are read every 10 ticks; set a cadence with NAME=TICKS, \ne.g. -metrics io,ctx,threads -metrics uss=30. Single-process mode only.")
+    parser.add_argument("-breakdown", action="store_true", help="Record per-thread CPU and the cores each thread ran on, exported to <name>_threads and <name>_cores, \nwith the busiest thread summarised (spots GIL-bound single-thread runs). Single-process mode only.")
+    parser.add_argument("-adaptive", type=float, nargs="?", const=ADAPTIVE_MAX, metavar="MAX", help=f"Adaptive sampling: sample every -s seconds while CPU/RAM change and double the interval \nwhile they are steady, up to MAX seconds (default: {ADAPTIVE_MAX:g}). Every row records its interval. Single-process mode only.")
+    parser.add_argument("-anomaly", nargs="?", const="", metavar="KEY=VALUE[,...]", help="Detect anomalies online for every monitored PID: RSS growing steadily (leak) and CPU level shifts \n(e.g. a collapse to near 0%% = likely I/O stall). Alerts are printed, added as markers and passed to the hooks. \nOptions: leak=MB_PER_MIN (default 10), window=S (RSS slope window, default 300), shift=FRACTION (default 0.5), hold=S (default 10).")
+    parser.add_argument("-onalert", action="append", metavar="CMD", help="Shell command run (without waiting) on every alert, with PERFMON_ALERT_KIND/_MESSAGE/_PID/_VALUE/_JSON in its environment. \nRepeatable. Implies -anomaly.")
+    parser.add_argument("-alertlog", type=str, metavar="PATH", help="Append every alert as one JSON line to PATH. Implies -anomaly.")
+    parser.add_argument("-tier", choices=("raw",) + TIER_NAMES, default="raw", help="Resolution of the export: raw samples (default) or 1s/1m/1h rollups \n(sample count + min/max/mean per bucket, kept for the whole run).")
     
     
     if len(sys.argv) == 1:
@@ -567,6 +1286,22 @@ def main():
         print("\n👋 Exiting.")
         return
         
+    try:
+        parse_thresholds(args.threshold)
+        parse_flush_policy(args)
+        parse_metrics(args.metrics)
+        parse_anomaly(args.anomaly)
+    except (ValueError, ImportError) as e:
+        print(f"\n❌ Error: {e}")
+        print("Here are the valid options:\n")
+        parser.print_help()
+        print("\n👋 Exiting.")
+        return
+
+    if args.convert:
+        convert_log(args.convert, args)
+        return
+
     if args.autosave and not (args.excel or args.csv):
         print("\n❌ Error: The -autosave argument must be paired with an export type (-excel or -csv).")
         print("Here are the valid options:\n")
@@ -574,8 +1309,25 @@ def main():
         print("\n👋 Exiting.")
         return
 
-    if args.n and not (args.excel or args.csv or args.autosave):
-        print("\n❌ Error: The -n argument can only be used with an export flag (-excel, -csv) or -autosave.")
+    if (args.flush or args.rotate is not None or args.compress) and not args.autosave:
+        print("\n❌ Error: The -flush, -rotate and -compress arguments can only be used with -autosave.")
+        print("Here are the valid options:\n")
+        parser.print_help()
+        print("\n👋 Exiting.")
+        return
+
+    if args.daemon:
+        if args.s is not None and not (0.1 <= args.s <= 10.0):
+            print("\n❌ Error: Sampling rate (-s) must be between 0.1 and 10.0.")
+            print("Here are the valid options:\n")
+            parser.print_help()
+            print("\n👋 Exiting.")
+            return
+        main_daemon(args)
+        return
+
+    if args.n and not (args.excel or args.csv or args.parquet or args.arrow or args.autosave):
+        print("\n❌ Error: The -n argument can only be used with an export flag (-excel, -csv, -parquet, -arrow) or -autosave.")
         print("Here are the valid options:\n")
         parser.print_help()
         print("\n👋 Exiting.")
@@ -591,7 +1343,7 @@ def main():
         main_cli(args)
         return
 
-    if args.s is not None and not any([args.rt, args.bf, args.excel, args.csv, args.n, args.end, args.autosave]):
+    if args.s is not None and not any([args.rt, args.bf, args.excel, args.csv, args.n, args.end, args.autosave, args.multi, args.tree, args.log, args.nolog, args.parquet, args.arrow, args.tier != "raw", args.threshold, args.nomarkers, args.overhead, args.budget != DEFAULT_BUDGET, args.metrics, args.breakdown, args.adaptive is not None, args.anomaly is not None, args.onalert, args.alertlog]):
         if not (0.1 <= args.s <= 10.0):
             print("\n❌ Error: Sampling rate (-s) must be between 0.1 and 10.0.")
             print("Here are the valid options:\n")
@@ -6,7 +6,26 @@
 - Auto-save ทุก 1 ชั่วโมง (หรือเมื่อถึงเงื่อนไข) ลงไฟล์ CSV/XLSX
     * ถ้า "ยังไม่ได้เลือกไฟล์" -> จะสร้างไฟล์ CSV อัตโนมัติในโฟลเดอร์ Downloads
 - Final save ตอนจบ (append ต่อไฟล์เดิมถ้ามี autosave มาก่อน)
-- ป้องกันกรณี "ไม่มีหัวตาราง" ด้วย _ensure_csv_header / _ensure_xlsx_header
+- ป้องกันกรณี "ไม่มีหัวตาราง" ด้วย _ensure_csv_header (CSV)
+- XLSX เขียนแบบ append-only ผ่าน XlsxAppendSink (ไม่ load/save ทั้งไฟล์ทุกรอบ)
+- ทุก sample ถูกเขียนลงไฟล์บันทึกหลัก .pmlog ทันที (binary append-only, ทนต่อโปรแกรมล่ม)
+    * เปิดกลับมาดู/ส่งออกเป็น CSV/XLSX ได้ด้วยปุ่ม "Open Log"
+- rollup 1 วิ/1 นาที/1 ชม. (count + min/max/mean) อัปเดตทุก sample ครอบคลุมทั้งรอบ
+    * เลือก "Resolution" เพื่อพล็อต/ส่งออกเป็น tier แทนข้อมูลดิบ (เหมาะกับ run ยาวหลายวัน)
+- สถิติของทั้งรอบ (mean/median/p95/p99/peak, เวลาที่ CPU >= 90%) อัปเดตทุก sample
+    * แสดงใต้ชื่อโปรเซส และต่อท้ายไฟล์ส่งออกทุกแบบ
+- เงื่อนไข auto-save ปรับได้ (เวลา / จำนวนแถว / ขนาดข้อมูล) + หมุนเป็นไฟล์ segment ตามขนาด
+    * segment ที่ปิดแล้วบีบอัดได้ (gzip/zstd, CSV) และมี manifest บอกช่วงเวลาของแต่ละ segment
+- รับ marker (step/epoch/phase/scalar) จากสคริปต์เทรนผ่าน perfmon.markers
+    * epoch/phase/mark วาดเป็นเส้นแนวตั้งบนกราฟ, ทุก marker ต่อท้ายไฟล์ส่งออกและอยู่ใน .pmlog
+- metric เสริม (I/O, context switches, threads, FDs, page faults, USS/PSS) เป็นคอลัมน์เพิ่ม (perfmon.registry)
+    * เลือก "Plot" เพื่อแสดง metric ใดก็ได้บนแกนล่างแทน RAM
+- "Thread/Core Breakdown": CPU ราย thread และราย core ของโปรเซส (perfmon.breakdown)
+    * แสดงเป็น heatmap ตามเวลา (ราย core / ราย thread ที่ใช้ CPU มากที่สุด) ใต้กราฟหลัก
+- "Rate": อัตราการ sample แบบปรับตัว (perfmon.adaptive) ค่า Sampling Rate = interval ต่ำสุด
+    * ถี่เมื่อ CPU/RAM เปลี่ยน ห่างขึ้นทีละ 2 เท่าเมื่อนิ่ง ทุกแถวมีคอลัมน์ interval (rollup/สถิติถ่วงน้ำหนักตามเวลา)
+- "Anomaly Alerts": ตรวจ RSS โตต่อเนื่อง (leak) / CPU เปลี่ยนระดับ แบบ online ทุก PID (perfmon.anomaly)
+    * alert แสดงที่แถบสถานะ + เส้น marker บนกราฟ + ต่อท้ายไฟล์ส่งออก/.pmlog
 """
 
 import sys
@@ -16,37 +35,87 @@ import threading
 import csv
 import os
 from datetime import datetime
+from itertools import chain
 
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QPushButton, QLabel,
     QFileDialog, QHBoxLayout, QDoubleSpinBox, QCheckBox,
-    QTableWidget, QTableWidgetItem, QSplitter, QHeaderView
+    QTableView, QSplitter, QHeaderView, QComboBox
 )
-from PyQt5.QtCore import Qt, pyqtSignal, QObject
-
-from openpyxl import Workbook, load_workbook
+from PyQt5.QtCore import Qt, pyqtSignal, QObject, QAbstractTableModel, QModelIndex
+
+from perfmon.adaptive import COLUMN as ADAPTIVE_COLUMN, AdaptiveRate
+from perfmon.anomaly import AnomalyWatch
+from perfmon.binlog import EXTENSION as LOG_EXTENSION, open_log, read_log
+from perfmon.breakdown import CORE_COLUMNS, ThreadBreakdown
+from perfmon.columnar import export_columnar
+from perfmon.detector import get_detector
+from perfmon.markers import LINE_KINDS, MarkerListener, marker_rows, place as place_markers
+from perfmon.downsample import minmax, visible_slice
+from perfmon.overhead import Overhead
+from perfmon.registry import ExtraSampler, parse_metrics
+from perfmon.rollup import Rollup, tier_index
+from perfmon.sampler import open_sampler
+from perfmon.scheduler import TickScheduler
+from perfmon.segments import FlushPolicy, check_compressor
+from perfmon.stats import SessionStats
+from perfmon.store import SampleStore, COLUMNS, MULTI_COLUMNS, column_label
+from perfmon.targets import TargetSet, find_training_processes
+from perfmon.tree import ProcessTree, children_path
+from perfmon.writer import BackgroundWriter
+from perfmon.xlsx_sink import XlsxAppendSink, write_xlsx
 
 from matplotlib.backends.backend_qt5agg import (
     FigureCanvasQTAgg as FigureCanvas,
     NavigationToolbar2QT as NavigationToolbar
 )
 from matplotlib.figure import Figure
+import numpy as np
+
+# ข้อความตัวอย่างสำหรับความกว้างคอลัมน์ของตาราง (ฟิลด์อื่นใช้ "100000.00 ")
+TABLE_SAMPLE_TEXT = {"elapsed": "Time (H:MM:SS.ms)", "cpu": "100.00 ", "pid": "4194304 "}
 
 
 # ------------------------------
 # ตัวกลางส่งสัญญาณ จาก thread ทำงานพื้นหลัง -> thread UI
 # ------------------------------
 class Worker(QObject):
-    # ส่งข้อมูล batch ให้ UI อัปเดต พร้อม action (เช่น "flush")
-    update_ui = pyqtSignal(list, str)
+    # ส่งข้อมูล batch (SampleStore) ให้ UI อัปเดต พร้อม action (เช่น "flush")
+    update_ui = pyqtSignal(object, str)
     # ส่งสัญญาณว่ามอนิเตอร์เสร็จสิ้น (เช่น โปรเซสตาย/จบ)
     finish_monitoring_signal = pyqtSignal(str)
+    # ส่งสัญญาณว่าเริ่มรอบใหม่ -> UI ผูกตาราง/กราฟกับ store ใหม่ (ต่อแบบ blocking)
+    session_started = pyqtSignal()
+
+
+# ------------------------------
+# แยกคอลัมน์ตาม PID -> {pid: (t, cpu, ram)} เป็น numpy arrays (ใช้กับโหมดหลายโปรเซส)
+# ------------------------------
+def split_by_pid(timestamps, cpu_vals, ram_vals, pids):
+    timestamps, cpu_vals, ram_vals = (np.asarray(v, dtype=np.float64) for v in (timestamps, cpu_vals, ram_vals))
+    pids = np.asarray(pids)
+    groups = {}
+    for p in np.unique(pids):
+        mask = pids == p
+        groups[int(p)] = (timestamps[mask], cpu_vals[mask], ram_vals[mask])
+    return groups
 
 
 # ------------------------------
 # วิดเจ็ตพล็อตกราฟ CPU/RAM ด้วย matplotlib
+# - เส้นหลักเก็บข้อมูลเต็มความละเอียดไว้ แต่ส่งให้ matplotlib เฉพาะจุดหลังลดจำนวน (min/max ต่อ pixel)
+#   ของช่วงที่มองเห็น -> วาดเร็วเท่าเดิมไม่ว่าประวัติจะยาวเท่าไร และ spike ไม่หาย
+# - zoom/pan จาก toolbar (xlim เปลี่ยน) -> คำนวณจุดใหม่ของช่วงนั้นที่ความละเอียดเต็ม
 # ------------------------------
 class PlotCanvas(QWidget):
+    REALTIME_WINDOW = 1000      # จำนวนจุดล่าสุดที่แสดงในโหมด real-time
+    HEADROOM = 0.25             # เผื่อที่ว่างแกน X/Y เพื่อไม่ต้องวาดใหม่ทั้งรูปบ่อยๆ
+    MAX_SEGMENTS = 100          # จำนวนเส้นย่อยสูงสุดก่อนรวมเป็นเส้นเดียว (วาดใหม่ทั้งรูป)
+    MIN_BUCKETS = 100           # จำนวน bucket ขั้นต่ำของการลดจุด (ตอนแกนยังไม่มีขนาดจริง)
+    OVERVIEW_BUCKETS = 16384    # series ที่ยาวกว่านี้ x4: เก็บฉบับลดจุดล่วงหน้าไว้ใช้ตอนมุมมองกว้าง
+    BAND_POINTS = 4000          # จำนวนจุดสูงสุดของแถบ min..max (โหมด rollup)
+    MAX_MARKERS = 200           # จำนวนเส้น marker (epoch/phase/mark) สูงสุดที่วาด
+
     def __init__(self, parent=None):
         super().__init__(parent)
         # Figure 1 อัน 2 แกน: CPU (บน) / RAM (ล่าง) และแชร์แกน X (เวลา)
@@ -72,44 +141,526 @@ class PlotCanvas(QWidget):
         self.ax_ram.grid(True)
         self.figure.tight_layout(rect=[0, 0.03, 1, 0.95])
 
-    def plot(self, timestamps, cpu_vals, ram_vals, is_real_time=True):
-        # ล้างของเดิมก่อนพล็อต
-        self.ax_cpu.clear()
-        self.ax_ram.clear()
+        # คอลัมน์ของแกนล่าง: RAM หรือ metric เสริมที่เลือก (set_lower)
+        self.lower = 'ram'
+
+        # เส้นหลักถาวร (ไม่ clear แกนทุกรอบ) -> อัปเดตด้วย set_data
+        self.cpu_line, = self.ax_cpu.plot([], [], '-', label='CPU (%)', color='tab:blue')
+        self.ram_line, = self.ax_ram.plot([], [], '-', label='RAM (MB)', color='tab:orange')
+
+        # สถานะการวาดแบบ incremental
+        self._segments = []         # เส้นย่อยของจุดใหม่ที่เพิ่มหลังการวาดเต็มครั้งล่าสุด
+        self._background = None     # ภาพพื้นหลัง (แกน/กริด/เส้นเดิม) สำหรับ blit
+        self._store = None          # SampleStore ที่กำลังพล็อตแบบ incremental
+        self._plotted = 0           # จำนวนแถวใน store ที่วาดไปแล้ว
+        self._real_time = None
+        self._auto_limits = None    # ขอบเขตแกนที่โปรแกรมตั้งเอง (ใช้ดูว่าผู้ใช้ zoom/pan อยู่หรือไม่)
+        self._pid_lines = {}        # โหมดหลายโปรเซส: pid -> (cpu_line, ram_line)
+        self._last_point = {}       # pid -> จุดสุดท้ายที่วาดแล้ว (ใช้ต่อเส้นย่อย)
+        self._series = []           # [(cpu_line, ram_line, t, cpu, ram, overview)] ข้อมูลเต็มความละเอียดของเส้นหลัก
+        self._setting_limits = False
+        self._bands = []            # แถบ min..max ของ rollup tier (fill_between)
+        self._marker_artists = []   # เส้น/ข้อความของ marker จากสคริปต์เทรน
+        self._markers_seen = 0      # จำนวน marker ที่ตรวจแล้ว (วาดเฉพาะตัวใหม่)
+
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+        self.canvas.mpl_connect('resize_event', self._on_resize)
+        self.ax_cpu.callbacks.connect('xlim_changed', self._on_xlim_changed)
+
+    def _on_draw(self, event):
+        # หลังวาดเต็มรูปทุกครั้ง เก็บภาพไว้เป็นพื้นหลังสำหรับ blit
+        self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+
+    def _on_resize(self, event):
+        # tight_layout เฉพาะตอนสร้าง/ขนาดเปลี่ยน/ชื่อแกนเปลี่ยน (set_lower) ไม่ใช่ทุกครั้งที่วาดใหม่
+        # (ต้นทุนราวครึ่งหนึ่งของการวาดเต็มรูป) / ความกว้างเปลี่ยน -> จำนวนจุดเปลี่ยน
+        self.figure.tight_layout(rect=[0, 0.03, 1, 0.95])
+        self._apply_downsample()
 
-        # ถ้า real-time และข้อมูลยาวมาก ให้ตัดเหลือท้ายๆ เพื่อประสิทธิภาพการวาด
-        if is_real_time and len(timestamps) > 1000:
-            timestamps = timestamps[-1000:]
-            cpu_vals = cpu_vals[-1000:]
-            ram_vals = ram_vals[-1000:]
+    def _on_xlim_changed(self, ax):
+        # zoom/pan: ลดจุดใหม่เฉพาะช่วงที่มองเห็น (เส้นย่อยที่ต่อท้ายไว้จะถูกรวมกลับเข้าเส้นหลักจาก store)
+        if self._setting_limits:
+            return
+        if self._segments and self._store is not None:
+            self._clear_segments()
+            self._set_series(*self._store_columns(self._store, self._real_time))
+        self._apply_downsample()
+        self.canvas.draw_idle()
+
+    def _apply_downsample(self):
+        # จุดที่ส่งให้เส้นหลัก = min/max ต่อ pixel ของช่วง X ที่มองเห็น (ไม่เกิน ~4 จุดต่อ pixel)
+        if not self._series:
+            return
+        lo, hi = self.ax_cpu.get_xlim()
+        buckets = max(int(self.ax_cpu.bbox.width), self.MIN_BUCKETS)
+        for cpu_line, ram_line, t, cpu_vals, ram_vals, overview in self._series:
+            if overview is not None and (hi - lo) / buckets >= (t[-1] - t[0]) / self.OVERVIEW_BUCKETS:
+                # 1 pixel กว้างกว่า 1 bucket ของ overview -> ลดจุดจาก overview (ค่าสุดขั้วยังอยู่ครบ)
+                for line, (ot, ov) in zip((cpu_line, ram_line), overview):
+                    start, stop = visible_slice(ot, lo, hi)
+                    line.set_data(*minmax(ot[start:stop], ov[start:stop], buckets))
+                continue
+            start, stop = visible_slice(t, lo, hi)
+            t_view = t[start:stop]
+            cpu_line.set_data(*minmax(t_view, cpu_vals[start:stop], buckets))
+            ram_line.set_data(*minmax(t_view, ram_vals[start:stop], buckets))
+
+    def _series_entry(self, cpu_line, ram_line, t, cpu_vals, ram_vals):
+        # series ยาวมาก: เตรียม overview (min/max ต่อ OVERVIEW_BUCKETS) ครั้งเดียว -> zoom out/pan ไม่ต้องไล่ทุกจุด
+        overview = None
+        if len(t) > 4 * self.OVERVIEW_BUCKETS:
+            overview = (minmax(t, cpu_vals, self.OVERVIEW_BUCKETS), minmax(t, ram_vals, self.OVERVIEW_BUCKETS))
+        return (cpu_line, ram_line, t, cpu_vals, ram_vals, overview)
+
+    def _current_limits(self):
+        return (self.ax_cpu.get_xlim(), self.ax_cpu.get_ylim(), self.ax_ram.get_ylim())
+
+    def _clear_segments(self):
+        for seg in self._segments:
+            seg.remove()
+        self._segments = []
+
+    def _clear_bands(self):
+        for band in self._bands:
+            band.remove()
+        self._bands = []
+
+    def _band(self, t, lo, hi):
+        # แถบยาวมาก: รวมช่วงที่ติดกันให้เหลือไม่เกิน BAND_POINTS จุด (ขอบแถบยังครอบค่าจริงทั้งหมด)
+        n = len(t)
+        if n <= self.BAND_POINTS:
+            return t, lo, hi
+        starts = np.arange(0, n, -(-n // self.BAND_POINTS))
+        return t[starts], np.minimum.reduceat(lo, starts), np.maximum.reduceat(hi, starts)
+
+    def _set_limits(self, timestamps, cpu_vals, ram_vals):
+        # ตั้งขอบเขตแกนพร้อมเผื่อที่ว่าง เพื่อให้จุดถัดๆ ไปวาดแบบ blit ได้โดยไม่ต้องขยายแกน
+        if len(timestamps) == 0:
+            self.ax_cpu.set_xlim(0, 1)
+            self.ax_cpu.set_ylim(0, 1)
+            self.ax_ram.set_ylim(0, 1)
+        else:
+            t0, t1 = timestamps[0], timestamps[-1]
+            span = max(t1 - t0, 1.0)
+            self.ax_cpu.set_xlim(t0, t1 + span * self.HEADROOM)
+
+            cpu_max = float(np.max(cpu_vals))
+            self.ax_cpu.set_ylim(0, max(cpu_max * (1 + self.HEADROOM), 1.0))
+
+            ram_min, ram_max = float(np.min(ram_vals)), float(np.max(ram_vals))
+            pad = max((ram_max - ram_min) * self.HEADROOM, ram_max * 0.05, 1.0)
+            self.ax_ram.set_ylim(max(0.0, ram_min - pad), ram_max + pad)
+        self._auto_limits = self._current_limits()
+
+    def _fits(self, timestamps, cpu_vals, ram_vals):
+        # จุดใหม่ยังอยู่ในกรอบแกนปัจจุบันหรือไม่
+        x_max = self.ax_cpu.get_xlim()[1]
+        cpu_lo, cpu_hi = self.ax_cpu.get_ylim()
+        ram_lo, ram_hi = self.ax_ram.get_ylim()
+        return (timestamps[-1] <= x_max
+                and cpu_lo <= min(cpu_vals) and max(cpu_vals) <= cpu_hi
+                and ram_lo <= min(ram_vals) and max(ram_vals) <= ram_hi)
+
+    def _pid_lines_for(self, pid):
+        # เส้น CPU/RAM ของแต่ละ PID (สีเดียวกันทั้ง 2 แกน) -> สร้างครั้งแรกที่เจอ PID นั้น
+        lines = self._pid_lines.get(pid)
+        if lines is None:
+            color = f"C{len(self._pid_lines) % 10}"
+            cpu_line, = self.ax_cpu.plot([], [], '-', label=f"PID {pid}", color=color)
+            ram_line, = self.ax_ram.plot([], [], '-', color=color)
+            lines = self._pid_lines[pid] = (cpu_line, ram_line)
+        return lines
+
+    def _store_columns(self, store, is_real_time):
+        # คอลัมน์ของ store สำหรับวาดเต็มรูป (real-time ตัดเหลือ REALTIME_WINDOW แถวท้าย)
+        start = max(0, len(store) - self.REALTIME_WINDOW) if is_real_time else 0
+        pids = np.frombuffer(store.column('pid', start), dtype=np.float64) if 'pid' in store.columns else None
+        return (np.frombuffer(store.column('elapsed', start), dtype=np.float64),
+                np.frombuffer(store.column('cpu', start), dtype=np.float64),
+                np.frombuffer(store.column(self.lower, start), dtype=np.float64), pids)
+
+    def _set_series(self, timestamps, cpu_vals, ram_vals, pids=None):
+        # ผูกข้อมูลเต็มความละเอียดกับเส้นหลัก (ยังไม่ลดจุด ดู _apply_downsample)
+        if pids is None:
+            self._series = [self._series_entry(self.cpu_line, self.ram_line, timestamps, cpu_vals, ram_vals)]
+            return
+        # โหมดหลายโปรเซส: 1 เส้นต่อ PID
+        self.cpu_line.set_data([], [])
+        self.ram_line.set_data([], [])
+        groups = split_by_pid(timestamps, cpu_vals, ram_vals, pids)
+        for pid in self._pid_lines:
+            if pid not in groups:
+                for line in self._pid_lines[pid]:
+                    line.set_data([], [])
+        self._series = []
+        for pid, (t, c, r) in groups.items():
+            cpu_line, ram_line = self._pid_lines_for(pid)
+            self._series.append(self._series_entry(cpu_line, ram_line, t, c, r))
+            self._last_point[pid] = (t[-1], c[-1], r[-1])
+        self.ax_cpu.legend(loc='upper left', fontsize='small')
+
+    def _draw_full(self, timestamps, cpu_vals, ram_vals, is_real_time, pids=None):
+        # วาดใหม่ทั้งรูป: รวมเส้นย่อยทั้งหมดกลับเป็นเส้นหลัก แล้วตั้งแกนใหม่
+        self._clear_segments()
+        self._clear_bands()
+        timestamps, cpu_vals, ram_vals = (np.asarray(v, dtype=np.float64) for v in (timestamps, cpu_vals, ram_vals))
+
+        # ถ้า real-time และข้อมูลยาวมาก ให้ตัดเหลือท้ายๆ (มุมมองแบบหน้าต่างเลื่อน)
+        if is_real_time and len(timestamps) > self.REALTIME_WINDOW:
+            timestamps = timestamps[-self.REALTIME_WINDOW:]
+            cpu_vals = cpu_vals[-self.REALTIME_WINDOW:]
+            ram_vals = ram_vals[-self.REALTIME_WINDOW:]
+            if pids is not None:
+                pids = pids[-self.REALTIME_WINDOW:]
+
+        self._set_series(timestamps, cpu_vals, ram_vals, pids)
+        self._setting_limits = True
+        try:
+            self._set_limits(timestamps, cpu_vals, ram_vals)
+        finally:
+            self._setting_limits = False
+        self._apply_downsample()
+        self.canvas.draw()
 
-        # พล็อต 2 เส้น: CPU (%) / RAM (MB)
-        self.ax_cpu.plot(timestamps, cpu_vals, '-', label='CPU (%)', color='tab:blue')
-        self.ax_cpu.set_ylabel("CPU Usage (%)")
-        self.ax_cpu.grid(True)
+    def plot(self, timestamps, cpu_vals, ram_vals, is_real_time=True, pids=None):
+        # วาดใหม่ทั้งรูปจากข้อมูลที่ให้มา (เช่น พล็อตสรุปหลังจบการเทรน)
+        self._store = None
+        self._plotted = 0
+        self._draw_full(timestamps, cpu_vals, ram_vals, is_real_time, pids)
+
+    def plot_rollup(self, store):
+        """
+        พล็อต rollup tier (SampleStore จาก Rollup.view): เส้น = mean, แถบจาง = min..max ของแต่ละ bucket
+        โหมดหลายโปรเซส: 1 เส้น + 1 แถบต่อ PID (สีเดียวกัน)
+        """
+        self._store = None
+        self._plotted = 0
+        self._clear_segments()
+        self._clear_bands()
+        cols = {name: np.frombuffer(store.column(name), dtype=np.float64) for name in store.columns}
+        t = cols['elapsed']
+        pids = cols.get('pid')
+        lower = self.lower
+        self._set_series(t, cols['cpu_mean'], cols[f'{lower}_mean'], pids)
+
+        if pids is None:
+            parts = [(self.cpu_line, self.ram_line, slice(None))]
+        else:
+            parts = [self._pid_lines[int(pid)] + (pids == pid,) for pid in np.unique(pids)]
+        for cpu_line, ram_line, sel in parts:
+            for ax, line, name in ((self.ax_cpu, cpu_line, 'cpu'), (self.ax_ram, ram_line, lower)):
+                band_t, lo, hi = self._band(t[sel], cols[f'{name}_min'][sel], cols[f'{name}_max'][sel])
+                self._bands.append(ax.fill_between(band_t, lo, hi, color=line.get_color(), alpha=0.2, linewidth=0))
+
+        # แกนครอบทั้งแถบ (ไม่ใช่แค่ค่าเฉลี่ย) / โหมดหลาย PID แถวไม่ได้เรียงตามเวลาทั้งก้อน
+        self._setting_limits = True
+        try:
+            self._set_limits(np.sort(t), cols['cpu_max'], np.r_[cols[f'{lower}_min'], cols[f'{lower}_max']])
+        finally:
+            self._setting_limits = False
+        self._apply_downsample()
+        self.canvas.draw()
 
-        self.ax_ram.plot(timestamps, ram_vals, '-', label='RAM (MB)', color='tab:orange')
-        self.ax_ram.set_ylabel("RAM Usage (MB)")
-        self.ax_ram.set_xlabel("Time (H:MM:SS)")
-        self.ax_ram.grid(True)
+    def append_from_store(self, store, is_real_time=True):
+        """
+        วาดเฉพาะแถวใหม่ของ store ตั้งแต่ครั้งก่อน -> ต้นทุน O(จำนวนจุดใหม่)
+        - จุดใหม่อยู่ในกรอบแกนเดิม: เพิ่มเป็นเส้นย่อย แล้ว blit ทับพื้นหลังที่เก็บไว้
+        - หลุดกรอบ / store ถูกรีเซ็ต / เปลี่ยนโหมด / เส้นย่อยเยอะเกิน / มี PID ใหม่: วาดใหม่ทั้งรูป
+          (แกนมีที่เผื่อไว้ จึงเกิดไม่บ่อย)
+        """
+        n = len(store)
+        pid_mode = 'pid' in store.columns
+        needs_full = (
+            store is not self._store
+            or n < self._plotted
+            or is_real_time != self._real_time
+            or self._background is None
+            or len(self._segments) >= self.MAX_SEGMENTS
+        )
+        if not needs_full and n == self._plotted:
+            return
 
-        self.figure.suptitle("CPU and RAM Usage Over Time")
+        if not needs_full:
+            # โหมดเดียว: รวมจุดสุดท้ายที่วาดไปแล้ว เพื่อให้เส้นต่อเนื่องกัน
+            # โหมดหลาย PID: จุดต่อเชื่อมดูจาก _last_point ของแต่ละ PID แทน
+            start = self._plotted if pid_mode else max(self._plotted - 1, 0)
+            timestamps = store.column('elapsed', start, n)
+            cpu_vals = store.column('cpu', start, n)
+            ram_vals = store.column(self.lower, start, n)
+            groups = None
+            if pid_mode:
+                groups = split_by_pid(timestamps, cpu_vals, ram_vals, store.column('pid', start, n))
+                needs_full = any(pid not in self._pid_lines for pid in groups)
+            # ถ้าผู้ใช้กำลัง zoom/pan อยู่ จะไม่ขยายแกนทับมุมมองของผู้ใช้
+            user_navigated = self._current_limits() != self._auto_limits
+            needs_full = needs_full or (not user_navigated and not self._fits(timestamps, cpu_vals, ram_vals))
+
+        self._store = store
+        self._real_time = is_real_time
+        self._plotted = n
+
+        if needs_full:
+            timestamps, cpu_vals, ram_vals, pids = self._store_columns(store, is_real_time)
+            self._draw_full(timestamps, cpu_vals, ram_vals, is_real_time, pids)
+            return
+
+        new_artists = []
+        if groups is None:
+            seg_cpu, = self.ax_cpu.plot(timestamps, cpu_vals, '-', color='tab:blue')
+            seg_ram, = self.ax_ram.plot(timestamps, ram_vals, '-', color='tab:orange')
+            new_artists.extend([seg_cpu, seg_ram])
+        else:
+            for pid, (t, c, r) in groups.items():
+                last = self._last_point.get(pid)
+                if last is not None:
+                    t, c, r = np.r_[last[0], t], np.r_[last[1], c], np.r_[last[2], r]
+                color = self._pid_lines[pid][0].get_color()
+                seg_cpu, = self.ax_cpu.plot(t, c, '-', color=color)
+                seg_ram, = self.ax_ram.plot(t, r, '-', color=color)
+                new_artists.extend([seg_cpu, seg_ram])
+                self._last_point[pid] = (t[-1], c[-1], r[-1])
+        self._segments.extend(new_artists)
+
+        if not self.canvas.supports_blit:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self._background)
+        for artist in new_artists:
+            artist.axes.draw_artist(artist)
+        self.canvas.blit(self.figure.bbox)
+        self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+
+    def add_markers(self, markers):
+        """
+        วาด marker ใหม่ (ตั้งแต่ครั้งก่อน) เป็นเส้นแนวตั้งบนทั้ง 2 แกน + ข้อความที่ขอบบนแกน CPU
+        เฉพาะ epoch/phase/mark (step/scalar ถี่เกินไปสำหรับเส้น) ไม่เกิน MAX_MARKERS เส้น
+        """
+        if len(markers) < self._markers_seen:
+            self.clear_markers()
+        new = markers[self._markers_seen:]
+        self._markers_seen += len(new)
+        added = False
+        for elapsed, kind, label, value in new:
+            if kind not in LINE_KINDS or len(self._marker_artists) >= 3 * self.MAX_MARKERS:
+                continue
+            text = label if kind == "phase" else f"{kind} {value:g} {label}".strip()
+            for ax in (self.ax_cpu, self.ax_ram):
+                self._marker_artists.append(ax.axvline(elapsed, color='gray', linestyle='--', linewidth=0.8, alpha=0.7))
+            self._marker_artists.append(self.ax_cpu.text(
+                elapsed, 1.0, text, transform=self.ax_cpu.get_xaxis_transform(),
+                rotation=90, fontsize='x-small', va='top', ha='right', color='gray'))
+            added = True
+        if added:
+            self.canvas.draw_idle()
+
+    def clear_markers(self):
+        for artist in self._marker_artists:
+            artist.remove()
+        self._marker_artists = []
+        self._markers_seen = 0
+
+    def set_lower(self, name):
+        """เปลี่ยนคอลัมน์ของแกนล่าง (เช่น 'uss', 'io_read') แล้วล้างกราฟ -> ผู้เรียกวาดใหม่"""
+        self.lower = name
+        label = column_label(name)
+        self.ax_ram.set_ylabel(label)
+        self.ram_line.set_label(label)
         self.figure.tight_layout(rect=[0, 0.03, 1, 0.95])
-        self.canvas.draw()
+        self.reset_graph()
 
     def reset_graph(self):
-        # ล้างกราฟและตั้ง label ใหม่ (ใช้เวลาปิด plotting หรือ reset ตาราง)
-        self.ax_cpu.clear()
-        self.ax_ram.clear()
-        self.ax_cpu.grid(True)
-        self.ax_ram.grid(True)
-        self.figure.suptitle("CPU and RAM Usage Over Time")
-        self.ax_cpu.set_ylabel("CPU Usage (%)")
-        self.ax_ram.set_ylabel("RAM Usage (MB)")
-        self.ax_ram.set_xlabel("Time (H:MM:SS)")
+        # ล้างกราฟ (ใช้เวลาปิด plotting หรือ reset ตาราง) -> label/กริดยังอยู่เพราะไม่ clear แกน
+        self._clear_segments()
+        self._clear_bands()
+        self.clear_markers()
+        self._store = None
+        self._plotted = 0
+        self._series = []
+        self.cpu_line.set_data([], [])
+        self.ram_line.set_data([], [])
+        for cpu_line, ram_line in self._pid_lines.values():
+            cpu_line.remove()
+            ram_line.remove()
+        self._pid_lines = {}
+        self._last_point = {}
+        legend = self.ax_cpu.get_legend()
+        if legend is not None:
+            legend.remove()
+        self._set_limits([], [], [])
         self.canvas.draw()
 
 
+# ------------------------------
+# heatmap CPU ราย core / ราย thread ตามเวลา (perfmon.breakdown)
+# - แกน Y = core (คงที่) หรือ thread ที่ใช้ CPU รวมมากที่สุด MAX_THREADS ตัว, แกน X = เวลา
+# - ลดจำนวนคอลัมน์เวลาเหลือไม่เกิน MAX_COLUMNS (ค่าสูงสุดต่อ bucket -> spike ไม่หาย)
+# - ใช้ AxesImage เดิมซ้ำ (set_data) ไม่สร้างแกน/colorbar ใหม่ทุกครั้ง
+# ------------------------------
+class HeatmapCanvas(QWidget):
+    MAX_COLUMNS = 1000          # จำนวนคอลัมน์เวลาสูงสุดที่วาด
+    MAX_THREADS = 32            # จำนวน thread สูงสุด (เรียงตาม CPU รวม)
+    MAX_TICKS = 16              # จำนวน label แกน Y สูงสุด
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.figure = Figure(figsize=(5, 2.5))
+        self.ax = self.figure.subplots()
+        self.canvas = FigureCanvas(self.figure)
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.canvas)
+        self.setLayout(layout)
+        self.ax.set_xlabel("Time (H:MM:SS)")
+        self._image = None
+
+    @classmethod
+    def _downsample(cls, t, matrix):
+        # คอลัมน์เวลาเกิน MAX_COLUMNS -> ค่าสูงสุดต่อ bucket (เติมแถวท้ายให้ครบ bucket ด้วย 0)
+        step = -(-len(t) // cls.MAX_COLUMNS)
+        if step <= 1:
+            return t, matrix
+        pad = -len(t) % step
+        if pad:
+            matrix = np.vstack([matrix, np.zeros((pad, matrix.shape[1]))])
+        return t[::step], matrix.reshape(-1, step, matrix.shape[1]).max(axis=1)
+
+    @staticmethod
+    def _core_matrix(cores):
+        # อ่านจำนวนแถวครั้งเดียว -> ทุกคอลัมน์ยาวเท่ากันแม้มีแถวใหม่ต่อท้ายระหว่างอ่าน
+        n = len(cores)
+        t = np.asarray(cores.column('elapsed', 0, n))
+        matrix = np.column_stack([np.asarray(cores.column(name, 0, n)) for name in CORE_COLUMNS[1:]])
+        return t, matrix, [f"core {i}" for i in range(matrix.shape[1])]
+
+    @classmethod
+    def _thread_matrix(cls, threads):
+        # long format (elapsed, tid, cpu) -> ตาราง [เวลา x thread] ของ thread ที่ใช้ CPU รวมมากที่สุด
+        n = len(threads)
+        t, tid, cpu = (np.asarray(threads.column(name, 0, n)) for name in ('elapsed', 'tid', 'cpu'))
+        times, t_index = np.unique(t, return_inverse=True)
+        tids, tid_index = np.unique(tid, return_inverse=True)
+        top = np.argsort(-np.bincount(tid_index, weights=cpu))[:cls.MAX_THREADS]
+        rank = np.full(len(tids), -1)
+        rank[top] = np.arange(len(top))
+        row = rank[tid_index]
+        keep = row >= 0
+        matrix = np.zeros((len(times), len(top)))
+        np.add.at(matrix, (t_index[keep], row[keep]), cpu[keep])
+        return times, matrix, [f"TID {int(tids[i])}" for i in top]
+
+    def matrices(self, breakdown, by="core"):
+        """สร้างตาราง (t, matrix, labels, title) จาก ThreadBreakdown: by = "core" (ถ้ามีข้อมูล core) หรือ "thread"
+        - ผู้เรียกต้องถือ lock เดียวกับที่ใช้ตอน breakdown.sample() ถ้า monitor thread ยังทำงานอยู่"""
+        if by == "core" and breakdown.cores:
+            t, matrix, labels = self._core_matrix(breakdown.cores)
+            return t, matrix, labels, "CPU per core (% of one core)"
+        if breakdown.threads:
+            t, matrix, labels = self._thread_matrix(breakdown.threads)
+            return t, matrix, labels, f"CPU per thread (top {len(labels)}, % of one core)"
+        return None
+
+    def draw(self, data):
+        """วาดผลของ matrices() -> ไม่แตะ breakdown จึงทำนอก lock ได้"""
+        if data is None:
+            return
+        t, matrix, labels, title = data
+        t, matrix = self._downsample(t, matrix)
+        extent = (t[0], t[-1] if t[-1] > t[0] else t[0] + 1.0, -0.5, len(labels) - 0.5)
+        if self._image is None:
+            self._image = self.ax.imshow(matrix.T, aspect='auto', origin='lower', interpolation='nearest',
+                                         cmap='magma', vmin=0.0, vmax=100.0, extent=extent)
+            self.figure.colorbar(self._image, ax=self.ax)
+        else:
+            self._image.set_data(matrix.T)
+            self._image.set_extent(extent)
+        step = max(1, -(-len(labels) // self.MAX_TICKS))
+        self.ax.set_yticks(range(0, len(labels), step))
+        self.ax.set_yticklabels(labels[::step])
+        self.ax.set_xlim(extent[0], extent[1])
+        self.ax.set_ylim(extent[2], extent[3])
+        self.ax.set_title(title)
+        self.canvas.draw_idle()
+
+    def reset(self):
+        if self._image is not None:
+            self._image.set_data(np.zeros((1, 1)))
+            self.canvas.draw_idle()
+
+
+# ------------------------------
+# โมเดลตารางแบบ virtual: อ่านค่าจาก SampleStore โดยตรง
+# - ไม่สร้าง item ต่อเซลล์ -> จัดรูปแบบข้อความเฉพาะแถวที่มองเห็นตอน data() ถูกเรียก
+# - แจ้งแถวใหม่ทีละ batch ด้วย beginInsertRows/endInsertRows
+# ------------------------------
+class SampleTableModel(QAbstractTableModel):
+    fields_changed = pyqtSignal(list)   # ชุดคอลัมน์เปลี่ยน (เช่น เข้าโหมดหลายโปรเซส / เพิ่ม metric) -> view ตั้งความกว้างใหม่
+
+    def __init__(self, store, format_duration, parent=None):
+        super().__init__(parent)
+        self._format_duration = format_duration
+        self._bind(store)
+
+    def _bind(self, store):
+        # คอลัมน์ของตารางตามฟิลด์ของ store (โหมดหลายโปรเซสจะมี PID เพิ่ม)
+        self._store = store
+        self._fields = store.fields()
+        self._headers = store.header()
+        self._rows = len(store)     # จำนวนแถวที่แจ้ง view ไปแล้ว
+
+    def fields(self):
+        return list(self._fields)
+
+    def set_store(self, store):
+        changed = store.fields() != self._fields
+        self.beginResetModel()
+        self._bind(store)
+        self.endResetModel()
+        if changed:
+            self.fields_changed.emit(self.fields())
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._rows
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._fields)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        row, field = index.row(), self._fields[index.column()]
+        if field == "source":
+            return self._store.row_source(row)
+        val = self._store.value(field, row)
+        if field == "elapsed":
+            return self._format_duration(val)  # คอลัมน์เวลา
+        if field == "pid":
+            return str(int(val))
+        return f"{val:.2f}"
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self._headers[section]
+        return str(section + 1)
+
+    def extend(self, batch):
+        # ต่อท้าย store ด้วย batch แล้วแจ้ง view ครั้งเดียวทั้งก้อน
+        if not batch:
+            return
+        first = self._rows
+        self.beginInsertRows(QModelIndex(), first, first + len(batch) - 1)
+        self._store.extend(batch)
+        self._rows = len(self._store)
+        self.endInsertRows()
+
+    def reset(self):
+        # หลัง store ถูก clear/เปลี่ยนจากภายนอก
+        self.beginResetModel()
+        self._rows = len(self._store)
+        self.endResetModel()
+
+
 # ------------------------------
 # วิดเจ็ตหลักของแอป
 # ------------------------------
@@ -128,16 +679,38 @@ class MonitorApp(QWidget):
         self.monitoring = False                 # กำลังมอนิเตอร์อยู่หรือไม่
         self.training_source = "Manual"         # แหล่งที่มา/คำสั่งแสดงในไฟล์ผลลัพธ์
         self.training_pid = None                # PID ของโปรเซสที่ติดตาม
-        self.data = []                          # ข้อมูลที่แสดงแล้วในตาราง/กราฟ
-        self.buffered_data = []                 # บัฟเฟอร์สะสมก่อน flush
+        self.data = SampleStore()               # ข้อมูลที่แสดงแล้วในตาราง/กราฟ (columnar)
+        self.buffered_data = SampleStore()      # บัฟเฟอร์สะสมก่อน flush
+        self._buffer_lock = threading.Lock()    # กัน thread มอนิเตอร์ append ขณะ UI สลับ buffer
         self.sampling_rate = 1.0                # คาบเวลาเก็บข้อมูล (วินาที)
-        self.training_start_time = None         # เวลาเริ่มนับของ session ปัจจุบัน
-        self.last_update_time = time.time()     # เวลา flush ล่าสุด
+        self.scheduler = None                   # TickScheduler ของรอบมอนิเตอร์ (นาฬิกา monotonic)
+        self.training_start_time = None         # scheduler.elapsed() ตอนเริ่ม session ปัจจุบัน
+        self.last_update_time = 0.0             # scheduler.elapsed() ตอน flush ล่าสุด
         self.update_interval = 2                # ช่วงเวลาระหว่างการ flush (โหมด buffered)
         self.initial_buffer_flushed = False     # เคย flush ครั้งแรกหรือยัง
         self.idle_start_time = None             # ใช้ขยายต่อได้ ถ้าต้อง detect idle
         self.IDLE_THRESHOLD_SECONDS = 30
         self.auto_save_path = None              # path ปลายทาง autosave/final save
+        self.run_log = None                     # BinLogWriter ของรอบนี้ (.pmlog เขียนทุก sample)
+        self.writer = None                      # BackgroundWriter ของรอบนี้ (เขียนไฟล์ auto-save แยก thread)
+        self.flush_policy = FlushPolicy()       # เงื่อนไข auto-save + การหมุน/บีบอัด segment ของรอบนี้
+        self.rollup = None                      # Rollup 1 วิ/1 นาที/1 ชม. ของทั้งรอบ (ไม่ถูกล้างตอน auto-save)
+        self._tier_plotted = None               # (tier, จำนวน bucket ที่ปิดแล้ว) ตอนพล็อต rollup ล่าสุด
+        self.stats = None                       # SessionStats ของทั้งรอบ (ไม่ถูกล้างตอน auto-save)
+        self.overhead = None                    # Overhead ของรอบนี้ (ต้นทุนของตัวมอนิเตอร์เอง + การลดอัตราแสดงผล)
+        self.extra = None                       # ExtraSampler ของรอบนี้ (metric เสริม, โหมดโปรเซสเดียว)
+        self.breakdown = None                   # ThreadBreakdown ของรอบนี้ (CPU ราย thread/core, โหมดโปรเซสเดียว)
+        self.adaptive = None                    # AdaptiveRate ของรอบนี้ (None = อัตราคงที่)
+        self.watch = None                       # AnomalyWatch ของรอบนี้ (None = ไม่ตรวจ)
+        self._heatmap_drawn = 0.0               # เวลา (monotonic) ที่วาด heatmap ล่าสุด
+        self.HEATMAP_INTERVAL = 5.0             # วาด heatmap ระหว่างทางไม่เกิน 1 ครั้งต่อกี่วินาที
+        self._plot_skipped = False              # งดวาดกราฟระหว่างทางเพราะเกิน budget -> วาดใหม่ตอนจบ
+        self.marker_listener = self.open_marker_listener()  # รับ marker จากสคริปต์เทรน (self.data.markers)
+        self.targets = None                     # TargetSet (โหมดหลายโปรเซส) / None = โปรเซสเดียว
+        self.process_tree = None                # ProcessTree (โหมดรวมโปรเซสลูก, โปรเซสเดียว)
+        self.child_rows = []                    # ค่ารายโปรเซสลูกของ sample ล่าสุด
+        self.last_discovery = 0.0               # เวลาค้นหาโปรเซสใหม่ครั้งล่าสุด (โหมดหลายโปรเซส)
+        self.DISCOVERY_INTERVAL = 2.0
 
         # เวลา cumulative ของทุก session (หลังจาก autosave จะ reset session time)
         self.total_elapsed_time = 0.0
@@ -152,22 +725,25 @@ class MonitorApp(QWidget):
         self.worker = Worker()
         self.worker.update_ui.connect(self.update_ui)
         self.worker.finish_monitoring_signal.connect(self.finish_monitoring)
+        # blocking: monitor thread รอจน UI ผูก store ใหม่เสร็จ ก่อนเริ่ม append ข้อมูลรอบนี้
+        self.worker.session_started.connect(self.start_monitoring_ui, Qt.BlockingQueuedConnection)
 
         # ---------- ตารางแสดงผล ----------
-        self.table = QTableWidget(0, 4)
+        # QTableView + โมเดลที่อ่านจาก self.data -> ต้นทุนขึ้นกับจำนวนแถวที่มองเห็นเท่านั้น
+        self.table_model = SampleTableModel(self.data, self.format_duration)
+        self.table = QTableView()
+        self.table.setModel(self.table_model)
         self.table.setWordWrap(False)
-        self.table.setHorizontalHeaderLabels(["Time (H:MM:SS.ms)", "CPU (%)", "RAM (MB)", "Source"])
         self.table.verticalHeader().setVisible(True)
-        self.table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
-        header = self.table.horizontalHeader()
-        header.setSectionResizeMode(0, QHeaderView.ResizeToContents)
-        header.setSectionResizeMode(1, QHeaderView.ResizeToContents)
-        header.setSectionResizeMode(2, QHeaderView.ResizeToContents)
-        header.setSectionResizeMode(3, QHeaderView.Stretch)
+        # ความสูงแถวคงที่ / ความกว้างคอลัมน์ตั้งตอนชุดคอลัมน์เปลี่ยนเท่านั้น (ไม่ ResizeToContents ที่ต้องไล่วัดทุกแถว)
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.table_model.fields_changed.connect(self.apply_table_columns)
+        self.apply_table_columns(self.table_model.fields())
 
         # ---------- Label สถานะ ----------
         self.status_label = QLabel("Status: Idle")
         self.source_label = QLabel("")
+        self.stats_label = QLabel("")
 
         # ---------- คอนโทรล UI ----------
         self.sampling_spinbox = QDoubleSpinBox()
@@ -186,11 +762,65 @@ class MonitorApp(QWidget):
         self.buffer_mode_checkbox = QCheckBox("Mode (tick=real-time, untick=buffered)")  # โหมด flush ทันที/เป็นช่วง
         self.buffer_mode_checkbox.setChecked(False)
 
+        self.multi_checkbox = QCheckBox("Monitor All Matching Processes")  # ติดตามทุกโปรเซสพร้อมกัน (มีคอลัมน์ PID)
+        self.multi_checkbox.setChecked(False)
+
+        self.tree_checkbox = QCheckBox("Include Child Processes")  # รวมโปรเซสลูก (DataLoader workers ฯลฯ)
+        self.tree_checkbox.setChecked(False)
+
+        # ความละเอียดของกราฟ/ไฟล์ส่งออก: ข้อมูลดิบ หรือ rollup tier
+        self.resolution_combo = QComboBox()
+        for label, tier in (("Raw", "raw"), ("1 s", "1s"), ("1 min", "1m"), ("1 h", "1h")):
+            self.resolution_combo.addItem(label, tier)
+        self.resolution_combo.currentIndexChanged.connect(self.change_resolution)
+
+        # metric เสริมที่เก็บเป็นคอลัมน์เพิ่ม (โหมดโปรเซสเดียว) / คอลัมน์ที่พล็อตบนแกนล่าง
+        self.metrics_combo = QComboBox()
+        for label, spec in (("CPU/RAM only", ""), ("+ I/O, ctx, threads, FDs, faults", "io,ctx,threads,fds,faults"),
+                            ("+ all (USS/PSS every 10 ticks)", "all")):
+            self.metrics_combo.addItem(label, spec)
+        self.plot_metric_combo = QComboBox()
+        self.plot_metric_combo.addItem(column_label('ram'), 'ram')
+        self.plot_metric_combo.currentIndexChanged.connect(self.change_plot_metric)
+
+        # อัตราการ sample: คงที่ หรือปรับตัวตั้งแต่ Sampling Rate ถึง interval สูงสุด (โหมดโปรเซสเดียว)
+        self.rate_combo = QComboBox()
+        for label, limit in (("Fixed rate", None), ("Adaptive up to 10 s", 10.0),
+                             ("Adaptive up to 30 s", 30.0), ("Adaptive up to 60 s", 60.0)):
+            self.rate_combo.addItem(label, limit)
+
+        # CPU ราย thread/core (โหมดโปรเซสเดียว) -> heatmap ใต้กราฟหลัก
+        self.breakdown_checkbox = QCheckBox("Thread/Core Breakdown")
+        self.breakdown_checkbox.setChecked(False)
+        self.heatmap_combo = QComboBox()
+        for label, by in (("Per core", "core"), ("Per thread", "thread")):
+            self.heatmap_combo.addItem(label, by)
+        self.heatmap_combo.currentIndexChanged.connect(lambda: self.update_heatmap(force=True))
+
+        # ตรวจ RSS leak / CPU เปลี่ยนระดับ แบบ online (ทุกโหมด) -> alert เป็น marker บนกราฟ
+        self.anomaly_checkbox = QCheckBox("Anomaly Alerts")
+        self.anomaly_checkbox.setChecked(False)
+
+        # เงื่อนไข auto-save (อย่างใดอย่างหนึ่ง) / ขนาดที่ขึ้นไฟล์ segment ใหม่ / การบีบอัด segment ที่ปิดแล้ว
+        self.flush_combo = QComboBox()
+        for label, options in (("Every 1 h", {}), ("Every 10 min", {"seconds": 600.0}),
+                               ("Every 100k rows", {"seconds": None, "rows": 100000}),
+                               ("Every 64 MB", {"seconds": None, "nbytes": 64 * 2**20})):
+            self.flush_combo.addItem(label, options)
+        self.rotate_combo = QComboBox()
+        for label, size in (("No rotation", None), ("64 MB", 64), ("256 MB", 256), ("1 GB", 1024)):
+            self.rotate_combo.addItem(label, size)
+        self.compress_combo = QComboBox()
+        for label, method in (("No compression", None), ("gzip", "gzip"), ("zstd", "zstd")):
+            self.compress_combo.addItem(label, method)
+
         # ปุ่มต่างๆ
         self.btn_reset = QPushButton("Reset Table")
         self.btn_export_excel = QPushButton("Export to Excel")
         self.btn_export_csv = QPushButton("Export to CSV")
+        self.btn_export_columnar = QPushButton("Export to Parquet/Arrow")
         self.btn_save_graph = QPushButton("Save Graph")
+        self.btn_open_log = QPushButton("Open Log")
         self.btn_exit = QPushButton("Exit")
 
         self.btn_select_autosave = QPushButton("Select Auto-Save File")
@@ -201,11 +831,15 @@ class MonitorApp(QWidget):
         self.btn_reset.clicked.connect(self.reset_table)
         self.btn_export_excel.clicked.connect(self.export_excel)
         self.btn_export_csv.clicked.connect(self.export_csv)
+        self.btn_export_columnar.clicked.connect(self.export_columnar_file)
         self.btn_save_graph.clicked.connect(self.save_graph)
+        self.btn_open_log.clicked.connect(self.open_log_file)
         self.btn_exit.clicked.connect(self.close)
 
         # วิดเจ็ตกราฟ
         self.graph = PlotCanvas(self)
+        self.heatmap = HeatmapCanvas(self)
+        self.heatmap.setVisible(False)
 
         # จัด Layout ทั้งหน้า
         self.setup_ui()
@@ -237,13 +871,19 @@ class MonitorApp(QWidget):
         control_layout = QHBoxLayout()
         control_layout.addWidget(QLabel("Sampling Rate (s):"))
         control_layout.addWidget(self.sampling_spinbox)
+        control_layout.addWidget(self.rate_combo)
         control_layout.addStretch()
         control_layout.addWidget(self.btn_reset)
         control_layout.addWidget(self.btn_export_excel)
         control_layout.addWidget(self.btn_export_csv)
+        control_layout.addWidget(self.btn_export_columnar)
         control_layout.addWidget(self.btn_save_graph)
+        control_layout.addWidget(self.btn_open_log)
         control_layout.addWidget(self.btn_select_autosave)
         control_layout.addWidget(self.auto_save_file_label)
+        control_layout.addWidget(self.flush_combo)
+        control_layout.addWidget(self.rotate_combo)
+        control_layout.addWidget(self.compress_combo)
         control_layout.addWidget(self.btn_exit)
 
         # แถวเช็คบ็อกซ์ตัวเลือก
@@ -252,17 +892,33 @@ class MonitorApp(QWidget):
         checkbox_layout.addWidget(self.enable_plot_checkbox)
         checkbox_layout.addWidget(self.plot_mode_checkbox)
         checkbox_layout.addWidget(self.buffer_mode_checkbox)
+        checkbox_layout.addWidget(self.multi_checkbox)
+        checkbox_layout.addWidget(self.tree_checkbox)
+        checkbox_layout.addWidget(QLabel("Resolution:"))
+        checkbox_layout.addWidget(self.resolution_combo)
+        checkbox_layout.addWidget(QLabel("Metrics:"))
+        checkbox_layout.addWidget(self.metrics_combo)
+        checkbox_layout.addWidget(QLabel("Plot:"))
+        checkbox_layout.addWidget(self.plot_metric_combo)
+        checkbox_layout.addWidget(self.breakdown_checkbox)
+        checkbox_layout.addWidget(self.anomaly_checkbox)
+        checkbox_layout.addWidget(self.heatmap_combo)
         checkbox_layout.addStretch()
 
-        # แบ่งครึ่งซ้าย/ขวา: ตาราง | กราฟ
+        # แบ่งครึ่งซ้าย/ขวา: ตาราง | กราฟ (+ heatmap ด้านล่างเมื่อเปิด breakdown)
+        graphs = QSplitter(Qt.Vertical)
+        graphs.addWidget(self.graph)
+        graphs.addWidget(self.heatmap)
+        graphs.setSizes([450, 250])
         splitter = QSplitter(Qt.Horizontal)
         splitter.addWidget(self.table)
-        splitter.addWidget(self.graph)
+        splitter.addWidget(graphs)
         splitter.setSizes([400, 700])
 
         # วางทุกอย่างในหน้าต่าง
         layout.addWidget(self.status_label)
         layout.addWidget(self.source_label)
+        layout.addWidget(self.stats_label)
         layout.addLayout(checkbox_layout)
         layout.addWidget(splitter)
         layout.addLayout(control_layout)
@@ -297,21 +953,65 @@ class MonitorApp(QWidget):
             self.auto_save_file_label.setText("No file selected")
             self.status_label.setText("Auto-save file selection cancelled.")
 
+    # ------------------------------
+    # FlushPolicy จากตัวเลือกบนหน้าจอ (zstd ไม่มีแพ็กเกจ -> ไม่บีบอัด)
+    # ------------------------------
+    def read_flush_policy(self):
+        options = dict(self.flush_combo.currentData())
+        rotate_mb = self.rotate_combo.currentData()
+        if rotate_mb is not None:
+            options["rotate_bytes"] = rotate_mb * 2**20
+        compress = self.compress_combo.currentData()
+        try:
+            check_compressor(compress)
+            options["compress"] = compress
+        except ImportError as e:
+            print(f"Compression disabled: {e}")
+        return FlushPolicy(**options)
+
+    def set_autosave_options_enabled(self, enabled):
+        for widget in (self.btn_select_autosave, self.flush_combo, self.rotate_combo, self.compress_combo):
+            widget.setEnabled(enabled)
+
+    # ------------------------------
+    # ความกว้างคอลัมน์ของตารางตามฟิลด์ของ store: คอลัมน์ Source ยืดเต็มที่ว่าง ที่เหลือกว้างตามข้อความตัวอย่าง
+    # ------------------------------
+    def apply_table_columns(self, fields):
+        header = self.table.horizontalHeader()
+        fm = self.table.fontMetrics()
+        for col, field in enumerate(fields):
+            if field == "source":
+                header.setSectionResizeMode(col, QHeaderView.Stretch)
+                continue
+            sample_text = TABLE_SAMPLE_TEXT.get(field, "100000.00 ")
+            title = self.table_model.headerData(col, Qt.Horizontal)
+            header.setSectionResizeMode(col, QHeaderView.Interactive)
+            header.resizeSection(col, max(fm.horizontalAdvance(sample_text), fm.horizontalAdvance(title)) + 24)
+
     # ------------------------------
     # ล้างตาราง+กราฟ และสถานะข้อมูลในหน่วยความจำ
     # ------------------------------
     def reset_table(self):
         self.data.clear()
-        self.buffered_data.clear()
-        self.table.setRowCount(0)
+        del self.data.markers[:]
+        with self._buffer_lock:
+            self.buffered_data.clear()
+            if self.rollup is not None:
+                self.rollup = Rollup.for_store(self.data)
+            if self.stats is not None:
+                self.stats = SessionStats.for_store(self.data)
+        self.table_model.reset()
         self.graph.reset_graph()
         self.status_label.setText("Status: Table and graph reset.")
         self.source_label.setText("")
+        self.stats_label.setText("")
+        self.stats_label.setToolTip("")
 
     # ------------------------------
     # ตรวจหาโปรเซสที่จะติดตาม
     # 1) ลองอ่าน PID จาก C:\temp\training_pid.txt (สำหรับ MATLAB)
-    # 2) ถ้าไม่พบ: ไล่หาโปรเซส python ที่รัน .py อยู่ (สำหรับสคริปต์เทรน)
+    # 2) ถ้าไม่พบ: หาโปรเซส python ที่รัน .py อยู่ (สำหรับสคริปต์เทรน)
+    #    ผ่าน detector ที่ตรวจเฉพาะโปรเซสใหม่ (ไม่ไล่ process_iter ทั้งเครื่องทุกรอบ)
     # ------------------------------
     def detect_training_process(self):
         try:
@@ -326,75 +1026,77 @@ class MonitorApp(QWidget):
         except (FileNotFoundError, ValueError, psutil.NoSuchProcess):
             pass
 
-        my_pid = psutil.Process().pid
-        for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-            try:
-                if proc.pid == my_pid:
-                    continue
-                cmdline_args = proc.info.get('cmdline')
-                if not cmdline_args:
-                    continue
-                name = (proc.info['name'] or '').lower()
-                # มองหา python + อาร์กิวเมนต์ลงท้าย .py
-                if "python" in name and any(str(arg).endswith(".py") for arg in cmdline_args):
-                    self.training_source = f"Python: {' '.join(map(str, cmdline_args))}"
-                    self.training_pid = proc.pid
-                    return True
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                continue
+        # มองหา python + อาร์กิวเมนต์ลงท้าย .py
+        for pid, cmdline_args in get_detector().matches():
+            self.training_source = f"Python: {' '.join(map(str, cmdline_args))}"
+            self.training_pid = pid
+            return True
         return False
 
     # ------------------------------
     # อ่าน CPU/RAM จากโปรเซสเป้าหมาย
     # ------------------------------
-    def get_training_process_resource(self, proc):
+    # -> (cpu, ram, *metric เสริม) ตามลำดับคอลัมน์ของ store หรือ None ถ้าอ่านไม่ได้
+    # ------------------------------
+    def get_training_process_resource(self, sampler):
         try:
-            # cpu_percent(interval=None) -> ค่าเฉลี่ยตั้งแต่ครั้งก่อนที่เรียก
-            cpu = proc.cpu_percent(interval=None) / psutil.cpu_count()
-            ram = proc.memory_info().rss / (1024 * 1024)  # bytes -> MB
-            return cpu, ram
+            if self.process_tree is not None:
+                # โหมด process tree: ค่ารวมทั้ง tree, ค่ารายลูกเก็บไว้ที่ self.child_rows
+                cpu, ram, self.child_rows = self.process_tree.sample()
+            else:
+                # CPU เฉลี่ยตั้งแต่ครั้งก่อนที่อ่าน (หารจำนวน core แล้ว), RAM เป็น MB
+                cpu, ram = sampler.sample()
+            extra = self.extra
+            return (cpu, ram) + extra.sample() if extra else (cpu, ram)
         except (psutil.NoSuchProcess, psutil.AccessDenied):
             # โปรเซสหาย/ปิด -> แจ้ง finish 1 ครั้ง
             if not self._finish_emitted:
                 self._finish_emitted = True
                 self.worker.finish_monitoring_signal.emit("Process terminated.")
-            return None, None
+            return None
         except Exception as e:
             print(f"Error getting process resource: {e}")
-            return None, None
+            return None
 
     # ------------------------------
     # ดันข้อมูลใน buffer ลงตาราง+กราฟ แล้วเคลียร์ buffer
     # ------------------------------
     def flush_buffer_to_table_and_graph(self):
-        if not self.buffered_data:
-            return
-
-        # เติมตารางทีละแถว
-        for rowdata in self.buffered_data:
-            row = self.table.rowCount()
-            self.table.insertRow(row)
-            self.table.setVerticalHeaderItem(row, QTableWidgetItem(str(row + 1)))
-            for i, val in enumerate(rowdata):
-                if i == 0:
-                    item_text = self.format_duration(val)  # คอลัมน์เวลา
-                else:
-                    item_text = f"{val:.2f}" if isinstance(val, float) else str(val)
-                self.table.setItem(row, i, QTableWidgetItem(item_text))
-
-        # รวมเข้าชุดข้อมูลหลัก
-        self.data.extend(self.buffered_data)
+        # สลับ buffer ออกมาทั้งก้อน (ไม่คัดลอก) แล้วให้ thread มอนิเตอร์เขียนลง buffer ใหม่
+        with self._buffer_lock:
+            if not self.buffered_data:
+                return
+            batch = self.buffered_data
+            self.buffered_data = batch.empty_like()
+
+        # รวมเข้าชุดข้อมูลหลัก + แจ้งตารางทีละ batch (เซลล์จัดรูปแบบตอนแสดงผลเท่านั้น)
+        overhead = self.overhead
+        mark = overhead.begin() if overhead is not None else 0
+        self.table_model.extend(batch)
+        self.update_stats_label()
+        if overhead is not None:
+            mark = overhead.lap("table", mark)
 
         # ถ้าเปิดพล็อตและไม่ได้เลือก "plot after end" -> วาดแบบเรียลไทม์
         if self.enable_plot_checkbox.isChecked() and not self.plot_mode_checkbox.isChecked():
-            is_real_time_mode = self.buffer_mode_checkbox.isChecked()
-            timestamps = [d[0] for d in self.data]
-            cpu_vals = [d[1] for d in self.data]
-            ram_vals = [d[2] for d in self.data]
-            self.graph.plot(timestamps, cpu_vals, ram_vals, is_real_time_mode)
-
-        # เคลียร์ buffer แล้วเลื่อนตารางไปท้าย
-        self.buffered_data.clear()
+            if self.monitoring and overhead is not None and overhead.skip_plot:
+                # ตัวมอนิเตอร์ใช้ CPU เกิน budget -> งดวาดระหว่างทาง (วาดใหม่ทั้งรูปตอนจบ)
+                self._plot_skipped = True
+            elif self.tier_level() is not None:
+                # โหมด rollup: วาดใหม่เมื่อมี bucket ปิดเพิ่ม (1 s tier ไม่เกินวินาทีละครั้ง)
+                self.graph.add_markers(self.data.markers)
+                self.redraw_graph(only_new_buckets=True)
+            else:
+                self.graph.add_markers(self.data.markers)
+                is_real_time_mode = self.buffer_mode_checkbox.isChecked()
+                # วาดเฉพาะจุดใหม่ (ไม่สร้าง list ของข้อมูลทั้งหมดใหม่ทุกครั้ง)
+                self.graph.append_from_store(self.data, is_real_time_mode)
+            if not self._plot_skipped:
+                self.update_heatmap()
+            if overhead is not None:
+                overhead.lap("plot", mark)
+
+        # เลื่อนตารางไปท้าย
         self.table.scrollToBottom()
 
     # ------------------------------
@@ -416,12 +1118,20 @@ class MonitorApp(QWidget):
         while True:
             # ยังไม่เริ่มมอนิเตอร์ -> ถ้าเลือก auto-start และตรวจพบโปรเซส ให้เริ่ม
             if not self.monitoring:
+                if self.auto_start_checkbox.isChecked() and self.multi_checkbox.isChecked():
+                    # โหมดหลายโปรเซส: เริ่มเมื่อพบอย่างน้อย 1 โปรเซส
+                    if not self.start_multi_monitoring():
+                        get_detector().wait(0.5)
+                    continue
                 if self.auto_start_checkbox.isChecked() and self.detect_training_process():
                     self.start_monitoring()
+                    proc_obj = None
                     try:
-                        proc_obj = psutil.Process(self.training_pid)
-                        proc_obj.cpu_percent(interval=None)  # prime CPU counter
-                        time.sleep(self.sampling_rate)
+                        # sampler เปิด /proc ค้างไว้ (Linux) -> ไม่ต้อง pid_exists/psutil หลายชั้นทุก tick
+                        if self.tree_checkbox.isChecked():
+                            self.process_tree = ProcessTree(self.training_pid)
+                        else:
+                            proc_obj = open_sampler(self.training_pid)
                     except psutil.NoSuchProcess:
                         if not self._finish_emitted:
                             self._finish_emitted = True
@@ -432,62 +1142,250 @@ class MonitorApp(QWidget):
                         if not self._finish_emitted:
                             self._finish_emitted = True
                             self.worker.finish_monitoring_signal.emit(f"Error starting monitoring: {e}")
+                elif self.auto_start_checkbox.isChecked():
+                    # รอ event โปรเซสใหม่ (ตื่นทันทีที่พบ) แทนการ sleep แล้วไล่ทั้งเครื่องใหม่
+                    get_detector().wait(0.5)
+                    continue
                 else:
                     time.sleep(0.5)
                     continue
 
-            # ถ้าโปรเซสตาย -> แจ้ง finish ครั้งเดียว
-            if not psutil.pid_exists(self.training_pid):
+            # โหมดหลายโปรเซส: อ่านทุก PID ในรอบเดียว
+            if self.targets is not None:
+                self.multi_monitor_tick()
+                continue
+
+            # เริ่มไม่สำเร็จ -> แจ้ง finish ครั้งเดียว (โปรเซสที่ตายระหว่างทางจะถูกจับใน get_training_process_resource)
+            if proc_obj is None and self.process_tree is None:
                 if not self._finish_emitted:
                     self._finish_emitted = True
                     self.worker.finish_monitoring_signal.emit("Process terminated.")
                 time.sleep(0.2)
                 continue
 
-            start_of_loop = time.time()
-            cpu, ram = self.get_training_process_resource(proc_obj)
+            # รอ deadline ถัดไป (ทุก sampling_rate บนนาฬิกา monotonic ไม่ drift ตามเวลาที่ใช้ในแต่ละรอบ)
+            self.scheduler.wait()
+            overhead = self.overhead
+            tick_start = mark = overhead.begin()
+            values = self.get_training_process_resource(proc_obj)
+            mark = overhead.lap("sample", mark)
 
-            if cpu is not None:
+            if values is not None:
                 # เวลา ณ session ปัจจุบัน + เวลาสะสมก่อนหน้า -> ทำให้แกน X ต่อเนื่องข้าม autosave/reset
-                current_session_elapsed = time.time() - self.training_start_time
-                self.buffered_data.append(
-                    (self.total_elapsed_time + current_session_elapsed, cpu, ram, self.training_source)
-                )
+                current_session_elapsed = self.scheduler.elapsed() - self.training_start_time
+                full_elapsed = self.total_elapsed_time + current_session_elapsed
+                if self.breakdown is not None:
+                    # ใต้ lock เดียวกับ UI thread -> heatmap/meta ไม่เห็นแถวที่เขียนไม่ครบหรือ totals ที่กำลังโต
+                    with self._buffer_lock:
+                        try:
+                            self.breakdown.sample(full_elapsed)
+                        except psutil.NoSuchProcess:
+                            pass    # โปรเซสจบระหว่าง tick -> sampler แจ้ง finish ใน tick ถัดไป
+                if self.adaptive is not None:
+                    # interval จริงของแถวนี้ต่อท้ายสุด + คาบของ tick ถัดไปตามการเปลี่ยนแปลงของ CPU/RAM
+                    values += (self.adaptive.update(full_elapsed, values[0], values[1]),)
+                    self.scheduler.set_interval(self.adaptive.interval)
+                with self._buffer_lock:
+                    self.buffered_data.append(full_elapsed, *values)
+                    if self.rollup is not None:
+                        self.rollup.add(full_elapsed, *values)
+                    if self.stats is not None:
+                        self.stats.add(full_elapsed, *values)
+                    if self.watch is not None:
+                        self.check_anomalies(full_elapsed, None, values[0], values[1])
+                    if self.run_log is not None:
+                        self.run_log.append(full_elapsed, *values)
+                    if self.process_tree is not None:
+                        self.append_children(full_elapsed, self.child_rows, self.process_tree.sources)
+                    self.collect_markers(full_elapsed)
+                mark = overhead.lap("aggregate", mark)
+                self.schedule_flush(current_session_elapsed)
+                overhead.lap("flush", mark)
+                self.end_overhead_tick(overhead, full_elapsed, tick_start)
+
+    # ------------------------------
+    # โหมด process tree: เก็บค่ารายโปรเซสลูกลง buffer (เรียกภายใต้ _buffer_lock)
+    # ------------------------------
+    def append_children(self, elapsed, rows, sources):
+        children = self.buffered_data.children
+        log = self.run_log.children if self.run_log is not None else None
+        for child_pid, cpu, ram in rows:
+            if child_pid not in children.sources:
+                children.register_source(child_pid, sources.get(child_pid, ""))
+            children.append(elapsed, child_pid, cpu, ram)
+            if log is not None:
+                log.register_source(child_pid, sources.get(child_pid, ""))
+                log.append(elapsed, child_pid, cpu, ram)
 
-                # ครบ 1 ชั่วโมง -> autosave กลางทาง แล้ว reset session 3600
-                if current_session_elapsed >= 3600.0 and len(self.buffered_data) > 0:
-                    self.auto_save_data()
+    # ------------------------------
+    # ช่องรับ marker จากสคริปต์เทรน (perfmon.markers) เปิดครั้งเดียวตลอดอายุโปรแกรม
+    # ------------------------------
+    def open_marker_listener(self):
+        try:
+            return MarkerListener()
+        except (OSError, ValueError) as e:
+            print(f"Training markers disabled: {e}")
+            return None
 
-                # โหมด flush
-                is_real_time_mode = self.buffer_mode_checkbox.isChecked()
-                if is_real_time_mode:
-                    # flush ทันทีทุกครั้งที่มีข้อมูล (real-time)
+    # ------------------------------
+    # รับ marker ที่ค้างอยู่ -> วางบนแกนเวลาของรอบ (self.data.markers) + เขียนลง .pmlog (เรียกภายใต้ _buffer_lock)
+    # ------------------------------
+    def collect_markers(self, elapsed):
+        if self.marker_listener is None:
+            return
+        events = self.marker_listener.drain()
+        if not events:
+            return
+        placed = place_markers(events, elapsed)
+        self.data.markers.extend(placed)
+        if self.run_log is not None:
+            self.run_log.write_markers(placed)
+
+    # ------------------------------
+    # ตรวจ anomaly ของ 1 sample -> alert เป็น marker (self.data.markers) + .pmlog (เรียกภายใต้ _buffer_lock)
+    # hook (report_alert) ถูกเรียกใน tick เดียวกับที่ตรวจพบ
+    # ------------------------------
+    def check_anomalies(self, elapsed, pid, cpu, ram):
+        alerts = self.watch.add(elapsed, pid, cpu, ram)
+        if not alerts:
+            return
+        placed = [alert.marker() for alert in alerts]
+        self.data.markers.extend(placed)
+        if self.run_log is not None:
+            self.run_log.write_markers(placed)
+
+    def report_alert(self, alert):
+        print(f"Alert at {self.format_duration(alert.elapsed)}: {alert}")
+        self.worker.update_ui.emit(None, f"status:Alert: {alert}")
+
+    # ------------------------------
+    # โหมดหลายโปรเซส: จำ source ของ PID ทั้งใน store และไฟล์ .pmlog
+    # ------------------------------
+    def register_source(self, pid, source):
+        self.data.register_source(pid, source)
+        with self._buffer_lock:
+            if self.run_log is not None:
+                self.run_log.register_source(pid, source)
+
+    # ------------------------------
+    # หลังได้ sample ใหม่: autosave ตาม FlushPolicy + ส่งสัญญาณ flush ตามโหมด
+    # ------------------------------
+    def schedule_flush(self, current_session_elapsed):
+        # ถึงเงื่อนไข (ค่าเริ่มต้นครบ 1 ชั่วโมง) -> เริ่ม session ใหม่ แล้วให้ UI thread ส่งข้อมูลไป autosave (thread นี้ไม่รอ I/O)
+        if len(self.buffered_data) > 0 and self.flush_policy.due(current_session_elapsed, self.data, self.buffered_data):
+            self.start_new_session()
+            self.worker.update_ui.emit(None, "autosave")
+
+        # โหมด flush (เกิน budget -> ลดอัตราการ flush ลง display_stride เท่า)
+        stride = self.overhead.display_stride
+        is_real_time_mode = self.buffer_mode_checkbox.isChecked()
+        if is_real_time_mode:
+            # flush ทันทีทุกครั้งที่มีข้อมูล (real-time)
+            if self.scheduler.ticks % stride == 0:
+                self.worker.update_ui.emit(self.buffered_data, "flush")
+        else:
+            # โหมด buffered: flush ครั้งแรกเมื่อครบ 10 วิ หลังจากนั้นปรับช่วงตามเวลาที่รัน
+            now = self.scheduler.elapsed()
+            elapsed = now - self.training_start_time
+            if not self.initial_buffer_flushed and elapsed >= 10:
+                self.worker.update_ui.emit(self.buffered_data, "flush")
+                self.last_update_time = now
+                self.initial_buffer_flushed = True
+            elif self.initial_buffer_flushed:
+                self.update_interval = self.get_dynamic_update_interval(elapsed) * stride
+                if now - self.last_update_time >= self.update_interval:
                     self.worker.update_ui.emit(self.buffered_data, "flush")
-                else:
-                    # โหมด buffered: flush ครั้งแรกเมื่อครบ 10 วิ หลังจากนั้นปรับช่วงตามเวลาที่รัน
-                    elapsed = time.time() - self.training_start_time
-                    if not self.initial_buffer_flushed and elapsed >= 10:
-                        self.worker.update_ui.emit(self.buffered_data, "flush")
-                        self.last_update_time = time.time()
-                        self.initial_buffer_flushed = True
-                    elif self.initial_buffer_flushed:
-                        self.update_interval = self.get_dynamic_update_interval(elapsed)
-                        if time.time() - self.last_update_time >= self.update_interval:
-                            self.worker.update_ui.emit(self.buffered_data, "flush")
-                            self.last_update_time = time.time()
-
-            # นอนให้ครบตาม sampling_rate
-            time_spent = time.time() - start_of_loop
-            sleep_time = max(0, self.sampling_rate - time_spent)
-            time.sleep(sleep_time)
+                    self.last_update_time = now
+
+    # ------------------------------
+    # โหมดหลายโปรเซส: เริ่มเมื่อพบโปรเซสเป้าหมายอย่างน้อย 1 ตัว
+    # ------------------------------
+    def start_multi_monitoring(self):
+        found = find_training_processes()
+        if not found:
+            return False
+        targets = TargetSet(tree=self.tree_checkbox.isChecked())
+        joined = targets.sync(found, 0.0)
+        if not joined:
+            return False
+        self.training_source = "Multiple training processes"
+        self.training_pid = None
+        self.start_monitoring(targets)
+        for t in joined:
+            self.register_source(t.pid, t.source)
+        self.last_discovery = 0.0
+        return True
+
+    # ------------------------------
+    # โหมดหลายโปรเซส: 1 tick = ค้นหาโปรเซสใหม่ (เป็นระยะ) + อ่านทุก PID ในรอบเดียว
+    # ------------------------------
+    def multi_monitor_tick(self):
+        self.scheduler.wait()
+        overhead = self.overhead
+        tick_start = mark = overhead.begin()
+        now = self.scheduler.elapsed()
+        current_session_elapsed = now - self.training_start_time
+        full_elapsed = self.total_elapsed_time + current_session_elapsed
+
+        if now - self.last_discovery >= self.DISCOVERY_INTERVAL:
+            self.last_discovery = now
+            for t in self.targets.sync(find_training_processes(), full_elapsed):
+                self.register_source(t.pid, t.source)
+                self.worker.update_ui.emit(None, f"status:Monitoring... PID {t.pid} joined")
+
+        samples, left = self.targets.sample(full_elapsed)
+        mark = overhead.lap("sample", mark)
+        for t in left:
+            self.worker.update_ui.emit(None, f"status:Monitoring... PID {t.pid} left")
+            if self.watch is not None:
+                self.watch.discard(t.pid)
+
+        if not self.targets.active:
+            if not self._finish_emitted:
+                self._finish_emitted = True
+                self.worker.finish_monitoring_signal.emit("All processes terminated.")
+            time.sleep(0.2)
+            return
+
+        with self._buffer_lock:
+            for pid, cpu, ram in samples:
+                self.buffered_data.append(full_elapsed, pid, cpu, ram)
+                if self.rollup is not None:
+                    self.rollup.add(full_elapsed, pid, cpu, ram)
+                if self.stats is not None:
+                    self.stats.add(full_elapsed, pid, cpu, ram)
+                if self.watch is not None:
+                    self.check_anomalies(full_elapsed, pid, cpu, ram)
+                if self.run_log is not None:
+                    self.run_log.append(full_elapsed, pid, cpu, ram)
+            if self.targets.children:
+                self.append_children(full_elapsed, self.targets.children, self.targets.child_sources())
+            self.collect_markers(full_elapsed)
+        mark = overhead.lap("aggregate", mark)
+        self.schedule_flush(current_session_elapsed)
+        overhead.lap("flush", mark)
+        self.end_overhead_tick(overhead, full_elapsed, tick_start)
+
+    # ------------------------------
+    # จบ tick: นับ loop latency/คิวของ writer/buffer ที่ค้าง -> แจ้งเมื่อระดับการลดอัตราแสดงผลเปลี่ยน
+    # ------------------------------
+    def end_overhead_tick(self, overhead, full_elapsed, tick_start):
+        writer = self.writer
+        if not overhead.end(full_elapsed, tick_start, writer.pending if writer is not None else 0, len(self.buffered_data)):
+            return
+        if overhead.level:
+            self.worker.update_ui.emit(None, f"status:Monitoring... monitor CPU {overhead.cpu:.1f}% over budget "
+                                             f"{overhead.budget:g}%, display 1/{overhead.display_stride}, live plot paused")
+        else:
+            self.worker.update_ui.emit(None, f"status:Monitoring... monitor CPU {overhead.cpu:.1f}% back within budget")
 
     # ------------------------------
     # รับประกันว่าไฟล์ CSV จะมีหัวตารางบรรทัดแรกเสมอ
     # - ว่าง/ไม่มีไฟล์ -> เขียนหัว
     # - มีข้อมูลแต่ไม่มีหัว -> แทรกหัวด้านบนโดยใช้ temp file
     # ------------------------------
-    def _ensure_csv_header(self, path):
-        header = ["Time (H:MM:SS.ms)", "CPU (%)", "RAM (MB)", "Source"]
+    def _ensure_csv_header(self, path, header=None):
+        header = header or ["Time (H:MM:SS.ms)", "CPU (%)", "RAM (MB)", "Source"]
         header_line_norm = ",".join(h.replace(", ", ",").strip() for h in header)
 
         if not os.path.exists(path) or os.path.getsize(path) == 0:
@@ -526,84 +1424,111 @@ class MonitorApp(QWidget):
                     pass
 
     # ------------------------------
-    # รับประกันว่าไฟล์ XLSX จะมีหัวตารางแถวแรกเสมอ
-    # - ไม่มีไฟล์ -> สร้างใหม่ + เขียนหัว
-    # - มีไฟล์:
-    #     * แถวแรกว่าง -> เขียนหัว
-    #     * แถวแรกไม่ใช่หัว -> แทรกแถวด้านบน แล้วเขียนหัว
+    # แถวท้ายไฟล์ส่งออก: source + ข้อมูลของรอบ (เวลาเริ่มจริง, สถิติการ sample)
     # ------------------------------
-    def _ensure_xlsx_header(self, path):
-        header = ["Time (H:MM:SS.ms)", "CPU (%)", "RAM (MB)", "Source"]
+    def export_footer(self, pad=3):
+        meta = dict(self.data.meta)
+        with self._buffer_lock:
+            if self.stats:
+                # สถิติล่าสุด (ระหว่างมอนิเตอร์ยังไม่อยู่ใน meta)
+                meta.update(self.stats.meta())
+        lines = [f"Command/Source: {self.training_source}"]
+        lines += [f"{label} {value}" for label, value in meta.items()]
+        footer = [[""] * pad + [line] for line in lines]
+        if self.data.markers:
+            footer += [[]] + [[""] * pad + row for row in marker_rows(self.data.markers, self.format_duration)]
+        return footer
 
-        if not os.path.exists(path):
-            wb = Workbook()
-            ws = wb.active
-            ws.append(header)
-            wb.save(path)
+    # ------------------------------
+    # เขียน series รายโปรเซสลูก (โหมด process tree) ลงไฟล์ <ชื่อเดิม>_children ข้างไฟล์หลัก
+    # - append=True: ต่อท้ายไฟล์ (XLSX เป็น segment) / finalize=True: รวม segment + footer
+    # ------------------------------
+    def save_children(self, path, stores, append=False, finalize=False):
+        if self.data.children is None:
             return
-
-        try:
-            wb = load_workbook(path)
-            ws = wb.active
-        except Exception:
-            wb = Workbook()
-            ws = wb.active
-
-        first_row_vals = [ws.cell(row=1, column=c).value for c in range(1, 5)]
-        first_row_empty = all(v is None for v in first_row_vals)
-
-        def norm(x):
-            return (x or "").replace(", ", ",").strip()
-
-        header_norm = [norm(h) for h in header]
-        first_norm = [norm(v) for v in first_row_vals]
-
-        if first_row_empty:
-            for c, val in enumerate(header, start=1):
-                ws.cell(row=1, column=c, value=val)
-        elif first_norm != header_norm:
-            ws.insert_rows(1)
-            for c, val in enumerate(header, start=1):
-                ws.cell(row=1, column=c, value=val)
-        # else: มีหัวถูกต้องแล้ว -> ไม่ทำอะไร
-
-        wb.save(path)
+        path = children_path(path)
+        header = self.data.children.header()
+        footer = self.export_footer(pad=4)
+        rows = ([self.format_duration(row[0])] + list(row[1:]) for row in chain.from_iterable(stores))
+
+        if path.lower().endswith('.xlsx'):
+            if append:
+                sink = XlsxAppendSink(path, header=header)
+                sink.append(rows)
+                if finalize:
+                    sink.finalize(footer=footer)
+            else:
+                write_xlsx(path, rows, header=header, footer=footer)
+
+        elif path.lower().endswith('.csv'):
+            if append:
+                self._ensure_csv_header(path, header)
+            with open(path, mode='a' if append else 'w', newline='', encoding='utf-8') as file:
+                writer = csv.writer(file)
+                if not append:
+                    writer.writerow(header)
+                writer.writerows(rows)
+                if finalize or not append:
+                    writer.writerow([])
+                    writer.writerows(footer)
 
     # ------------------------------
-    # Auto-save (กลางทาง)
+    # Auto-save (กลางทาง) - รันบน UI thread เมื่อได้สัญญาณ "autosave"
     # - ถ้าไม่เลือกไฟล์ไว้ -> สร้าง CSV อัตโนมัติใน Downloads ชื่อ Data_YYYYMMDD_HHMMSS.csv
-    # - ถ้าเลือก .xlsx/.csv -> append ลงไฟล์นั้น โดยบังคับมีหัวตารางก่อนเสมอ
-    # - หลังเขียนเสร็จ -> reset session (ล้างตาราง/เวลาสะสมเฉพาะรอบ)
+    # - สลับข้อมูลที่แสดงแล้ว + buffer ค้างออกมาทั้งก้อน (ไม่คัดลอก) แล้วล้างตารางเริ่ม session ใหม่
+    # - การเขียนไฟล์ไปทำใน BackgroundWriter (write_autosave) -> ทั้ง UI และ thread มอนิเตอร์ไม่ต้องรอ I/O
     # ------------------------------
     def auto_save_data(self):
-        try:
-            # ถ้ายังไม่ตั้ง path -> สร้าง CSV อัตโนมัติใน Downloads
-            if not self.auto_save_path:
-                downloads_path = os.path.join(os.path.expanduser("~"), "Downloads")
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                self.auto_save_path = os.path.join(downloads_path, f"Data_{timestamp}.csv")
-                # อัปเดต label ชื่อไฟล์ (ให้ผู้ใช้รู้ว่าไฟล์ไปลงชื่ออะไร)
-                self.worker.update_ui.emit([], "set_autosave_label:" + os.path.basename(self.auto_save_path))
+        if not self.monitoring or self.writer is None:
+            return  # จบรอบไปแล้ว -> ข้อมูลที่เหลือถูกเขียนใน final save
+
+        # ถ้ายังไม่ตั้ง path -> สร้าง CSV อัตโนมัติใน Downloads
+        if not self.auto_save_path:
+            downloads_path = os.path.join(os.path.expanduser("~"), "Downloads")
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            self.auto_save_path = os.path.join(downloads_path, f"Data_{timestamp}.csv")
+            # อัปเดต label ชื่อไฟล์ (ให้ผู้ใช้รู้ว่าไฟล์ไปลงชื่ออะไร)
+            self.auto_save_file_label.setText(os.path.basename(self.auto_save_path))
+        path = self.auto_save_path
 
-            path = self.auto_save_path
+        with self._buffer_lock:
+            pending = self.buffered_data
+            self.buffered_data = pending.empty_like()
+        batch = self.data
+        self.data = batch.empty_like()
+        self.data.meta = batch.meta
+        self.data.markers = batch.markers
+        self.table_model.set_store(self.data)
+
+        rows = len(batch) + len(pending)
+        if self.writer.submit(self.write_autosave, path, batch, pending, rows=rows):
+            self._autosave_written = True
+            self.status_label.setText(f"Auto-saving data to {os.path.basename(path)} and reset.")
+        else:
+            self.status_label.setText(f"Auto-save queue full: dropped {rows} rows (disk slower than sampling).")
 
-            # เตรียมข้อมูลที่จะบันทึก (ข้อมูลที่แสดงแล้ว + buffer ค้าง)
-            all_data_to_save = self.data + self.buffered_data
+    # ------------------------------
+    # เขียนข้อมูล auto-save 1 ก้อน (รันใน BackgroundWriter thread)
+    # - .csv -> append ลงไฟล์นั้น โดยบังคับมีหัวตารางก่อนเสมอ
+    # - .xlsx -> เขียนเป็น segment ข้างไฟล์ แล้วรวมเป็นไฟล์เดียวตอนจบ
+    # - เปิดการหมุนไฟล์/บีบอัด -> เขียนลง segment ปัจจุบัน (<ชื่อ>_partNNN) และปิด segment เมื่อใหญ่ถึงขนาดที่ตั้ง
+    # ------------------------------
+    def write_autosave(self, path, batch, pending):
+        try:
+            all_data_to_save = chain(batch, pending)
+            segments = self.flush_policy.segments(path)
+            if segments is not None:
+                path = segments.active()
 
             if path.lower().endswith('.xlsx'):
-                # บังคับหัวตารางก่อน
-                self._ensure_xlsx_header(path)
-                # append ลงไฟล์
-                wb = load_workbook(path)
-                ws = wb.active
-                for row_data in all_data_to_save:
-                    formatted_row = [self.format_duration(row_data[0])] + list(row_data[1:])
-                    ws.append(formatted_row)
-                wb.save(path)
+                # append เป็น segment ใหม่ (หัวตารางจะถูกเขียนตอนรวมไฟล์ใน finish_monitoring)
+                XlsxAppendSink(path, header=batch.header()).append(
+                    [self.format_duration(row_data[0])] + list(row_data[1:]) for row_data in all_data_to_save
+                )
 
             elif path.lower().endswith('.csv'):
                 # บังคับหัวตารางก่อน
-                self._ensure_csv_header(path)
+                self._ensure_csv_header(path, batch.header())
                 # append ลงไฟล์
                 with open(path, mode='a', newline='', encoding='utf-8') as file:
                     writer = csv.writer(file)
@@ -611,24 +1536,39 @@ class MonitorApp(QWidget):
                         formatted_row = [self.format_duration(row_data[0])] + list(row_data[1:])
                         writer.writerow(formatted_row)
 
-            # แจ้งสถานะ + ตั้งธงว่ามี autosave แล้ว + reset session
-            self.status_label.setText(f"Auto-saved data to {os.path.basename(path)} and reset.")
-            self._autosave_written = True
-            self.reset_data_after_save()
+            self.save_children(path, (batch.children, pending.children), append=True)
+            if segments is not None:
+                segments.record(path, batch, pending)
+                if segments.full(path):
+                    self.close_segment(segments, path, batch)
+            self.worker.update_ui.emit(None, f"status:Auto-saved data to {os.path.basename(path)} and reset.")
+            return True
 
         except Exception as e:
-            self.status_label.setText(f"Error during auto-save: {e}")
+            self.worker.update_ui.emit(None, f"status:Error during auto-save: {e}")
+            return False
 
     # ------------------------------
-    # หลัง autosave: เพิ่มเวลาสะสมรวม + ล้างข้อมูล session ปัจจุบัน + เริ่มเวลาใหม่
+    # ปิด segment ที่ใหญ่ถึงขนาดที่ตั้ง: รวม XLSX (+ _children) แล้วบีบอัด CSV ตามที่เลือก
+    # auto-save ครั้งถัดไปจะเริ่ม segment ใหม่
     # ------------------------------
-    def reset_data_after_save(self):
-        self.total_elapsed_time += (time.time() - self.training_start_time)
-        self.data.clear()
-        self.buffered_data.clear()
-        self.table.setRowCount(0)
-        self.training_start_time = time.time()
-        self.last_update_time = self.training_start_time
+    def close_segment(self, segments, path, store):
+        if path.lower().endswith('.xlsx'):
+            XlsxAppendSink(path, header=store.header()).finalize()
+            if store.children is not None:
+                child_sink = XlsxAppendSink(children_path(path), header=store.children.header())
+                if child_sink.has_pending():
+                    child_sink.finalize()
+        return segments.close(path)
+
+    # ------------------------------
+    # ครบรอบ autosave (thread มอนิเตอร์): เพิ่มเวลาสะสมรวม + เริ่มเวลา session ใหม่
+    # ------------------------------
+    def start_new_session(self):
+        now = self.scheduler.elapsed()
+        self.total_elapsed_time += (now - self.training_start_time)
+        self.training_start_time = now
+        self.last_update_time = now
         self.initial_buffer_flushed = False
 
     # ------------------------------
@@ -637,9 +1577,13 @@ class MonitorApp(QWidget):
     def update_ui(self, new_data, action):
         if action == "flush":
             self.flush_buffer_to_table_and_graph()
+        elif action == "autosave":
+            self.auto_save_data()
         elif action.startswith("set_autosave_label:"):
             label_text = action.split(":", 1)[1]
             self.auto_save_file_label.setText(label_text)
+        elif action.startswith("status:"):
+            self.status_label.setText(action.split(":", 1)[1])
 
     # ------------------------------
     # จบการมอนิเตอร์ -> Final save
@@ -654,10 +1598,47 @@ class MonitorApp(QWidget):
         # ปลดล็อก UI บางส่วน
         self.monitoring = False
         self.sampling_spinbox.setEnabled(True)
-        self.btn_select_autosave.setEnabled(True)
+        self.metrics_combo.setEnabled(True)
+        self.rate_combo.setEnabled(True)
+        self.breakdown_checkbox.setEnabled(True)
+        self.anomaly_checkbox.setEnabled(True)
+        self.set_autosave_options_enabled(True)
 
         self.status_label.setText(f"Status: {message}. Showing final result...")
         self.source_label.setText(f"Finished monitoring: {self.training_source}")
+        if self.scheduler is not None:
+            # สถิติการ sample ของรอบนี้ -> แสดงผล + ท้ายไฟล์ส่งออก
+            self.data.meta.update(self.scheduler.meta())
+            self.source_label.setText(f"Finished monitoring: {self.training_source} | Sampling: {self.scheduler.summary()}")
+        if self.adaptive is not None:
+            self.data.meta.update(self.adaptive.meta())
+        if self.watch is not None:
+            self.watch.close()
+            self.data.meta.update(self.watch.meta())
+        if self.overhead is not None:
+            # ต้นทุนของตัวมอนิเตอร์เอง -> ท้ายไฟล์ส่งออก + series แยก (data.overhead)
+            self.overhead.close()
+            self.overhead.series.started_at = self.data.started_at
+            self.data.overhead = self.overhead.series
+            self.data.meta.update(self.overhead.meta())
+        if self.breakdown is not None:
+            # CPU ราย thread/core -> series แยก (data.threads / data.cores) + สรุป thread ที่ใช้ CPU มากที่สุด
+            self.breakdown.close()
+            self.data.threads, self.data.cores = self.breakdown.threads, self.breakdown.cores
+            for series in (self.data.threads, self.data.cores):
+                if series is not None:
+                    series.started_at = self.data.started_at
+            self.data.meta.update(self.breakdown.meta())
+        # รอ auto-save ที่ค้างเขียนเสร็จก่อน (final save ต่อท้ายไฟล์เดียวกัน ต้องเรียงลำดับ)
+        self.close_writer()
+        with self._buffer_lock:
+            if self.stats:
+                self.data.meta.update(self.stats.meta())
+                self.data.stats = self.stats
+        self.close_run_log()
+        with self._buffer_lock:
+            if self.rollup is not None:
+                self.rollup.flush()
 
         path = self.auto_save_path
 
@@ -669,61 +1650,66 @@ class MonitorApp(QWidget):
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 path = os.path.join(downloads_path, f"FinalData_{timestamp}.xlsx")
                 self.auto_save_path = path
+            # หมุนไฟล์/บีบอัด -> ข้อมูลสุดท้ายลง segment ปัจจุบัน แล้วปิด segment นั้น
+            segments = self.flush_policy.segments(path)
+            if segments is not None:
+                path = segments.active()
 
-            all_data_to_save = self.data + self.buffered_data
+            all_data_to_save = chain(self.data, self.buffered_data)
+            child_stores = (self.data.children, self.buffered_data.children)
 
             try:
                 # เคย autosave มาก่อน -> append ต่อไฟล์เดิม (ไม่เขียนหัวซ้ำ)
-                if self._autosave_written and os.path.exists(path):
-                    if path.lower().endswith('.xlsx'):
-                        self._ensure_xlsx_header(path)
-                        wb = load_workbook(path)
-                        ws = wb.active
-                        for row_data in all_data_to_save:
-                            formatted_row = [self.format_duration(row_data[0])] + list(row_data[1:])
-                            ws.append(formatted_row)
-                        # แทรกบรรทัดว่าง + ข้อความ source ไว้ท้ายไฟล์ (เหมือนเวอร์ชันฐาน)
-                        ws.append([])
-                        ws.append(["", "", "", f"Command/Source: {self.training_source}"])
-                        wb.save(path)
+                xlsx_sink = XlsxAppendSink(path, header=self.data.header()) if path.lower().endswith('.xlsx') else None
+                if self._autosave_written and (os.path.exists(path) or (xlsx_sink and xlsx_sink.has_pending())):
+                    if xlsx_sink is not None:
+                        xlsx_sink.append(
+                            [self.format_duration(row_data[0])] + list(row_data[1:]) for row_data in all_data_to_save
+                        )
+                        # รวม segment ทั้งหมด + บรรทัดว่าง + ข้อความ source ไว้ท้ายไฟล์ (เหมือนเวอร์ชันฐาน)
+                        xlsx_sink.finalize(footer=self.export_footer())
+                        self.save_children(path, child_stores, append=True, finalize=True)
                         self.status_label.setText(f"Status: Final data appended to {os.path.basename(path)}")
 
                     elif path.lower().endswith('.csv'):
-                        self._ensure_csv_header(path)
+                        self._ensure_csv_header(path, self.data.header())
                         with open(path, mode='a', newline='', encoding='utf-8') as file:
                             writer = csv.writer(file)
                             for row_data in all_data_to_save:
                                 formatted_row = [self.format_duration(row_data[0])] + list(row_data[1:])
                                 writer.writerow(formatted_row)
                             writer.writerow([])
-                            writer.writerow(["", "", "", f"Command/Source: {self.training_source}"])
+                            writer.writerows(self.export_footer())
+                        self.save_children(path, child_stores, append=True, finalize=True)
                         self.status_label.setText(f"Status: Final data appended to {os.path.basename(path)}")
 
                 # ไม่เคย autosave -> เขียนใหม่เพื่อหลีกเลี่ยงข้อมูลซ้ำ (เขียนหัวด้วย)
                 else:
                     if path.lower().endswith('.xlsx'):
-                        wb = Workbook()
-                        ws = wb.active
-                        ws.append(["Time (H:MM:SS.ms)", "CPU (%)", "RAM (MB)", "Source"])
-                        for row_data in all_data_to_save:
-                            formatted_row = [self.format_duration(row_data[0])] + list(row_data[1:])
-                            ws.append(formatted_row)
-                        ws.append([])
-                        ws.append(["", "", "", f"Command/Source: {self.training_source}"])
-                        wb.save(path)
+                        write_xlsx(
+                            path,
+                            ([self.format_duration(row_data[0])] + list(row_data[1:]) for row_data in all_data_to_save),
+                            header=self.data.header(),
+                            footer=self.export_footer(),
+                        )
+                        self.save_children(path, child_stores)
                         self.status_label.setText(f"Status: Final data saved to {os.path.basename(path)}")
 
                     elif path.lower().endswith('.csv'):
                         with open(path, mode='w', newline='', encoding='utf-8') as file:
                             writer = csv.writer(file)
-                            writer.writerow(["Time (H:MM:SS.ms)", "CPU (%)", "RAM (MB)", "Source"])
+                            writer.writerow(self.data.header())
                             for row_data in all_data_to_save:
                                 formatted_row = [self.format_duration(row_data[0])] + list(row_data[1:])
                                 writer.writerow(formatted_row)
                             writer.writerow([])
-                            writer.writerow(["", "", "", f"Command/Source: {self.training_source}"])
+                            writer.writerows(self.export_footer())
+                        self.save_children(path, child_stores)
                         self.status_label.setText(f"Status: Final data saved to {os.path.basename(path)}")
 
+                if segments is not None:
+                    segments.record(path, self.data, self.buffered_data)
+                    segments.close(path)
                 self._final_written = True
 
             except Exception as e:
@@ -731,25 +1717,135 @@ class MonitorApp(QWidget):
 
         # อัปเดตตาราง/กราฟ รอบสุดท้าย (ไม่เขียนไฟล์เพิ่ม)
         self.flush_buffer_to_table_and_graph()
+        self.update_stats_label()
 
-        # ถ้าผู้ใช้เลือก plot-after-end -> วาดกราฟสรุปหลังจบ
-        if self.enable_plot_checkbox.isChecked() and self.plot_mode_checkbox.isChecked():
-            timestamps = [d[0] for d in self.data]
-            cpu_vals = [d[1] for d in self.data]
-            ram_vals = [d[2] for d in self.data]
-            self.graph.plot(timestamps, cpu_vals, ram_vals, is_real_time=False)
+        # ถ้าผู้ใช้เลือก plot-after-end (หรืองดวาดระหว่างทางเพราะเกิน budget) -> วาดกราฟสรุปหลังจบ
+        if self.enable_plot_checkbox.isChecked() and (self.plot_mode_checkbox.isChecked() or self._plot_skipped):
+            self.graph.add_markers(self.data.markers)
+            self.redraw_graph()
+        self._plot_skipped = False
+        self.update_heatmap(force=True)
 
         self._is_finalizing = False
 
+    # ------------------------------
+    # ปิด BackgroundWriter ของรอบ: รองานที่ค้างเขียนเสร็จ + สรุปลงท้ายไฟล์ส่งออก (ถ้ามี auto-save)
+    # ------------------------------
+    def close_writer(self):
+        writer, self.writer = self.writer, None
+        if writer is None:
+            return
+        writer.close()
+        if writer.submitted or writer.dropped:
+            self.data.meta.update(writer.meta())
+
+    # ------------------------------
+    # ไฟล์บันทึกหลัก (.pmlog): ชื่อเดียวกับไฟล์ auto-save ถ้าเลือกไว้ (เขียนต่อเป็น session ใหม่)
+    # ไม่งั้นสร้างใหม่ใน Downloads
+    # ------------------------------
+    def open_run_log(self):
+        if self.auto_save_path:
+            path = os.path.splitext(self.auto_save_path)[0] + LOG_EXTENSION
+        else:
+            downloads_path = os.path.join(os.path.expanduser("~"), "Downloads")
+            os.makedirs(downloads_path, exist_ok=True)
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            path = os.path.join(downloads_path, f"Data_{timestamp}{LOG_EXTENSION}")
+        try:
+            return open_log(path, self.data)
+        except (OSError, ValueError) as e:
+            print(f"Binary log disabled: {e}")
+            return None
+
+    def close_run_log(self):
+        with self._buffer_lock:
+            log, self.run_log = self.run_log, None
+            if log is not None and self.stats:
+                log.write_stats(self.stats)
+        if log is not None:
+            log.write_meta(self.data.meta)
+            log.close()
+
+    # ------------------------------
+    # เปิดไฟล์ .pmlog -> แสดงในตาราง/กราฟ แล้วใช้ปุ่ม Export แปลงเป็น Excel/CSV
+    # (ส่วนท้ายที่เขียนไม่ครบหลังโปรแกรมล่มจะถูกข้าม)
+    # ------------------------------
+    def open_log_file(self):
+        if self.monitoring:
+            self.status_label.setText("Cannot open a log while monitoring.")
+            return
+        path, _ = QFileDialog.getOpenFileName(self, "Open Log", "", f"Monitor Logs (*{LOG_EXTENSION})")
+        if not path:
+            return
+        try:
+            store = read_log(path)
+        except (OSError, ValueError) as e:
+            self.status_label.setText(f"Error opening log: {e}")
+            return
+        self.reset_table()
+        self.data = store
+        with self._buffer_lock:
+            self.buffered_data = store.empty_like()
+        self.table_model.set_store(self.data)
+        self.populate_plot_metrics()
+        self.training_source = store.source
+        self.rollup = Rollup.from_store(store)
+        # สถิติที่บันทึกไว้ (รวมทุก session ในไฟล์) หรือคำนวณจากข้อมูลดิบสำหรับไฟล์ที่ไม่มี
+        self.stats = store.stats or SessionStats.from_store(store)
+        store.stats = self.stats
+        store.meta.update(self.stats.meta())
+        self.update_stats_label()
+        if self.enable_plot_checkbox.isChecked() and store:
+            self.redraw_graph()
+            self.graph.add_markers(store.markers)
+        self.status_label.setText(f"Status: Loaded {len(store)} rows from {os.path.basename(path)}")
+        self.source_label.setText(f"Log source: {store.source}")
+
     # ------------------------------
     # เริ่มมอนิเตอร์ใหม่ (รีเซ็ตสถานะรอบใหม่)
+    # - ทำงานบน monitor thread: ตั้ง sampler/scheduler/store เท่านั้น
+    # - ส่วน widget/โมเดลตาราง ทำใน start_monitoring_ui บน thread UI
     # ------------------------------
-    def start_monitoring(self):
+    def start_monitoring(self, targets=None):
         self.sampling_rate = self.sampling_spinbox.value()
         self.monitoring = True
-        self.reset_table()
-        self.training_start_time = time.time()
-        self.last_update_time = self.training_start_time
+        # store ใหม่ต่อ session: source เก็บครั้งเดียว / โหมดหลายโปรเซสมีคอลัมน์ PID เพิ่ม
+        self.targets = targets
+        self.process_tree = None
+        # metric เสริม (โหมดโปรเซสเดียว) -> คอลัมน์ต่อจาก cpu/ram คงที่ตลอดรอบ
+        self.extra = self.open_extra_sampler() if targets is None else None
+        columns = MULTI_COLUMNS if targets is not None else COLUMNS + (self.extra.names if self.extra is not None else ())
+        self.breakdown = self.open_breakdown() if targets is None else None
+        limit = self.rate_combo.currentData()
+        self.adaptive = AdaptiveRate(self.sampling_rate, limit) if limit and targets is None else None
+        if self.adaptive is not None:
+            columns += (ADAPTIVE_COLUMN,)
+        self.watch = AnomalyWatch([self.report_alert]) if self.anomaly_checkbox.isChecked() else None
+        self._heatmap_drawn = 0.0
+        self.data = SampleStore(self.training_source, columns)
+        if self.tree_checkbox.isChecked():
+            self.data.track_children()  # series รายโปรเซสลูก (ส่งออกเป็นไฟล์ _children)
+        with self._buffer_lock:
+            self.buffered_data = self.data.empty_like()
+        if self.marker_listener is not None:
+            self.marker_listener.drain()    # ทิ้ง marker ที่มาถึงก่อนเริ่มรอบ
+        # นาฬิกาของรอบนี้: deadline ทุก sampling_rate + สถิติ jitter/tick ที่พลาด
+        self.scheduler = TickScheduler(self.sampling_rate)
+        self.overhead = Overhead()
+        self._plot_skipped = False
+        self.data.started_at = self.buffered_data.started_at = self.scheduler.wall_anchor
+        # ไฟล์บันทึกหลักของรอบนี้ (ข้อมูลลงดิสก์ต่อเนื่อง ไม่ต้องรอ auto-save)
+        self.close_run_log()
+        self.close_writer()
+        self.writer = BackgroundWriter()
+        self.flush_policy = self.read_flush_policy()
+        run_log = self.open_run_log()
+        with self._buffer_lock:
+            self.run_log = run_log
+            self.rollup = Rollup.for_store(self.data)
+            self.stats = SessionStats.for_store(self.data)
+        self.training_start_time = 0.0
+        self.last_update_time = 0.0
         self.initial_buffer_flushed = False
         self.idle_start_time = None
 
@@ -759,53 +1855,226 @@ class MonitorApp(QWidget):
         self._is_finalizing = False
         self._final_written = False
         self._autosave_written = False
+        self.worker.session_started.emit()
+
+    def start_monitoring_ui(self):
+        self.table_model.set_store(self.data)
+        self.populate_plot_metrics()
+        self.reset_table()
 
         # ระหว่างมอนิเตอร์ ไม่อยากให้เผลอไปเปลี่ยน sampling/ไฟล์
         self.sampling_spinbox.setEnabled(False)
-        self.btn_select_autosave.setEnabled(False)
-
-        self.status_label.setText("Monitoring...")
+        self.metrics_combo.setEnabled(False)
+        self.rate_combo.setEnabled(False)
+        self.breakdown_checkbox.setEnabled(False)
+        self.anomaly_checkbox.setEnabled(False)
+        self.set_autosave_options_enabled(False)
+
+        run_log = self.run_log
+        self.status_label.setText(f"Monitoring... Recording to {os.path.basename(run_log.path)}" if run_log else "Monitoring...")
         self.source_label.setText(f"Monitoring process: {self.training_source}")
 
     # ------------------------------
-    # Export เฉพาะข้อมูลที่อยู่ใน self.data ปัจจุบันเป็น Excel
+    # สรุปสถิติ 1 บรรทัด (mean/p95/max) ใต้ชื่อโปรเซส, รายละเอียดทั้งหมดใน tooltip
+    # ------------------------------
+    def update_stats_label(self):
+        with self._buffer_lock:
+            if not self.stats:
+                return
+            text = self.stats.headline()
+            details = self.stats.meta()
+        if self.overhead is not None:
+            details.update(self.overhead.meta())
+        if self.breakdown is not None:
+            with self._buffer_lock:
+                details.update(self.breakdown.meta())
+        if self.adaptive is not None:
+            details.update(self.adaptive.meta())
+        if self.watch is not None:
+            details.update(self.watch.meta())
+        self.stats_label.setText(f"Stats: {text}")
+        self.stats_label.setToolTip("\n".join(f"{label} {value}" for label, value in details.items()))
+
+    # ------------------------------
+    # metric เสริมตามตัวเลือก "Metrics" (ตัวที่แพลตฟอร์ม/สิทธิ์ไม่รองรับถูกตัดออก)
+    # ------------------------------
+    def open_extra_sampler(self):
+        metrics = parse_metrics(self.metrics_combo.currentData())
+        if not metrics or self.training_pid is None:
+            return None
+        try:
+            extra = ExtraSampler(self.training_pid, metrics)
+        except psutil.Error as e:
+            print(f"Extra metrics disabled: {e}")
+            return None
+        for name, reason in extra.unavailable.items():
+            print(f"Metric {name} unavailable: {reason}")
+        return extra if extra else None
+
+    # ------------------------------
+    # Thread/Core Breakdown: CPU ราย thread + core ที่แต่ละ thread รันล่าสุด (perfmon.breakdown)
+    # ------------------------------
+    def open_breakdown(self):
+        if not self.breakdown_checkbox.isChecked() or self.training_pid is None:
+            return None
+        try:
+            return ThreadBreakdown(self.training_pid, self.training_source)
+        except psutil.Error as e:
+            print(f"Thread breakdown disabled: {e}")
+            return None
+
+    def update_heatmap(self, force=False):
+        # วาดใหม่ทั้งรูป (ต้นทุนตามความยาว run) -> ระหว่างมอนิเตอร์ไม่เกิน 1 ครั้งต่อ HEATMAP_INTERVAL วินาที
+        breakdown = self.breakdown
+        if breakdown is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._heatmap_drawn < self.HEATMAP_INTERVAL:
+            return
+        self._heatmap_drawn = now
+        self.heatmap.setVisible(True)
+        # ถือ lock เฉพาะตอนอ่าน breakdown เป็นตาราง -> การวาด matplotlib ไม่บล็อก monitor thread
+        with self._buffer_lock:
+            data = self.heatmap.matrices(breakdown, self.heatmap_combo.currentData())
+        self.heatmap.draw(data)
+
+    # ------------------------------
+    # Plot: คอลัมน์ของแกนล่าง = RAM หรือ metric เสริมที่ store มี
+    # ------------------------------
+    def populate_plot_metrics(self):
+        current = self.graph.lower
+        names = [c for c in self.data.columns if c not in ("elapsed", "pid", "cpu")]
+        self.plot_metric_combo.blockSignals(True)
+        self.plot_metric_combo.clear()
+        for name in names:
+            self.plot_metric_combo.addItem(column_label(name), name)
+        self.plot_metric_combo.setCurrentIndex(names.index(current) if current in names else 0)
+        self.plot_metric_combo.blockSignals(False)
+        if current not in names:
+            self.graph.set_lower('ram')
+
+    def change_plot_metric(self):
+        name = self.plot_metric_combo.currentData()
+        if name is None or name == self.graph.lower:
+            return
+        self._tier_plotted = None
+        self.graph.set_lower(name)
+        if self.enable_plot_checkbox.isChecked() and self.data:
+            self.redraw_graph()
+            self.graph.add_markers(self.data.markers)
+
+    # ------------------------------
+    # Resolution: Raw = ข้อมูลดิบ, 1 s / 1 min / 1 h = rollup tier ของทั้งรอบ
+    # ------------------------------
+    def tier_level(self):
+        if self.rollup is None:
+            return None
+        return tier_index(self.resolution_combo.currentData())
+
+    def change_resolution(self):
+        self._tier_plotted = None
+        if self.enable_plot_checkbox.isChecked() and (self.data or self.rollup is not None):
+            self.redraw_graph()
+
+    # ------------------------------
+    # วาดกราฟใหม่ทั้งรูปตาม Resolution ที่เลือก
+    # - only_new_buckets=True: ข้ามถ้า tier ยังไม่มี bucket ที่ปิดเพิ่ม (ใช้ตอน flush ระหว่างมอนิเตอร์)
+    # ------------------------------
+    def redraw_graph(self, only_new_buckets=False):
+        level = self.tier_level()
+        if level is None:
+            self._tier_plotted = None
+            self.graph.plot(
+                self.data.column('elapsed'), self.data.column('cpu'), self.data.column(self.graph.lower), is_real_time=False,
+                pids=self.data.column('pid') if 'pid' in self.data.columns else None
+            )
+            return
+        with self._buffer_lock:
+            plotted = (level, len(self.rollup.stores[level]))
+            if only_new_buckets and plotted == self._tier_plotted:
+                return
+            view = self.rollup.view(level)
+        self._tier_plotted = plotted
+        self.graph.plot_rollup(view)
+
+    # ------------------------------
+    # ข้อมูลที่จะส่งออก: Raw = self.data, tier = rollup ของทั้งรอบ (count + min/max/mean ต่อ bucket)
+    # ------------------------------
+    def export_store(self):
+        level = self.tier_level()
+        if level is None:
+            return self.data
+        with self._buffer_lock:
+            view = self.rollup.view(level)
+        view.stats = self.data.stats
+        view.markers = self.data.markers
+        return view
+
+    # ------------------------------
+    # Export ข้อมูลปัจจุบัน (ตาม Resolution) เป็น Excel
     # ------------------------------
     def export_excel(self):
-        if not self.data:
+        store = self.export_store()
+        if not store:
             self.status_label.setText("Status: No data to export")
             return
         path, _ = QFileDialog.getSaveFileName(self, "Save Excel File", "", "Excel Files (*.xlsx)")
         if path:
-            wb = Workbook()
-            ws = wb.active
-            ws.append(["Time (H:MM:SS.ms)", "CPU (%)", "RAM (MB)", "Source"])
-            for row in self.data:
-                formatted_row = [self.format_duration(row[0])] + list(row[1:])
-                ws.append(formatted_row)
-            ws.append([])
-            ws.append(["", "", "", f"Command/Source: {self.training_source}"])
-            wb.save(path)
+            write_xlsx(
+                path,
+                ([self.format_duration(row[0])] + list(row[1:]) for row in store),
+                header=store.header(),
+                footer=self.export_footer(pad=store.fields().index("source")),
+            )
+            if store is self.data:
+                self.save_children(path, (self.data.children,))
             self.status_label.setText(f"Status: Excel saved to {path}")
 
     # ------------------------------
-    # Export เฉพาะข้อมูลที่อยู่ใน self.data ปัจจุบันเป็น CSV
+    # Export ข้อมูลปัจจุบัน (ตาม Resolution) เป็น CSV
     # ------------------------------
     def export_csv(self):
-        if not self.data:
+        store = self.export_store()
+        if not store:
             self.status_label.setText("Status: No data to export")
             return
         path, _ = QFileDialog.getSaveFileName(self, "Save CSV File", "", "CSV Files (*.csv)")
         if path:
             with open(path, mode='w', newline='', encoding='utf-8') as file:
                 writer = csv.writer(file)
-                writer.writerow(["Time (H:MM:SS.ms)", "CPU (%)", "RAM (MB)", "Source"])
-                for row in self.data:
+                writer.writerow(store.header())
+                for row in store:
                     formatted_row = [self.format_duration(row[0])] + list(row[1:])
                     writer.writerow(formatted_row)
                 writer.writerow([])
-                writer.writerow(["", "", "", f"Command/Source: {self.training_source}"])
+                writer.writerows(self.export_footer(pad=store.fields().index("source")))
+            if store is self.data:
+                self.save_children(path, (self.data.children,))
             self.status_label.setText(f"Status: CSV saved to {path}")
 
+    # ------------------------------
+    # Export แบบคอลัมน์ (Parquet / Arrow IPC): ค่าตัวเลขจริง + เวลาเริ่มใน metadata (ต้องมี pyarrow)
+    # ------------------------------
+    def export_columnar_file(self):
+        store = self.export_store()
+        if not store:
+            self.status_label.setText("Status: No data to export")
+            return
+        path, selected = QFileDialog.getSaveFileName(
+            self, "Save Columnar File", "", "Parquet Files (*.parquet);;Arrow IPC Files (*.arrow)"
+        )
+        if not path:
+            return
+        if not os.path.splitext(path)[1]:
+            path += ".arrow" if "Arrow" in selected else ".parquet"
+        try:
+            export_columnar(path, store)
+            self.status_label.setText(f"Status: Columnar data saved to {path}")
+        except ImportError:
+            self.status_label.setText("Status: Parquet/Arrow export requires pyarrow (pip install pyarrow)")
+        except Exception as e:
+            self.status_label.setText(f"Error saving columnar data: {e}")
+
     # ------------------------------
     # บันทึกรูปกราฟปัจจุบันเป็น PNG
     # ------------------------------
@@ -821,6 +2090,16 @@ class MonitorApp(QWidget):
             self.graph.figure.savefig(path, dpi=300, bbox_inches='tight')
             self.status_label.setText(f"Status: Graph saved to {path}")
 
+    # ------------------------------
+    # ปิดหน้าต่างระหว่างมอนิเตอร์ -> ส่งข้อมูลที่ค้างใน buffer ของ .pmlog ลงดิสก์ก่อน
+    # ------------------------------
+    def closeEvent(self, event):
+        self.close_run_log()
+        self.close_writer()
+        if self.marker_listener is not None:
+            self.marker_listener.close()
+        super().closeEvent(event)
+
 
 # ------------------------------
 # main entry
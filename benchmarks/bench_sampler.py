@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark: ต้นทุนต่อการอ่าน CPU/RAM 1 ครั้งของแต่ละ backend
+- legacy : เส้นทางเดิมใน loop (pid_exists + cpu_percent + memory_info + cpu_count)
+- psutil : PsutilSampler (oneshot + cpu_times)
+- proc   : ProcSampler (os.preadv บน fd /proc ที่เปิดค้างไว้) -- Linux เท่านั้น
+
+วิธีรัน (จากโฟลเดอร์ราก):
+    python benchmarks/bench_sampler.py --pids 200 --rounds 50
+"""
+
+import argparse
+import sys
+import time
+
+from common import kill, spawn_idle
+
+import psutil
+
+from perfmon.sampler import open_sampler
+
+
+def legacy_reader(pid):
+    proc = psutil.Process(pid)
+    proc.cpu_percent(interval=None)
+
+    def read():
+        if not psutil.pid_exists(pid):
+            raise psutil.NoSuchProcess(pid)
+        cpu = proc.cpu_percent(interval=None) / psutil.cpu_count()
+        ram = proc.memory_info().rss / (1024 * 1024)
+        return cpu, ram
+    return read
+
+
+def run(readers, rounds):
+    """คืนค่าเวลาเฉลี่ยต่อการอ่าน 1 ครั้ง (ไมโครวินาที)"""
+    for read in readers:
+        read()  # warm-up
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for read in readers:
+            read()
+    return (time.perf_counter() - start) / (rounds * len(readers)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-sample cost of the sampler backends.")
+    parser.add_argument("--pids", type=int, default=100, help="Number of idle target processes.")
+    parser.add_argument("--rounds", type=int, default=50, help="Ticks to time per backend.")
+    args = parser.parse_args()
+
+    procs = spawn_idle(args.pids)
+    try:
+        time.sleep(0.5)
+        pids = [p.pid for p in procs]
+        backends = {"legacy": lambda pid: legacy_reader(pid)}
+        backends["psutil"] = lambda pid: open_sampler(pid, backend="psutil").sample
+        if sys.platform.startswith("linux"):
+            backends["proc"] = lambda pid: open_sampler(pid, backend="proc").sample
+
+        print(f"{args.pids} PIDs x {args.rounds} ticks")
+        print(f"{'backend':<8} {'us/sample':>10} {'max Hz @ N PIDs':>16}")
+        baseline = None
+        for name, factory in backends.items():
+            per_sample = run([factory(pid) for pid in pids], args.rounds)
+            baseline = baseline or per_sample
+            max_hz = 1e6 / (per_sample * args.pids)
+            print(f"{name:<8} {per_sample:>10.1f} {max_hz:>16.1f}   ({baseline / per_sample:.1f}x)")
+    finally:
+        kill(procs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+helper ที่ใช้ร่วมกันของ benchmark (suite.py และ bench_sampler.py)
+- path ของสคริปต์หลัก + load_script() สำหรับ import สคริปต์ที่ชื่อไฟล์มีช่องว่าง (เช่น format_duration ของ CLI)
+- parse_counts() / label(): "10k,1m" <-> จำนวนแถว
+- best_of() / per_call(): จับเวลา
+- make_store() / append_csv(): ข้อมูลจำลองและการเขียน CSV แบบ auto-save เดิม
+- spawn_idle() / kill(): โปรเซสว่างเป็นเป้าหมายของการ sample
+"""
+
+import csv
+import importlib.util
+import os
+import subprocess
+import sys
+import time
+from array import array
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from perfmon.store import SampleStore
+
+CLI_SCRIPT = os.path.join(ROOT, "CPU_RAM Monitor_CLI by psutil.py")
+GUI_SCRIPT = os.path.join(ROOT, "CPU_RAM Monitor_GUI by psutil.py")
+SUFFIXES = {"k": 10**3, "m": 10**6}
+
+
+def parse_counts(text):
+    """"10k,1m,10m" -> [10000, 1000000, 10000000]"""
+    counts = []
+    for part in text.split(","):
+        part = part.strip().lower()
+        scale = SUFFIXES.get(part[-1:], 1)
+        counts.append(int(float(part[:-1] if scale > 1 else part) * scale))
+    return counts
+
+
+def label(n):
+    for suffix, scale in (("m", 10**6), ("k", 10**3)):
+        if n >= scale and n % scale == 0:
+            return f"{n // scale}{suffix}"
+    return str(n)
+
+
+def load_script(path, name):
+    """import สคริปต์หลัก (ชื่อไฟล์มีช่องว่าง) เป็นโมดูลโดยไม่รัน main()"""
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def best_of(repeat, fn, setup=None):
+    """เวลาที่ดีที่สุด (วินาที) ของ fn() จาก repeat รอบ (setup() เรียกก่อนทุกรอบ ไม่นับเวลา)"""
+    best = float("inf")
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def per_call(fn, calls):
+    """เวลาเฉลี่ย (วินาที) ต่อการเรียก fn() 1 ครั้ง"""
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls
+
+
+def make_store(rows, start=0.0, base_rows=10000):
+    """
+    store ขนาด rows แถว (sample ทุก 0.1 วินาที เริ่มที่ start): สร้าง 1 ก้อนแล้ว extend ซ้ำ (คัดลอกทีละ chunk ไม่ใช่ทีละแถว)
+    แล้วเขียนคอลัมน์เวลาใหม่ผ่าน memoryview ให้เพิ่มขึ้นต่อเนื่องทั้ง store
+    """
+    base = SampleStore("Python: train.py --epochs 100")
+    for i in range(min(rows, base_rows)):
+        base.append(i * 0.1, (i * 7) % 100 + 0.25, 2048.0 + i % 512)
+    store = base.empty_like()
+    while len(store) + len(base) <= rows:
+        store.extend(base)
+    for i in range(rows - len(store)):
+        store.append(0.0, base.value("cpu", i), base.value("ram", i))
+    for first, stop, views in store.iter_chunks():
+        views[0][:] = array('d', [start + i * 0.1 for i in range(first, stop)])
+    store.started_at = time.time()
+    return store
+
+
+def append_csv(store, path, format_duration=None):
+    """ต่อท้ายแถวของ store ลง CSV ทีละแถว (แบบ auto-save เดิม), format_duration=None -> เวลาเป็นวินาที"""
+    with open(path, mode='a', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        for row in store:
+            if format_duration is not None:
+                row = [format_duration(row[0])] + list(row[1:])
+            writer.writerow(row)
+
+
+def spawn_idle(n):
+    """สร้างโปรเซสว่าง n ตัวเป็นเป้าหมาย"""
+    code = "import time; time.sleep(3600)"
+    return [subprocess.Popen([sys.executable, "-c", code]) for _ in range(n)]
+
+
+def kill(procs):
+    for p in procs:
+        p.kill()
+    for p in procs:
+        p.wait()
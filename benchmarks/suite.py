@@ -0,0 +1,828 @@
+# -*- coding: utf-8 -*-
+"""
+ชุด benchmark รวมของ hot path หลัก ผลเป็น JSON (เทียบกับ baseline ที่บันทึกไว้ได้)
+- tick      : ต้นทุนต่อ tick ของ loop การ sample (sampler + store + rollup + stats) 1 เป้าหมาย และ N เป้าหมาย
+- detector  : ต้นทุนตอนรอ + ความหน่วงในการตรวจพบโปรเซสใหม่ (process_iter เดิม / scan / netlink)
+- binlog    : ต้นทุนต่อแถวของ CSV เทียบ .pmlog, ขนาดไฟล์ และเวลาอ่านกลับ (read_log)
+- columnar  : เวลาโหลด run จาก CSV / .pmlog / Parquet / Arrow (Parquet/Arrow ต้องมี pyarrow)
+- downsample: minmax / lttb บน series ยาว (--points)
+- rollup    : ต้นทุนต่อ sample ของ rollup 1 วิ/1 นาที/1 ชม.
+- stats     : ต้นทุนต่อ sample ของ SessionStats + ความคลาดเคลื่อนของ p50/p95/p99
+- writer    : เวลาที่ loop หยุดรอตอน auto-save (เขียนเองเทียบ BackgroundWriter)
+- segments  : เวลาเขียนต่อก้อน + อ่านช่วงเวลาสั้นๆ จากไฟล์เดียวเทียบ segment ที่หมุน (manifest)
+- markers   : ต้นทุนต่อ event ฝั่งสคริปต์เทรน (ไม่มี/มีตัวฟัง) + สัดส่วนที่ถูกทิ้งตอนส่งรัว
+- metrics   : เรนเดอร์ snapshot ต่อ tick + latency ของ GET /metrics (โหมด -daemon)
+- monitor   : Monitor แบบ in-process: เวลา import, CPU ต่อ tick, งานช้าลงกี่ %
+- overhead  : ต้นทุนของการวัดตัวเอง (lap / tick / ปิด window)
+- registry  : ต้นทุนต่อ tick ของ metric เสริมแต่ละตัว
+- breakdown : ต้นทุนต่อ tick ของ CPU ราย thread/core เทียบ Process.threads()
+- adaptive  : จำนวน sample และความคลาดเคลื่อนของค่าเฉลี่ย อัตราคงที่เทียบแบบปรับตัว
+- anomaly   : ต้นทุนต่อ sample + เวลาจนได้ alert แรก
+- autosave  : auto_save_to_file (CSV / XLSX) ที่ 10k / 1M / 10M แถว
+- export    : export_csv / export_excel ของ CLI ที่ 10k / 1M / 10M แถว
+- format    : format_duration (ครั้ง/วินาที)
+- gui       : PlotCanvas.plot และ flush_buffer_to_table_and_graph เทียบความยาวประวัติ (Qt offscreen)
+  ต้องมี PyQt5 + matplotlib ไม่งั้นข้ามกลุ่มนี้ (บันทึกว่า skipped ในผล)
+เปรียบเทียบ backend ของ sampler (psutil / /proc) อยู่ที่ bench_sampler.py
+
+แต่ละรายการวัด --repeat รอบแล้วใช้ค่าที่ดีที่สุด (ลด noise จากโปรเซสอื่น)
+เทียบ baseline: รายการที่แย่ลงเกิน --tolerance (สัดส่วน) ถือว่า regression -> exit code 1
+
+วิธีรัน (จากโฟลเดอร์ราก):
+    python benchmarks/suite.py --sizes 10k --save-baseline benchmarks/baseline.json     # บันทึก baseline (ชุดเร็ว)
+    python benchmarks/suite.py --sizes 10k --baseline benchmarks/baseline.json          # เทียบก่อนอัปเกรด
+    python benchmarks/suite.py --groups stats,rollup --samples 1m                       # เฉพาะบางกลุ่ม
+    python benchmarks/suite.py --output results.json                                    # ชุดเต็ม (10M แถวใช้เวลานาน)
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import datetime
+
+from common import (CLI_SCRIPT, GUI_SCRIPT, ROOT, append_csv, best_of, kill, label, load_script, make_store,
+                    parse_counts, per_call, spawn_idle)
+
+import psutil
+
+from perfmon.adaptive import AdaptiveRate
+from perfmon.anomaly import AnomalyWatch
+from perfmon.binlog import BinLogWriter, open_log, read_log
+from perfmon.breakdown import ThreadBreakdown
+from perfmon.columnar import export_columnar, load_run
+from perfmon.detector import NetlinkDetector, ScanDetector, is_python_script
+from perfmon.markers import MarkerClient, MarkerListener
+from perfmon.metrics import MetricsServer, MetricsSnapshot
+from perfmon.overhead import Overhead
+from perfmon.registry import REGISTRY, ExtraSampler, parse_metrics
+from perfmon.rollup import Rollup
+from perfmon.sampler import open_sampler
+from perfmon.scheduler import TickScheduler
+from perfmon.segments import FlushPolicy, open_segment, select_segments
+from perfmon.stats import QUANTILES, SessionStats
+from perfmon.store import COLUMNS, MULTI_COLUMNS, SampleStore
+
+GROUPS = ("tick", "detector", "binlog", "columnar", "downsample", "rollup", "stats", "writer", "segments",
+          "markers", "metrics", "monitor", "overhead", "registry", "breakdown", "adaptive", "anomaly",
+          "autosave", "export", "format", "gui")
+CLI_GROUPS = {"binlog", "columnar", "autosave", "export", "format"}     # ใช้ฟังก์ชันจากสคริปต์ CLI
+
+
+class Results:
+    def __init__(self):
+        self.items = {}
+
+    def add(self, name, value, unit, better):
+        self.items[name] = {"value": value, "unit": unit, "better": better}
+        print(f"  {name:<44} {value:>14.3f} {unit}")
+
+    def skip(self, group, reason):
+        self.items[f"{group}[skipped]"] = {"value": None, "unit": reason, "better": None}
+        print(f"  {group:<44} skipped: {reason}")
+
+
+# ---------- tick ----------
+def bench_tick(results, targets, rounds, repeat):
+    procs = spawn_idle(max(targets))
+    try:
+        time.sleep(0.5)
+        for n in targets:
+            samplers = [open_sampler(p.pid) for p in procs[:n]]
+            store = SampleStore("bench", MULTI_COLUMNS if n > 1 else ("elapsed", "cpu", "ram"))
+            rollup, stats = Rollup.for_store(store), SessionStats.for_store(store)
+            clock = [0.0]
+
+            def tick_one():
+                for _ in range(rounds):
+                    clock[0] += 0.1
+                    cpu, ram = samplers[0].sample()
+                    store.append(clock[0], cpu, ram)
+                    rollup.add(clock[0], cpu, ram)
+                    stats.add(clock[0], cpu, ram)
+
+            def tick_many():
+                for _ in range(rounds):
+                    clock[0] += 0.1
+                    for sampler in samplers:
+                        cpu, ram = sampler.sample()
+                        store.append(clock[0], sampler.pid, cpu, ram)
+                        rollup.add(clock[0], sampler.pid, cpu, ram)
+                        stats.add(clock[0], sampler.pid, cpu, ram)
+
+            seconds = best_of(repeat, tick_one if n == 1 else tick_many)
+            results.add(f"tick[{n} target{'s' if n > 1 else ''}]", seconds / rounds * 1e6, "us/tick", "lower")
+            for sampler in samplers:
+                sampler.close()
+    finally:
+        kill(procs)
+
+
+# ---------- detector ----------
+def legacy_matches():
+    """การค้นหาแบบเดิม: ไล่ process_iter ทั้งเครื่องทุกรอบ"""
+    found = []
+    for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
+        try:
+            args = proc.info.get('cmdline')
+            if args and is_python_script(proc.info['name'] or '', args):
+                found.append((proc.pid, args))
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            continue
+    return found
+
+
+def detection_latency(matches, wait, script, poll_interval=1.0):
+    """เวลาตั้งแต่ spawn สคริปต์ .py จนตรวจพบ (รอแบบเดียวกับ loop จริง)"""
+    before = {pid for pid, _ in matches()}
+    spawned = {}
+
+    def spawn():
+        time.sleep(poll_interval / 3)
+        spawned["t"] = time.perf_counter()
+        spawned["p"] = subprocess.Popen([sys.executable, script])
+    threading.Thread(target=spawn).start()
+    while True:
+        wait(poll_interval)
+        if "t" in spawned and any(pid not in before for pid, _ in matches()):
+            elapsed = time.perf_counter() - spawned["t"]
+            kill([spawned["p"]])
+            return elapsed
+
+
+def bench_detector(results, calls, tmp):
+    script = os.path.join(tmp, "train_idle.py")
+    with open(script, "w", encoding="utf-8") as f:
+        f.write("import time\ntime.sleep(30)\n")
+    backends = {"legacy": (legacy_matches, time.sleep)}
+    scan = ScanDetector()
+    backends["scan"] = (scan.matches, scan.wait)
+    try:
+        netlink = NetlinkDetector()
+        backends["netlink"] = (netlink.matches, netlink.wait)
+    except (OSError, AttributeError) as e:
+        results.skip("detector[netlink]", str(e))
+    for name, (matches, wait) in backends.items():
+        matches()   # warm-up (สแกนครั้งแรก)
+        results.add(f"detector[{name},idle]", per_call(matches, calls) * 1e3, "ms/call", "lower")
+        results.add(f"detector[{name},latency]", detection_latency(matches, wait, script) * 1e3, "ms", "lower")
+    if "netlink" in backends:
+        netlink.close()
+
+
+# ---------- binlog ----------
+def bench_binlog(results, cli, rows, tmp):
+    store = make_store(rows)
+    csv_path = os.path.join(tmp, "run.csv")
+    log_path = os.path.join(tmp, "run.pmlog")
+
+    start = time.perf_counter()
+    append_csv(store, csv_path, cli.format_duration)
+    csv_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    log = BinLogWriter(log_path, COLUMNS, store.source)
+    for row in store:
+        log.append(*row[:-1])
+    log.close()
+    log_seconds = time.perf_counter() - start
+
+    for name, seconds, path in (("csv", csv_seconds, csv_path), ("pmlog", log_seconds, log_path)):
+        results.add(f"record[{name}]", seconds / rows * 1e6, "us/row", "lower")
+        results.add(f"record[{name},size]", os.path.getsize(path) / rows, "bytes/row", "lower")
+    start = time.perf_counter()
+    read_log(log_path)
+    results.add(f"read_log[{label(rows)}]", rows / (time.perf_counter() - start), "rows/s", "higher")
+
+
+# ---------- columnar ----------
+def parse_duration(text):
+    hours, minutes, seconds = text.split(":")
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def load_csv(path):
+    """โหลด CSV ที่ส่งออกแบบเดิมเป็น numpy arrays (แบบที่ dashboard ทำ)"""
+    import numpy as np
+
+    elapsed, cpu, ram = [], [], []
+    with open(path, newline='', encoding='utf-8') as file:
+        reader = csv.reader(file)
+        next(reader)
+        for row in reader:
+            if not row:
+                break
+            elapsed.append(parse_duration(row[0]))
+            cpu.append(float(row[1]))
+            ram.append(float(row[2]))
+    return np.array(elapsed), np.array(cpu), np.array(ram)
+
+
+def bench_columnar(results, cli, rows, tmp):
+    store = make_store(rows)
+    paths = {name: os.path.join(tmp, f"run.{name}") for name in ("csv", "pmlog", "parquet", "arrow")}
+    with open(paths["csv"], mode='w', newline='', encoding='utf-8') as file:
+        file.write(",".join(store.header()) + "\r\n")
+    append_csv(store, paths["csv"], cli.format_duration)
+    log = open_log(paths["pmlog"], store)
+    for row in store:
+        log.append(*row[:-1])
+    log.close()
+
+    loaders = {"csv": load_csv, "pmlog": load_run}
+    try:
+        export_columnar(paths["parquet"], store)
+        export_columnar(paths["arrow"], store)
+        loaders.update(parquet=load_run, arrow=load_run)
+    except ImportError as e:
+        results.skip("columnar[parquet/arrow]", str(e))
+    for name, loader in loaders.items():
+        seconds = best_of(1, lambda: loader(paths[name]))
+        results.add(f"load[{name},{label(rows)}]", seconds * 1e3, "ms", "lower")
+        results.add(f"load[{name},size]", os.path.getsize(paths[name]) / rows, "bytes/row", "lower")
+
+
+# ---------- downsample ----------
+def bench_downsample(results, points, width, repeat):
+    import numpy as np
+
+    from perfmon.downsample import lttb, minmax
+
+    rng = np.random.default_rng(0)
+    for n in points:
+        t = np.arange(n) * 0.1
+        y = rng.random(n) * 50
+        results.add(f"minmax[{label(n)}]", best_of(repeat, lambda: minmax(t, y, width)) * 1e3, "ms", "lower")
+        results.add(f"lttb[{label(n)}]", best_of(repeat, lambda: lttb(t, y, 2 * width)) * 1e3, "ms", "lower")
+
+
+# ---------- rollup / stats ----------
+def bench_rollup(results, samples, repeat):
+    def run():
+        rollup = Rollup()
+        add = rollup.add
+        for i in range(samples):
+            add(i * 1.0, (i * 7) % 100 + 0.25, 2048.0 + i % 512)
+        rollup.flush()
+
+    results.add("rollup.add", best_of(repeat, run) / samples * 1e6, "us/sample", "lower")
+
+
+def bench_stats(results, samples, repeat):
+    rng = random.Random(0)
+    cpu = [min(rng.lognormvariate(3.5, 0.6), 100.0) for _ in range(samples)]
+    ram = [2048.0 + rng.gauss(0, 64) + i * 0.001 for i in range(samples)]
+    holder = []
+
+    def run():
+        stats = SessionStats()
+        add = stats.add
+        for i in range(samples):
+            add(i * 0.1, cpu[i], ram[i])
+        holder[:] = [stats]
+
+    results.add("stats.add", best_of(repeat, run) / samples * 1e6, "us/sample", "lower")
+    summary = holder[0].summary()
+    for name, values in (("cpu", cpu), ("ram", ram)):
+        ordered = sorted(values)
+        worst = max(abs(summary[name][f"p{round(q * 100)}"] / ordered[int(q * (len(ordered) - 1))] - 1)
+                    for q in QUANTILES)
+        results.add(f"stats[{name},quantile error]", worst * 100, "%", "lower")
+
+
+# ---------- writer / segments ----------
+def bench_writer(results, rows, batches, tmp):
+    from perfmon.writer import BackgroundWriter
+
+    stall = 0.0
+    for _ in range(batches):
+        store = make_store(rows)
+        start = time.perf_counter()
+        append_csv(store, os.path.join(tmp, "inline.csv"))
+        stall = max(stall, time.perf_counter() - start)
+    results.add(f"autosave stall[inline,{label(rows)}]", stall * 1e3, "ms", "lower")
+
+    writer = BackgroundWriter()
+    stall = 0.0
+    for _ in range(batches):
+        store = make_store(rows)
+        start = time.perf_counter()
+        writer.submit(append_csv, store, os.path.join(tmp, "queued.csv"), rows=len(store))
+        stall = max(stall, time.perf_counter() - start)
+    writer.close()
+    results.add(f"autosave stall[queued,{label(rows)}]", stall * 1e3, "ms", "lower")
+
+
+def count_range(paths, lo, hi):
+    count = 0
+    for path in paths:
+        with open_segment(path) as f:
+            for line in f:
+                if lo <= float(line.split(",", 1)[0]) <= hi:
+                    count += 1
+    return count
+
+
+def bench_segments(results, rows, batches, tmp, rotate_mb=4.0):
+    single = os.path.join(tmp, "single.csv")
+    segments = FlushPolicy(rotate_bytes=int(rotate_mb * 2**20)).segments(os.path.join(tmp, "rotated.csv"))
+    worst_single = worst_rotated = 0.0
+    for b in range(batches):
+        store = make_store(rows, start=b * rows * 0.1)
+        start = time.perf_counter()
+        append_csv(store, single)
+        worst_single = max(worst_single, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        path = segments.active()
+        append_csv(store, path)
+        segments.record(path, store)
+        if segments.full(path):
+            segments.close(path)
+        worst_rotated = max(worst_rotated, time.perf_counter() - start)
+    segments.close(segments.active())
+    results.add("segments write[single]", worst_single * 1e3, "ms/batch", "lower")
+    results.add("segments write[rotated]", worst_rotated * 1e3, "ms/batch", "lower")
+
+    # ช่วง 10 นาทีกลาง run
+    total = batches * rows * 0.1
+    lo, hi = total / 2, total / 2 + 600.0
+    start = time.perf_counter()
+    count_range([single], lo, hi)
+    results.add("segments range read[single]", (time.perf_counter() - start) * 1e3, "ms", "lower")
+    start = time.perf_counter()
+    count_range(select_segments(segments.manifest_path, lo, hi), lo, hi)
+    results.add("segments range read[rotated]", (time.perf_counter() - start) * 1e3, "ms", "lower")
+
+
+# ---------- markers / metrics ----------
+def bench_markers(results, events, tmp):
+    # socket แยกของ benchmark (ไม่ชนกับตัวมอนิเตอร์ที่อาจรันอยู่), ไม่มี AF_UNIX -> UDP ค่าเริ่มต้น
+    address = os.path.join(tmp, "markers.sock") if hasattr(socket, "AF_UNIX") else None
+    client = MarkerClient(address)
+
+    def emit():
+        for _ in range(events):
+            client.scalar("loss", 0.5)
+
+    results.add("marker emit[no listener]", best_of(1, emit) / events * 1e6, "us/event", "lower")
+    listener = MarkerListener(address, maxlen=events)
+    client.sent = client.dropped = 0
+    results.add("marker emit[listening]", best_of(1, emit) / events * 1e6, "us/event", "lower")
+    time.sleep(0.5)     # ให้ thread ของ listener รับ datagram ที่ค้างใน socket ให้หมด
+    listener.drain()
+    listener.close()
+    client.close()
+    results.add("marker burst dropped", client.dropped / events * 100, "%", "lower")
+
+
+def bench_metrics(results, targets, updates, scrapes):
+    snapshot = MetricsSnapshot()
+    scheduler = TickScheduler(1.0)
+    sources = {1000 + i: f"Python: train.py --rank {i}" for i in range(targets)}
+    samples = [(pid, 12.5, 2048.0) for pid in sources]
+    update = per_call(lambda: snapshot.update(samples, scheduler, sources), updates)
+    results.add(f"metrics update[{targets} targets]", update * 1e6, "us/tick", "lower")
+
+    server = MetricsServer(snapshot, port=0)
+    stop = threading.Event()
+
+    def churn():
+        while not stop.is_set():
+            snapshot.update(samples, scheduler, sources)
+
+    thread = threading.Thread(target=churn, daemon=True)
+    thread.start()
+    latencies = []
+    for _ in range(scrapes):
+        start = time.perf_counter()
+        with urllib.request.urlopen(server.url) as response:
+            response.read()
+        latencies.append(time.perf_counter() - start)
+    stop.set()
+    thread.join()
+    server.close()
+    latencies.sort()
+    results.add("metrics scrape[p50]", latencies[len(latencies) // 2] * 1e3, "ms", "lower")
+    results.add("metrics scrape[p99]", latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e3, "ms", "lower")
+
+
+# ---------- monitor / overhead ----------
+HEAVY = ("openpyxl", "PyQt5", "matplotlib", "numpy")
+IMPORT_PROBE = (
+    "import sys, time; t = time.perf_counter(); import perfmon.monitor; "
+    "print(time.perf_counter() - t); "
+    f"print(','.join(sorted(m for m in sys.modules if m.split('.')[0] in {HEAVY!r})))"
+)
+
+
+def workload(seconds):
+    """วนคำนวณจนครบเวลา -> จำนวนรอบที่ทำได้"""
+    end = time.perf_counter() + seconds
+    rounds = 0
+    while time.perf_counter() < end:
+        sum(range(1000))
+        rounds += 1
+    return rounds
+
+
+def bench_monitor(results, interval, seconds):
+    from perfmon.monitor import Monitor
+
+    out = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=ROOT, capture_output=True, text=True, check=True)
+    elapsed, heavy = (out.stdout.splitlines() + [""])[:2]
+    results.add("monitor import", float(elapsed) * 1e3, "ms", "lower")
+    if heavy:
+        print(f"  ⚠️ heavy modules loaded by perfmon.monitor: {heavy}")
+
+    alone = workload(seconds)
+    thread_cpu = []
+    # window ยาวกว่า run -> callback ถูกเรียกครั้งเดียวตอน stop (ใน thread ของมอนิเตอร์)
+    with Monitor(interval=interval, window=1e9, callback=lambda w: thread_cpu.append(time.thread_time())) as mon:
+        monitored = workload(seconds)
+    results.add("monitor tick", thread_cpu[0] / max(len(mon.store), 1) * 1e6, "us CPU/tick", "lower")
+    results.add("monitor workload slowdown", (1 - monitored / alone) * 100, "%", "lower")
+
+
+def bench_overhead(results, ticks, interval=0.01):
+    overhead = Overhead()
+    mark = overhead.begin()
+    start = time.perf_counter()
+    for _ in range(ticks):
+        mark = overhead.lap("sample", mark)
+    results.add("overhead lap", (time.perf_counter() - start) / ticks * 1e9, "ns/stage", "lower")
+
+    overhead = Overhead()
+    start = time.perf_counter()
+    for i in range(ticks):
+        tick_start = mark = overhead.begin()
+        mark = overhead.lap("sample", mark)
+        mark = overhead.lap("aggregate", mark)
+        overhead.lap("display", mark)
+        overhead.end(i * interval, tick_start, 0, 0)
+    results.add("overhead tick", (time.perf_counter() - start) / ticks * 1e9, "ns/tick", "lower")
+
+    window = per_call(lambda: overhead._close_window(0.0), 1000)
+    overhead.close()
+    results.add("overhead window", window * 1e6, "us/window", "lower")
+
+
+# ---------- registry / breakdown ----------
+def bench_registry(results, ticks):
+    pid = os.getpid()
+    sampler = open_sampler(pid)
+    results.add(f"registry[cpu/ram,{sampler.backend}]", per_call(sampler.sample, ticks) * 1e6, "us/tick", "lower")
+    sampler.close()
+    for name in REGISTRY:
+        extra = ExtraSampler(pid, [(name, 1)])
+        if not extra:
+            results.skip(f"registry[{name}]", extra.unavailable[name])
+            continue
+        results.add(f"registry[{name}]", per_call(extra.sample, ticks) * 1e6, "us/tick", "lower")
+    for name, spec in (("cheap", "io,ctx,threads,fds,faults"), ("all", "all")):
+        extra = ExtraSampler(pid, parse_metrics(spec))
+        results.add(f"registry[{name}]", per_call(extra.sample, ticks) * 1e6, "us/tick", "lower")
+
+
+BUSY_CHILD = (
+    "import sys, threading, time\n"
+    "stop = threading.Event()\n"
+    "for _ in range(int(sys.argv[1]) - 1): threading.Thread(target=stop.wait, daemon=True).start()\n"
+    "print('ready', flush=True)\n"
+    "end = time.perf_counter() + 600\n"
+    "while time.perf_counter() < end: pass\n"
+)
+
+
+def bench_breakdown(results, threads, ticks):
+    child = subprocess.Popen([sys.executable, "-c", BUSY_CHILD, str(threads)], stdout=subprocess.PIPE, text=True)
+    try:
+        child.stdout.readline()
+        breakdown = ThreadBreakdown(child.pid)
+        clock = iter(range(1, ticks + 1))
+        cost = per_call(lambda: breakdown.sample(float(next(clock))), ticks)
+        results.add(f"breakdown[{breakdown.backend},{threads} threads]", cost * 1e3, "ms/tick", "lower")
+        breakdown.close()
+        proc = psutil.Process(child.pid)
+        results.add(f"breakdown[Process.threads,{threads} threads]", per_call(proc.threads, ticks) * 1e3, "ms/tick", "lower")
+    finally:
+        kill([child])
+
+
+# ---------- adaptive / anomaly ----------
+RESOLUTION = 0.01           # วินาทีต่อจุดของสัญญาณจำลอง
+
+
+def make_signal(seconds, bursts, seed=1):
+    """[cpu %] ทุก RESOLUTION วินาที: พื้น 2% + burst 60-95% ยาว 5-60 s"""
+    rng = random.Random(seed)
+    n = int(seconds / RESOLUTION)
+    cpu = [2.0] * n
+    for _ in range(bursts):
+        start = rng.randrange(n)
+        length = int(rng.uniform(5, 60) / RESOLUTION)
+        level = rng.uniform(60, 95)
+        for i in range(start, min(n, start + length)):
+            cpu[i] = level
+    return cpu
+
+
+def sample_signal(cpu, interval_of, columns):
+    """sample สัญญาณ (ค่า = CPU เฉลี่ยตลอด interval เหมือน sampler จริง): interval_of(row หรือ None) -> (คาบถัดไป, คอลัมน์เสริม)"""
+    prefix = [0.0]
+    for x in cpu:
+        prefix.append(prefix[-1] + x)
+    store = SampleStore("bench", columns)
+    i, n = 0, len(cpu)
+    ram = 100.0
+    step, _ = interval_of(None)
+    while True:
+        j = i + max(int(round(step / RESOLUTION)), 1)
+        if j > n:
+            break
+        value = (prefix[j] - prefix[i]) / (j - i)
+        ram += value / 1000.0
+        step, extra = interval_of((j * RESOLUTION, value, ram))
+        store.append(j * RESOLUTION, value, ram, *extra)
+        i = j
+    return store
+
+
+def bench_adaptive(results, seconds, fastest=0.5, slowest=30.0, bursts=20):
+    cpu = make_signal(seconds, bursts)
+    true_mean = sum(cpu) / len(cpu)
+    rate = AdaptiveRate(fastest, slowest)
+
+    def adaptive(row):
+        if row is None:
+            return rate.interval, ()
+        return rate.interval, (rate.update(*row),)
+
+    runs = (("fixed", sample_signal(cpu, lambda row: (fastest, ()), COLUMNS)),
+            ("adaptive", sample_signal(cpu, adaptive, COLUMNS + ("interval",))))
+    for name, store in runs:
+        weighted = SessionStats.from_store(store).summary()["cpu"]["mean"]
+        results.add(f"sampling[{name},samples]", len(store), "samples", "lower")
+        results.add(f"sampling[{name},mean error]", abs(weighted - true_mean), "% CPU", "lower")
+
+
+def anomaly_signal(i, t, rng, event):
+    """(cpu, ram) ของ PID i ณ เวลา t: PID คู่ CPU collapse ที่ event, PID คี่ RSS โต 40 MB/นาที ตั้งแต่ event"""
+    cpu = max(0.0, rng.gauss(80.0, 10.0))
+    ram = 2000.0 + rng.gauss(0.0, 5.0)
+    if t >= event:
+        if i % 2 == 0:
+            cpu = rng.uniform(0.0, 4.0)
+        else:
+            ram += (t - event) * 40.0 / 60.0
+    return cpu, ram
+
+
+def bench_anomaly(results, pids, seconds, interval=1.0):
+    rng = random.Random(1)
+    event = seconds / 2
+    ticks = int(seconds / interval)
+    rows = [[anomaly_signal(i, k * interval, rng, event) for i in range(pids)] for k in range(ticks)]
+
+    watch = AnomalyWatch()
+    add = watch.add
+    start = time.perf_counter()
+    for k, row in enumerate(rows):
+        for pid, (cpu, ram) in enumerate(row):
+            add(k * interval, pid, cpu, ram)
+    results.add(f"anomaly.add[{pids} PIDs]", (time.perf_counter() - start) / (ticks * pids) * 1e6, "us/sample", "lower")
+
+    # alert แรกของแต่ละ PID ต่อชนิด -> เวลาตั้งแต่เกิดเหตุ (median ของ PID ทั้งหมด)
+    first = {}
+    for alert in watch.alerts:
+        if alert.elapsed >= event:
+            first.setdefault((alert.pid, alert.kind), alert.elapsed - event)
+    for kind in sorted({kind for _, kind in first}):
+        delays = sorted(delay for (_, k), delay in first.items() if k == kind)
+        results.add(f"anomaly delay[{kind}]", delays[len(delays) // 2], "s", "lower")
+    results.add("anomaly false alerts", sum(1 for alert in watch.alerts if alert.elapsed < event), "alerts", "lower")
+
+
+# ---------- autosave / export ----------
+def bench_files(results, cli, groups, sizes, repeat, tmp):
+    quiet = contextlib.redirect_stdout(io.StringIO())
+    for n in sizes:
+        store = make_store(n)
+        source = store.source
+        cases = []
+        if "autosave" in groups:
+            cases += [(f"auto_save_to_file[csv,{label(n)}]", ".csv",
+                       lambda path, store=store, source=source: cli.auto_save_to_file(store, source, path)),
+                      (f"auto_save_to_file[xlsx,{label(n)}]", ".xlsx",
+                       lambda path, store=store, source=source: cli.auto_save_to_file(store, source, path))]
+        if "export" in groups:
+            cases += [(f"export_csv[{label(n)}]", "",
+                       lambda path, store=store, source=source: cli.export_csv(store, source, path)),
+                      (f"export_excel[{label(n)}]", "",
+                       lambda path, store=store, source=source: cli.export_excel(store, source, path))]
+        work = os.path.join(tmp, "files")
+        path = os.path.join(work, "bench")
+
+        def fresh():
+            # ไฟล์ของรอบก่อน (รวม segment XLSX) -> ทุกรอบเริ่มจากไฟล์ใหม่
+            shutil.rmtree(work, ignore_errors=True)
+            os.makedirs(work)
+
+        for name, extension, run in cases:
+            def once():
+                with quiet:
+                    run(path + extension)
+
+            results.add(name, n / best_of(repeat, once, fresh), "rows/s", "higher")
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def bench_format(results, cli, calls, repeat):
+    fmt = cli.format_duration
+    values = [i * 0.1234 for i in range(1000)]
+    loops = max(1, calls // len(values))
+
+    def run():
+        for _ in range(loops):
+            for v in values:
+                fmt(v)
+
+    results.add("format_duration", loops * len(values) / best_of(repeat, run), "calls/s", "higher")
+
+
+# ---------- gui ----------
+def bench_gui(results, history, flushes, repeat, tmp):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        gui = load_script(GUI_SCRIPT, "perfmon_gui_bench")
+    except ImportError as e:
+        results.skip("gui", str(e))
+        return
+    import numpy as np
+
+    app = gui.QApplication.instance() or gui.QApplication([])
+    cwd = os.getcwd()
+    os.chdir(tmp)       # MonitorApp สร้างโฟลเดอร์ไฟล์ PID ของ MATLAB ใน path ปัจจุบันบนระบบที่ไม่ใช่ Windows
+    try:
+        canvas = gui.PlotCanvas()
+        canvas.resize(1100, 500)
+        for n in history:
+            store = make_store(n)
+            t, cpu, ram = (np.frombuffer(store.column(c), dtype=np.float64) for c in ("elapsed", "cpu", "ram"))
+            seconds = best_of(repeat, lambda: canvas.plot(t, cpu, ram, is_real_time=False))
+            results.add(f"PlotCanvas.plot[{label(n)}]", seconds * 1e3, "ms", "lower")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            win = gui.MonitorApp()
+        win.resize(1100, 700)
+        win.enable_plot_checkbox.setChecked(True)
+        win.plot_mode_checkbox.setChecked(False)
+        win.buffer_mode_checkbox.setChecked(False)     # buffered: กราฟแสดงประวัติทั้งหมด
+        for n in history:
+            store = make_store(n)
+            with win._buffer_lock:
+                win.data = store
+                win.buffered_data = store.empty_like()
+            win.table_model.set_store(store)
+            win.graph.append_from_store(store, False)
+            app.processEvents()
+            elapsed = store.last("elapsed")
+            latencies = []
+            for _ in range(flushes):
+                elapsed += 0.1
+                with win._buffer_lock:
+                    win.buffered_data.append(elapsed, 50.0, 2048.0)
+                start = time.perf_counter()
+                win.flush_buffer_to_table_and_graph()
+                app.processEvents()
+                latencies.append(time.perf_counter() - start)
+            latencies.sort()
+            results.add(f"flush_buffer_to_table_and_graph[{label(n)},p50]", latencies[len(latencies) // 2] * 1e3, "ms", "lower")
+            results.add(f"flush_buffer_to_table_and_graph[{label(n)},max]", latencies[-1] * 1e3, "ms", "lower")
+        win.close()
+    finally:
+        os.chdir(cwd)
+
+
+# ---------- baseline ----------
+def compare(results, baseline, tolerance):
+    """พิมพ์ตารางเทียบ baseline -> คืนค่ารายชื่อที่ regression เกิน tolerance"""
+    regressions = []
+    print(f"\n{'benchmark':<44} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name, item in results.items.items():
+        old = baseline.get("results", {}).get(name)
+        if not old or old["value"] is None or item["value"] is None or old["unit"] != item["unit"]:
+            continue
+        if item["better"] == "higher":
+            change = item["value"] / old["value"] - 1 if old["value"] else 0.0
+        else:
+            change = old["value"] / item["value"] - 1 if item["value"] else 0.0
+        flag = ""
+        if change < -tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<44} {old['value']:>12.3f} {item['value']:>12.3f} {change * 100:>+8.1f}%{flag}")
+    return regressions
+
+
+def machine_info():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "commit": commit, "date": datetime.now().isoformat(timespec="seconds")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the sampler, recorders, exporters and GUI rendering.")
+    parser.add_argument("--groups", default=",".join(GROUPS), help=f"Comma-separated groups ({', '.join(GROUPS)}).")
+    parser.add_argument("--sizes", default="10k,1m,10m", help="Row counts for auto-save/export.")
+    parser.add_argument("--history", default="1k,100k,1m", help="History lengths for the GUI benchmarks.")
+    parser.add_argument("--targets", default="1,8", help="Target process counts for the tick benchmark.")
+    parser.add_argument("--samples", default="200k", help="Samples for the binlog/columnar/rollup/stats benchmarks.")
+    parser.add_argument("--points", default="100k,1m", help="Series lengths for the downsample benchmark.")
+    parser.add_argument("--rounds", type=int, default=200, help="Ticks per tick measurement.")
+    parser.add_argument("--flushes", type=int, default=50, help="Flushes per history length.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark (best is kept).")
+    parser.add_argument("--output", help="Write results as JSON.")
+    parser.add_argument("--save-baseline", help="Write results as a baseline JSON (same format as --output).")
+    parser.add_argument("--baseline", help="Baseline JSON to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before a regression is reported.")
+    args = parser.parse_args()
+
+    groups = {g.strip() for g in args.groups.split(",")}
+    samples = parse_counts(args.samples)[0]
+    results = Results()
+    with tempfile.TemporaryDirectory() as tmp:
+        cli = None
+        if groups & CLI_GROUPS:
+            try:
+                cli = load_script(CLI_SCRIPT, "perfmon_cli_bench")
+            except ImportError as e:
+                results.skip("cli", str(e))
+        runs = (
+            ("tick", lambda: bench_tick(results, parse_counts(args.targets), args.rounds, args.repeat)),
+            ("detector", lambda: bench_detector(results, 20, tmp)),
+            ("binlog", lambda: bench_binlog(results, cli, samples, tmp)),
+            ("columnar", lambda: bench_columnar(results, cli, samples, tmp)),
+            ("downsample", lambda: bench_downsample(results, parse_counts(args.points), 1000, args.repeat)),
+            ("rollup", lambda: bench_rollup(results, samples, args.repeat)),
+            ("stats", lambda: bench_stats(results, samples, args.repeat)),
+            ("writer", lambda: bench_writer(results, 36000, 3, tmp)),
+            ("segments", lambda: bench_segments(results, 36000, 12, tmp)),
+            ("markers", lambda: bench_markers(results, 100000, tmp)),
+            ("metrics", lambda: bench_metrics(results, 8, 20000, 300)),
+            ("monitor", lambda: bench_monitor(results, 0.01, 2.0)),
+            ("overhead", lambda: bench_overhead(results, 100000)),
+            ("registry", lambda: bench_registry(results, 1000)),
+            ("breakdown", lambda: bench_breakdown(results, 200, 100)),
+            ("adaptive", lambda: bench_adaptive(results, 3600.0)),
+            ("anomaly", lambda: bench_anomaly(results, 64, 3600.0)),
+        )
+        for group, run in runs:
+            if group not in groups or (group in CLI_GROUPS and cli is None):
+                continue
+            print(group)
+            run()
+        if cli is not None and groups & {"autosave", "export"}:
+            print("autosave/export")
+            bench_files(results, cli, groups, parse_counts(args.sizes), args.repeat, tmp)
+        if cli is not None and "format" in groups:
+            print("format")
+            bench_format(results, cli, 1000000, args.repeat)
+        if "gui" in groups:
+            print("gui")
+            bench_gui(results, parse_counts(args.history), args.flushes, args.repeat, tmp)
+
+    report = {"machine": machine_info(), "results": results.items}
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📁 Saved results to {os.path.abspath(path)}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\n✅ No regressions beyond tolerance.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+"""
+โมดูลกลางที่ใช้ร่วมกันระหว่างเวอร์ชัน CLI และ GUI
+- ห้าม import ไลบรารีหนัก (openpyxl, PyQt5, matplotlib) ที่ระดับแพ็กเกจ
+  ให้ import เฉพาะในโมดูลย่อยที่ต้องใช้จริงเท่านั้น
+"""
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+อัตราการ sample แบบปรับตามการเปลี่ยนแปลงของสัญญาณ (แทนอัตราคงที่ทั้ง session)
+- เริ่มที่ interval ต่ำสุด (ค่า -s / spinbox) และกลับมาที่ interval ต่ำสุดทันทีเมื่อ
+  CPU เปลี่ยนเกิน cpu_delta (จุด %), RAM เปลี่ยนเกิน ram_delta (% ของ RSS, อย่างน้อย RAM_FLOOR MB)
+  หรือความแกว่งของ CPU (EWMA ของ |ΔCPU|) เกินครึ่งหนึ่งของ cpu_delta
+- นิ่งติดกัน patience tick -> interval x2 (exponential backoff) จนถึง max_interval
+  interval จึงเป็น min_interval * 2**level เสมอ
+- ทุกแถวติด interval จริงของตัวเอง (คอลัมน์ "interval" ต่อท้ายสุด = วินาทีนับจาก sample ก่อนหน้า
+  = ช่วงที่ค่า CPU เฉลี่ยของแถวนั้นครอบคลุม) -> Rollup / SessionStats ถ่วงน้ำหนักด้วยคอลัมน์นี้
+  ค่าเฉลี่ย/quantile/rollup จึงเป็นแบบตามเวลา ไม่เอียงไปทางช่วงที่ sample ถี่
+- หมายเหตุ: CPU ของ sampler เป็นค่าเฉลี่ยตลอด interval -> spike สั้นๆ ระหว่างช่วงช้ายังถูกเฉลี่ย
+  แต่ค่าเฉลี่ยที่ขยับจะดึงกลับมา sample ถี่ทันทีใน tick ถัดไป
+"""
+
+import math
+
+from .store import COLUMN_LABELS
+
+COLUMN = "interval"
+DEFAULT_MAX = 30.0          # วินาที
+CPU_DELTA = 5.0             # จุด % ของ CPU ต่อ sample
+RAM_DELTA = 1.0             # % ของ RSS ต่อ sample
+RAM_FLOOR = 1.0             # MB (โปรเซสเล็กๆ ไม่ต้องกลับมาเร็วเพราะ RSS ขยับไม่กี่ KB)
+PATIENCE = 3                # tick ที่นิ่งติดกันก่อนขยับ interval ขึ้น 1 ระดับ
+SMOOTHING = 0.3             # น้ำหนักของ |ΔCPU| ล่าสุดใน EWMA ความแกว่ง
+
+COLUMN_LABELS[COLUMN] = "Interval (s)"
+
+
+class AdaptiveRate:
+    """update(elapsed, cpu, ram) ทุก tick -> interval ของแถวนั้น, self.interval = คาบของ tick ถัดไป"""
+
+    def __init__(self, min_interval, max_interval=DEFAULT_MAX, cpu_delta=CPU_DELTA, ram_delta=RAM_DELTA,
+                 patience=PATIENCE):
+        self.min_interval = float(min_interval)
+        self.max_interval = max(float(max_interval), self.min_interval)
+        self.max_level = int(math.log2(self.max_interval / self.min_interval) + 1e-9)
+        self.cpu_delta = cpu_delta
+        self.ram_delta = ram_delta
+        self.patience = patience
+        self.level = 0
+        self.samples = 0
+        self.covered = 0.0                  # วินาทีที่ sample ทั้งหมดครอบคลุม
+        self.bursts = 0                     # ครั้งที่กลับมาเร็วจากระดับที่ช้ากว่า
+        self.level_samples = [0] * (self.max_level + 1)
+        self._last = None                   # (elapsed, cpu, ram) ของ sample ก่อนหน้า
+        self._swing = 0.0                   # EWMA ของ |ΔCPU|
+        self._calm = 0
+
+    @property
+    def interval(self):
+        """คาบของ tick ถัดไป (วินาที)"""
+        return self.min_interval * (1 << self.level)
+
+    def update(self, elapsed, cpu, ram):
+        """
+        บันทึก sample ณ elapsed แล้วเลือกคาบถัดไป
+        :returns: interval ของ sample นี้ (วินาทีนับจาก sample ก่อนหน้า, sample แรก = คาบที่ตั้งไว้)
+        """
+        last = self._last
+        spent = elapsed - last[0] if last is not None else self.interval
+        self._last = (elapsed, cpu, ram)
+        self.samples += 1
+        self.covered += spent
+        self.level_samples[self.level] += 1
+        if last is None:
+            return spent
+        d_cpu = abs(cpu - last[1])
+        self._swing += SMOOTHING * (d_cpu - self._swing)
+        if (d_cpu >= self.cpu_delta or self._swing >= self.cpu_delta / 2
+                or abs(ram - last[2]) >= max(last[2] * self.ram_delta / 100.0, RAM_FLOOR)):
+            if self.level:
+                self.bursts += 1
+            self.level = 0
+            self._calm = 0
+        else:
+            self._calm += 1
+            if self._calm >= self.patience and self.level < self.max_level:
+                self.level += 1
+                self._calm = 0
+        return spent
+
+    # ---------- สรุป ----------
+    def summary(self):
+        """ข้อความสรุป 1 บรรทัด: ช่วง interval, จำนวน sample เทียบกับอัตราคงที่ที่ interval ต่ำสุด"""
+        fixed = self.covered / self.min_interval
+        saved = (1 - self.samples / fixed) * 100 if fixed > 0 else 0.0
+        fast = self.level_samples[0] / self.samples * 100 if self.samples else 0.0
+        return (f"{self.min_interval:g}-{self.max_interval:g} s, {self.samples} samples over {self.covered:.0f} s "
+                f"({fixed:.0f} at a fixed {self.min_interval:g} s, {saved:.0f}% fewer), "
+                f"{self.bursts} bursts, {fast:.0f}% of samples at {self.min_interval:g} s")
+
+    def meta(self):
+        """ข้อมูลท้ายไฟล์ส่งออก (label -> ค่า)"""
+        return {"Adaptive sampling:": self.summary()}
@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+"""
+ตรวจจับความผิดปกติแบบ online ระหว่าง sample (ไม่ต้องรอดูกราฟหลังจบ run)
+- RSS โตต่อเนื่อง (memory leak): linear regression แบบเพิ่มทีละ sample บน sliding window (LEAK_WINDOW วินาที)
+  window แบ่งเป็น SLOTS ช่อง เก็บผลรวม (n, Σt, Σx, Σt², Σtx, Σx²) ต่อช่อง -> sample ละ O(1)
+  ช่องเก่าหลุดออกทั้งช่องตอนขึ้นช่องใหม่ (O(SLOTS) ต่อช่อง ไม่ใช่ต่อ sample) และประเมิน slope ตอนนั้น
+  slope >= leak_rate MB/นาที และ R² >= LEAK_FIT (โตแบบเส้นตรง ไม่ใช่แกว่ง) -> alert "leak"
+  ยังโตต่อ -> alert ซ้ำเมื่อระยะเวลาเพิ่มเป็น 2 เท่า (5, 10, 20 นาที ...), หยุดโต -> "leak_end"
+- CPU เปลี่ยนระดับ (change point): CUSUM สองทางถ่วงด้วยเวลา (หน่วย %·วินาที) เทียบกับค่าเฉลี่ยของช่วงปัจจุบัน
+  ขนาดขั้นต่ำ = max(cpu_floor, cpu_shift x ค่าเฉลี่ย), สะสมเกินครึ่งหนึ่งของขนาด x cpu_hold -> เปลี่ยนระดับ
+  (ขั้นพอดีขนาดขั้นต่ำถูกจับหลัง cpu_hold วินาที ขั้นใหญ่กว่าถูกจับเร็วกว่า)
+  ลดลงเหลือ <= STALL_SHARE ของเดิม -> "cpu_stall", ลด -> "cpu_drop", เพิ่ม -> "cpu_rise"
+- ทุก PID มี detector ของตัวเอง (state คงที่ต่อ PID) -> ใช้กับโหมดหลายโปรเซสได้
+- alert ถูกส่งให้ hook ทุกตัวใน tick เดียวกับที่ตรวจพบ: callable(alert) ใดๆ, CommandHook (คำสั่ง shell ไม่รอ),
+  LogHook (JSON 1 บรรทัดต่อ alert) และผู้เรียกบันทึกเป็น marker kind "alert" (กราฟ/ไฟล์ส่งออก/.pmlog)
+- หน่วย CPU เป็นหน่วยเดียวกับคอลัมน์ cpu ของ store (% ของทั้งเครื่อง)
+"""
+
+import collections
+import json
+import os
+import subprocess
+
+LEAK_RATE = 10.0            # MB/นาที
+LEAK_WINDOW = 300.0         # วินาที
+LEAK_FIT = 0.8              # R² ขั้นต่ำของเส้นตรง
+SLOTS = 10                  # ช่องต่อ window
+CPU_SHIFT = 0.5             # ขนาดขั้นต่ำของการเปลี่ยนระดับ (สัดส่วนของค่าเฉลี่ยปัจจุบัน)
+CPU_FLOOR = 2.0             # ขนาดขั้นต่ำ (จุด %) เมื่อค่าเฉลี่ยใกล้ 0
+CPU_HOLD = 10.0             # วินาทีที่ขั้นขนาดขั้นต่ำต้องคงอยู่ก่อนนับว่าเปลี่ยนระดับ
+STALL_SHARE = 0.2           # CPU ใหม่ <= 20% ของเดิม -> "collapsed"
+
+KINDS = ("leak", "leak_end", "cpu_stall", "cpu_drop", "cpu_rise")
+_NONE = ()
+
+
+def _span(seconds):
+    """ระยะเวลาแบบอ่านง่าย: "45 s" / "20 min" / "2.5 h" """
+    if seconds < 60:
+        return f"{seconds:.0f} s"
+    if seconds < 3600:
+        return f"{seconds / 60:.0f} min"
+    return f"{seconds / 3600:.1f} h"
+
+
+class Alert:
+    __slots__ = ("elapsed", "pid", "kind", "message", "value")
+
+    def __init__(self, elapsed, kind, message, value, pid=None):
+        self.elapsed = elapsed
+        self.pid = pid
+        self.kind = kind            # ค่าใน KINDS
+        self.message = message
+        self.value = value          # leak: MB/นาที, cpu_*: ระดับ CPU ใหม่ (%)
+
+    def __str__(self):
+        return self.message if self.pid is None else f"PID {self.pid}: {self.message}"
+
+    def to_dict(self):
+        return {"elapsed": self.elapsed, "pid": self.pid, "kind": self.kind, "message": self.message, "value": self.value}
+
+    def env(self):
+        """ตัวแปร environment ของ CommandHook"""
+        return {"PERFMON_ALERT_KIND": self.kind, "PERFMON_ALERT_MESSAGE": str(self),
+                "PERFMON_ALERT_PID": "" if self.pid is None else str(self.pid),
+                "PERFMON_ALERT_ELAPSED": f"{self.elapsed:.3f}", "PERFMON_ALERT_VALUE": f"{self.value:g}",
+                "PERFMON_ALERT_JSON": json.dumps(self.to_dict())}
+
+    def marker(self):
+        """marker (elapsed, kind, label, value) สำหรับ store.markers / .pmlog"""
+        return (self.elapsed, "alert", str(self), self.value)
+
+
+class SlopeWindow:
+    """
+    slope ของ x ตามเวลาบน window ล่าสุด (regression แบบเพิ่มทีละ sample)
+    add() คืน True เมื่อขึ้นช่องใหม่ -> fit() ของช่องที่ปิดแล้ว SLOTS ช่องล่าสุดพร้อมอ่าน
+    """
+
+    def __init__(self, window=LEAK_WINDOW, slots=SLOTS):
+        self.window = float(window)
+        self.slots = slots
+        self.slot_len = self.window / slots
+        self._origin = None                 # (t, x) ของ sample แรก -> ค่าเล็ก ไม่เสียความละเอียดของ float
+        self._closed = collections.deque()  # ช่องที่ปิดแล้ว [index, t แรก, n, Σt, Σx, Σt², Σtx, Σx²]
+        self._open = None
+
+    def add(self, t, x):
+        if self._origin is None:
+            self._origin = (t, x)
+        t0, x0 = self._origin
+        t, x = t - t0, x - x0
+        index = int(t // self.slot_len)
+        acc = self._open
+        rolled = False
+        if acc is None or index != acc[0]:
+            if acc is not None:
+                closed = self._closed
+                closed.append(acc)
+                while closed and closed[0][0] <= index - 1 - self.slots:
+                    closed.popleft()
+                rolled = True
+            acc = self._open = [index, t, 0, 0.0, 0.0, 0.0, 0.0, 0.0]
+        acc[2] += 1
+        acc[3] += t
+        acc[4] += x
+        acc[5] += t * t
+        acc[6] += t * x
+        acc[7] += x * x
+        return rolled
+
+    def fit(self):
+        """(slope ต่อวินาที, R², วินาทีที่ครอบคลุม, ค่าที่เส้นตรงให้ ณ ต้น window) ของช่องที่ปิดแล้ว หรือ None"""
+        closed = self._closed
+        if not closed:
+            return None
+        n = st = sx = stt = stx = sxx = 0.0
+        for acc in closed:
+            n += acc[2]
+            st += acc[3]
+            sx += acc[4]
+            stt += acc[5]
+            stx += acc[6]
+            sxx += acc[7]
+        var_t = n * stt - st * st
+        if n < 3 or var_t <= 0:
+            return None
+        cov = n * stx - st * sx
+        var_x = n * sxx - sx * sx
+        slope = cov / var_t
+        r2 = cov * cov / (var_t * var_x) if var_x > 0 else 0.0
+        start = closed[0][1]
+        covered = (closed[-1][0] + 1) * self.slot_len - start
+        at_start = (sx - slope * st) / n + slope * start + self._origin[1]
+        return slope, r2, covered, at_start
+
+
+class ChangePoint:
+    """CUSUM สองทางถ่วงด้วยเวลา -> add() คืน (ระดับเดิม, ระดับใหม่) เมื่อ CPU เปลี่ยนระดับ ไม่งั้น None"""
+
+    def __init__(self, shift=CPU_SHIFT, floor=CPU_FLOOR, hold=CPU_HOLD):
+        self.shift = shift
+        self.floor = floor
+        self.hold = hold
+        self._last = None
+        self._sum = self._time = 0.0        # ช่วงปัจจุบัน: Σx·dt, Σdt
+        self._up = self._down = 0.0         # CUSUM ขาขึ้น/ขาลง (%·วินาที)
+        self._up_sum = self._up_time = 0.0  # Σx·dt, Σdt ตั้งแต่ CUSUM ขาขึ้นเริ่มสะสม (= ระดับใหม่)
+        self._down_sum = self._down_time = 0.0
+
+    def add(self, t, x):
+        last, self._last = self._last, t
+        if last is None or t <= last:
+            return None
+        dt = t - last
+        self._sum += x * dt
+        self._time += dt
+        if self._time < self.hold:
+            return None         # ค่าเฉลี่ยของช่วงยังไม่นิ่ง
+        mean = self._sum / self._time
+        drift = max(self.floor, self.shift * mean) / 2
+        limit = drift * self.hold
+
+        self._up += (x - mean - drift) * dt
+        if self._up <= 0.0:
+            self._up = self._up_sum = self._up_time = 0.0
+        else:
+            self._up_sum += x * dt
+            self._up_time += dt
+        self._down += (mean - x - drift) * dt
+        if self._down <= 0.0:
+            self._down = self._down_sum = self._down_time = 0.0
+        else:
+            self._down_sum += x * dt
+            self._down_time += dt
+
+        if self._up > limit:
+            part_sum, part_time = self._up_sum, self._up_time
+        elif self._down > limit:
+            part_sum, part_time = self._down_sum, self._down_time
+        else:
+            return None
+        # ระดับเดิม = ช่วงก่อนเริ่มสะสม, ระดับใหม่ = ตั้งแต่เริ่มสะสม -> ช่วงใหม่เริ่มจากส่วนหลัง
+        rest = self._time - part_time
+        old = (self._sum - part_sum) / rest if rest > 0 else mean
+        new = part_sum / part_time
+        self._sum, self._time = part_sum, part_time
+        self._up = self._up_sum = self._up_time = 0.0
+        self._down = self._down_sum = self._down_time = 0.0
+        if abs(new - old) < max(self.floor, self.shift * max(old, new) / 2):
+            return None         # ค่าเฉลี่ยไหลช้าๆ -> ตั้งช่วงใหม่โดยไม่แจ้ง
+        return old, new
+
+
+class _Detector:
+    """detector ของ 1 PID"""
+
+    def __init__(self, leak_rate, leak_window, cpu_shift, cpu_hold):
+        self.leak_rate = leak_rate
+        self.slope = SlopeWindow(leak_window)
+        self.change = ChangePoint(cpu_shift, CPU_FLOOR, cpu_hold)
+        self._since = None          # (elapsed, RSS) ตอนเริ่มโต
+        self._next_report = 0.0     # ระยะเวลาที่จะแจ้งครั้งถัดไป
+        self._reported = False
+
+    def add(self, elapsed, cpu, ram):
+        alerts = _NONE
+        step = self.change.add(elapsed, cpu)
+        if step is not None:
+            alerts = [self._cpu_alert(elapsed, *step)]
+        if self.slope.add(elapsed, ram):
+            alert = self._leak_alert(elapsed, ram)
+            if alert is not None:
+                alerts = (alerts or []) + [alert]
+        return alerts
+
+    @staticmethod
+    def _cpu_alert(elapsed, old, new):
+        if new < old:
+            if new <= old * STALL_SHARE:
+                return Alert(elapsed, "cpu_stall", f"CPU collapsed to {new:.1f}% (from {old:.1f}%), likely I/O stall", new)
+            return Alert(elapsed, "cpu_drop", f"CPU dropped from {old:.1f}% to {new:.1f}%", new)
+        return Alert(elapsed, "cpu_rise", f"CPU rose from {old:.1f}% to {new:.1f}%", new)
+
+    def _leak_alert(self, elapsed, ram):
+        fit = self.slope.fit()
+        if fit is None:
+            return None
+        slope, r2, covered, at_start = fit
+        rate = slope * 60.0
+        window = self.slope.window
+        if rate >= self.leak_rate and r2 >= LEAK_FIT and covered >= window * (1 - 1 / self.slope.slots):
+            if self._since is None:
+                self._since = (elapsed - covered, at_start)
+                self._next_report = covered
+            duration = elapsed - self._since[0]
+            if duration >= self._next_report:
+                self._next_report = duration * 2
+                self._reported = True
+                return Alert(elapsed, "leak", f"RSS growing {rate:.1f} MB/min for {_span(duration)} "
+                                              f"({self._since[1]:.0f} -> {ram:.0f} MB)", rate)
+        elif self._since is not None and rate < self.leak_rate / 2:
+            since, self._since = self._since, None
+            if self._reported:
+                self._reported = False
+                return Alert(elapsed, "leak_end", f"RSS growth stopped after {_span(elapsed - since[0])} "
+                                                  f"(+{ram - since[1]:.0f} MB)", rate)
+        return None
+
+
+class AnomalyWatch:
+    """
+    add(elapsed, pid, cpu, ram) ทุก sample -> [Alert] ที่เพิ่งเกิด (ส่วนใหญ่ว่าง) และเรียก hook ทุกตัวทันที
+    pid=None สำหรับโหมดโปรเซสเดียว
+    """
+
+    def __init__(self, hooks=(), leak_rate=LEAK_RATE, leak_window=LEAK_WINDOW, cpu_shift=CPU_SHIFT, cpu_hold=CPU_HOLD):
+        self.hooks = list(hooks)
+        self.leak_rate = leak_rate
+        self.leak_window = leak_window
+        self.cpu_shift = cpu_shift
+        self.cpu_hold = cpu_hold
+        self.alerts = []
+        self._detectors = {}
+
+    def add(self, elapsed, pid, cpu, ram):
+        detector = self._detectors.get(pid)
+        if detector is None:
+            detector = self._detectors[pid] = _Detector(self.leak_rate, self.leak_window, self.cpu_shift, self.cpu_hold)
+        alerts = detector.add(elapsed, cpu, ram)
+        for alert in alerts:
+            alert.pid = pid
+            self.alerts.append(alert)
+            for hook in self.hooks:
+                try:
+                    hook(alert)
+                except Exception as e:
+                    print(f"⚠️ Alert hook failed: {e}")
+        return alerts
+
+    def discard(self, pid):
+        """ลืม state ของ PID ที่จบแล้ว (โหมดหลายโปรเซส)"""
+        self._detectors.pop(pid, None)
+
+    def describe(self):
+        return (f"RSS slope >= {self.leak_rate:g} MB/min over {_span(self.leak_window)}, "
+                f"CPU shifts >= {self.cpu_shift * 100:.0f}% of the level held {self.cpu_hold:g} s")
+
+    def meta(self):
+        """ข้อมูลท้ายไฟล์ส่งออก (label -> ค่า)"""
+        if not self.alerts:
+            return {"Anomaly alerts:": "none"}
+        counts = collections.Counter(alert.kind for alert in self.alerts)
+        return {"Anomaly alerts:": f"{len(self.alerts)} (" + ", ".join(f"{k} {counts[k]}" for k in KINDS if k in counts) + ")",
+                "Last alert:": str(self.alerts[-1])}
+
+    def close(self):
+        for hook in self.hooks:
+            close = getattr(hook, "close", None)
+            if close is not None:
+                close()
+
+
+class CommandHook:
+    """รันคำสั่ง shell ต่อ alert โดยไม่รอให้จบ (รายละเอียดอยู่ใน env PERFMON_ALERT_*)"""
+
+    def __init__(self, command):
+        self.command = command
+        self._procs = []
+
+    def __call__(self, alert):
+        self._procs = [p for p in self._procs if p.poll() is None]     # เก็บโปรเซสที่จบแล้ว
+        env = dict(os.environ, **alert.env())
+        self._procs.append(subprocess.Popen(self.command, shell=True, env=env, stdin=subprocess.DEVNULL))
+
+    def close(self):
+        self._procs = [p for p in self._procs if p.poll() is None]
+
+
+class LogHook:
+    """ต่อท้าย JSON 1 บรรทัดต่อ alert (เปิด-ปิดไฟล์ทุกครั้ง: alert เกิดไม่บ่อย และไฟล์ถูกหมุนได้ระหว่างทาง)"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, alert):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(alert.to_dict()) + "\n")
+
+
+def parse_anomaly(text):
+    """
+    "leak=40,window=600,shift=0.5,hold=10" -> kwargs ของ AnomalyWatch ("" = ค่าเริ่มต้น)
+    :raises ValueError: ชื่อ/ค่าไม่ถูกต้อง
+    """
+    keys = {"leak": "leak_rate", "window": "leak_window", "shift": "cpu_shift", "hold": "cpu_hold"}
+    options = {}
+    for item in (text or "").split(","):
+        item = item.strip().lower()
+        if not item:
+            continue
+        key, _, value = item.partition("=")
+        try:
+            if key not in keys:
+                raise ValueError
+            value = float(value)
+            if value <= 0:
+                raise ValueError
+        except ValueError:
+            raise ValueError(f"Invalid anomaly option '{item}' (expected leak=MB_PER_MIN, window=S, shift=FRACTION or hold=S)") from None
+        options[keys[key]] = value
+    return options
@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+"""
+ไฟล์บันทึกหลักแบบ binary append-only (.pmlog) ทนต่อโปรแกรมล่ม
+- ข้อมูลลงดิสก์ต่อเนื่องทุก FLUSH_INTERVAL วินาที (write ลง OS) และ fsync ทุก FSYNC_INTERVAL วินาที
+  -> ถ้าโปรแกรมล่ม/ถูก OOM kill เสียข้อมูลไม่เกิน ~1 วินาที แทนที่จะเสียถึง 1 ชั่วโมง
+- ต้นทุนต่อแถวคงที่: แถวละ 8 bytes ต่อคอลัมน์ (float64) ไม่มีการจัดรูปแบบข้อความ
+- CSV/XLSX เป็นการแปลงจากไฟล์นี้ (read_log -> SampleStore -> exporter เดิม)
+
+รูปแบบไฟล์:
+    MAGIC (8 bytes) | ความยาว header (uint32) | header JSON | padding ให้ครบ 8 bytes
+    | record ขนาดคงที่ (float64 x จำนวนคอลัมน์) ...
+- header: columns, source, byteorder, created, started_at (anchor เวลาจริงของ elapsed = 0), meta
+- frame ข้อมูลเสริม (source ของ PID ใหม่, meta/สถิติตอนจบ, เริ่ม session ใหม่) แทรกอยู่ในสายเดียวกัน:
+  record แรกของ frame มีคอลัมน์แรกเป็น NaN และคอลัมน์ที่สองเป็นความยาว payload (bytes)
+  ตามด้วย payload JSON ที่ pad จนครบขนาด record -> ทุกอย่างยังเรียงเป็น record ขนาดคงที่
+- ส่วนท้ายที่เขียนไม่ครบ (ขนาดไม่ลงตัว, frame ขาด, record ที่เป็นศูนย์ทั้งหมด, เวลาย้อนกลับ)
+  ถือว่าเสีย: reader ข้าม, writer ตัดทิ้ง (recover) ก่อนเขียนต่อ
+- series รายโปรเซสลูก (โหมด process tree) อยู่ในไฟล์ children_path(path) รูปแบบเดียวกัน
+- สถิติ (SessionStats) ของหลาย session ในไฟล์เดียวกันถูกรวม (merge) ตอนอ่าน
+- marker จากสคริปต์เทรน (perfmon.markers) เป็น frame {"markers": [[elapsed, kind, label, value], ...]}
+"""
+
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from datetime import datetime
+
+from .stats import SessionStats
+from .store import MULTI_COLUMNS, SampleStore
+from .tree import children_path
+
+MAGIC = b"PMONLOG1"
+EXTENSION = ".pmlog"
+FLUSH_INTERVAL = 1.0        # วินาที: ส่งข้อมูลใน buffer ลง OS (รอดจากโปรแกรมล่ม)
+FSYNC_INTERVAL = 10.0       # วินาที: fsync ลงดิสก์ (รอดจากไฟดับ/เครื่องล่ม)
+_LEN = struct.Struct("<I")
+
+
+def _pad8(n):
+    return (n + 7) & ~7
+
+
+def _read_header(mm):
+    if mm[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a perfmon binary log")
+    (length,) = _LEN.unpack_from(mm, len(MAGIC))
+    start = len(MAGIC) + _LEN.size
+    header = json.loads(bytes(mm[start:start + length]).decode("utf-8"))
+    return header, _pad8(start + length)
+
+
+def _walk(mm, offset, ncols, swap=False):
+    """
+    ไล่ record ตั้งแต่ offset
+    yield ("row", values) / ("frame", dict) และหยุดที่ส่วนท้ายที่เสีย
+    คืนค่า (ผ่าน StopIteration.value) = offset ที่ข้อมูลสมบูรณ์สิ้นสุด
+    """
+    width = ncols * 8
+    count = (len(mm) - offset) // width
+    data = memoryview(mm)[offset:offset + count * width].cast("d")
+    if swap:
+        data = array("d", data)
+        data.byteswap()
+    last = float("-inf")
+    i = 0
+    while i < count:
+        base = i * ncols
+        first = data[base]
+        if math.isnan(first):
+            nbytes = data[base + 1]
+            if not 0 <= nbytes < len(mm):
+                break       # ความยาว payload เสีย
+            nbytes = int(nbytes)
+            slots = -(-nbytes // width)
+            if i + 1 + slots > count:
+                break       # frame ขาด
+            start = offset + (i + 1) * width
+            try:
+                payload = json.loads(bytes(mm[start:start + nbytes]).decode("utf-8"))
+            except ValueError:
+                break
+            if "session" in payload:
+                last = float("-inf")    # session ใหม่: เวลาเริ่มนับใหม่ได้
+            yield "frame", payload
+            i += 1 + slots
+            continue
+        values = tuple(data[base:base + ncols])
+        if first < last or not any(values):
+            break           # เวลาย้อนกลับ / record ศูนย์ทั้งแถว -> ส่วนท้ายที่เขียนไม่ครบ
+        last = first
+        yield "row", values
+        i += 1
+    return offset + i * width
+
+
+def _merge_stats(stats, payload):
+    """รวมสถิติจาก frame {"stats": ...} (threshold ไม่ตรงกับ session ก่อนหน้า -> ใช้ของ session หลังสุด)"""
+    other = SessionStats.from_dict(payload)
+    if stats is None:
+        return other
+    try:
+        return stats.merge(other)
+    except ValueError:
+        return other
+
+
+def recover(path):
+    """ตัดส่วนท้ายที่เขียนไม่ครบทิ้ง -> คืนค่าจำนวน bytes ที่ตัด"""
+    size = os.path.getsize(path)
+    with open(path, "r+b") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            header, offset = _read_header(mm)
+            walker = _walk(mm, offset, len(header["columns"]), header.get("byteorder", sys.byteorder) != sys.byteorder)
+            while True:
+                try:
+                    next(walker)
+                except StopIteration as stop:
+                    end = stop.value
+                    break
+        if end < size:
+            f.truncate(end)
+    return size - end
+
+
+def read_log(path):
+    """อ่านไฟล์ .pmlog ทั้งไฟล์ (ผ่าน mmap) -> SampleStore (columns/source/sources/meta/stats ตาม header และ frame)"""
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            header, offset = _read_header(mm)
+            columns = header["columns"]
+            store = SampleStore(header.get("source", ""), columns)
+            store.meta.update(header.get("meta", {}))
+            store.started_at = header.get("started_at")
+            swap = header.get("byteorder", sys.byteorder) != sys.byteorder
+            append = store.append
+            for kind, value in _walk(mm, offset, len(columns), swap):
+                if kind == "row":
+                    append(*value)
+                else:
+                    for pid, source in value.get("sources", {}).items():
+                        store.register_source(int(pid), source)
+                    store.meta.update(value.get("meta", {}))
+                    if "stats" in value:
+                        store.stats = _merge_stats(store.stats, value["stats"])
+                    store.markers.extend(tuple(m) for m in value.get("markers", ()))
+    child_path = children_path(path)
+    if os.path.exists(child_path):
+        store.children = read_log(child_path)
+    return store
+
+
+def read_arrays(path):
+    """
+    อ่านไฟล์ .pmlog เป็น numpy array ต่อคอลัมน์ แบบ vectorized (ไม่วนทีละแถวเหมือน read_log)
+    ข้ามส่วนท้ายที่เสียด้วยกฎเดียวกับ _walk, ต้องมี numpy (import เฉพาะตอนเรียก)
+    :returns: (header, {column: ndarray float64}, sources {pid: source}, meta, stats (SessionStats หรือ None), markers)
+    """
+    import numpy as np
+
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            header, offset = _read_header(mm)
+            columns = header["columns"]
+            ncols = len(columns)
+            width = ncols * 8
+            count = (len(mm) - offset) // width
+            dtype = np.dtype("<f8" if header.get("byteorder", sys.byteorder) == "little" else ">f8")
+            raw = np.frombuffer(mm, dtype=dtype, count=count * ncols, offset=offset).reshape(count, ncols)
+
+            # --- frame: หา record ที่คอลัมน์แรกเป็น NaN ไล่ตามลำดับ (NaN ใน payload ของ frame ก่อนหน้าไม่นับ) ---
+            is_row = np.ones(count, dtype=bool)
+            end = count
+            frames = []
+            pos = 0
+            for r in np.flatnonzero(np.isnan(raw[:, 0])).tolist():
+                if r < pos:
+                    continue
+                nbytes = float(raw[r, 1])
+                if not 0 <= nbytes < len(mm):
+                    end = r
+                    break
+                nbytes = int(nbytes)
+                slots = -(-nbytes // width)
+                if r + 1 + slots > count:
+                    end = r
+                    break
+                start = offset + (r + 1) * width
+                try:
+                    payload = json.loads(bytes(mm[start:start + nbytes]).decode("utf-8"))
+                except ValueError:
+                    end = r
+                    break
+                is_row[r:r + 1 + slots] = False
+                frames.append((r, payload))
+                pos = r + 1 + slots
+            rows = np.flatnonzero(is_row[:end])
+            data = raw[rows]        # คัดลอกออกจาก mmap (ปิดไฟล์ได้)
+            del raw
+
+    # --- ส่วนท้ายที่เสีย: record ศูนย์ทั้งแถว / เวลาย้อนกลับภายใน session เดียวกัน ---
+    sessions = np.array([r for r, payload in frames if "session" in payload], dtype=np.int64)
+    session_of = np.searchsorted(sessions, rows)
+    elapsed = data[:, 0]
+    bad = ~data.any(axis=1)
+    bad[1:] |= (elapsed[1:] < elapsed[:-1]) & (session_of[1:] == session_of[:-1])
+    first_bad = np.flatnonzero(bad)
+    if first_bad.size:
+        end = rows[first_bad[0]]
+        data = data[:first_bad[0]]
+
+    sources, meta, stats, markers = {}, dict(header.get("meta", {})), None, []
+    for r, payload in frames:
+        if r >= end:
+            break
+        sources.update((int(pid), source) for pid, source in payload.get("sources", {}).items())
+        meta.update(payload.get("meta", {}))
+        if "stats" in payload:
+            stats = _merge_stats(stats, payload["stats"])
+        markers.extend(tuple(m) for m in payload.get("markers", ()))
+    return header, {name: np.ascontiguousarray(data[:, i]) for i, name in enumerate(columns)}, sources, meta, stats, markers
+
+
+def open_log(path, store):
+    """เปิด writer ตามโครงของ store (columns, source, sources และ children ถ้ามี)"""
+    log = BinLogWriter(path, store.columns, store.source, started_at=store.started_at)
+    for pid, source in store.sources.items():
+        log.register_source(pid, source)
+    if store.children is not None:
+        log.track_children()
+    return log
+
+
+class BinLogWriter:
+    """
+    เขียน record ต่อท้ายไฟล์ .pmlog
+    - append(*values): เก็บลง buffer ในหน่วยความจำ แล้ว write/fsync ตามรอบเวลา (ต้นทุนคงที่ต่อแถว)
+    - ไฟล์เดิมที่มีอยู่ (เช่น เปิดใหม่หลังล่ม) จะถูก recover แล้วเขียนต่อเป็น session ใหม่
+      คอลัมน์ต้องตรงกับของเดิม ไม่งั้น raise ValueError
+    """
+
+    def __init__(self, path, columns, source="", meta=None, started_at=None,
+                 flush_interval=FLUSH_INTERVAL, fsync_interval=FSYNC_INTERVAL):
+        self.path = path
+        self.columns = tuple(columns)
+        self.ncols = len(self.columns)
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.source = source
+        self.started_at = started_at
+        self.children = None
+        self._buf = array("d")
+        self._sources = set()
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    header, _ = _read_header(mm)
+            if tuple(header["columns"]) != self.columns:
+                raise ValueError(f"{os.path.basename(path)} has columns {header['columns']}, expected {list(self.columns)}")
+            self.dropped_bytes = recover(path)
+            self._file = open(path, "ab")
+            self._frame({"session": datetime.now().isoformat(timespec="seconds"), "source": source, "started_at": started_at})
+        else:
+            self.dropped_bytes = 0
+            self._file = open(path, "wb")
+            header = json.dumps({
+                "format": "perfmon-binlog",
+                "version": 1,
+                "columns": list(self.columns),
+                "source": source,
+                "byteorder": sys.byteorder,
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "started_at": started_at,
+                "meta": meta or {},
+            }).encode("utf-8")
+            head = MAGIC + _LEN.pack(len(header)) + header
+            self._file.write(head + b"\0" * (_pad8(len(head)) - len(head)))
+        self.flush(fsync=True)
+
+    def _frame(self, payload):
+        """เขียน frame ข้อมูลเสริม (ส่ง record ที่ค้างใน buffer ออกก่อนเพื่อรักษาลำดับ)"""
+        raw = json.dumps(payload).encode("utf-8")
+        width = self.ncols * 8
+        head = array("d", [0.0] * self.ncols)
+        head[0], head[1] = float("nan"), float(len(raw))
+        self._buf.tofile(self._file)
+        del self._buf[:]
+        self._file.write(head.tobytes() + raw + b"\0" * (-len(raw) % width))
+
+    def track_children(self):
+        """เปิดไฟล์ series รายโปรเซสลูกคู่กัน -> คืนค่า writer ของลูก"""
+        if self.children is None:
+            self.children = BinLogWriter(children_path(self.path), MULTI_COLUMNS, self.source, started_at=self.started_at,
+                                         flush_interval=self.flush_interval, fsync_interval=self.fsync_interval)
+        return self.children
+
+    def register_source(self, pid, source):
+        """บันทึก source ของ PID (ครั้งเดียวต่อ PID)"""
+        pid = int(pid)
+        if pid in self._sources:
+            return
+        self._sources.add(pid)
+        self._frame({"sources": {str(pid): source}})
+
+    def write_meta(self, meta):
+        """บันทึกข้อมูลเสริม (เช่น สถิติการ sample ตอนจบ)"""
+        self._frame({"meta": meta})
+
+    def write_stats(self, stats):
+        """บันทึกสถิติของ session (SessionStats) แบบ merge ได้"""
+        self._frame({"stats": stats.to_dict()})
+
+    def write_markers(self, markers):
+        """บันทึก marker [(elapsed, kind, label, value)] ที่เพิ่งได้รับ"""
+        self._frame({"markers": [list(m) for m in markers]})
+
+    def append(self, *values):
+        self._buf.extend(values)
+        now = time.monotonic()
+        if now - self._last_flush >= self.flush_interval:
+            self.flush(fsync=now - self._last_fsync >= self.fsync_interval)
+
+    def flush(self, fsync=False):
+        """ส่ง buffer ลงไฟล์ (และ fsync ถ้าขอ)"""
+        if self._buf:
+            self._buf.tofile(self._file)
+            del self._buf[:]
+        self._file.flush()
+        now = time.monotonic()
+        self._last_flush = now
+        if fsync:
+            os.fsync(self._file.fileno())
+            self._last_fsync = now
+
+    def close(self):
+        if self.children is not None:
+            self.children.close()
+        if self._file.closed:
+            return
+        self.flush(fsync=True)
+        self._file.close()
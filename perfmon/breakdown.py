@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+แยก CPU ของโปรเซสเป็นราย thread และราย core (แยกงาน GIL-bound 1 thread ที่ 100% ออกจากงานที่กระจายหลาย core)
+- Linux: เปิด /proc/<pid>/task/<tid>/stat ค้างไว้ต่อ thread แล้วอ่านด้วย os.pread (ไม่ต้อง open/close ทุก tick)
+  ได้ utime+stime และ core ที่ thread รันครั้งล่าสุด (ฟิลด์ processor)
+- อื่นๆ: psutil Process.threads() (ไม่มีข้อมูล core -> ไม่มี series ราย core)
+- สถานะต่อ thread เป็น array ตาม slot (tid -> slot): เวลา CPU ครั้งก่อน -> delta ต่อ tick
+  ไม่สร้าง object ต่อ thread ทุก tick, slot ของ thread ที่จบแล้วถูกใช้ซ้ำ -> ใช้ได้กับโปรเซส 200+ thread
+- ทุก tick บันทึก:
+  cores   : SampleStore (elapsed, core0..coreN-1) CPU ของโปรเซสที่รันบนแต่ละ core (% ของ 1 core)
+  threads : SampleStore (elapsed, tid, cpu, core) เฉพาะ thread ที่ใช้ CPU ใน tick นั้น (thread ที่ว่างไม่กินที่)
+- CPU ราย thread/core เป็น % ของ 1 core (ไม่หารจำนวน core) -> thread ที่ชน GIL จะอยู่ใกล้ 100
+"""
+
+import os
+import sys
+import time
+from array import array
+
+import psutil
+
+from .sampler import CPU_COUNT
+from .store import COLUMN_LABELS, SampleStore
+
+_HAS_PROC = sys.platform.startswith("linux") and os.path.isdir("/proc") and hasattr(os, "pread")
+if _HAS_PROC:
+    CLK_TCK = os.sysconf("SC_CLK_TCK")
+
+THREAD_COLUMNS = ("elapsed", "tid", "cpu", "core")
+CORE_COLUMNS = ("elapsed",) + tuple(f"core{i}" for i in range(CPU_COUNT))
+GIL_SHARE = 0.9             # thread เดียวใช้ >= 90% ของ CPU ทั้งโปรเซส -> น่าจะ single-thread/GIL-bound
+
+COLUMN_LABELS["tid"] = "TID"
+COLUMN_LABELS["core"] = "Core"
+for _i in range(CPU_COUNT):
+    COLUMN_LABELS[f"core{_i}"] = f"Core {_i} (%)"
+
+
+class ThreadBreakdown:
+    """sample(elapsed) ทุก tick -> เติม self.threads / self.cores"""
+
+    def __init__(self, pid, source=""):
+        self.pid = pid
+        self.backend = "proc" if _HAS_PROC else "psutil"
+        self.threads = SampleStore(source, THREAD_COLUMNS)
+        self.cores = SampleStore(source, CORE_COLUMNS) if _HAS_PROC else None
+        self._slots = {}                # tid -> slot
+        self._slot_tid = array('q')     # slot -> tid (0 = ว่าง)
+        self._prev = array('d')         # slot -> เวลา CPU สะสม (วินาที) ตอนอ่านครั้งก่อน
+        self._seen = array('q')         # slot -> tick ล่าสุดที่พบ thread นี้
+        self._fds = []                  # slot -> fd ของ /proc/<pid>/task/<tid>/stat (Linux)
+        self._free = []                 # slot ที่ว่าง (thread จบแล้ว)
+        self._core_acc = array('d', bytes(8 * CPU_COUNT))
+        self._tick = 0
+        self.totals = {}                # tid -> [CPU-วินาทีสะสม, ค่าสูงสุด %]
+        self.busy_seconds = 0.0         # CPU-วินาทีรวมของทุก thread
+        self.duration = 0.0             # เวลาจริง (วินาที) ที่ครอบคลุมด้วย tick ที่บันทึก
+        self.max_threads = 0
+        if _HAS_PROC:
+            self._task_dir = f"/proc/{pid}/task"
+            if not os.path.isdir(self._task_dir):
+                raise psutil.NoSuchProcess(pid)
+        else:
+            self._proc = psutil.Process(pid)
+        self._stamp = time.monotonic()
+        # อ่านครั้งแรกเป็นจุดตั้งต้นของ delta (ยังไม่บันทึก)
+        self._read(record=False)
+
+    # ---------- slot ----------
+    def _open_slot(self, tid):
+        fd = None
+        if _HAS_PROC:
+            try:
+                fd = os.open(f"{self._task_dir}/{tid}/stat", os.O_RDONLY)
+            except OSError:
+                return None     # thread จบไปก่อนเปิดได้
+        if self._free:
+            slot = self._free.pop()
+            self._slot_tid[slot], self._prev[slot], self._seen[slot] = tid, 0.0, self._tick
+            self._fds[slot] = fd
+        else:
+            slot = len(self._slot_tid)
+            self._slot_tid.append(tid)
+            self._prev.append(0.0)
+            self._seen.append(self._tick)
+            self._fds.append(fd)
+        self._slots[tid] = slot
+        return slot
+
+    def _close_slot(self, slot):
+        del self._slots[self._slot_tid[slot]]
+        self._slot_tid[slot] = 0
+        fd, self._fds[slot] = self._fds[slot], None
+        if fd is not None:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        self._free.append(slot)
+
+    def _thread_times(self):
+        """[(tid, เวลา CPU สะสม วินาที, core)] ของทุก thread ที่ยังอยู่ (core = -1 ถ้าไม่รู้)"""
+        if not _HAS_PROC:
+            try:
+                return [(t.id, t.user_time + t.system_time, -1) for t in self._proc.threads()]
+            except psutil.AccessDenied:
+                raise psutil.NoSuchProcess(self.pid)
+        try:
+            names = os.listdir(self._task_dir)
+        except (FileNotFoundError, ProcessLookupError):
+            raise psutil.NoSuchProcess(self.pid)
+        out = []
+        pread = os.pread
+        for name in names:
+            tid = int(name)
+            slot = self._slots.get(tid)
+            if slot is None:
+                slot = self._open_slot(tid)
+                if slot is None:
+                    continue
+            try:
+                data = pread(self._fds[slot], 1024, 0)
+            except OSError:
+                continue        # thread จบระหว่างอ่าน -> slot ถูกปิดตอนท้าย tick
+            if not data:
+                continue
+            # ฟิลด์หลังชื่อ "(comm)": [11] utime, [12] stime, [36] processor
+            fields = data[data.rfind(b")") + 2:].split(b" ", 37)
+            out.append((tid, (int(fields[11]) + int(fields[12])) / CLK_TCK, int(fields[36])))
+        return out
+
+    # ---------- sample ----------
+    def _read(self, record, elapsed=0.0):
+        tick = self._tick = self._tick + 1
+        rows = self._thread_times()
+        now = time.monotonic()
+        dt = now - self._stamp
+        self._stamp = now
+        if record and dt > 0.0:
+            self.duration += dt
+        prev, seen, slots = self._prev, self._seen, self._slots
+        core_acc = self._core_acc
+        threads, totals = self.threads, self.totals
+        for tid, cpu_time, core in rows:
+            slot = slots.get(tid)
+            if slot is None:
+                slot = self._open_slot(tid)     # backend psutil: thread ใหม่
+            delta = cpu_time - prev[slot]
+            prev[slot] = cpu_time
+            seen[slot] = tick
+            if not record or delta <= 0.0 or dt <= 0.0:
+                continue
+            # เวลา CPU นับเป็น jiffy (1/CLK_TCK วิ) -> tick สั้นๆ ปัดเกิน 100% ได้ แต่ 1 thread ใช้ได้ไม่เกิน 1 core
+            pct = min(delta / dt * 100.0, 100.0)
+            threads.append(elapsed, tid, pct, core)
+            if 0 <= core < CPU_COUNT:
+                core_acc[core] += pct
+            total = totals.get(tid)
+            if total is None:
+                totals[tid] = [delta, pct]
+            else:
+                total[0] += delta
+                if pct > total[1]:
+                    total[1] = pct
+            self.busy_seconds += delta
+        # thread ที่ไม่พบใน tick นี้ = จบแล้ว -> คืน slot
+        for slot in [s for tid, s in slots.items() if seen[s] != tick]:
+            self._close_slot(slot)
+        self.max_threads = max(self.max_threads, len(slots))
+        if record and self.cores is not None:
+            self.cores.append(elapsed, *core_acc)
+            for i in range(CPU_COUNT):
+                core_acc[i] = 0.0
+
+    def sample(self, elapsed):
+        """
+        อ่านเวลา CPU ของทุก thread แล้วบันทึก delta ตั้งแต่ครั้งก่อน ณ elapsed
+        :raises psutil.NoSuchProcess: โปรเซสจบแล้ว
+        """
+        self._read(True, elapsed)
+
+    # ---------- สรุป ----------
+    def busiest(self, count=3):
+        """[(tid, CPU-วินาที, max %)] ของ thread ที่ใช้ CPU มากที่สุด"""
+        ranked = sorted(self.totals.items(), key=lambda item: -item[1][0])[:count]
+        return [(tid, total, peak) for tid, (total, peak) in ranked]
+
+    def meta(self):
+        """ข้อมูลท้ายไฟล์ส่งออก (label -> ค่า)"""
+        meta = {}
+        duration = self.duration
+        top = self.busiest()
+        if top and self.busy_seconds > 0:
+            tid, total, peak = top[0]
+            share = total / self.busy_seconds
+            text = (f"TID {tid} {total / duration * 100 if duration > 0 else 0.0:.1f}% mean / {peak:.1f}% max "
+                    f"of one core ({share * 100:.0f}% of process CPU)")
+            if share >= GIL_SHARE:
+                text += " -> likely single-thread / GIL-bound"
+            meta["Busiest thread:"] = text
+            meta["Top threads:"] = ", ".join(f"TID {t} {s:.1f} CPU-s" for t, s, _ in top)
+        meta["Threads:"] = f"max {self.max_threads} alive, {len(self.totals)} used CPU"
+        if self.cores:
+            means = [self.cores.mean(name) for name in CORE_COLUMNS[1:]]
+            used = sum(1 for m in means if m >= 1.0)
+            busiest = max(range(CPU_COUNT), key=means.__getitem__)
+            meta["Cores:"] = f"{used} of {CPU_COUNT} used (>= 1% mean), busiest core {busiest} at {means[busiest]:.1f}% mean"
+        return meta
+
+    def close(self):
+        for slot, fd in enumerate(self._fds):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+                self._fds[slot] = None
+
+    def __del__(self):
+        self.close()
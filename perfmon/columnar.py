@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+ส่งออกแบบคอลัมน์ (Parquet / Arrow IPC) และโหลด run กลับมาเป็น numpy arrays
+- คอลัมน์เป็นชนิดตัวเลขจริง: elapsed (วินาที float64), pid/count (int64), cpu/ram (float64)
+  ไม่ใช่ข้อความ H:MM:SS.ms -> วิเคราะห์ต่อได้ทันทีโดยไม่ต้อง parse ทีละแถว
+- เวลาจริง = started_at (อยู่ใน schema metadata) + elapsed
+- source, sources (PID -> source), meta, stats (SessionStats), markers เก็บใน schema metadata (คีย์ขึ้นต้น "perfmon.")
+- เขียนทีละ row group (ROW_GROUP_ROWS แถว) จาก chunk ของ SampleStore -> ใช้หน่วยความจำคงที่
+- ต้องมี pyarrow สำหรับ Parquet/Arrow และ numpy สำหรับ load_run (import เฉพาะตอนเรียกใช้)
+"""
+
+import json
+import os
+
+from .binlog import EXTENSION as LOG_EXTENSION, read_arrays
+from .stats import SessionStats
+from .tree import children_path
+
+ROW_GROUP_ROWS = 65536
+ARROW_EXTENSIONS = (".arrow", ".feather", ".ipc")
+INT_COLUMNS = ("pid", "count")
+
+
+def _schema(pa, store):
+    fields = [pa.field(name, pa.int64() if name in INT_COLUMNS else pa.float64()) for name in store.columns]
+    return pa.schema(fields, metadata={
+        "perfmon.source": store.source,
+        "perfmon.sources": json.dumps({str(pid): source for pid, source in store.sources.items()}),
+        "perfmon.meta": json.dumps(store.meta),
+        "perfmon.started_at": json.dumps(store.started_at),
+        "perfmon.stats": json.dumps(store.stats.to_dict() if store.stats else None),
+        "perfmon.markers": json.dumps([list(m) for m in store.markers]),
+    })
+
+
+def _batch(pa, schema, pending):
+    """รวม chunk ที่ค้างไว้เป็น RecordBatch 1 ก้อน (อ่านจาก memoryview ของ chunk ตรงๆ)"""
+    arrays = []
+    for i, field in enumerate(schema):
+        parts = [pa.Array.from_buffers(pa.float64(), len(views[i]), [None, pa.py_buffer(views[i])]) for views in pending]
+        column = pa.concat_arrays(parts)
+        if field.type != pa.float64():
+            column = column.cast(field.type)
+        arrays.append(column)
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _batches(pa, store, schema):
+    pending, rows = [], 0
+    for start, stop, views in store.iter_chunks():
+        pending.append(views)
+        rows += stop - start
+        if rows >= ROW_GROUP_ROWS:
+            yield _batch(pa, schema, pending)
+            pending, rows = [], 0
+    if pending:
+        yield _batch(pa, schema, pending)
+
+
+def export_columnar(path, store):
+    """
+    ส่งออก store เป็น Parquet (.parquet) หรือ Arrow IPC (.arrow/.feather/.ipc) ตามนามสกุล
+    series รายโปรเซสลูก (โหมด process tree) ไปที่ children_path(path)
+    """
+    import pyarrow as pa
+
+    schema = _schema(pa, store)
+    if path.lower().endswith(ARROW_EXTENSIONS):
+        import pyarrow.ipc
+        with pa.OSFile(path, "wb") as sink, pyarrow.ipc.new_file(sink, schema) as writer:
+            for batch in _batches(pa, store, schema):
+                writer.write_batch(batch)
+    else:
+        import pyarrow.parquet as pq
+        with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+            for batch in _batches(pa, store, schema):
+                writer.write_batch(batch)
+    if store.children:
+        export_columnar(children_path(path), store.children)
+
+
+class Run:
+    """
+    ข้อมูล 1 run เป็น numpy arrays (เวลาเป็นมิลลิวินาที)
+    - run["elapsed_ms"], run["cpu"], run["ram"], run["pid"] (ถ้ามีคอลัมน์ PID)
+    - run["wall_ms"]: เวลาจริงแบบ epoch มิลลิวินาที (ถ้ารู้ started_at)
+    - source, sources (PID -> source), meta, started_at, children (Run ของโปรเซสลูก หรือ None)
+    - stats: SessionStats ของ run (None ถ้าไฟล์ไม่มี) -> รวมหลาย run ด้วย stats.merge() ได้โดยไม่ต้องอ่านข้อมูลซ้ำ
+    - markers: [(elapsed วินาที, kind, label, value)] event จากสคริปต์เทรน (perfmon.markers)
+    """
+
+    def __init__(self, arrays, source="", sources=None, meta=None, started_at=None, stats=None, markers=None):
+        self.arrays = arrays
+        self.source = source
+        self.sources = sources or {}
+        self.meta = meta or {}
+        self.started_at = started_at
+        self.stats = stats
+        self.markers = markers or []
+        self.children = None
+
+    @property
+    def columns(self):
+        return tuple(self.arrays)
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def __contains__(self, name):
+        return name in self.arrays
+
+    def __len__(self):
+        return len(self.arrays["elapsed_ms"])
+
+
+def _make_run(columns, source, sources, meta, started_at, stats=None, markers=None):
+    import numpy as np
+
+    elapsed_ms = np.asarray(columns["elapsed"], dtype=np.float64) * 1000.0
+    arrays = {"elapsed_ms": elapsed_ms}
+    if started_at is not None:
+        arrays["wall_ms"] = elapsed_ms + started_at * 1000.0
+    for name, values in columns.items():
+        if name != "elapsed":
+            arrays[name] = np.asarray(values, dtype=np.int64 if name in INT_COLUMNS else np.float64)
+    return Run(arrays, source, {int(pid): s for pid, s in sources.items()}, meta, started_at, stats,
+               [tuple(m) for m in markers or ()])
+
+
+def load_run(path):
+    """
+    โหลด run จาก .pmlog / .parquet / .arrow (.feather, .ipc) -> Run
+    ไฟล์ children_path(path) ถ้ามีจะถูกโหลดเป็น run.children
+    """
+    if path.lower().endswith(LOG_EXTENSION):
+        header, columns, sources, meta, stats, markers = read_arrays(path)
+        run = _make_run(columns, header.get("source", ""), sources, meta, header.get("started_at"), stats, markers)
+    else:
+        import pyarrow as pa
+        if path.lower().endswith(ARROW_EXTENSIONS):
+            import pyarrow.ipc
+            table = pyarrow.ipc.open_file(pa.memory_map(path)).read_all()
+        else:
+            import pyarrow.parquet as pq
+            table = pq.read_table(path)
+        metadata = {k.decode("utf-8"): v.decode("utf-8") for k, v in (table.schema.metadata or {}).items()}
+        columns = {name: table.column(name).to_numpy() for name in table.column_names}
+        stats = json.loads(metadata.get("perfmon.stats", "null"))
+        run = _make_run(
+            columns,
+            metadata.get("perfmon.source", ""),
+            json.loads(metadata.get("perfmon.sources", "{}")),
+            json.loads(metadata.get("perfmon.meta", "{}")),
+            json.loads(metadata.get("perfmon.started_at", "null")),
+            SessionStats.from_dict(stats) if stats else None,
+            json.loads(metadata.get("perfmon.markers", "[]")),
+        )
+    child_path = children_path(path)
+    if os.path.exists(child_path):
+        run.children = load_run(child_path)
+    return run
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+ตรวจจับโปรเซสเป้าหมายแบบ event-driven แทนการไล่ process_iter ทั้งเครื่องทุกรอบ
+- NetlinkDetector (Linux, ต้องมีสิทธิ์ CAP_NET_ADMIN): สมัครรับ event fork/exec/exit
+  จาก kernel proc connector -> ตรวจเฉพาะโปรเซสที่เพิ่งเกิด และรู้ทันทีที่เกิด
+- ScanDetector (ทุกแพลตฟอร์ม): สแกนแบบ incremental ตรวจเฉพาะ PID ที่ยังไม่เคยเห็น
+  ผลลัพธ์ cache ตาม (pid, create_time) -> โปรเซสเดิมไม่ถูกอ่าน cmdline ซ้ำผ่าน psutil
+  แต่ทุกรอบเทียบ exec_fingerprint ของ PID ที่เคยเห็น -> PID ที่ exec เป็นโปรแกรมอื่น
+  (เช่น launcher ที่ exec python ทีหลัง) หรือถูกนำกลับมาใช้ จะถูกตรวจใหม่
+- get_detector(match): detector ที่ใช้ร่วมกันทั้งโปรแกรม (1 ตัวต่อเงื่อนไข, เลือก backend ให้อัตโนมัติ)
+
+ทั้งสองแบบ:
+- matches() -> [(pid, cmdline_args)] ของโปรเซสที่เข้าเงื่อนไขและยังทำงานอยู่ (เรียงตาม PID)
+- wait(timeout) -> รอจนมีโปรเซสใหม่ที่เข้าเงื่อนไข (หรือหมดเวลา)
+"""
+
+import os
+import select
+import socket
+import struct
+import sys
+import time
+
+import psutil
+
+_HAS_PROC = sys.platform.startswith("linux") and os.path.isdir("/proc")
+
+
+def is_python_script(name, cmdline_args):
+    """เงื่อนไขมาตรฐาน: python ที่มีอาร์กิวเมนต์ลงท้าย .py"""
+    return "python" in name.lower() and any(str(arg).endswith(".py") for arg in cmdline_args)
+
+
+def exec_fingerprint(pid):
+    """
+    ค่าราคาถูกที่เปลี่ยนเมื่อ PID exec เป็นโปรแกรมอื่นหรือถูกนำกลับมาใช้ (None = โปรเซสหายไปแล้ว)
+    - Linux: ไบต์ดิบของ /proc/<pid>/cmdline (read 1 ครั้ง ไม่สร้าง psutil.Process)
+    - อื่นๆ: create_time
+    """
+    try:
+        if _HAS_PROC:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                return f.read()
+        return psutil.Process(pid).create_time()
+    except (FileNotFoundError, ProcessLookupError, psutil.NoSuchProcess):
+        return None
+    except (PermissionError, psutil.AccessDenied):
+        return b""      # อ่านไม่ได้ -> ค่าคงที่ (ไม่ตรวจซ้ำทุกรอบ)
+
+
+class ScanDetector:
+    """สแกน /proc แบบ incremental: ตรวจละเอียดเฉพาะ PID ใหม่"""
+
+    backend = "scan"
+    # โปรเซสที่อายุน้อยกว่านี้ตอนตรวจ อาจยังอยู่ระหว่าง fork -> exec: ตรวจซ้ำรอบถัดไป
+    RECHECK_WINDOW = 2.0
+
+    def __init__(self, match=is_python_script):
+        self.match = match
+        self.exclude = {os.getpid()}
+        self._seen = {}         # pid -> (create_time, exec_fingerprint, cmdline_args หรือ None ถ้าไม่เข้าเงื่อนไข)
+        self._young = set()     # PID ที่ต้องตรวจซ้ำ (ยังใหม่มากตอนตรวจ)
+
+    def _evaluate(self, pid):
+        """อ่านชื่อ/cmdline ของ PID 1 ครั้งแล้ว cache ผล"""
+        if pid in self.exclude:
+            return
+        # อ่าน fingerprint ก่อน cmdline -> ถ้า exec ระหว่างนี้ fingerprint รอบหน้าจะต่างและถูกตรวจใหม่
+        fingerprint = exec_fingerprint(pid)
+        if fingerprint is None:
+            self._forget(pid)
+            return
+        try:
+            proc = psutil.Process(pid)
+            with proc.oneshot():
+                create_time = proc.create_time()
+                name = proc.name() or ""
+                args = proc.cmdline()
+        except (psutil.NoSuchProcess, psutil.ZombieProcess):
+            self._forget(pid)
+            return
+        except psutil.AccessDenied:
+            self._seen[pid] = (None, fingerprint, None)
+            return
+        matched = bool(args) and self.match(name, args)
+        self._seen[pid] = (create_time, fingerprint, args if matched else None)
+        if not matched and time.time() - create_time < self.RECHECK_WINDOW:
+            self._young.add(pid)
+        else:
+            self._young.discard(pid)
+
+    def _forget(self, pid):
+        self._seen.pop(pid, None)
+        self._young.discard(pid)
+
+    def refresh(self):
+        """สแกน 1 รอบ: ลบ PID ที่หายไป + ตรวจ PID ใหม่/ที่ยังใหม่มาก/ที่ fingerprint เปลี่ยน"""
+        alive = set(psutil.pids())
+        for pid in [p for p in self._seen if p not in alive]:
+            self._forget(pid)
+        for pid in alive:
+            entry = self._seen.get(pid)
+            if entry is None or pid in self._young or exec_fingerprint(pid) != entry[1]:
+                self._evaluate(pid)
+
+    def _verified(self):
+        """โปรเซสที่เข้าเงื่อนไข (ยืนยัน create_time เดิม -> กัน PID ถูกนำกลับมาใช้)"""
+        found = []
+        for pid in sorted(self._seen):
+            create_time, _, args = self._seen[pid]
+            if args is None:
+                continue
+            try:
+                if psutil.Process(pid).create_time() != create_time:
+                    self._evaluate(pid)
+                    create_time, _, args = self._seen.get(pid, (None, None, None))
+                    if args is None:
+                        continue
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                self._forget(pid)
+                continue
+            found.append((pid, args))
+        return found
+
+    def matches(self):
+        self.refresh()
+        return self._verified()
+
+    def wait(self, timeout):
+        time.sleep(timeout)
+
+    def close(self):
+        pass
+
+
+# --- ค่าคงที่ของ kernel proc connector (linux/connector.h, linux/cn_proc.h) ---
+NETLINK_CONNECTOR = 11
+CN_IDX_PROC = 1
+CN_VAL_PROC = 1
+PROC_CN_MCAST_LISTEN = 1
+NLMSG_DONE = 3
+PROC_EVENT_FORK = 0x00000001
+PROC_EVENT_EXEC = 0x00000002
+PROC_EVENT_EXIT = 0x80000000
+
+_NLMSG_HDR = struct.Struct("=IHHII")    # len, type, flags, seq, pid
+_CN_MSG = struct.Struct("=IIIIHH")      # idx, val, seq, ack, len, flags
+_EVENT_OFFSET = _NLMSG_HDR.size + _CN_MSG.size      # proc_event: what, cpu, timestamp_ns
+_DATA_OFFSET = _EVENT_OFFSET + 16                   # event_data (union)
+_U32 = struct.Struct("=I")
+_U32X2 = struct.Struct("=II")
+
+
+class NetlinkDetector(ScanDetector):
+    """
+    รับ event fork/exec/exit จาก kernel แล้วตรวจเฉพาะ PID ที่เกี่ยวข้อง
+    - สแกนเต็ม 1 ครั้งตอนเริ่ม (หาโปรเซสที่รันอยู่ก่อนแล้ว)
+    - event ตกหล่น (socket buffer เต็ม) -> สแกน incremental ใหม่ 1 รอบ
+    """
+
+    backend = "netlink"
+
+    def __init__(self, match=is_python_script):
+        super().__init__(match)
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_CONNECTOR)
+        try:
+            self.sock.bind((0, CN_IDX_PROC))
+            op = _U32.pack(PROC_CN_MCAST_LISTEN)
+            cn = _CN_MSG.pack(CN_IDX_PROC, CN_VAL_PROC, 0, 0, len(op), 0) + op
+            self.sock.send(_NLMSG_HDR.pack(_NLMSG_HDR.size + len(cn), NLMSG_DONE, 0, 0, 0) + cn)
+            self.sock.setblocking(False)
+        except OSError:
+            self.sock.close()
+            raise
+        self._new_match = False
+        self.refresh()
+
+    def _handle(self, data):
+        offset = 0
+        while offset + _NLMSG_HDR.size <= len(data):
+            length = _NLMSG_HDR.unpack_from(data, offset)[0]
+            if length < _DATA_OFFSET or offset + length > len(data):
+                break
+            what = _U32.unpack_from(data, offset + _EVENT_OFFSET)[0]
+            if what == PROC_EVENT_FORK:
+                # child_pid, child_tgid (ข้าม thread: pid != tgid)
+                pid, tgid = _U32X2.unpack_from(data, offset + _DATA_OFFSET + 8)
+                if pid == tgid:
+                    self._check(pid)
+            elif what == PROC_EVENT_EXEC:
+                pid, tgid = _U32X2.unpack_from(data, offset + _DATA_OFFSET)
+                if pid == tgid:
+                    self._check(pid)
+            elif what == PROC_EVENT_EXIT:
+                pid, tgid = _U32X2.unpack_from(data, offset + _DATA_OFFSET)
+                if pid == tgid:
+                    self._forget(pid)
+            offset += (length + 3) & ~3
+
+    def _check(self, pid):
+        self._evaluate(pid)
+        if self._seen.get(pid, (None, None, None))[2] is not None:
+            self._new_match = True
+
+    def _drain(self):
+        """อ่าน event ที่ค้างอยู่ทั้งหมด (non-blocking)"""
+        while True:
+            try:
+                data = self.sock.recv(65536)
+            except BlockingIOError:
+                return
+            except OSError:
+                # ENOBUFS: event ล้น buffer -> ไม่รู้ว่าพลาดอะไรไป สแกนใหม่ 1 รอบ
+                self.refresh()
+                continue
+            self._handle(data)
+
+    def matches(self):
+        self._drain()
+        return self._verified()
+
+    def wait(self, timeout):
+        """รอ event จน PID ใหม่เข้าเงื่อนไข หรือครบ timeout"""
+        deadline = time.monotonic() + timeout
+        self._new_match = False
+        while not self._new_match:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            ready, _, _ = select.select([self.sock], [], [], remaining)
+            if ready:
+                self._drain()
+
+    def close(self):
+        self.sock.close()
+
+
+_detectors = {}
+
+
+def get_detector(match=is_python_script):
+    """detector ที่ใช้ร่วมกันต่อเงื่อนไข: NetlinkDetector ถ้าทำได้ ไม่งั้น ScanDetector"""
+    detector = _detectors.get(match)
+    if detector is None:
+        if sys.platform.startswith("linux") and hasattr(socket, "AF_NETLINK"):
+            try:
+                detector = NetlinkDetector(match)
+            except OSError:
+                pass    # ไม่มีสิทธิ์/kernel ไม่รองรับ -> สแกนแบบ incremental
+        _detectors[match] = detector or ScanDetector(match)
+    return _detectors[match]
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+ลดจำนวนจุดของ series ก่อนพล็อต (ใช้ numpy, import เฉพาะโมดูลนี้)
+- minmax(): แบ่งช่วงเวลาเป็น bucket ตามจำนวน pixel แล้วเก็บจุดแรก/ต่ำสุด/สูงสุด/สุดท้ายของแต่ละ bucket
+  -> ยอด (spike) ทุกจุดยังอยู่ครบ, ได้ไม่เกิน 4 จุดต่อ pixel, ต้นทุน O(n) แบบ vectorized
+- lttb(): Largest-Triangle-Three-Buckets เลือกจุดที่คงรูปทรงของเส้นได้ดีที่สุดต่อ bucket
+  (เส้นดูเรียบกว่า แต่ไม่รับประกันว่าเก็บ spike จุดเดียวไว้ได้)
+- visible_slice(): เลือกเฉพาะช่วงที่อยู่ในแกน X ปัจจุบัน (+1 จุดนอกขอบแต่ละข้าง ให้เส้นลากถึงขอบ)
+ทุกฟังก์ชันรับ t ที่เรียงจากน้อยไปมาก และคืนค่าเป็น numpy arrays
+"""
+
+import numpy as np
+
+
+def visible_slice(t, lo, hi):
+    """ช่วง index [start, stop) ของจุดที่อยู่ใน [lo, hi] รวมจุดข้างนอกที่ติดขอบ"""
+    start = max(int(np.searchsorted(t, lo, side="left")) - 1, 0)
+    stop = min(int(np.searchsorted(t, hi, side="right")) + 1, len(t))
+    return start, stop
+
+
+def minmax_indices(t, y, buckets):
+    """index ของจุดที่เก็บไว้ (เรียงตามเวลา): แรก/ต่ำสุด/สูงสุด/สุดท้าย ของแต่ละ bucket"""
+    n = len(t)
+    if n <= 4 * buckets:
+        return np.arange(n)
+    t0, t1 = t[0], t[-1]
+    span = t1 - t0
+    # จุดเริ่มของแต่ละ bucket: t เรียงแล้ว -> searchsorted ขอบ bucket (O(buckets log n) ไม่ต้องคำนวณ bucket ทุกจุด)
+    if span <= 0:
+        starts = -(-np.arange(buckets) * n // buckets)
+    else:
+        starts = np.searchsorted(t, t0 + np.arange(buckets) * (span / buckets))
+    starts = starts[np.r_[True, starts[1:] != starts[:-1]]]     # ตัด bucket ว่าง
+    ends = np.r_[starts[1:], n] - 1
+    counts = ends - starts + 1
+
+    keep = np.zeros(n, dtype=bool)
+    keep[starts] = True
+    keep[ends] = True
+    for reduce in (np.minimum, np.maximum):
+        extreme = np.repeat(reduce.reduceat(y, starts), counts)
+        hits = np.flatnonzero(y == extreme)
+        # ตัวแรกที่ถึงค่าสุดขั้วในแต่ละ bucket = hit แรกที่ >= จุดเริ่ม bucket (ค่าซ้ำกันทั้ง bucket จะไม่เก็บทุกจุด)
+        first = np.searchsorted(hits, starts)
+        keep[hits[first[first < len(hits)]]] = True
+    return np.flatnonzero(keep)
+
+
+def minmax(t, y, buckets):
+    t = np.asarray(t, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    idx = minmax_indices(t, y, buckets)
+    return t[idx], y[idx]
+
+
+def lttb(t, y, threshold):
+    """Largest-Triangle-Three-Buckets -> threshold จุด (จุดแรก/สุดท้ายคงไว้เสมอ)"""
+    t = np.asarray(t, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(t)
+    if threshold >= n or threshold < 3:
+        return t, y
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    out = np.empty(threshold, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # จุดเฉลี่ยของ bucket ถัดไป (bucket สุดท้ายใช้จุดปลาย)
+        nlo, nhi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_t = t[nlo:nhi].mean() if nhi > nlo else t[-1]
+        avg_y = y[nlo:nhi].mean() if nhi > nlo else y[-1]
+        area = np.abs((t[a] - avg_t) * (y[lo:hi] - y[a]) - (t[a] - t[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        out[i + 1] = a
+    return t[out], y[out]
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+ช่องทางส่ง event จากสคริปต์เทรน (step / epoch / phase / scalar / mark) มาที่ตัวมอนิเตอร์
+- ฝั่งสคริปต์เทรน: step() / epoch() / phase() / scalar() / mark() ส่ง datagram ขนาดเล็ก 1 ก้อนต่อ event
+  ผ่าน Unix-domain socket (SOCK_DGRAM) แบบ non-blocking -> ไม่มี connect/handshake, ไม่รอ
+  ไม่มีตัวมอนิเตอร์ฟังอยู่ / buffer ของ socket เต็ม -> ทิ้ง event นั้น (นับไว้ที่ client.dropped) ไม่ raise
+  (ระบบที่ไม่มี AF_UNIX เช่น Windows ใช้ UDP 127.0.0.1 แทน)
+- ฝั่งมอนิเตอร์: MarkerListener รับใน daemon thread เก็บลง deque, loop การ sample ดึงด้วย drain() ทุก tick
+  แล้ว place() แปลงเวลาจริงของ event เป็น elapsed ของ run -> marker = (elapsed, kind, label, value)
+- kind "alert" มาจาก perfmon.anomaly (ตัวมอนิเตอร์บันทึกเอง) แต่สคริปต์เทรนส่ง mark ชนิดนี้ได้เช่นกัน
+- ที่อยู่: env PERFMON_MARKERS (path ของ socket หรือ host:port) หรือค่าเริ่มต้น <tempdir>/perfmon-markers.sock
+- โมดูลนี้ใช้เฉพาะ standard library (import ในสคริปต์เทรนได้โดยไม่มีต้นทุนเพิ่ม)
+
+ตัวอย่างในสคริปต์เทรน:
+    from perfmon import markers
+    markers.epoch(3); markers.phase("eval"); markers.scalar("loss", 0.42)
+"""
+
+import collections
+import os
+import socket
+import struct
+import tempfile
+import threading
+import time
+
+KINDS = ("step", "epoch", "phase", "scalar", "mark", "alert")   # ต่อท้ายเท่านั้น (รหัสใน datagram = ลำดับ)
+LINE_KINDS = ("epoch", "phase", "mark", "alert")     # kind ที่วาดเป็นเส้นแนวตั้งบนกราฟ/แสดงใน console
+MAX_LABEL = 200                             # bytes (UTF-8) ของ label ต่อ event
+MAX_PENDING = 65536                         # event ค้างสูงสุดก่อนตัวเก่าสุดถูกทิ้ง
+DEFAULT_UDP_PORT = 9465
+_PACKET = struct.Struct("<dBd")             # เวลาจริง (epoch วินาที), kind, value แล้วตามด้วย label
+_KIND_CODES = {kind: i for i, kind in enumerate(KINDS)}
+
+
+def resolve_address(address=None):
+    """ที่อยู่ของช่องทาง -> (family, address) ตาม address / env PERFMON_MARKERS / ค่าเริ่มต้น"""
+    address = address or os.environ.get("PERFMON_MARKERS")
+    has_unix = hasattr(socket, "AF_UNIX")
+    if address:
+        host, sep, port = address.rpartition(":")
+        if sep and port.isdigit() and host and os.sep not in host:
+            return socket.AF_INET, (host, int(port))
+        if has_unix:
+            return socket.AF_UNIX, address
+        raise ValueError(f"Marker address '{address}' must be host:port on this platform")
+    if has_unix:
+        return socket.AF_UNIX, os.path.join(tempfile.gettempdir(), "perfmon-markers.sock")
+    return socket.AF_INET, ("127.0.0.1", DEFAULT_UDP_PORT)
+
+
+class MarkerClient:
+    """ฝั่งผู้ส่ง: socket เดียวต่อโปรเซส, ทุก event เป็น sendto 1 ครั้งแบบ non-blocking"""
+
+    def __init__(self, address=None):
+        family, self.address = resolve_address(address)
+        self._sock = socket.socket(family, socket.SOCK_DGRAM)
+        self._sock.setblocking(False)
+        self._send = self._sock.sendto
+        self._pack = _PACKET.pack
+        self.sent = 0
+        self.dropped = 0
+
+    def emit(self, kind, value=0.0, label=""):
+        packet = self._pack(time.time(), _KIND_CODES[kind], value)
+        if label:
+            packet += label.encode("utf-8")[:MAX_LABEL]
+        try:
+            self._send(packet, self.address)
+            self.sent += 1
+        except OSError:
+            self.dropped += 1   # ไม่มีผู้ฟัง / buffer เต็ม -> ไม่บล็อกการเทรน
+
+    def step(self, n):
+        self.emit("step", n)
+
+    def epoch(self, n, label=""):
+        self.emit("epoch", n, label)
+
+    def phase(self, name):
+        self.emit("phase", 0.0, name)
+
+    def scalar(self, name, value):
+        self.emit("scalar", value, name)
+
+    def mark(self, label, value=0.0):
+        self.emit("mark", value, label)
+
+    def close(self):
+        self._sock.close()
+
+
+_client = None
+
+
+def get_client():
+    """MarkerClient ของโปรเซสนี้ (สร้างครั้งแรกที่ใช้)"""
+    global _client
+    if _client is None:
+        _client = MarkerClient()
+    return _client
+
+
+def step(n):
+    get_client().step(n)
+
+
+def epoch(n, label=""):
+    get_client().epoch(n, label)
+
+
+def phase(name):
+    get_client().phase(name)
+
+
+def scalar(name, value):
+    get_client().scalar(name, value)
+
+
+def mark(label, value=0.0):
+    get_client().mark(label, value)
+
+
+class MarkerListener:
+    """
+    ฝั่งมอนิเตอร์: รับ event ใน daemon thread
+    - socket path ที่ค้างจากโปรแกรมที่ล่มจะถูกลบแล้ว bind ใหม่
+      แต่ถ้ามีตัวมอนิเตอร์อื่นฟังอยู่ -> raise OSError (ไม่แย่งช่องทางกัน)
+    """
+
+    def __init__(self, address=None, maxlen=MAX_PENDING):
+        family, self.address = resolve_address(address)
+        self._events = collections.deque(maxlen=maxlen)
+        self._closed = False
+        sock = socket.socket(family, socket.SOCK_DGRAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)   # รับ burst ได้โดยไม่ทิ้ง
+            if family == socket.AF_UNIX and os.path.exists(self.address):
+                self._remove_stale(self.address)
+            sock.bind(self.address)
+        except OSError:
+            sock.close()
+            raise
+        sock.settimeout(0.5)
+        self._sock = sock
+        self._thread = threading.Thread(target=self._run, name="perfmon-markers", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _remove_stale(path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            probe.connect(path)
+        except OSError:
+            os.remove(path)     # ไม่มีผู้ฟัง = ไฟล์ค้าง
+            return
+        finally:
+            probe.close()
+        raise OSError(f"Another monitor is already listening on {path}")
+
+    def _run(self):
+        recv = self._sock.recv
+        unpack = _PACKET.unpack_from
+        size = _PACKET.size
+        append = self._events.append
+        while not self._closed:
+            try:
+                packet = recv(size + MAX_LABEL)
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            if len(packet) < size:
+                continue
+            wall, code, value = unpack(packet)
+            if code < len(KINDS):
+                append((wall, KINDS[code], packet[size:].decode("utf-8", "replace"), value))
+
+    def drain(self):
+        """event ที่รับมาแล้วทั้งหมด [(เวลาจริง, kind, label, value)] ตามลำดับที่มาถึง"""
+        events = self._events
+        return [events.popleft() for _ in range(len(events))]
+
+    def close(self):
+        self._closed = True
+        self._sock.close()
+        self._thread.join()
+        if isinstance(self.address, str):
+            try:
+                os.remove(self.address)
+            except OSError:
+                pass
+
+
+def place(events, elapsed, wall=None):
+    """
+    แปลง event (เวลาจริง) เป็น marker บนแกนเวลาของ run: (elapsed, kind, label, value)
+    elapsed / wall = elapsed ของ run และเวลาจริง ณ ตอนนี้ (จุดอ้างอิงเดียวกัน)
+    """
+    if wall is None:
+        wall = time.time()
+    return [(elapsed - (wall - t), kind, label, value) for t, kind, label, value in events]
+
+
+def marker_rows(markers, format_time):
+    """แถวสำหรับต่อท้ายไฟล์ส่งออก: หัวตาราง + 1 แถวต่อ marker"""
+    rows = [["Marker time", "Kind", "Label", "Value"]]
+    rows += [[format_time(e), kind, label, value] for e, kind, label, value in markers]
+    return rows
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+endpoint HTTP แบบ Prometheus (text format 0.0.4) สำหรับโหมด daemon
+- MetricsSnapshot: loop การ sample เรียก update() ทุก tick -> เรนเดอร์ข้อความทั้งหน้าเป็น bytes ครั้งเดียว
+  แล้วสลับ reference (การกำหนดค่า attribute เป็น atomic) -> ฝั่ง HTTP แค่ส่ง bytes ที่มีอยู่
+  ไม่อ่าน /proc ไม่ต้องล็อก และ scrape ถี่แค่ไหนก็ไม่เพิ่มงานให้ loop การ sample
+- MetricsServer: ThreadingHTTPServer ใน daemon thread (1 thread ต่อ request)
+  -> client ที่ช้า/ค้างไม่บล็อกทั้ง sampler และ scrape อื่น
+- GET /metrics (หรือ /) = snapshot ล่าสุด, GET /healthz = "ok"
+- ไม่ต้องใช้แพ็กเกจเพิ่ม (http.server ของ standard library)
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PORT = 9464
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+MAX_LABEL_LEN = 200
+
+
+def _escape(value):
+    value = str(value)[:MAX_LABEL_LEN]
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class MetricsSnapshot:
+    """ค่าล่าสุดของทุกเป้าหมาย + counter สะสมข้ามรอบ (เขียนจาก thread การ sample เท่านั้น)"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.samples_total = 0
+        self.runs_total = 0
+        self._ticks_base = 0        # ticks/missed ของรอบก่อนๆ (TickScheduler เริ่มนับใหม่ทุกรอบ)
+        self._missed_base = 0
+        self._scheduler = None
+        self._overhead = None       # perfmon.overhead.Overhead ของรอบปัจจุบัน (ต้นทุนของตัวมอนิเตอร์เอง)
+        self._labels = {}           # pid -> ข้อความ label (escape ไว้ครั้งเดียว)
+        self.body = self._render((), 0.0)
+
+    def _label(self, pid, sources):
+        label = self._labels.get(pid)
+        if label is None:
+            label = self._labels[pid] = f'pid="{pid}",source="{_escape(sources.get(pid, ""))}"'
+        return label
+
+    def update(self, samples, scheduler, sources, overhead=None):
+        """
+        บันทึก tick ล่าสุด: samples = [(pid, cpu, ram), ...] ของเป้าหมายที่ยังทำงานอยู่
+        sources = dict pid -> source (อ้างอิง dict เดิมได้ ไม่ต้องสร้างใหม่ทุก tick)
+        overhead = Overhead ของ loop (ส่งออกเป็น gauge perfmon_self_*)
+        """
+        self._overhead = overhead
+        if scheduler is not self._scheduler:
+            if self._scheduler is not None:
+                self._ticks_base += self._scheduler.ticks
+                self._missed_base += self._scheduler.missed
+            self._scheduler = scheduler
+            self.runs_total += 1
+        self.samples_total += len(samples)
+        rows = [(self._label(pid, sources), cpu, ram) for pid, cpu, ram in samples]
+        self.body = self._render(rows, time.time())
+
+    def idle(self):
+        """ไม่มีเป้าหมาย (ระหว่างรอโปรเซสใหม่): ล้าง gauge รายโปรเซส, counter คงเดิม"""
+        self._labels.clear()
+        self._overhead = None
+        self.body = self._render((), 0.0)
+
+    def _render(self, rows, last_sample):
+        ticks = self._ticks_base + (self._scheduler.ticks if self._scheduler else 0)
+        missed = self._missed_base + (self._scheduler.missed if self._scheduler else 0)
+        lines = [
+            "# HELP perfmon_cpu_percent CPU usage of the monitored process, normalized to all cores.",
+            "# TYPE perfmon_cpu_percent gauge",
+        ]
+        lines += [f"perfmon_cpu_percent{{{label}}} {cpu:.6g}" for label, cpu, _ in rows]
+        lines += [
+            "# HELP perfmon_ram_megabytes Resident memory of the monitored process in MB.",
+            "# TYPE perfmon_ram_megabytes gauge",
+        ]
+        lines += [f"perfmon_ram_megabytes{{{label}}} {ram:.6g}" for label, _, ram in rows]
+        lines += [
+            "# HELP perfmon_targets Number of processes currently monitored.",
+            "# TYPE perfmon_targets gauge",
+            f"perfmon_targets {len(rows)}",
+            "# HELP perfmon_samples_total Samples recorded since the daemon started.",
+            "# TYPE perfmon_samples_total counter",
+            f"perfmon_samples_total {self.samples_total}",
+            "# HELP perfmon_ticks_total Sampling ticks since the daemon started.",
+            "# TYPE perfmon_ticks_total counter",
+            f"perfmon_ticks_total {ticks}",
+            "# HELP perfmon_ticks_missed_total Ticks skipped because the sampler fell behind.",
+            "# TYPE perfmon_ticks_missed_total counter",
+            f"perfmon_ticks_missed_total {missed}",
+            "# HELP perfmon_runs_total Monitoring runs (training sessions) since the daemon started.",
+            "# TYPE perfmon_runs_total counter",
+            f"perfmon_runs_total {self.runs_total}",
+            "# HELP perfmon_last_sample_timestamp_seconds Wall time of the latest sample (0 while idle).",
+            "# TYPE perfmon_last_sample_timestamp_seconds gauge",
+            f"perfmon_last_sample_timestamp_seconds {last_sample:.3f}",
+            "# HELP perfmon_start_time_seconds Wall time the daemon started.",
+            "# TYPE perfmon_start_time_seconds gauge",
+            f"perfmon_start_time_seconds {self.started:.3f}",
+        ]
+        overhead = self._overhead
+        if overhead is not None and overhead.series:
+            series = overhead.series
+            lines += [
+                "# HELP perfmon_self_cpu_percent CPU used by the monitor itself (smoothed), percent of one core.",
+                "# TYPE perfmon_self_cpu_percent gauge",
+                f"perfmon_self_cpu_percent {overhead.cpu:.6g}",
+                "# HELP perfmon_self_rss_megabytes Resident memory of the monitor itself in MB.",
+                "# TYPE perfmon_self_rss_megabytes gauge",
+                f"perfmon_self_rss_megabytes {series.last('ram'):.6g}",
+                "# HELP perfmon_loop_max_seconds Longest sampling-loop iteration in the last overhead window.",
+                "# TYPE perfmon_loop_max_seconds gauge",
+                f"perfmon_loop_max_seconds {series.last('loop_ms') / 1e3:.6g}",
+                "# HELP perfmon_degradation_level Display-rate reduction level (0 = within the CPU budget).",
+                "# TYPE perfmon_degradation_level gauge",
+                f"perfmon_degradation_level {overhead.level}",
+            ]
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path in ("/metrics", "/"):
+            self._reply(200, self.server.snapshot.body, CONTENT_TYPE)
+        elif path == "/healthz":
+            self._reply(200, b"ok\n", "text/plain; charset=utf-8")
+        else:
+            self._reply(404, b"not found\n", "text/plain; charset=utf-8")
+
+    def _reply(self, code, body, content_type):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass    # ไม่พิมพ์ทุก scrape ลง console
+
+
+class MetricsServer:
+    """HTTP server ของ snapshot (รันใน daemon thread), port=0 = ให้ระบบเลือก port ว่าง"""
+
+    def __init__(self, snapshot, host="127.0.0.1", port=DEFAULT_PORT):
+        self.snapshot = snapshot
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.snapshot = snapshot
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="perfmon-metrics", daemon=True)
+        self._thread.start()
+
+    @property
+    def address(self):
+        host, port = self._httpd.server_address[:2]
+        return host, port
+
+    @property
+    def url(self):
+        host, port = self.address
+        return f"http://{host}:{port}/metrics"
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+"""
+มอนิเตอร์แบบ in-process: รันเป็น daemon thread ในโปรเซสที่เทรนเอง (ไม่ต้องเดาโปรเซสด้วย get_pid())
+
+    from perfmon.monitor import Monitor
+    with Monitor(interval=1.0, window=60, callback=print_window) as mon:   # pid=None = โปรเซสนี้เอง
+        train()
+        mon.snapshot()          # ค่าล่าสุด + สถิติของ run ถึงตอนนี้
+    mon.store                   # SampleStore ของทั้ง run (rollup/stats/markers ครบหลัง stop)
+
+- ใช้แกนเดียวกับ monitor() ของ CLI: sampler (/proc หรือ psutil), TickScheduler, Rollup, SessionStats
+- callback(window) ถูกเรียกใน thread ของมอนิเตอร์ทุก window วินาที (และครั้งสุดท้ายตอน stop)
+  ด้วยแถวใหม่ตั้งแต่ window ก่อน -> ควรทำงานสั้นๆ ไม่งั้น tick ถัดไปจะช้า (นับใน scheduler.missed)
+- views()/window.chunks() คืน memoryview ที่ชี้ไปที่ chunk ของ store โดยตรง (ไม่คัดลอก)
+  อ่านได้ขณะที่ thread ของมอนิเตอร์ยัง append อยู่
+- import เฉพาะ standard library + psutil (ไม่ดึง openpyxl/PyQt5/matplotlib/numpy เข้ามาในโปรเซสเทรน)
+หมายเหตุ: วัดโปรเซสตัวเองจะรวม CPU ของ thread มอนิเตอร์ด้วย (1 การอ่าน /proc ต่อ tick)
+"""
+
+import os
+import threading
+
+import psutil
+
+from .adaptive import COLUMN as ADAPTIVE_COLUMN, AdaptiveRate
+from .anomaly import AnomalyWatch
+from .binlog import open_log
+from .breakdown import ThreadBreakdown
+from .registry import ExtraSampler, parse_metrics
+from .rollup import Rollup
+from .sampler import open_sampler
+from .scheduler import TickScheduler
+from .stats import SessionStats
+from .store import COLUMNS, SampleStore
+from .tree import ProcessTree
+
+
+class Window:
+    """แถว [start:stop] ของ store ที่ส่งให้ callback (elapsed อยู่ในช่วง first..last)"""
+
+    def __init__(self, store, start, stop):
+        self.store = store
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    @property
+    def first(self):
+        return self.store.value("elapsed", self.start)
+
+    @property
+    def last(self):
+        return self.store.value("elapsed", self.stop - 1)
+
+    def chunks(self):
+        """(start_row, stop_row, [memoryview ต่อคอลัมน์]) ของแถวใน window (ไม่คัดลอก)"""
+        return self.store.iter_chunks(self.start, self.stop)
+
+    def column(self, name):
+        """คอลัมน์ของ window เป็น array('d') (คัดลอก)"""
+        return self.store.column(name, self.start, self.stop)
+
+    def mean(self, name):
+        total = 0.0
+        index = self.store.columns.index(name)
+        for _, _, views in self.chunks():
+            total += sum(views[index])
+        return total / len(self) if len(self) else 0.0
+
+
+class Monitor:
+    """
+    เก็บ CPU/RAM ของ pid (None = โปรเซสนี้) ทุก interval วินาทีใน background thread
+    - tree=True: รวมโปรเซสลูกหลาน (DataLoader workers ฯลฯ) -> store.children
+    - window/callback: เรียก callback(Window) ทุก window วินาที (window=None -> ทุก tick)
+    - log_path: เขียน .pmlog ต่อเนื่องเหมือน CLI (-log)
+    - metrics: metric เสริมเป็นคอลัมน์ต่อจาก cpu/ram เช่น "io,threads,uss=30" (ดู perfmon.registry)
+    - breakdown=True: CPU ราย thread/core -> store.threads / store.cores (ดู perfmon.breakdown)
+    - adaptive: interval สูงสุด (วินาที) ของอัตราการ sample แบบปรับตัว, interval = ต่ำสุด (ดู perfmon.adaptive)
+      ทุกแถวมีคอลัมน์ interval ต่อท้าย
+    - anomaly: True หรือ kwargs ของ AnomalyWatch (เช่น {"leak_rate": 40}) -> ตรวจ RSS leak / CPU เปลี่ยนระดับ
+      on_alert(alert) ถูกเรียกใน thread ของมอนิเตอร์ใน tick ที่ตรวจพบ (ระบุ on_alert = เปิด anomaly ด้วย)
+      alert ทุกตัวเป็น marker kind "alert" ใน store.markers (ดู perfmon.anomaly)
+    - โปรเซสเป้าหมายจบ -> thread หยุดเอง (running = False), ข้อมูลยังอยู่ใน store
+    """
+
+    def __init__(self, pid=None, interval=1.0, tree=False, window=None, callback=None,
+                 thresholds=None, log_path=None, metrics=None, breakdown=False, adaptive=None,
+                 anomaly=None, on_alert=None):
+        self.pid = os.getpid() if pid is None else int(pid)
+        self.interval = float(interval)
+        self.tree = tree
+        self.window = window
+        self.callback = callback
+        self.thresholds = thresholds
+        self.log_path = log_path
+        self.metrics = parse_metrics(metrics)
+        self.breakdown = breakdown
+        self.adaptive = adaptive
+        self.anomaly = anomaly
+        self.on_alert = on_alert
+        self.store = None
+        self.scheduler = None
+        self.rollup = None
+        self.stats = None
+        self._sampler = None
+        self._extra = None
+        self._breakdown = None
+        self._rate = None
+        self._watch = None
+        self._log = None
+        self._window_start = 0
+        self._window_time = 0.0
+        self._stop = threading.Event()
+        self._lock = threading.Lock()   # กันอ่าน stats ระหว่างที่ tick กำลังอัปเดต (snapshot)
+        self._thread = None
+
+    # ---------- วงจรชีวิต ----------
+    def start(self):
+        """เปิด sampler แล้วเริ่ม thread (raise psutil.NoSuchProcess / AccessDenied ทันทีถ้าเข้าถึงไม่ได้)"""
+        if self.running:
+            return self
+        try:
+            source = ' '.join(psutil.Process(self.pid).cmdline())
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            source = ""
+        self._sampler = ProcessTree(self.pid) if self.tree else open_sampler(self.pid)
+        try:
+            self._extra = ExtraSampler(self.pid, self.metrics) if self.metrics else None
+            self._breakdown = ThreadBreakdown(self.pid, source) if self.breakdown else None
+        except psutil.Error:
+            self._sampler.close()
+            raise
+        extra_columns = self._extra.names if self._extra is not None else ()
+        self._rate = AdaptiveRate(self.interval, self.adaptive) if self.adaptive else None
+        if self._rate is not None:
+            extra_columns += (ADAPTIVE_COLUMN,)
+        self.store = SampleStore(source or f"PID {self.pid}", COLUMNS + extra_columns)
+        if self.tree:
+            self.store.track_children()
+        self.scheduler = TickScheduler(self.interval)
+        self.store.started_at = self.scheduler.wall_anchor
+        if self.store.children is not None:
+            self.store.children.started_at = self.store.started_at
+        if self._breakdown is not None:
+            self.store.threads, self.store.cores = self._breakdown.threads, self._breakdown.cores
+            for series in (self.store.threads, self.store.cores):
+                if series is not None:
+                    series.started_at = self.store.started_at
+        self.rollup = Rollup.for_store(self.store)
+        self.stats = SessionStats.for_store(self.store, self.thresholds)
+        self._watch = None
+        if self.anomaly or self.on_alert is not None:
+            options = self.anomaly if isinstance(self.anomaly, dict) else {}
+            self._watch = AnomalyWatch([self.on_alert] if self.on_alert is not None else (), **options)
+        self._log = open_log(self.log_path, self.store) if self.log_path else None
+        self._window_start, self._window_time = 0, 0.0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="perfmon-monitor", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """หยุด thread (ไม่ต้องรอครบ interval) แล้วเติม rollup/stats/meta ลง store -> คืนค่า store"""
+        if self._thread is None:
+            return self.store
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self._sampler.close()
+        store = self.store
+        self.rollup.flush()
+        store.rollup = self.rollup
+        store.stats = self.stats
+        store.meta.update(self.scheduler.meta())
+        if self._rate is not None:
+            store.meta.update(self._rate.meta())
+        if self._breakdown is not None:
+            self._breakdown.close()
+            store.meta.update(self._breakdown.meta())
+        if self._watch is not None:
+            self._watch.close()
+            store.meta.update(self._watch.meta())
+        if self.stats:
+            store.meta.update(self.stats.meta())
+        if self._log:
+            self._log.write_meta(store.meta)
+            if store.markers:
+                self._log.write_markers(store.markers)
+            if self.stats:
+                self._log.write_stats(self.stats)
+            self._log.close()
+            self._log = None
+        return store
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    # ---------- loop การ sample ----------
+    def _run(self):
+        store, children, extra = self.store, self.store.children, self._extra
+        scheduler, rollup, stats, log = self.scheduler, self.rollup, self.stats, self._log
+        wait = self._stop.wait
+        while not self._stop.is_set():
+            scheduler.wait(wait)
+            if self._stop.is_set():
+                break
+            try:
+                if children is not None:
+                    cpu, ram, child_rows = self._sampler.sample()
+                else:
+                    cpu, ram = self._sampler.sample()
+                values = (cpu, ram) + extra.sample() if extra else (cpu, ram)
+            except psutil.NoSuchProcess:
+                break
+            elapsed = scheduler.elapsed()
+            if self._rate is not None:
+                values += (self._rate.update(elapsed, cpu, ram),)
+                scheduler.set_interval(self._rate.interval)
+            if self._breakdown is not None:
+                try:
+                    self._breakdown.sample(elapsed)
+                except psutil.NoSuchProcess:
+                    break
+            with self._lock:
+                store.append(elapsed, *values)
+                rollup.add(elapsed, *values)
+                stats.add(elapsed, *values)
+            if log:
+                log.append(elapsed, *values)
+            if self._watch is not None:
+                for alert in self._watch.add(elapsed, None, cpu, ram):
+                    store.markers.append(alert.marker())
+            if children is not None:
+                for child_pid, child_cpu, child_ram in child_rows:
+                    if child_pid not in children.sources:
+                        children.register_source(child_pid, self._sampler.sources.get(child_pid, ""))
+                        if log:
+                            log.children.register_source(child_pid, children.sources[child_pid])
+                    children.append(elapsed, child_pid, child_cpu, child_ram)
+                    if log:
+                        log.children.append(elapsed, child_pid, child_cpu, child_ram)
+            if self.callback is not None and (self.window is None or elapsed - self._window_time >= self.window):
+                self._emit_window(elapsed)
+        if self.callback is not None and len(store) > self._window_start:
+            self._emit_window(scheduler.elapsed())
+
+    def _emit_window(self, elapsed):
+        stop = len(self.store)
+        window = Window(self.store, self._window_start, stop)
+        self._window_start, self._window_time = stop, elapsed
+        try:
+            self.callback(window)
+        except Exception as e:
+            print(f"⚠️ Monitor callback failed: {e}")
+
+    # ---------- อ่านระหว่างทำงาน ----------
+    def mark(self, kind, value=0.0, label=""):
+        """บันทึก marker (เช่น "epoch", 3) ณ เวลาปัจจุบันของ run ลง store.markers โดยตรง (ไม่ผ่าน socket)"""
+        if self.scheduler is not None:
+            self.store.markers.append((self.scheduler.elapsed(), kind, label, value))
+
+    def views(self):
+        """{คอลัมน์: [memoryview ต่อ chunk]} ของทุกแถวที่บันทึกแล้ว ณ ตอนนี้ (ไม่คัดลอก)"""
+        if self.store is None:
+            return {}
+        chunks = list(self.store.iter_chunks(0, len(self.store)))
+        return {name: [views[i] for _, _, views in chunks] for i, name in enumerate(self.store.columns)}
+
+    def snapshot(self):
+        """ค่าล่าสุดและสรุปของ run ถึงตอนนี้ (dict เล็กๆ ไม่คัดลอกข้อมูลดิบ)"""
+        store = self.store
+        n = len(store) if store is not None else 0
+        snap = {"pid": self.pid, "running": self.running, "samples": n}
+        if n:
+            with self._lock:
+                summary = self.stats.summary()
+            snap.update(elapsed=store.value("elapsed", n - 1), cpu=store.value("cpu", n - 1),
+                        ram=store.value("ram", n - 1), stats=summary)
+        if self.scheduler is not None:
+            snap["sampling"] = self.scheduler.stats()
+        return snap
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+วัดต้นทุนของตัวมอนิเตอร์เอง (monitor the monitor) -> ยืนยันว่าไม่รบกวนงานที่กำลังวัด
+- เวลาต่อ stage ของ loop (sample / aggregate / display / flush / plot / table) ด้วย perf_counter_ns
+  จับแบบ lap: mark = overhead.lap("sample", mark) -> อ่านนาฬิกา 1 ครั้งต่อ stage
+- loop latency = เวลาทำงานของ tick ตั้งแต่ตื่นจนจบ (ไม่รวมเวลารอ deadline)
+- ทุก window วินาที: อ่าน CPU/RSS ของโปรเซสมอนิเตอร์เอง (sampler ของ os.getpid()) แล้วเก็บ 1 แถวลง series
+  (SampleStore: elapsed, cpu, ram, loop_ms, queue, backlog) -> ต้นทุนไม่ขึ้นกับอัตราการ sample
+  cpu ของ series นี้เป็น % ของ 1 core (ไม่หารจำนวน core) เพื่อเทียบกับ budget ได้ตรงๆ
+  window สุดท้ายที่ยังไม่ครบถูกปิดตอน close() (run สั้นกว่า window ก็มีค่าที่วัดได้), ก่อนมี window ใด -> สรุปเป็น n/a
+- budget (% ของ 1 core): ค่าเฉลี่ยแบบ EWMA เกิน budget -> level +1, ต่ำกว่าครึ่ง budget -> level -1
+  ผู้เรียกลดอัตราการแสดงผลตาม display_stride (= 2 ** level) และงดวาดกราฟระหว่างทางเมื่อ skip_plot
+- GUI: stage plot/table ถูกจับใน UI thread ส่วน stage อื่นใน thread มอนิเตอร์ (คนละ key จึงไม่ชนกัน)
+"""
+
+import os
+import time
+
+from .sampler import CPU_COUNT, open_sampler
+from .store import SampleStore
+
+STAGES = ("sample", "aggregate", "display", "flush", "plot", "table")
+COLUMNS = ("elapsed", "cpu", "ram", "loop_ms", "queue", "backlog")
+DEFAULT_BUDGET = 5.0        # % ของ 1 core
+WINDOW = 10.0               # วินาทีต่อแถวของ series / ต่อการตัดสินใจลด-คืนระดับ
+MAX_LEVEL = 6               # display_stride สูงสุด 64
+SMOOTHING = 0.3             # น้ำหนักของ window ล่าสุดใน EWMA
+
+
+class Overhead:
+    def __init__(self, budget=DEFAULT_BUDGET, window=WINDOW):
+        self.budget = budget            # None/0 = วัดอย่างเดียว ไม่ลดระดับ
+        self.window = window
+        self.stage_ns = dict.fromkeys(STAGES, 0)
+        self.stage_calls = dict.fromkeys(STAGES, 0)
+        self.stage_max_ns = dict.fromkeys(STAGES, 0)
+        self.series = SampleStore("perfmon overhead", COLUMNS)
+        self.ticks = 0
+        self.loop_ns = 0
+        self.loop_max_ns = 0
+        self.queue_max = 0
+        self.backlog_max = 0
+        self.cpu = None                 # EWMA ของ CPU (% ของ 1 core) ต่อ window
+        self.cpu_max = 0.0
+        self.ram_max = 0.0
+        self.level = 0
+        self.max_level = 0
+        self.degraded_seconds = 0.0
+        self._cpu_start = time.process_time()
+        self._wall_start = time.monotonic()
+        self._window_start = None
+        self._window_end = None         # elapsed ของ tick ล่าสุดใน window ที่ยังเปิด
+        self._window_loop_ns = 0
+        self._window_queue = 0
+        self._window_backlog = 0
+        self._sampler = open_sampler(os.getpid())
+
+    # ---------- จับเวลาใน loop ----------
+    @staticmethod
+    def begin():
+        """เวลาเริ่ม tick (ส่งต่อให้ lap/end)"""
+        return time.perf_counter_ns()
+
+    def lap(self, stage, mark):
+        """บวกเวลาตั้งแต่ mark เข้า stage -> คืนค่าเวลาปัจจุบัน (mark ของ stage ถัดไป)"""
+        now = time.perf_counter_ns()
+        spent = now - mark
+        self.stage_ns[stage] += spent
+        self.stage_calls[stage] += 1
+        if spent > self.stage_max_ns[stage]:
+            self.stage_max_ns[stage] = spent
+        return now
+
+    def end(self, elapsed, start, queue=0, backlog=0):
+        """
+        จบ tick: start = begin() ของ tick นี้, queue = งานค้างของ writer, backlog = แถวที่ยังไม่แสดง/flush
+        :returns: True ถ้า level เปลี่ยน (ผู้เรียกแจ้งผู้ใช้ได้)
+        """
+        spent = time.perf_counter_ns() - start
+        self.ticks += 1
+        self.loop_ns += spent
+        if spent > self._window_loop_ns:
+            self._window_loop_ns = spent
+        if queue > self._window_queue:
+            self._window_queue = queue
+        if backlog > self._window_backlog:
+            self._window_backlog = backlog
+        self._window_end = elapsed
+        if self._window_start is None:
+            self._window_start = elapsed
+        elif elapsed - self._window_start >= self.window:
+            return self._close_window(elapsed)
+        return False
+
+    def _close_window(self, elapsed, final=False):
+        try:
+            cpu, ram = self._sampler.sample()
+        except Exception:
+            cpu, ram = 0.0, 0.0
+        cpu *= CPU_COUNT
+        self.series.append(elapsed, cpu, ram, self._window_loop_ns / 1e6, self._window_queue, self._window_backlog)
+        self.cpu = cpu if self.cpu is None else self.cpu + SMOOTHING * (cpu - self.cpu)
+        self.cpu_max = max(self.cpu_max, cpu)
+        self.ram_max = max(self.ram_max, ram)
+        self.loop_max_ns = max(self.loop_max_ns, self._window_loop_ns)
+        self.queue_max = max(self.queue_max, self._window_queue)
+        self.backlog_max = max(self.backlog_max, self._window_backlog)
+        if self.level:
+            self.degraded_seconds += elapsed - self._window_start
+        self._window_start = elapsed
+        self._window_end = None
+        self._window_loop_ns = self._window_queue = self._window_backlog = 0
+        if final:
+            return False            # จบ run แล้ว ไม่ต้องตัดสินใจลด-คืนระดับ
+
+        level = self.level
+        if self.budget:
+            if self.cpu > self.budget and level < MAX_LEVEL:
+                level += 1
+            elif self.cpu < self.budget / 2 and level:
+                level -= 1
+        changed = level != self.level
+        self.level = level
+        self.max_level = max(self.max_level, level)
+        return changed
+
+    # ---------- การลดระดับ ----------
+    @property
+    def display_stride(self):
+        """แสดงผล 1 ใน display_stride ครั้ง (1 = ปกติ)"""
+        return 1 << self.level
+
+    @property
+    def skip_plot(self):
+        """เกิน budget -> งดวาดกราฟระหว่างทาง (วาดครั้งเดียวตอนจบ)"""
+        return self.level > 0
+
+    # ---------- สรุป ----------
+    def cpu_mean(self):
+        """CPU เฉลี่ยของโปรเซสมอนิเตอร์ทั้งรอบ (% ของ 1 core, รวมทุก thread)"""
+        wall = time.monotonic() - self._wall_start
+        return (time.process_time() - self._cpu_start) / wall * 100.0 if wall > 0 else 0.0
+
+    def summary(self):
+        """ข้อความสรุป 1 บรรทัด (แสดงผล/ท้ายไฟล์ส่งออก)"""
+        loop_mean = self.loop_ns / self.ticks / 1e6 if self.ticks else 0.0
+        loop_max = max(self.loop_max_ns, self._window_loop_ns) / 1e6
+        budget = f"budget {self.budget:g}%" if self.budget else "no budget"
+        # ยังไม่มี window ที่ปิด (run สั้นกว่า window และยังไม่ close) -> ยังไม่มีค่าที่วัดได้ ไม่ใช่ 0
+        cpu_max, ram_max = (f"{self.cpu_max:.2f}%", f"{self.ram_max:.1f} MB") if self.series else ("n/a", "n/a")
+        text = (f"CPU mean {self.cpu_mean():.2f}% / max {cpu_max} of one core ({budget}), "
+                f"RSS max {ram_max}, loop mean {loop_mean:.3f} ms / max {loop_max:.3f} ms, "
+                f"max queue {max(self.queue_max, self._window_queue)}, max backlog {max(self.backlog_max, self._window_backlog)}")
+        if self.max_level:
+            text += f", degraded {self.degraded_seconds:.0f} s (display 1/{1 << self.max_level})"
+        return text
+
+    def stages(self):
+        """เวลาเฉลี่ย/สูงสุดต่อครั้งของแต่ละ stage ที่ถูกใช้"""
+        parts = []
+        for stage in STAGES:
+            calls = self.stage_calls[stage]
+            if calls:
+                parts.append(f"{stage} {self.stage_ns[stage] / calls / 1e3:.1f} us "
+                             f"(max {self.stage_max_ns[stage] / 1e6:.2f} ms)")
+        return ", ".join(parts)
+
+    def meta(self):
+        """ข้อมูลท้ายไฟล์ส่งออก (label -> ค่า)"""
+        return {"Monitor overhead:": self.summary(), "Monitor stages:": self.stages()}
+
+    def close(self):
+        """จบ run: ปิด window สุดท้ายที่ยังไม่ครบ (run สั้นกว่า window ก็ยังได้ค่า CPU/RSS อย่างน้อย 1 แถว)"""
+        if self._window_end is not None:
+            self._close_window(self._window_end, final=True)
+        self._sampler.close()
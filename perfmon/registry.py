@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+ทะเบียน metric เสริมต่อโปรเซส (นอกเหนือจาก cpu/ram ของ sampler)
+- Metric: ชื่อคอลัมน์, label, หน่วย, ต้นทุน (cheap/expensive), กลุ่มการอ่าน (เรียก psutil 1 ครั้งต่อกลุ่ม)
+  cheap -> อ่านทุก tick, expensive (memory_full_info ไล่ smaps ทั้งโปรเซส) -> ทุก EXPENSIVE_EVERY tick
+  กำหนดรอบเองได้ต่อ metric: "uss=30"
+- ExtraSampler.sample(): 1 tick = psutil oneshot() 1 ครั้ง อ่านเฉพาะกลุ่มที่มี metric ถึงรอบ
+  metric ที่ยังไม่ถึงรอบใช้ค่าล่าสุด -> ทุกแถวมีค่าครบ (คอลัมน์ของ store ไม่มีช่องว่าง)
+- counter สะสม (io bytes, context switches, page faults) -> อัตราต่อวินาทีจากผลต่างระหว่างการอ่าน
+- label/หน่วยถูกลงทะเบียนเข้า COLUMN_LABELS / stats.UNITS ตอน import
+  -> ตาราง, ไฟล์ส่งออก, rollup, สถิติ และ .pmlog ใช้คอลัมน์ใหม่ได้โดยไม่มีโค้ดราย metric
+- metric ที่แพลตฟอร์ม/สิทธิ์ไม่รองรับ (เช่น pss นอก Linux, io_counters ของโปรเซสผู้ใช้อื่น)
+  ถูกตัดออกตอนเปิด sampler (ดู unavailable) คอลัมน์จึงคงที่ตลอดรอบ
+"""
+
+import sys
+import time
+
+import psutil
+
+from .sampler import MB
+from .stats import UNITS
+from .store import COLUMN_LABELS
+
+EXPENSIVE_EVERY = 10        # tick ต่อการอ่าน metric ที่แพง (ค่าเริ่มต้น)
+
+
+class Metric:
+    __slots__ = ("name", "label", "unit", "cost", "group", "read", "rate")
+
+    def __init__(self, name, label, unit, cost, group, read=None, rate=False):
+        self.name = name
+        self.label = label
+        self.unit = unit
+        self.cost = cost            # "cheap" / "expensive"
+        self.group = group          # key ของ GROUPS (ผลการอ่านใช้ร่วมกันใน tick เดียว)
+        self.read = read            # ผลของกลุ่ม -> ตัวเลข (None = ใช้ผลตรงๆ)
+        self.rate = rate            # True = counter สะสม -> ต่อวินาที
+
+    @property
+    def every(self):
+        return EXPENSIVE_EVERY if self.cost == "expensive" else 1
+
+
+def _page_faults(proc):
+    # Linux: minflt (ฟิลด์ 10) + majflt (ฟิลด์ 12) ของ /proc/<pid>/stat / Windows: num_page_faults
+    if sys.platform.startswith("linux"):
+        try:
+            with open(f"/proc/{proc.pid}/stat", "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            raise psutil.NoSuchProcess(proc.pid)
+        fields = data[data.rfind(b")") + 2:].split(b" ", 10)
+        return int(fields[7]) + int(fields[9])
+    return proc.memory_info().num_page_faults
+
+
+def _open_fds(proc):
+    return proc.num_fds() if hasattr(proc, "num_fds") else proc.num_handles()
+
+
+# กลุ่มการอ่าน: 1 การเรียกต่อ tick ไม่ว่าจะมีกี่ metric ในกลุ่ม
+GROUPS = {
+    "io": lambda proc: proc.io_counters(),
+    "ctx": lambda proc: proc.num_ctx_switches(),
+    "threads": lambda proc: proc.num_threads(),
+    "fds": _open_fds,
+    "faults": _page_faults,
+    "full": lambda proc: proc.memory_full_info(),
+}
+
+REGISTRY = {m.name: m for m in (
+    Metric("io_read", "IO read (MB/s)", "MB/s", "cheap", "io", lambda r: r.read_bytes / MB, rate=True),
+    Metric("io_write", "IO write (MB/s)", "MB/s", "cheap", "io", lambda r: r.write_bytes / MB, rate=True),
+    Metric("ctx", "Ctx switches (/s)", "/s", "cheap", "ctx", lambda r: r.voluntary + r.involuntary, rate=True),
+    Metric("threads", "Threads", "", "cheap", "threads"),
+    Metric("fds", "Open FDs", "", "cheap", "fds"),
+    Metric("faults", "Page faults (/s)", "/s", "cheap", "faults", rate=True),
+    Metric("uss", "USS (MB)", "MB", "expensive", "full", lambda r: r.uss / MB),
+    Metric("pss", "PSS (MB)", "MB", "expensive", "full", lambda r: r.pss / MB),
+)}
+
+# ชื่อย่อที่ขยายเป็นหลาย metric
+ALIASES = {
+    "io": ("io_read", "io_write"),
+    "mem": ("uss", "pss"),
+    "all": tuple(REGISTRY),
+}
+
+for _metric in REGISTRY.values():
+    COLUMN_LABELS[_metric.name] = _metric.label
+    UNITS[_metric.name] = _metric.unit
+
+
+def parse_metrics(values):
+    """
+    "io,ctx,uss=30" (หรือ list ของข้อความแบบนี้ จาก -metrics ที่ระบุซ้ำ) -> [(name, every)] ตามลำดับใน REGISTRY
+    :raises ValueError: ชื่อ metric/รอบไม่ถูกต้อง
+    """
+    if not values:
+        return []
+    if isinstance(values, str):
+        values = [values]
+    chosen = {}
+    for text in values:
+        for item in text.split(","):
+            item = item.strip().lower()
+            if not item:
+                continue
+            name, _, every = item.partition("=")
+            names = ALIASES.get(name, (name,))
+            if any(n not in REGISTRY for n in names):
+                raise ValueError(f"Unknown metric '{name}' (choose from {', '.join(list(REGISTRY) + list(ALIASES))})")
+            try:
+                every = int(every) if every else None
+                if every is not None and every < 1:
+                    raise ValueError
+            except ValueError:
+                raise ValueError(f"Invalid metric cadence '{item}' (expected NAME=TICKS, TICKS >= 1)") from None
+            for n in names:
+                chosen[n] = every or REGISTRY[n].every
+    return [(name, chosen[name]) for name in REGISTRY if name in chosen]
+
+
+class ExtraSampler:
+    """อ่าน metric เสริมของ PID 1 ตัว -> sample() คืน tuple ตามลำดับ self.names"""
+
+    def __init__(self, pid, metrics):
+        self.pid = pid
+        self.proc = psutil.Process(pid)
+        self.unavailable = {}       # name -> เหตุผลที่ใช้ไม่ได้
+        chosen = []
+        results = {}
+        now = time.monotonic()
+        with self.proc.oneshot():
+            for name, every in metrics:
+                metric = REGISTRY[name]
+                try:
+                    if metric.group not in results:
+                        results[metric.group] = GROUPS[metric.group](self.proc)
+                    x = self._value(metric, results[metric.group])
+                except (psutil.AccessDenied, AttributeError, NotImplementedError, OSError) as e:
+                    self.unavailable[name] = str(e) or type(e).__name__
+                    continue
+                chosen.append((metric, every, x))
+        self.metrics = [(metric, every) for metric, every, _ in chosen]
+        self.names = tuple(metric.name for metric, _ in self.metrics)
+        # gauge เริ่มจากค่าที่อ่านได้, อัตราเริ่มที่ 0 (ยังไม่มีช่วงเวลา)
+        self._values = [0.0 if metric.rate else x for metric, _, x in chosen]
+        self._counters = [x for _, _, x in chosen]
+        self._stamps = [now] * len(chosen)
+        self.tick = 1               # ค่าเริ่มต้นอ่านไปแล้ว -> tick ถัดไปค่อยอ่าน metric ที่แพงอีกรอบตามรอบ
+
+    @staticmethod
+    def _value(metric, result):
+        return float(metric.read(result) if metric.read is not None else result)
+
+    def __bool__(self):
+        return bool(self.names)
+
+    def sample(self):
+        """
+        อ่าน metric ที่ถึงรอบใน oneshot() เดียว -> tuple ของค่าทุก metric (ที่ไม่ถึงรอบ = ค่าล่าสุด)
+        :raises psutil.NoSuchProcess: โปรเซสจบแล้ว
+        """
+        tick = self.tick
+        self.tick = tick + 1
+        values = self._values
+        results = {}
+        now = time.monotonic()
+        with self.proc.oneshot():
+            for i, (metric, every) in enumerate(self.metrics):
+                if tick % every:
+                    continue
+                result = results.get(metric.group)
+                if result is None:
+                    try:
+                        result = results[metric.group] = GROUPS[metric.group](self.proc)
+                    except psutil.AccessDenied:
+                        continue
+                x = self._value(metric, result)
+                if metric.rate:
+                    dt = now - self._stamps[i]
+                    values[i] = (x - self._counters[i]) / dt if dt > 0 else 0.0
+                    self._counters[i], self._stamps[i] = x, now
+                else:
+                    values[i] = x
+        return tuple(values)
+
+    def describe(self):
+        """ข้อความสั้นๆ ของ metric ที่เก็บ + รอบ เช่น "io_read, io_write, uss (every 10 ticks)" """
+        return ", ".join(name if every == 1 else f"{name} (every {every} ticks)"
+                         for name, (_, every) in zip(self.names, self.metrics))
+
+    def close(self):
+        pass
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+rollup หลายระดับความละเอียด (tier) ที่อัปเดตแบบ incremental ระหว่างเก็บข้อมูล
+- ค่าเริ่มต้น 3 ชั้น: 1 วินาที -> 1 นาที -> 1 ชั่วโมง (TIERS)
+- แต่ละ bucket เก็บ count และ min/max/mean ของทุก metric (เช่น cpu, ram)
+- ต่อกันแบบ cascade: bucket ชั้นล่างที่ปิดแล้วจะถูกรวมเข้าชั้นถัดไป (ไม่ย้อนไปอ่านข้อมูลดิบ)
+  -> ต้นทุนต่อ sample คงที่, run 7 วันที่ชั้น 1 ชม. มีแค่ 168 แถวต่อ PID
+- แต่ละ tier เป็น SampleStore (คอลัมน์ elapsed = เวลาเริ่ม bucket, [pid], count, <metric>_min/_max/_mean)
+  จึงส่งออก/พล็อตผ่านโค้ดเดิมได้ทันที
+- โหมดหลายโปรเซส (มีคอลัมน์ pid): แยก bucket ต่อ PID
+- store ที่มีคอลัมน์ interval (perfmon.adaptive, อัตราการ sample ไม่คงที่): mean เป็นแบบถ่วงน้ำหนักด้วยเวลา
+  (น้ำหนัก = interval / interval ของ sample แรก) -> ช่วงที่ sample ถี่ไม่ทำให้ค่าเฉลี่ยเอียง, count ยังเป็นจำนวน sample จริง
+"""
+
+from .store import SampleStore
+
+TIERS = (1.0, 60.0, 3600.0)
+TIER_NAMES = ("1s", "1m", "1h")
+STATS = ("min", "max", "mean")
+
+
+def tier_index(name):
+    """ชื่อ tier ("1s"/"1m"/"1h") -> ลำดับชั้น, "raw"/None -> None"""
+    if name in (None, "raw"):
+        return None
+    return TIER_NAMES.index(name)
+
+
+class Rollup:
+    def __init__(self, metrics=("cpu", "ram"), pid=False, tiers=TIERS, source=""):
+        self.metrics = tuple(metrics)
+        self.pid = pid
+        # index ของคอลัมน์ interval ใน metrics (None = อัตราคงที่ ทุก sample น้ำหนักเท่ากัน)
+        self.weight_index = self.metrics.index("interval") if "interval" in self.metrics else None
+        self.unit = None            # interval ของ sample แรก (น้ำหนัก 1)
+        self.tiers = tuple(tiers)
+        columns = ("elapsed",) + (("pid",) if pid else ()) + ("count",) + tuple(
+            f"{metric}_{stat}" for metric in self.metrics for stat in STATS)
+        self.stores = [SampleStore(source, columns) for _ in self.tiers]
+        self.meta = {}
+        self._open = [{} for _ in self.tiers]      # ชั้น -> {pid หรือ None: [bucket, count, weight, min, max, sum, ...]}
+
+    @classmethod
+    def for_store(cls, store, tiers=TIERS):
+        """rollup ที่คอลัมน์/source/sources/meta/started_at ตาม store (ใช้ dict sources และ meta ร่วมกัน)"""
+        rollup = cls([c for c in store.columns if c not in ("elapsed", "pid")], "pid" in store.columns, tiers, store.source)
+        for tier in rollup.stores:
+            tier.sources = store.sources
+            tier.started_at = store.started_at
+        rollup.meta = store.meta
+        return rollup
+
+    @classmethod
+    def from_store(cls, store, tiers=TIERS):
+        """สร้าง rollup จากข้อมูลดิบที่มีอยู่แล้ว (เช่น เปิดจากไฟล์ .pmlog)"""
+        rollup = cls.for_store(store, tiers)
+        add = rollup.add
+        for _, _, views in store.iter_chunks():
+            for values in zip(*views):
+                add(*values)
+        rollup.flush()
+        return rollup
+
+    # ---------- เขียน ----------
+    def add(self, elapsed, *values):
+        """เพิ่ม 1 sample: add(elapsed, cpu, ram) หรือ add(elapsed, pid, cpu, ram) ตามลำดับคอลัมน์ของ store"""
+        key = None
+        if self.pid:
+            key, values = int(values[0]), values[1:]
+        if self.weight_index is None:
+            self._merge(0, key, int(elapsed // self.tiers[0]), 1, 1.0, [(v, v, v) for v in values])
+            return
+        interval = values[self.weight_index]
+        if self.unit is None:
+            self.unit = interval if interval > 0 else 1.0
+        w = interval / self.unit
+        self._merge(0, key, int(elapsed // self.tiers[0]), 1, w, [(v, v, v * w) for v in values])
+
+    def _merge(self, level, key, bucket, count, weight, stats):
+        acc = self._open[level].get(key)
+        if acc is not None and acc[0] != bucket:
+            self._close(level, key, acc)
+            acc = None
+        if acc is None:
+            acc = [bucket, count, weight]
+            for lo, hi, total in stats:
+                acc += (lo, hi, total)
+            self._open[level][key] = acc
+            return
+        acc[1] += count
+        acc[2] += weight
+        j = 3
+        for lo, hi, total in stats:
+            if lo < acc[j]:
+                acc[j] = lo
+            if hi > acc[j + 1]:
+                acc[j + 1] = hi
+            acc[j + 2] += total
+            j += 3
+
+    def _row(self, level, key, acc):
+        row = [acc[0] * self.tiers[level]]
+        if self.pid:
+            row.append(key)
+        row.append(acc[1])
+        weight = acc[2] or 1.0
+        for j in range(3, len(acc), 3):
+            row += (acc[j], acc[j + 1], acc[j + 2] / weight)
+        return row
+
+    def _close(self, level, key, acc):
+        # bucket ปิด -> บันทึกลง tier นี้ แล้วรวมต่อเข้าชั้นถัดไป
+        del self._open[level][key]
+        self.stores[level].append(*self._row(level, key, acc))
+        if level + 1 < len(self.tiers):
+            start = acc[0] * self.tiers[level]
+            stats = [(acc[j], acc[j + 1], acc[j + 2]) for j in range(3, len(acc), 3)]
+            self._merge(level + 1, key, int(start // self.tiers[level + 1]), acc[1], acc[2], stats)
+
+    def flush(self):
+        """ปิดทุก bucket ที่ยังเปิดอยู่ (ตอนจบ run) ไล่จากชั้นล่างขึ้นบน"""
+        for level, open_buckets in enumerate(self._open):
+            for key in list(open_buckets):
+                self._close(level, key, open_buckets[key])
+
+    # ---------- อ่าน ----------
+    def view(self, level):
+        """tier ที่ level รวม bucket ที่ยังเปิดอยู่ (ค่าบางส่วน) -> SampleStore ใหม่ (ขนาดเล็ก)"""
+        tier = self.stores[level]
+        out = tier.empty_like()
+        out.extend(tier)
+        out.meta = self.meta
+        for key, acc in self._open[level].items():
+            out.append(*self._row(level, key, acc))
+        return out
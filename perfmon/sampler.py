@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+ตัวอ่าน CPU/RAM ของโปรเซส 1 ตัว (sampler) สำหรับ loop ที่เรียกถี่ๆ
+- ProcSampler (Linux): เปิด /proc/<pid>/stat และ /proc/<pid>/statm ค้างไว้
+  แล้วอ่านด้วย os.preadv ลง buffer ที่จองไว้ครั้งเดียว parse เฉพาะฟิลด์ที่ใช้
+  -> ไม่มี open/close และไม่สร้าง object ของ psutil ทุก tick
+  fd ผูกกับโปรเซสเดิม: ถ้าโปรเซสจบ (แม้ PID จะถูกนำกลับมาใช้) การอ่านจะ error ทันที
+  จึงไม่ต้องเรียก pid_exists แยก
+- PsutilSampler: ใช้ psutil ตามเดิม (Windows/macOS หรือเมื่อเปิด /proc ไม่ได้)
+- open_sampler(pid): เลือก backend ให้อัตโนมัติ
+
+ทั้งสองแบบ:
+- sample() -> (cpu %, ram MB) โดย cpu เฉลี่ยตั้งแต่การอ่านครั้งก่อน และหารด้วยจำนวน core แล้ว
+- โปรเซสจบ/เป็น zombie -> raise psutil.NoSuchProcess (หรือ ZombieProcess)
+- since_birth=True: นับ CPU ตั้งแต่โปรเซสเกิด (ใช้กับโปรเซสลูกที่เพิ่งเกิด)
+"""
+
+import os
+import sys
+import time
+
+import psutil
+
+MB = 1024 * 1024
+CPU_COUNT = psutil.cpu_count() or 1
+
+_HAS_PROC = sys.platform.startswith("linux") and os.path.isdir("/proc") and hasattr(os, "pread")
+if _HAS_PROC:
+    CLK_TCK = os.sysconf("SC_CLK_TCK")
+    PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+class PsutilSampler:
+    """backend สำรอง: psutil (ทุกแพลตฟอร์ม)"""
+
+    backend = "psutil"
+
+    def __init__(self, pid, since_birth=False):
+        self.pid = pid
+        self.proc = psutil.Process(pid)
+        with self.proc.oneshot():
+            if since_birth:
+                self._cpu_time, self._stamp = 0.0, self.proc.create_time()
+            else:
+                t = self.proc.cpu_times()
+                self._cpu_time, self._stamp = t.user + t.system, time.time()
+
+    def sample(self):
+        proc = self.proc
+        try:
+            with proc.oneshot():
+                if proc.status() == psutil.STATUS_ZOMBIE:
+                    raise psutil.ZombieProcess(self.pid)
+                t = proc.cpu_times()
+                rss = proc.memory_info().rss
+        except psutil.AccessDenied:
+            raise psutil.NoSuchProcess(self.pid)
+        now = time.time()
+        cpu_time = t.user + t.system
+        dt = now - self._stamp
+        cpu = (cpu_time - self._cpu_time) / dt * 100.0 / CPU_COUNT if dt > 0 else 0.0
+        self._cpu_time, self._stamp = cpu_time, now
+        return cpu, rss / MB
+
+    def close(self):
+        pass
+
+
+class ProcSampler:
+    """backend เร็ว: อ่าน /proc ตรงผ่าน fd ที่เปิดค้างไว้ (Linux)"""
+
+    backend = "proc"
+
+    def __init__(self, pid, since_birth=False):
+        self.pid = pid
+        self._stat_fd = self._statm_fd = None
+        try:
+            self._stat_fd = os.open(f"/proc/{pid}/stat", os.O_RDONLY)
+            self._statm_fd = os.open(f"/proc/{pid}/statm", os.O_RDONLY)
+        except FileNotFoundError:
+            self.close()
+            raise psutil.NoSuchProcess(pid)
+        except PermissionError:
+            self.close()
+            raise psutil.AccessDenied(pid)
+        # buffer จองครั้งเดียว (บรรทัด stat ยาวไม่เกิน ~1 KB)
+        self._stat_buf = bytearray(4096)
+        self._statm_buf = bytearray(256)
+        self._stat_bufs = [self._stat_buf]
+        self._statm_bufs = [self._statm_buf]
+        self._scale = 100.0 / CLK_TCK / CPU_COUNT
+
+        fields = self._read_stat()
+        if since_birth:
+            # starttime (ฟิลด์ 22) เป็น tick นับจาก boot -> เทียบกับนาฬิกา CLOCK_BOOTTIME ได้ตรง
+            self._ticks, self._stamp = 0, int(fields[19]) / CLK_TCK
+        else:
+            self._ticks, self._stamp = int(fields[11]) + int(fields[12]), self._now()
+
+    @staticmethod
+    def _now():
+        return time.clock_gettime(time.CLOCK_BOOTTIME)
+
+    def _pread(self, fd, bufs):
+        try:
+            if hasattr(os, "preadv"):
+                return os.preadv(fd, bufs, 0)
+            data = os.pread(fd, len(bufs[0]), 0)
+            bufs[0][:len(data)] = data
+            return len(data)
+        except ProcessLookupError:
+            # โปรเซสที่ fd ชี้อยู่จบไปแล้ว
+            raise psutil.NoSuchProcess(self.pid)
+
+    def _read_stat(self):
+        """คืนค่าฟิลด์หลังชื่อโปรเซส: [0]=state, [11]=utime, [12]=stime, [19]=starttime"""
+        n = self._pread(self._stat_fd, self._stat_bufs)
+        buf = self._stat_buf
+        # ชื่อโปรเซส (comm) อยู่ในวงเล็บและมีช่องว่างได้ -> เริ่ม parse หลัง ')' ตัวสุดท้าย
+        end = buf.rfind(b")", 0, n)
+        fields = buf[end + 2:n].split(b" ", 20)
+        if fields[0] in (b"Z", b"X"):
+            raise psutil.ZombieProcess(self.pid)
+        return fields
+
+    def sample(self):
+        fields = self._read_stat()
+        now = self._now()
+        n = self._pread(self._statm_fd, self._statm_bufs)
+        buf = self._statm_buf
+        start = buf.index(b" ") + 1
+        resident = int(buf[start:buf.index(b" ", start, n)])
+
+        ticks = int(fields[11]) + int(fields[12])
+        dt = now - self._stamp
+        cpu = (ticks - self._ticks) / dt * self._scale if dt > 0 else 0.0
+        self._ticks, self._stamp = ticks, now
+        return cpu, resident * PAGE_SIZE / MB
+
+    def close(self):
+        for fd in (self._stat_fd, self._statm_fd):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self._stat_fd = self._statm_fd = None
+
+    def __del__(self):
+        self.close()
+
+
+def open_sampler(pid, since_birth=False, backend=None):
+    """
+    สร้าง sampler ของ PID (Linux -> ProcSampler, อื่นๆ -> PsutilSampler)
+    backend: บังคับ "proc" หรือ "psutil" (ใช้ตอน benchmark/ดีบัก)
+    :raises psutil.NoSuchProcess / psutil.AccessDenied
+    """
+    if backend == "psutil" or (backend is None and not _HAS_PROC):
+        return PsutilSampler(pid, since_birth)
+    try:
+        return ProcSampler(pid, since_birth)
+    except psutil.AccessDenied:
+        if backend == "proc":
+            raise
+        return PsutilSampler(pid, since_birth)
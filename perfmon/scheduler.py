@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+ตัวจับจังหวะการ sample แบบ deadline บน time.monotonic_ns()
+- เป้าหมายของแต่ละ tick เป็นเวลาสัมบูรณ์ start + k * interval
+  (ไม่ใช่ sleep(interval - เวลาที่ใช้) ซึ่งสะสม error และ drift เมื่อเครื่องมีโหลด)
+- tick ที่พลาดไปแล้ว (ช้ากว่าเกิน 1 interval) จะถูกข้ามและนับไว้ ไม่ยิงติดๆ กันเพื่อไล่ให้ทัน
+- นาฬิกา monotonic ไม่กระโดดตาม NTP/การปรับเวลา -> elapsed เชื่อถือได้
+  ส่วนเวลาจริง (wall clock) เก็บเป็น anchor ครั้งเดียวตอนเริ่ม ใช้แสดงในไฟล์ส่งออก
+- สถิติ jitter (ช้ากว่า deadline เท่าไร) ต่อ session: mean/std/max + จำนวน tick ที่พลาด
+- set_interval(): เปลี่ยนคาบระหว่าง run (perfmon.adaptive) deadline ถัดไป = deadline ล่าสุด + คาบใหม่
+"""
+
+import math
+import time
+from datetime import datetime
+
+
+class TickScheduler:
+    def __init__(self, interval):
+        self.interval = float(interval)
+        self.interval_ns = max(1, int(round(self.interval * 1e9)))
+        self.start_ns = time.monotonic_ns()
+        self.wall_anchor = time.time()      # เวลาจริง ณ start_ns (สำหรับ export)
+        self._deadline_ns = self.start_ns   # deadline ของ tick ล่าสุด
+        self._next_ns = self.start_ns + self.interval_ns
+        self.interval_min = self.interval_max = self.interval
+        self.ticks = 0
+        self.missed = 0
+        # Welford: ค่าเฉลี่ย/ความแปรปรวนของ jitter (วินาที) แบบไม่ต้องเก็บทุกค่า
+        self._jitter_mean = 0.0
+        self._jitter_m2 = 0.0
+        self.jitter_max = 0.0
+
+    def elapsed(self):
+        """วินาทีตั้งแต่เริ่ม (monotonic)"""
+        return (time.monotonic_ns() - self.start_ns) / 1e9
+
+    def wall_time(self, elapsed):
+        """แปลง elapsed -> datetime ตามนาฬิกาจริง ณ ตอนเริ่ม"""
+        return datetime.fromtimestamp(self.wall_anchor + elapsed)
+
+    def wait(self, sleep=time.sleep):
+        """
+        รอจนถึง deadline ถัดไป
+        sleep: ฟังก์ชันรอ (วินาที) เช่น threading.Event.wait เพื่อให้ปลุกก่อนเวลาได้ตอนสั่งหยุด
+        :returns: จำนวน tick ที่พลาดไปก่อนหน้า tick นี้ (0 = ตรงเวลา)
+        """
+        now = time.monotonic_ns()
+        deadline = self._next_ns
+        if now < deadline:
+            sleep((deadline - now) / 1e9)
+            now = time.monotonic_ns()
+
+        late = now - deadline
+        skipped = 0
+        if late >= self.interval_ns:
+            # ช้าเกิน 1 รอบ -> ข้ามไป deadline ล่าสุดที่ผ่านมา (ไม่ยิงชดเชยติดๆ กัน)
+            skipped = late // self.interval_ns
+            self.missed += skipped
+            deadline += skipped * self.interval_ns
+            late -= skipped * self.interval_ns
+
+        self._record_jitter(late / 1e9)
+        self._deadline_ns = deadline
+        self._next_ns = deadline + self.interval_ns
+        return skipped
+
+    def set_interval(self, interval):
+        """เปลี่ยนคาบตั้งแต่ tick ถัดไป (นับจาก deadline ของ tick ล่าสุด)"""
+        interval = float(interval)
+        if interval == self.interval:
+            return
+        self.interval = interval
+        self.interval_ns = max(1, int(round(interval * 1e9)))
+        self._next_ns = self._deadline_ns + self.interval_ns
+        self.interval_min = min(self.interval_min, interval)
+        self.interval_max = max(self.interval_max, interval)
+
+    def _record_jitter(self, value):
+        self.ticks += 1
+        delta = value - self._jitter_mean
+        self._jitter_mean += delta / self.ticks
+        self._jitter_m2 += delta * (value - self._jitter_mean)
+        if value > self.jitter_max:
+            self.jitter_max = value
+
+    def stats(self):
+        """สถิติของ session: ticks, missed, jitter (มิลลิวินาที)"""
+        std = math.sqrt(self._jitter_m2 / (self.ticks - 1)) if self.ticks > 1 else 0.0
+        return {
+            "interval": self.interval,
+            "ticks": self.ticks,
+            "missed": self.missed,
+            "jitter_mean_ms": self._jitter_mean * 1e3,
+            "jitter_std_ms": std * 1e3,
+            "jitter_max_ms": self.jitter_max * 1e3,
+        }
+
+    def summary(self):
+        """ข้อความสรุป 1 บรรทัด (แสดงผล/ท้ายไฟล์ส่งออก)"""
+        s = self.stats()
+        interval = f"{self.interval_min:g}-{self.interval_max:g}" if self.interval_min != self.interval_max else f"{s['interval']:g}"
+        return (f"interval {interval}s, {s['ticks']} ticks, {s['missed']} missed, "
+                f"jitter mean {s['jitter_mean_ms']:.2f} ms / std {s['jitter_std_ms']:.2f} ms / max {s['jitter_max_ms']:.2f} ms")
+
+    def meta(self):
+        """ข้อมูลท้ายไฟล์ส่งออก (label -> ค่า): เวลาเริ่มจริง + สถิติการ sample"""
+        return {
+            "Started at:": self.wall_time(0).strftime("%Y-%m-%d %H:%M:%S"),
+            "Sampling:": self.summary(),
+        }
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+นโยบาย flush ของ Auto-Save + การแบ่งไฟล์ Auto-Save เป็น segment
+- FlushPolicy: flush เมื่อครบเวลา (ค่าเริ่มต้น 1 ชม. เหมือนเดิม) / จำนวนแถว / ขนาดข้อมูลในหน่วยความจำ
+  อย่างใดอย่างหนึ่งถึงก่อน -> ข้อมูลต่อครั้งมีขอบเขต ต้นทุนการเขียนแต่ละครั้งคาดเดาได้
+- SegmentSet: เมื่อเปิดการหมุนไฟล์ (rotate_bytes) หรือการบีบอัด ไฟล์จะถูกแบ่งเป็น
+  <ชื่อ>_part001.csv, <ชื่อ>_part002.csv, ... ขึ้นไฟล์ใหม่เมื่อ segment ปัจจุบันใหญ่ถึงขนาดที่กำหนด
+  segment ที่ปิดแล้วบีบอัดได้ (gzip / zstd, เฉพาะ CSV เพราะ XLSX บีบอัดในตัวอยู่แล้ว)
+- manifest (<ชื่อ>.manifest.json) เก็บช่วงเวลา / จำนวนแถว / ขนาด ของทุก segment
+  -> select_segments() คืนเฉพาะ segment ที่ทับช่วงเวลาที่ต้องการ ไม่ต้องเปิดทุกไฟล์
+- สถานะทั้งหมดอยู่ใน manifest บนดิสก์ จึงเขียนต่อได้ข้ามรอบมอนิเตอร์/ข้ามการรันโปรแกรม
+  (เรียกจาก thread เดียวต่อครั้ง: BackgroundWriter ระหว่างรอบ หรือ final save หลังปิด writer)
+- zstd ใช้แพ็กเกจ zstandard (import เมื่อใช้จริงเท่านั้น)
+"""
+
+import glob
+import gzip
+import json
+import os
+import shutil
+
+from .tree import children_path
+
+MANIFEST_SUFFIX = ".manifest.json"
+COMPRESSORS = ("gzip", "zstd")
+_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("zstd compression requires the 'zstandard' package (pip install zstandard)")
+    return zstandard
+
+
+def check_compressor(method):
+    """ตรวจวิธีบีบอัดตั้งแต่ตอนเริ่ม (ไม่ให้ไปล้มตอนปิด segment กลางทาง)"""
+    if method is None:
+        return
+    if method not in COMPRESSORS:
+        raise ValueError(f"Unknown compression '{method}' (expected one of: {', '.join(COMPRESSORS)})")
+    if method == "zstd":
+        _zstd()
+
+
+def compress_file(path, method):
+    """บีบอัด path -> path.gz / path.zst (เขียนไฟล์ชั่วคราวแล้ว rename) แล้วลบต้นฉบับ -> path ใหม่"""
+    out = path + _SUFFIXES[method]
+    tmp = out + ".tmp"
+    opener = gzip.open if method == "gzip" else _zstd().open
+    with open(path, "rb") as src, opener(tmp, "wb") as dst:
+        shutil.copyfileobj(src, dst, 1 << 20)
+    os.replace(tmp, out)
+    os.remove(path)
+    return out
+
+
+def open_segment(path):
+    """เปิด segment CSV (บีบอัดหรือไม่ก็ได้) เป็นไฟล์ข้อความสำหรับ csv.reader"""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    if path.endswith(".zst"):
+        return _zstd().open(path, "rt", encoding="utf-8", newline="")
+    return open(path, newline="", encoding="utf-8")
+
+
+def _file_bytes(path):
+    # XLSX แบบ append เขียนเป็นไฟล์ย่อยใน <path>.segments (ดู XlsxAppendSink) -> นับรวมด้วย
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    return size + sum(os.path.getsize(p) for p in glob.glob(os.path.join(path + ".segments", "*")))
+
+
+def _data_bytes(store):
+    size = len(store) * len(store.columns) * 8
+    if store.children is not None:
+        size += _data_bytes(store.children)
+    return size
+
+
+class FlushPolicy:
+    """เงื่อนไข flush ของ Auto-Save (None = ไม่ใช้เงื่อนไขนั้น) + ค่าการหมุนไฟล์/บีบอัด"""
+
+    def __init__(self, seconds=3600.0, rows=None, nbytes=None, rotate_bytes=None, compress=None):
+        self.seconds = seconds
+        self.rows = rows
+        self.nbytes = nbytes
+        self.rotate_bytes = rotate_bytes
+        self.compress = compress
+
+    def due(self, session_elapsed, *stores):
+        """ถึงเวลา flush หรือยัง (stores = ข้อมูลที่ค้างอยู่ในหน่วยความจำของ session นี้)"""
+        if self.seconds is not None and session_elapsed >= self.seconds:
+            return True
+        if self.rows is not None and sum(len(store) for store in stores) >= self.rows:
+            return True
+        if self.nbytes is not None and sum(_data_bytes(store) for store in stores) >= self.nbytes:
+            return True
+        return False
+
+    def segments(self, path):
+        """SegmentSet ของ path หรือ None (ไม่หมุน/ไม่บีบอัด = เขียนต่อไฟล์เดียวแบบเดิม)"""
+        if path is None or (self.rotate_bytes is None and self.compress is None):
+            return None
+        return SegmentSet(path, self.rotate_bytes, self.compress)
+
+    def describe(self):
+        parts = []
+        if self.seconds is not None:
+            parts.append(f"every {self.seconds:g} s")
+        if self.rows is not None:
+            parts.append(f"{self.rows} rows")
+        if self.nbytes is not None:
+            parts.append(f"{self.nbytes / 2**20:g} MB")
+        text = "flush at " + " / ".join(parts or ["end of run"])
+        if self.rotate_bytes is not None:
+            text += f", rotate at {self.rotate_bytes / 2**20:g} MB"
+        if self.compress:
+            text += f", {self.compress} closed segments"
+        return text
+
+
+class SegmentSet:
+    """segment ของไฟล์ Auto-Save 1 ชุด (สถานะอยู่ใน manifest)"""
+
+    def __init__(self, path, rotate_bytes=None, compress=None):
+        self.path = path
+        self.rotate_bytes = rotate_bytes
+        self.compress = compress
+        self.root, self.ext = os.path.splitext(path)
+        self.manifest_path = self.root + MANIFEST_SUFFIX
+
+    def _load(self):
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"version": 1, "segments": []}
+
+    def _save(self, manifest):
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(tmp, self.manifest_path)
+
+    def _open_entry(self, manifest, path):
+        segments = manifest["segments"]
+        if segments and not segments[-1]["closed"] and segments[-1]["file"] == os.path.basename(path):
+            return segments[-1]
+        return None
+
+    def active(self):
+        """path ของ segment ที่เขียนต่อได้ (segment ล่าสุดปิดแล้ว -> ชื่อ segment ถัดไป)"""
+        segments = self._load()["segments"]
+        if segments and not segments[-1]["closed"]:
+            return os.path.join(os.path.dirname(self.path), segments[-1]["file"])
+        return f"{self.root}_part{len(segments) + 1:03d}{self.ext}"
+
+    def record(self, path, *stores):
+        """บันทึกลง manifest ว่าเพิ่งเขียน stores ลง segment path (ช่วงเวลา/จำนวนแถว/ขนาด)"""
+        manifest = self._load()
+        entry = self._open_entry(manifest, path)
+        if entry is None:
+            entry = {"file": os.path.basename(path), "start": None, "end": None,
+                     "wall_start": None, "wall_end": None, "rows": 0, "bytes": 0, "closed": False}
+            manifest["segments"].append(entry)
+        for store in stores:
+            if not store:
+                continue
+            start, end = store.value("elapsed", 0), store.value("elapsed", -1)
+            entry["start"] = start if entry["start"] is None else min(entry["start"], start)
+            entry["end"] = end if entry["end"] is None else max(entry["end"], end)
+            if store.started_at is not None:
+                # เวลาจริง (epoch) -> เทียบข้ามรอบมอนิเตอร์ได้ (elapsed เริ่มนับ 0 ใหม่ทุกรอบ)
+                entry["wall_start"] = min(x for x in (entry["wall_start"], store.started_at + start) if x is not None)
+                entry["wall_end"] = max(x for x in (entry["wall_end"], store.started_at + end) if x is not None)
+            entry["rows"] += len(store)
+        entry["bytes"] = _file_bytes(path)
+        self._save(manifest)
+
+    def full(self, path):
+        """segment นี้ใหญ่ถึงขนาดที่ต้องหมุนไฟล์หรือยัง"""
+        return self.rotate_bytes is not None and _file_bytes(path) >= self.rotate_bytes
+
+    def close(self, path):
+        """
+        ปิด segment (เรียกหลังรวมไฟล์ XLSX แล้ว): บีบอัดไฟล์หลัก + ไฟล์ _children ถ้าตั้งไว้ (เฉพาะ CSV)
+        แล้วบันทึกลง manifest -> path สุดท้ายของ segment
+        """
+        manifest = self._load()
+        entry = self._open_entry(manifest, path)
+        if entry is None:
+            return path
+        child = children_path(path)
+        if self.compress and path.lower().endswith(".csv") and os.path.exists(path):
+            path = compress_file(path, self.compress)
+            if os.path.exists(child):
+                child = compress_file(child, self.compress)
+            entry["file"] = os.path.basename(path)
+        if os.path.exists(child):
+            entry["children"] = os.path.basename(child)
+        entry["bytes"] = _file_bytes(path)
+        entry["closed"] = True
+        self._save(manifest)
+        return path
+
+
+def select_segments(manifest_path, start=None, end=None, wall=False):
+    """
+    path ของ segment ที่มีข้อมูลทับช่วง [start, end] (None = ไม่จำกัดด้านนั้น)
+    - wall=False: ช่วงเป็น elapsed วินาที / wall=True: เวลาจริง epoch วินาที
+    """
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    lo, hi = ("wall_start", "wall_end") if wall else ("start", "end")
+    folder = os.path.dirname(manifest_path)
+    paths = []
+    for entry in manifest["segments"]:
+        if entry[lo] is None:
+            continue
+        if (end is not None and entry[lo] > end) or (start is not None and entry[hi] < start):
+            continue
+        paths.append(os.path.join(folder, entry["file"]))
+    return paths
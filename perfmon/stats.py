@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""
+สถิติของ session แบบ streaming (หน่วยความจำคงที่ ไม่ต้องอ่านไฟล์ส่งออกซ้ำ)
+- Welford: count/mean/variance/min/max
+- DDSketch: quantile (median/p95/p99) ที่ความคลาดเคลื่อนสัมพัทธ์ไม่เกิน RELATIVE_ACCURACY
+  (เก็บจำนวนนับต่อ bucket แบบ log -> จำนวน bucket ขึ้นกับช่วงของค่า ไม่ใช่จำนวน sample)
+- เวลาที่ค่าอยู่เหนือ threshold (เช่น CPU >= 90%) นับจากช่วงเวลาระหว่าง sample
+- ทุกตัว merge กันได้ (รวม segment หลัง Auto-Save / หลายรอบ / หลายไฟล์) และแปลงเป็น dict (JSON) ได้
+- โหมดหลายโปรเซส (มีคอลัมน์ pid): แยกสถิติต่อ PID
+- store ที่มีคอลัมน์ interval (perfmon.adaptive): ทุก sample ถ่วงน้ำหนักด้วยช่วงเวลาที่มันครอบคลุม
+  (น้ำหนัก = interval / interval ของ sample แรก) -> mean/std/quantile เป็นแบบตามเวลา ไม่เอียงไปทางช่วงที่ sample ถี่
+"""
+
+import math
+
+RELATIVE_ACCURACY = 0.01
+MAX_BUCKETS = 2048
+QUANTILES = (0.5, 0.95, 0.99)
+DEFAULT_THRESHOLDS = {"cpu": (90.0,)}
+UNITS = {"cpu": "%", "ram": "MB", "interval": "s"}   # metric เสริม (perfmon.registry) เพิ่มหน่วยของตัวเองตอน import
+HEADLINE = ("cpu", "ram")               # metric ที่แสดงในสรุป 1 บรรทัด (ที่เหลืออยู่ใน meta)
+
+
+class Welford:
+    """ค่าเฉลี่ย/ความแปรปรวนแบบ online ถ่วงน้ำหนักได้ (West 1979, merge ด้วยสูตรของ Chan et al.)"""
+
+    __slots__ = ("count", "weight", "mean", "m2", "min", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.weight = 0.0       # ผลรวมน้ำหนัก (= count เมื่อทุก sample น้ำหนัก 1)
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, x, w=1.0):
+        self.count += 1
+        self.weight += w
+        delta = x - self.mean
+        self.mean += delta * w / self.weight
+        self.m2 += w * delta * (x - self.mean)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+
+    def merge(self, other):
+        if not other.count:
+            return
+        weight = self.weight + other.weight
+        delta = other.mean - self.mean
+        self.mean += delta * other.weight / weight
+        self.m2 += other.m2 + delta * delta * self.weight * other.weight / weight
+        self.count += other.count
+        self.weight = weight
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def std(self):
+        # แก้ bias แบบ n/(n-1) ของน้ำหนักรวม (น้ำหนัก 1 ทุกตัว -> m2 / (n - 1) ตามเดิม)
+        return math.sqrt(self.m2 / self.weight * self.count / (self.count - 1)) if self.count > 1 else 0.0
+
+    def to_dict(self):
+        return {"count": self.count, "weight": self.weight, "mean": self.mean, "m2": self.m2,
+                "min": self.min if self.count else None, "max": self.max if self.count else None}
+
+    @classmethod
+    def from_dict(cls, d):
+        w = cls()
+        w.count, w.mean, w.m2 = d["count"], d["mean"], d["m2"]
+        w.weight = d.get("weight", w.count)     # ไฟล์รุ่นก่อน: น้ำหนัก 1 ทุก sample
+        if w.count:
+            w.min, w.max = d["min"], d["max"]
+        return w
+
+
+class DDSketch:
+    """
+    quantile sketch แบบ log-bucket (DDSketch)
+    - ค่า x > 0 ลง bucket k = ceil(log_gamma(x)), gamma = (1 + a) / (1 - a)
+    - ค่า <= 0 (เช่น CPU 0%) นับแยกไว้ที่ zero_count
+    - add(x, w): นับแบบถ่วงน้ำหนัก (count = ผลรวมน้ำหนัก) สำหรับ sample ที่ครอบคลุมเวลาไม่เท่ากัน
+    - bucket เกิน max_buckets -> รวม bucket ต่ำสุดเข้าด้วยกัน (ความแม่นยำของ quantile สูงๆ ยังคงเดิม)
+    """
+
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY, max_buckets=MAX_BUCKETS):
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, x, w=1):
+        self.count += w
+        if x <= 0:
+            self.zero_count += w
+            return
+        k = math.ceil(math.log(x) / self._log_gamma)
+        bins = self.bins
+        bins[k] = bins.get(k, 0) + w
+        if len(bins) > self.max_buckets:
+            self._collapse()
+
+    def _collapse(self):
+        keys = sorted(self.bins)
+        extra = keys[:len(keys) - self.max_buckets + 1]
+        self.bins[extra[-1]] += sum(self.bins.pop(k) for k in extra[:-1])
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for k, n in other.bins.items():
+            self.bins[k] = self.bins.get(k, 0) + n
+        self.zero_count += other.zero_count
+        self.count += other.count
+        if len(self.bins) > self.max_buckets:
+            self._collapse()
+
+    def quantile(self, q):
+        """ค่าที่ quantile q (0..1), None ถ้ายังไม่มีข้อมูล"""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for k in sorted(self.bins):
+            seen += self.bins[k]
+            if seen > rank:
+                return 2 * self.gamma ** k / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+    def to_dict(self):
+        return {"relative_accuracy": self.relative_accuracy, "zero_count": self.zero_count,
+                "bins": {str(k): n for k, n in self.bins.items()}}
+
+    @classmethod
+    def from_dict(cls, d):
+        s = cls(d["relative_accuracy"])
+        s.bins = {int(k): n for k, n in d["bins"].items()}
+        s.zero_count = d["zero_count"]
+        s.count = s.zero_count + sum(s.bins.values())
+        return s
+
+
+class _Series:
+    """สถิติของ 1 series (ทั้ง run หรือ 1 PID): moments + sketch ต่อ metric + เวลาเหนือ threshold"""
+
+    def __init__(self, metrics, thresholds):
+        self.moments = {m: Welford() for m in metrics}
+        self.sketches = {m: DDSketch() for m in metrics}
+        self.above = {m: [0.0] * len(thresholds.get(m, ())) for m in metrics}
+        self.duration = 0.0
+        self.last = None        # elapsed ของ sample ล่าสุด
+
+    def merge(self, other):
+        for m, w in other.moments.items():
+            self.moments[m].merge(w)
+            self.sketches[m].merge(other.sketches[m])
+            self.above[m] = [a + b for a, b in zip(self.above[m], other.above[m])]
+        self.duration += other.duration
+        if other.last is not None and (self.last is None or other.last > self.last):
+            self.last = other.last
+
+    def to_dict(self):
+        return {"duration": self.duration, "last": self.last,
+                "moments": {m: w.to_dict() for m, w in self.moments.items()},
+                "sketches": {m: s.to_dict() for m, s in self.sketches.items()},
+                "above": self.above}
+
+
+class SessionStats:
+    """
+    สถิติของทั้ง session อัปเดตทีละ sample
+    - add(elapsed, cpu, ram) หรือ add(elapsed, pid, cpu, ram) ตามลำดับคอลัมน์ของ store
+    - thresholds: {metric: (ค่า, ...)} นับเวลาที่ค่า >= threshold
+    - metric "interval" (perfmon.adaptive) -> ทุก metric ถ่วงน้ำหนักด้วย interval ของ sample
+    - merge(other) รวมกับอีก session (PID เดียวกันรวมกัน), to_dict()/from_dict() สำหรับเก็บลงไฟล์
+    """
+
+    def __init__(self, metrics=("cpu", "ram"), pid=False, thresholds=None):
+        self.metrics = tuple(metrics)
+        self.pid = pid
+        thresholds = DEFAULT_THRESHOLDS if thresholds is None else thresholds
+        self.thresholds = {m: tuple(sorted(float(v) for v in thresholds.get(m, ()))) for m in self.metrics}
+        self.series = {}        # pid หรือ None -> _Series
+        self.weight_index = self.metrics.index("interval") if "interval" in self.metrics else None
+        self.unit = None        # interval ของ sample แรก (น้ำหนัก 1)
+
+    @classmethod
+    def for_store(cls, store, thresholds=None):
+        """stats ที่ metric ตามคอลัมน์ของ store"""
+        return cls([c for c in store.columns if c not in ("elapsed", "pid")], "pid" in store.columns, thresholds)
+
+    @classmethod
+    def from_store(cls, store, thresholds=None):
+        """คำนวณจากข้อมูลดิบที่มีอยู่แล้ว (เช่น ไฟล์ .pmlog เก่าที่ยังไม่มีสถิติ)"""
+        stats = cls.for_store(store, thresholds)
+        add = stats.add
+        for _, _, views in store.iter_chunks():
+            for values in zip(*views):
+                add(*values)
+        return stats
+
+    def _series_for(self, key):
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = _Series(self.metrics, self.thresholds)
+        return series
+
+    # ---------- เขียน ----------
+    def add(self, elapsed, *values):
+        key = None
+        if self.pid:
+            key, values = int(values[0]), values[1:]
+        series = self._series_for(key)
+        w = 1
+        if self.weight_index is not None:
+            interval = values[self.weight_index]
+            if self.unit is None:
+                self.unit = interval if interval > 0 else 1.0
+            w = interval / self.unit
+        # ช่วงเวลาของ sample นี้ = ห่างจาก sample ก่อนหน้า (sample แรกยังไม่มีช่วงเวลา)
+        dt = elapsed - series.last if series.last is not None else 0.0
+        series.last = elapsed
+        series.duration += dt
+        for m, x in zip(self.metrics, values):
+            series.moments[m].add(x, w)
+            series.sketches[m].add(x, w)
+            limits = self.thresholds[m]
+            if limits:
+                above = series.above[m]
+                for i, limit in enumerate(limits):
+                    if x >= limit:
+                        above[i] += dt
+
+    def merge(self, other):
+        """รวมสถิติของอีก session เข้ามา (threshold ต้องตรงกัน) -> คืนค่า self"""
+        if other.metrics != self.metrics or other.thresholds != self.thresholds:
+            raise ValueError("Cannot merge stats with different metrics or thresholds")
+        for key, series in other.series.items():
+            self._series_for(key).merge(series)
+        return self
+
+    # ---------- อ่าน ----------
+    def __bool__(self):
+        return bool(self.series)
+
+    def summary(self, key=None):
+        """ค่าสรุปของ 1 series: {metric: {count, mean, std, min, max, p50, p95, p99, above: {threshold: วินาที}}, duration}"""
+        return self._summarize(self.series[key])
+
+    def _summarize(self, series):
+        out = {"duration": series.duration}
+        for m in self.metrics:
+            w, sketch = series.moments[m], series.sketches[m]
+            out[m] = {"count": w.count, "mean": w.mean, "std": w.std, "min": w.min, "max": w.max,
+                      "above": dict(zip(self.thresholds[m], series.above[m]))}
+            for q in QUANTILES:
+                # ค่าจาก sketch คลาดได้ไม่เกิน RELATIVE_ACCURACY -> ไม่ให้เกินช่วง min..max จริง
+                value = sketch.quantile(q)
+                out[m][f"p{round(q * 100)}"] = None if value is None else min(max(value, w.min), w.max)
+        return out
+
+    def meta(self):
+        """ข้อมูลท้ายไฟล์ส่งออก (label -> ค่า) เช่น "CPU:" -> "mean ... / p95 ... / max ... %" """
+        meta = {}
+        for key in sorted(self.series, key=lambda k: -1 if k is None else k):
+            summary = self.summary(key)
+            prefix = "" if key is None else f"PID {key} "
+            for m in self.metrics:
+                s = summary[m]
+                if not s["count"]:
+                    continue
+                unit = UNITS.get(m, "")
+                meta[f"{prefix}{m.upper()}:"] = (
+                    f"mean {s['mean']:.2f} / std {s['std']:.2f} / median {s['p50']:.2f} / "
+                    f"p95 {s['p95']:.2f} / p99 {s['p99']:.2f} / min {s['min']:.2f} / max {s['max']:.2f} {unit}".rstrip())
+                for limit, seconds in s["above"].items():
+                    share = seconds / summary["duration"] * 100 if summary["duration"] else 0.0
+                    meta[f"{prefix}{m.upper()} >= {limit:g}{unit}:"] = f"{_format_seconds(seconds)} ({share:.1f}% of run)"
+        return meta
+
+    def headline(self):
+        """สรุป 1 บรรทัดสำหรับแสดงระหว่างมอนิเตอร์ (โหมดหลายโปรเซส: รวมทุก PID)"""
+        total = _Series(self.metrics, self.thresholds)
+        for series in self.series.values():
+            total.merge(series)
+        summary = self._summarize(total)
+        parts = []
+        for m in self.metrics:
+            s = summary[m]
+            if s["count"] and m in HEADLINE:
+                parts.append(f"{m.upper()} mean {s['mean']:.1f} / p95 {s['p95']:.1f} / max {s['max']:.1f} {UNITS.get(m, '')}".rstrip())
+        return " | ".join(parts)
+
+    def to_dict(self):
+        return {"version": 1, "metrics": list(self.metrics), "pid": self.pid, "unit": self.unit,
+                "thresholds": {m: list(v) for m, v in self.thresholds.items()},
+                "series": {"" if k is None else str(k): s.to_dict() for k, s in self.series.items()}}
+
+    @classmethod
+    def from_dict(cls, d):
+        stats = cls(d["metrics"], d["pid"], d["thresholds"])
+        stats.unit = d.get("unit")
+        for key, sd in d["series"].items():
+            series = stats._series_for(int(key) if key else None)
+            series.duration, series.last = sd["duration"], sd["last"]
+            series.moments = {m: Welford.from_dict(v) for m, v in sd["moments"].items()}
+            series.sketches = {m: DDSketch.from_dict(v) for m, v in sd["sketches"].items()}
+            series.above = {m: list(v) for m, v in sd["above"].items()}
+        return stats
+
+
+def _format_seconds(seconds):
+    s_int = int(seconds)
+    hours, remainder = divmod(s_int, 3600)
+    minutes, secs = divmod(remainder, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}"
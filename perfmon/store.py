@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+ที่เก็บ sample แบบคอลัมน์ (columnar) แทน list ของ tuple (elapsed, cpu, ram, source)
+- แต่ละคอลัมน์เป็น array('d') แบ่งเป็น chunk ขนาดคงที่ (จองไว้ล่วงหน้า ไม่ resize)
+  -> 8 bytes ต่อค่า และ memoryview ของ chunk ใช้ได้โดยไม่ต้องคัดลอก
+- source เก็บครั้งเดียวต่อ session (intern) ไม่ต้องพ่วงไปกับทุกแถว
+- วนลูป (for row in store) ยังได้ tuple (elapsed, cpu, ram, source) เหมือนเดิม
+  เพื่อให้โค้ด export เดิมใช้งานได้ทันที
+- ถ้ามีคอลัมน์ "pid" (โหมดหลายโปรเซส) source จะดูจาก store.sources ตาม PID
+  และแถวจะเป็น (elapsed, cpu, ram, source, pid)
+- store.children (โหมด process tree) เก็บ series รายโปรเซสลูกแยกจากค่ารวม
+  และเดินตามแถวหลักไปด้วยเสมอ (empty_like/extend/clear)
+- คอลัมน์เสริม (perfmon.registry เช่น io_read, uss) ต่อท้าย cpu/ram -> แถวเป็น (elapsed, cpu, ram, ..., source)
+"""
+
+import sys
+from array import array
+
+CHUNK_ROWS = 4096
+COLUMNS = ("elapsed", "cpu", "ram")
+MULTI_COLUMNS = ("elapsed", "pid", "cpu", "ram")
+
+# ชื่อหัวตารางของแต่ละคอลัมน์ (ใช้ร่วมกันทุก exporter)
+COLUMN_LABELS = {
+    "elapsed": "Time (H:MM:SS.ms)",
+    "cpu": "CPU (%)",
+    "ram": "RAM (MB)",
+    "pid": "PID",
+    # คอลัมน์ของ rollup tier (perfmon.rollup)
+    "count": "Samples",
+    "cpu_min": "CPU min (%)",
+    "cpu_max": "CPU max (%)",
+    "cpu_mean": "CPU mean (%)",
+    "ram_min": "RAM min (MB)",
+    "ram_max": "RAM max (MB)",
+    "ram_mean": "RAM mean (MB)",
+    # คอลัมน์ของ series ต้นทุนตัวมอนิเตอร์เอง (perfmon.overhead)
+    "loop_ms": "Loop max (ms)",
+    "queue": "Writer queue",
+    "backlog": "Backlog (rows)",
+}
+
+
+def column_label(name):
+    """หัวตารางของคอลัมน์ (คอลัมน์ rollup ของ metric เสริม "<metric>_min" -> "<label> min (หน่วย)")"""
+    label = COLUMN_LABELS.get(name)
+    if label is not None:
+        return label
+    base, _, stat = name.rpartition("_")
+    if stat in ("min", "max", "mean") and base in COLUMN_LABELS:
+        text, paren, unit = COLUMN_LABELS[base].partition(" (")
+        return f"{text} {stat}{paren}{unit}"
+    return name
+
+
+def _new_chunk():
+    return array('d', bytes(8 * CHUNK_ROWS))
+
+
+class SampleStore:
+    """คอลัมน์ float64 ที่โตได้เรื่อยๆ + source ของ session"""
+
+    def __init__(self, source="", columns=COLUMNS):
+        self.columns = tuple(columns)
+        self._col_index = {name: i for i, name in enumerate(self.columns)}
+        self._source = sys.intern(source or "")
+        self._pid_index = self._col_index.get("pid")
+        self.sources = {}           # PID -> source (ใช้เมื่อมีคอลัมน์ pid)
+        self.children = None        # SampleStore ของโปรเซสลูก (โหมด process tree)
+        self.meta = {}              # ข้อมูลท้ายไฟล์ส่งออก (label -> ค่า) เช่น เวลาเริ่ม/สถิติการ sample
+        self.started_at = None      # เวลาจริง (epoch วินาที) ณ elapsed = 0 (anchor ของนาฬิกา monotonic)
+        self.rollup = None          # perfmon.rollup.Rollup ของทั้ง run (ไม่ถูกล้างตอน Auto-Save)
+        self.stats = None           # perfmon.stats.SessionStats ของทั้ง run (ไม่ถูกล้างตอน Auto-Save)
+        self.markers = []           # [(elapsed, kind, label, value)] event จากสคริปต์เทรน (perfmon.markers) ของทั้ง run
+        self.overhead = None        # SampleStore ต้นทุนของตัวมอนิเตอร์เอง (perfmon.overhead) ของทั้ง run
+        self.threads = None         # SampleStore CPU ราย thread (perfmon.breakdown) ของทั้ง run
+        self.cores = None           # SampleStore CPU ราย core (perfmon.breakdown) ของทั้ง run
+        self.clear()
+
+    # ---------- source ----------
+    @property
+    def source(self):
+        return self._source
+
+    @source.setter
+    def source(self, value):
+        self._source = sys.intern(value or "")
+
+    def register_source(self, pid, source):
+        """จำ source ของ PID ไว้ครั้งเดียว (โหมดหลายโปรเซส)"""
+        self.sources[int(pid)] = sys.intern(source or "")
+
+    def row_source(self, index):
+        if self._pid_index is None:
+            return self._source
+        return self.sources.get(int(self.value("pid", index)), self._source)
+
+    def fields(self):
+        """ลำดับฟิลด์ของแถวที่ได้จากการวนลูป/ส่งออก"""
+        fields = [c for c in self.columns if c != "pid"] + ["source"]
+        if self._pid_index is not None:
+            fields.append("pid")
+        return fields
+
+    def header(self):
+        """หัวตารางสำหรับไฟล์ส่งออก/ตาราง ตามคอลัมน์ที่มีจริง"""
+        return ["Source" if f == "source" else column_label(f) for f in self.fields()]
+
+    def track_children(self):
+        """เปิดการเก็บ series รายโปรเซสลูก -> คืนค่า store ของลูก"""
+        if self.children is None:
+            self.children = SampleStore(self._source, MULTI_COLUMNS)
+            self.children.started_at = self.started_at
+        return self.children
+
+    def empty_like(self):
+        """store ว่างที่มีคอลัมน์/source เดียวกัน (ใช้ dict sources ร่วมกัน)"""
+        other = SampleStore(self._source, self.columns)
+        other.sources = self.sources
+        other.started_at = self.started_at
+        if self.children is not None:
+            other.children = self.children.empty_like()
+        return other
+
+    # ---------- เขียน ----------
+    def clear(self):
+        # ใช้ chunk แรกซ้ำ (ไม่จองใหม่ทุกครั้ง) -> memoryview ที่ได้จาก iter_chunks ใช้ได้จนถึง clear() เท่านั้น
+        chunks = getattr(self, "_chunks", None)
+        if chunks:
+            self._chunks = [[col[0]] for col in chunks]
+        else:
+            self._chunks = [[_new_chunk()] for _ in self.columns]
+        self._fill = 0      # จำนวนแถวใน chunk สุดท้าย
+        self._length = 0
+        if getattr(self, "children", None) is not None:
+            self.children.clear()
+
+    def append(self, *values):
+        """เพิ่ม 1 แถว (ค่าเรียงตาม self.columns)"""
+        if self._fill == CHUNK_ROWS:
+            for col in self._chunks:
+                col.append(_new_chunk())
+            self._fill = 0
+        fill = self._fill
+        for col, value in zip(self._chunks, values):
+            col[-1][fill] = value
+        self._fill = fill + 1
+        self._length += 1
+
+    def extend(self, other):
+        """ต่อท้ายด้วยข้อมูลจาก store อื่น (คัดลอกทีละช่วงของ chunk ไม่ใช่ทีละแถว)"""
+        self.sources.update(other.sources)
+        if other.children is not None:
+            self.track_children().extend(other.children)
+        for start, stop, views in other.iter_chunks():
+            pos = start
+            while pos < stop:
+                if self._fill == CHUNK_ROWS:
+                    for col in self._chunks:
+                        col.append(_new_chunk())
+                    self._fill = 0
+                n = min(stop - pos, CHUNK_ROWS - self._fill)
+                offset = pos - start
+                for col, view in zip(self._chunks, views):
+                    memoryview(col[-1])[self._fill:self._fill + n] = view[offset:offset + n]
+                self._fill += n
+                self._length += n
+                pos += n
+
+    # ---------- อ่าน ----------
+    def __len__(self):
+        return self._length
+
+    def __bool__(self):
+        return self._length > 0
+
+    def _locate(self, index):
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("SampleStore index out of range")
+        return divmod(index, CHUNK_ROWS)
+
+    def value(self, name, index):
+        chunk, offset = self._locate(index)
+        return self._chunks[self._col_index[name]][chunk][offset]
+
+    def _row(self, values):
+        i = self._pid_index
+        if i is None:
+            return values + (self._source,)
+        pid = int(values[i])
+        return values[:i] + values[i + 1:] + (self.sources.get(pid, self._source), pid)
+
+    def __getitem__(self, index):
+        chunk, offset = self._locate(index)
+        return self._row(tuple(col[chunk][offset] for col in self._chunks))
+
+    def __iter__(self):
+        if self._pid_index is None:
+            source = self._source
+            for _, _, views in self.iter_chunks():
+                for values in zip(*views):
+                    yield values + (source,)
+            return
+        for _, _, views in self.iter_chunks():
+            for values in zip(*views):
+                yield self._row(values)
+
+    def iter_chunks(self, start=0, stop=None):
+        """
+        วนทีละ chunk: (start_row, stop_row, [memoryview ต่อคอลัมน์])
+        memoryview ชี้ไปที่ข้อมูลจริงโดยไม่คัดลอก
+        start/stop: เฉพาะช่วงแถว [start:stop] -> ระบุ stop = len(store) ที่อ่านไว้ก่อน
+        แล้วอ่านได้ขณะที่อีก thread ยัง append อยู่ (แถวที่ < stop เขียนเสร็จแล้ว และ chunk ไม่ถูกย้าย)
+        """
+        if stop is None:
+            stop = self._length
+        for i in range(start // CHUNK_ROWS, (stop + CHUNK_ROWS - 1) // CHUNK_ROWS):
+            lo = max(start, i * CHUNK_ROWS)
+            hi = min(stop, (i + 1) * CHUNK_ROWS)
+            if hi <= lo:
+                continue
+            offset = i * CHUNK_ROWS
+            yield lo, hi, [memoryview(col[i])[lo - offset:hi - offset] for col in self._chunks]
+
+    def column(self, name, start=0, stop=None):
+        """คืนค่าคอลัมน์ (หรือช่วง [start:stop]) เป็น array('d') ใหม่"""
+        length = self._length
+        if stop is None or stop > length:
+            stop = length
+        if start < 0:
+            start = max(0, length + start)
+        out = array('d')
+        if start >= stop:
+            return out
+        col = self._chunks[self._col_index[name]]
+        first, last = start // CHUNK_ROWS, (stop - 1) // CHUNK_ROWS
+        for i in range(first, last + 1):
+            lo = start - i * CHUNK_ROWS if i == first else 0
+            hi = stop - i * CHUNK_ROWS if i == last else CHUNK_ROWS
+            out.extend(col[i][lo:hi])
+        return out
+
+    def last(self, name):
+        return self.value(name, -1)
+
+    def mean(self, name):
+        """ค่าเฉลี่ยของคอลัมน์ (0 ถ้ายังไม่มีข้อมูล)"""
+        if not self._length:
+            return 0
+        col = self._chunks[self._col_index[name]]
+        total = 0.0
+        for i, chunk in enumerate(col):
+            count = CHUNK_ROWS if i < len(col) - 1 else self._fill
+            total += sum(memoryview(chunk)[:count])
+        return total / self._length
+
+    @property
+    def nbytes(self):
+        return sum(len(col) for col in self._chunks) * CHUNK_ROWS * 8
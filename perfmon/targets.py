@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+ติดตามหลายโปรเซสพร้อมกัน (multi-target)
+- find_training_processes(): หาโปรเซส MATLAB/Python ที่เข้าเงื่อนไข "ทั้งหมด" (ไม่ใช่แค่ตัวแรก)
+- TargetSet: เก็บวงจรชีวิตของแต่ละ PID (เข้า/ออกกลาง session ได้)
+  และอ่าน CPU/RAM ของทุกโปรเซสใน loop เดียว (ไม่มี thread ต่อโปรเซส)
+- tree=True: ค่าของแต่ละเป้าหมายเป็นผลรวมของทั้ง process tree (ดู perfmon.tree)
+"""
+
+import os
+
+import psutil
+
+from .detector import get_detector
+from .sampler import open_sampler
+from .tree import ProcessTree
+
+PID_FILE_PATH = "C:\\temp\\training_pid.txt"
+
+
+def find_training_processes(pid_file_path=PID_FILE_PATH):
+    """คืนค่า list ของ (pid, source) ของโปรเซสเทรนทั้งหมดที่พบ"""
+    found = []
+    seen = set()
+
+    # --- MATLAB (ผ่านไฟล์ PID) ---
+    try:
+        if os.path.exists(pid_file_path):
+            with open(pid_file_path, "r") as f:
+                pid = int(f.read().strip())
+            proc = psutil.Process(pid)
+            if proc.is_running():
+                found.append((pid, f"MATLAB (PID: {pid}) CMD: {' '.join(proc.cmdline())}"))
+                seen.add(pid)
+    except (FileNotFoundError, ValueError, psutil.NoSuchProcess, psutil.AccessDenied):
+        pass
+
+    # --- Python ที่รันไฟล์ .py (ตรวจเฉพาะโปรเซสใหม่ ผ่าน detector) ---
+    for pid, cmdline_args in get_detector().matches():
+        if pid not in seen:
+            found.append((pid, f"Python: {' '.join(map(str, cmdline_args))}"))
+    return found
+
+
+class Target:
+    """สถานะของโปรเซสเป้าหมาย 1 ตัว"""
+
+    def __init__(self, pid, source, joined, tree=False):
+        self.pid = pid
+        self.source = source
+        self.joined = joined        # elapsed (วินาที) ตอนเริ่มติดตาม
+        self.left = None            # elapsed ตอนโปรเซสจบ (None = ยังทำงานอยู่)
+        self.tree = ProcessTree(pid) if tree else None
+        self.sampler = open_sampler(pid) if self.tree is None else None
+
+
+class TargetSet:
+    """ชุดโปรเซสเป้าหมาย: sync() รับผลการค้นหาใหม่, sample() อ่านค่าทุกตัวในรอบเดียว"""
+
+    def __init__(self, tree=False):
+        self.targets = {}           # pid -> Target (รวมตัวที่จบไปแล้ว)
+        self.active = {}            # pid -> Target ที่ยังทำงานอยู่
+        self.tree = tree
+        self.children = []          # [(child_pid, cpu, ram)] ของ sample() ล่าสุด (โหมด tree)
+
+    def sync(self, found, elapsed):
+        """เพิ่มโปรเซสที่เพิ่งพบ -> คืนค่า list ของ Target ที่เข้าร่วมใหม่"""
+        joined = []
+        # PID น้อยก่อน -> parent มักถูกเพิ่มก่อนลูกของมัน
+        for pid, source in sorted(found):
+            if pid in self.active:
+                continue
+            # โหมด tree: ลูกของเป้าหมายที่มีอยู่แล้ว (เช่น worker ที่ fork มา) ไม่นับเป็นเป้าหมายซ้ำ
+            if self.tree and any(pid in t.tree.members for t in self.active.values()):
+                continue
+            old = self.targets.get(pid)
+            if old is not None and old.left is None:
+                continue
+            try:
+                target = Target(pid, source, elapsed, tree=self.tree)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+            self.targets[pid] = target
+            self.active[pid] = target
+            joined.append(target)
+        return joined
+
+    def sample(self, elapsed):
+        """
+        อ่าน CPU/RAM ของทุกโปรเซสที่ยังทำงาน
+        :returns: (samples, left) -> samples = [(pid, cpu, ram)], left = [Target ที่เพิ่งจบ]
+        โหมด tree: ค่าใน samples เป็นผลรวมทั้ง tree และค่ารายลูกอยู่ใน self.children
+        """
+        samples, left = [], []
+        self.children = []
+        for pid, target in list(self.active.items()):
+            try:
+                if target.tree is not None:
+                    cpu, ram, children = target.tree.sample()
+                    samples.append((pid, cpu, ram))
+                    self.children.extend(children)
+                    continue
+                # zombie (จบแล้วแต่ parent ยังไม่ reap) นับว่าออกแล้ว (sampler raise ให้)
+                cpu, ram = target.sampler.sample()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                (target.tree or target.sampler).close()
+                target.left = elapsed
+                del self.active[pid]
+                left.append(target)
+                continue
+            samples.append((pid, cpu, ram))
+        return samples, left
+
+    def child_sources(self):
+        """PID -> command line ของโปรเซสลูกทุกตัวที่เคยพบ (โหมด tree)"""
+        sources = {}
+        for target in self.targets.values():
+            if target.tree is not None:
+                sources.update(target.tree.sources)
+        return sources
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+รวม CPU/RAM ของโปรเซสเป้าหมาย + ลูกหลานทั้งหมด (process tree)
+- งานอย่าง PyTorch DataLoader (num_workers>0), multiprocessing pool, MATLAB parallel workers
+  ใช้ CPU/RAM ส่วนใหญ่ในโปรเซสลูก ถ้าวัดแค่ parent จะได้ค่าต่ำกว่าจริงหลายเท่า
+- refresh(): ค้นหาลูกหลานใหม่ (ต้องไล่ทุกโปรเซสในเครื่อง -> ทำเป็นระยะ ไม่ใช่ทุก tick)
+- sample(): อ่านทุกสมาชิกใน pass เดียว ผ่าน sampler ต่อโปรเซส (ดู perfmon.sampler)
+  ลูกที่เกิดกลาง session นับ CPU ตั้งแต่ตอนเกิด จึงไม่เสียช่วงแรกของ worker
+หมายเหตุ: RAM รวมเป็นผลรวม RSS ซึ่งนับหน้าหน่วยความจำที่แชร์กัน (fork/COW) ซ้ำได้
+"""
+
+import os
+import time
+
+import psutil
+
+from .sampler import open_sampler
+
+
+class ProcessTree:
+    REFRESH_INTERVAL = 1.0      # วินาทีระหว่างการค้นหาลูกหลานใหม่
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.root = psutil.Process(pid)
+        self.members = {}       # pid -> sampler
+        self.sources = {}       # child pid -> command line
+        self._last_refresh = 0.0
+        self._add(self.root, since_birth=False)
+        self.refresh(since_birth=False)
+
+    def _add(self, proc, since_birth):
+        try:
+            # ลูกที่เพิ่งเกิด: ตั้งต้นที่ CPU = 0 ณ เวลาเกิด
+            sampler = open_sampler(proc.pid, since_birth)
+            if proc.pid != self.pid:
+                self.sources[proc.pid] = ' '.join(proc.cmdline()) or proc.name()
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            return
+        self.members[proc.pid] = sampler
+
+    def refresh(self, since_birth=True):
+        """เพิ่มลูกหลานที่เกิดใหม่เข้าในชุดที่ติดตาม"""
+        self._last_refresh = time.time()
+        try:
+            children = self.root.children(recursive=True)
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            return
+        for child in children:
+            if child.pid not in self.members:
+                self._add(child, since_birth)
+
+    def close(self):
+        """ปิด fd ของ sampler ทุกตัว"""
+        for sampler in self.members.values():
+            sampler.close()
+        self.members.clear()
+
+    @property
+    def child_count(self):
+        return len(self.members) - 1
+
+    def sample(self):
+        """
+        อ่านทุกสมาชิกในรอบเดียว
+        :returns: (cpu รวม, ram รวม (MB), [(child_pid, cpu, ram), ...])
+        :raises psutil.NoSuchProcess: เมื่อโปรเซสหลักจบแล้ว
+        """
+        if time.time() - self._last_refresh >= self.REFRESH_INTERVAL:
+            self.refresh()
+
+        total_cpu = total_ram = 0.0
+        children, gone = [], []
+        for pid, sampler in self.members.items():
+            try:
+                cpu, ram = sampler.sample()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                gone.append(pid)
+                continue
+            total_cpu += cpu
+            total_ram += ram
+            if pid != self.pid:
+                children.append((pid, cpu, ram))
+
+        for pid in gone:
+            self.members.pop(pid).close()
+        if self.pid in gone:
+            raise psutil.NoSuchProcess(self.pid)
+        return total_cpu, total_ram, children
+
+
+def children_path(path):
+    """path ของไฟล์ series รายโปรเซสลูก -> <ชื่อเดิม>_children.<นามสกุลเดิม>"""
+    root, ext = os.path.splitext(path)
+    return f"{root}_children{ext}"
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+thread เขียนไฟล์แยกจาก loop การ sample (Auto-Save CSV/XLSX)
+- loop การ sample ส่งงานผ่าน submit() แบบไม่รอ: ส่ง SampleStore ทั้งก้อน (ไม่คัดลอก)
+  แล้วเก็บต่อใน store ใหม่ -> การจัดรูปแบบข้อความและ I/O เกิดใน thread นี้ทั้งหมด
+  จังหวะการ sample จึงไม่ขึ้นกับความช้าของดิสก์/ไฟล์ XLSX
+- คิวมีขนาดจำกัด (QUEUE_SIZE งาน): เต็ม -> รอได้ไม่เกิน put_timeout แล้วทิ้งงานนั้น
+  และนับไว้ (dropped / dropped_rows) แทนการบล็อก loop การ sample
+  (ข้อมูลทุกแถวยังอยู่ในไฟล์บันทึกหลัก .pmlog แปลงใหม่ได้ด้วย -convert)
+- งานรันตามลำดับที่ส่ง, exception หรือค่าคืน False นับเป็น errors (thread ไม่ตาย)
+"""
+
+import queue
+import threading
+import time
+
+QUEUE_SIZE = 4
+
+
+class BackgroundWriter:
+    def __init__(self, maxsize=QUEUE_SIZE, put_timeout=0.0, name="perfmon-writer"):
+        self.maxsize = maxsize
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize)
+        self.submitted = 0
+        self.written = 0
+        self.errors = 0
+        self.dropped = 0
+        self.dropped_rows = 0
+        self.max_depth = 0          # จำนวนงานค้างในคิวสูงสุด
+        self.max_latency = 0.0      # วินาทีของงานที่ใช้เวลานานที่สุด
+        self.last_error = None
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args, rows=0):
+        """
+        ส่งงาน fn(*args) เข้าคิว (rows = จำนวนแถวของงาน ใช้นับตอนทิ้ง)
+        :returns: True ถ้ารับงาน, False ถ้าคิวเต็มและงานถูกทิ้ง
+        """
+        try:
+            if self.put_timeout > 0:
+                self._queue.put((fn, args), timeout=self.put_timeout)
+            else:
+                self._queue.put_nowait((fn, args))
+        except queue.Full:
+            self.dropped += 1
+            self.dropped_rows += rows
+            return False
+        self.submitted += 1
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+        return True
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                fn, args = item
+                start = time.perf_counter()
+                try:
+                    ok = fn(*args) is not False
+                except Exception as e:
+                    ok = False
+                    self.last_error = e
+                if ok:
+                    self.written += 1
+                else:
+                    self.errors += 1
+                self.max_latency = max(self.max_latency, time.perf_counter() - start)
+            finally:
+                self._queue.task_done()
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    def drain(self):
+        """รอจนงานที่ส่งไปแล้วเขียนเสร็จทั้งหมด (เช่น ก่อน final save)"""
+        self._queue.join()
+
+    def close(self):
+        """เขียนงานที่ค้างให้เสร็จแล้วหยุด thread"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def summary(self):
+        """ข้อความสรุป 1 บรรทัด (แสดงผล/ท้ายไฟล์ส่งออก)"""
+        return (f"{self.written} batches written, {self.errors} failed, "
+                f"{self.dropped} dropped ({self.dropped_rows} rows), "
+                f"max write {self.max_latency:.2f} s, max queue {self.max_depth}/{self.maxsize}")
+
+    def meta(self):
+        """ข้อมูลท้ายไฟล์ส่งออก (label -> ค่า)"""
+        return {"Auto-save writer:": self.summary()}
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+เขียนไฟล์ XLSX แบบ append โดยไม่ต้อง load_workbook/save ทั้งไฟล์ทุกรอบ
+- ทุกครั้งที่ flush จะเขียนเป็นไฟล์ segment เล็กๆ (write-only) ในโฟลเดอร์ข้างไฟล์ปลายทาง
+  -> ต้นทุนต่อ flush คงที่ ไม่โตตามขนาดไฟล์
+- ตอนจบ (finalize) ค่อยรวมไฟล์เดิม + segment ทั้งหมดเป็นไฟล์เดียวแบบ streaming
+- ขึ้น sheet ใหม่อัตโนมัติก่อนถึงขีดจำกัด 1,048,576 แถวของ Excel
+- ไฟล์หลักเดิมอ่านไม่ได้ (เสีย/ไม่ใช่ XLSX) -> ย้ายไปเป็น .bak แล้วแจ้งเตือน ไม่เขียนทับ
+"""
+
+import glob
+import os
+
+from openpyxl import Workbook, load_workbook
+
+EXCEL_MAX_ROWS = 1048576
+HEADER = ["Time (H:MM:SS.ms)", "CPU (%)", "RAM (MB)", "Source"]
+
+
+def _norm(x):
+    return str(x or "").replace(", ", ",").strip()
+
+
+class _SheetRoller:
+    """เขียนแถวลง workbook แบบ write-only และขึ้น sheet ใหม่ (พร้อมหัวตาราง) เมื่อเต็ม"""
+
+    def __init__(self, wb, header, title, max_rows=EXCEL_MAX_ROWS):
+        self.wb = wb
+        self.header = list(header) if header else None
+        self.title = title
+        self.max_rows = max_rows
+        self.index = 0
+        self.ws = None
+        self.rows = 0
+        self._new_sheet()
+
+    def _new_sheet(self):
+        self.index += 1
+        name = self.title if self.index == 1 else f"{self.title}_{self.index}"
+        self.ws = self.wb.create_sheet(name[:31])
+        self.rows = 0
+        if self.header:
+            self.ws.append(self.header)
+            self.rows = 1
+
+    def append(self, row):
+        if self.rows >= self.max_rows:
+            self._new_sheet()
+        self.ws.append(list(row))
+        self.rows += 1
+
+
+def write_xlsx(path, rows, header=HEADER, footer=None, title="Monitoring_Log",
+               max_rows=EXCEL_MAX_ROWS):
+    """
+    เขียนไฟล์ XLSX ใหม่ทั้งไฟล์แบบ streaming (write-only)
+    - rows: iterable ของแถวที่จัดรูปแบบแล้ว
+    - footer: list ของแถวท้ายไฟล์ (จะเว้น 1 บรรทัดก่อนเขียน)
+    """
+    wb = Workbook(write_only=True)
+    roller = _SheetRoller(wb, header, title, max_rows)
+    for row in rows:
+        roller.append(row)
+    if footer:
+        roller.append([])
+        for row in footer:
+            roller.append(row)
+    wb.save(path)
+
+
+class XlsxAppendSink:
+    """
+    ปลายทาง XLSX แบบ append-only
+    - append(rows): เขียน segment ใหม่ 1 ไฟล์ (ไม่แตะไฟล์หลัก)
+    - finalize(footer): รวม segment ทั้งหมดเข้าไฟล์หลัก แล้วลบ segment ทิ้ง
+    ถ้าโปรแกรมล่มกลางทาง segment ที่ค้างอยู่จะถูกรวมในการ finalize ครั้งถัดไปของ path เดิม
+    """
+
+    def __init__(self, path, header=HEADER):
+        self.path = path
+        self.header = list(header)
+        self.segment_dir = path + ".segments"
+
+    def _segments(self):
+        return sorted(glob.glob(os.path.join(self.segment_dir, "seg_*.xlsx")))
+
+    def has_pending(self):
+        return bool(self._segments())
+
+    def append(self, rows):
+        rows = list(rows)
+        if not rows:
+            return
+        os.makedirs(self.segment_dir, exist_ok=True)
+        segments = self._segments()
+        index = int(os.path.basename(segments[-1])[4:10]) + 1 if segments else 1
+        seg_path = os.path.join(self.segment_dir, f"seg_{index:06d}.xlsx")
+        tmp_path = seg_path + ".tmp"
+
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Segment")
+        for row in rows:
+            ws.append(list(row))
+        wb.save(tmp_path)
+        # rename หลังเขียนเสร็จ -> ไม่มี segment ครึ่งๆ กลางๆ ถ้าล่มระหว่างเขียน
+        os.replace(tmp_path, seg_path)
+
+    def _existing_rows(self):
+        """อ่านแถวจากไฟล์หลักเดิม (ถ้ามี) แบบ read-only โดยข้ามแถวหัวตาราง"""
+        header_norm = [_norm(h) for h in self.header]
+        wb = load_workbook(self.path, read_only=True)
+        try:
+            for ws in wb.worksheets:
+                for values in ws.iter_rows(values_only=True):
+                    values = list(values)
+                    while values and values[-1] is None:
+                        values.pop()
+                    if [_norm(v) for v in values[:len(header_norm)]] == header_norm:
+                        continue
+                    yield values
+        finally:
+            wb.close()
+
+    def _move_aside(self, error):
+        """ไฟล์หลักเดิมอ่านไม่ได้ -> เปลี่ยนชื่อเป็น <path>.bak (หรือ .N.bak) เก็บไว้ แทนการเขียนทับ"""
+        backup = self.path + ".bak"
+        n = 1
+        while os.path.exists(backup):
+            backup = f"{self.path}.{n}.bak"
+            n += 1
+        os.replace(self.path, backup)
+        print(f"⚠️ Cannot read {os.path.basename(self.path)} ({error}); moved it to {os.path.basename(backup)}")
+
+    def _segment_rows(self, segments):
+        for seg_path in segments:
+            wb = load_workbook(seg_path, read_only=True)
+            try:
+                for ws in wb.worksheets:
+                    for values in ws.iter_rows(values_only=True):
+                        yield list(values)
+            finally:
+                wb.close()
+
+    def finalize(self, footer=None):
+        """รวมไฟล์เดิม + segment ทั้งหมด (+ footer) เป็นไฟล์ XLSX เดียว"""
+        segments = self._segments()
+        if not segments and not footer:
+            return
+
+        title = "Monitoring_Log"
+        sources = []
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            try:
+                wb = load_workbook(self.path, read_only=True)
+                title = wb.sheetnames[0] if wb.sheetnames else title
+                wb.close()
+            except Exception as e:
+                # ย้ายไม่ได้ (เช่น ไม่มีสิทธิ์) -> raise ต่อ, segment ยังอยู่ให้ finalize ใหม่ได้
+                self._move_aside(e)
+            else:
+                sources.append(self._existing_rows())
+        sources.append(self._segment_rows(segments))
+
+        def all_rows():
+            for src in sources:
+                yield from src
+
+        tmp_path = self.path + ".tmp.xlsx"
+        write_xlsx(tmp_path, all_rows(), header=self.header, footer=footer, title=title)
+        os.replace(tmp_path, self.path)
+
+        for seg_path in segments:
+            try:
+                os.remove(seg_path)
+            except OSError:
+                pass
+        try:
+            os.rmdir(self.segment_dir)
+        except OSError:
+            pass
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""ให้ import perfmon ได้เมื่อรัน pytest จากโฟลเดอร์ใดก็ได้"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+perfmon.binlog: อ่านกลับได้ครบ และกู้ไฟล์ที่ถูกตัดกลางคัน (โปรแกรมล่ม) ได้ถึง record สมบูรณ์ตัวสุดท้าย
+"""
+
+import os
+
+import pytest
+
+from perfmon.binlog import BinLogWriter, read_arrays, read_log, recover
+from perfmon.stats import SessionStats
+from perfmon.store import COLUMNS, MULTI_COLUMNS
+
+SOURCE = "Python: train.py --epochs 3"
+WIDTH = len(COLUMNS) * 8        # ขนาด record (bytes)
+
+
+def rows(n, start=0.0):
+    return [(start + i * 0.1, float(i % 100) + 0.5, 2048.0 + i) for i in range(n)]
+
+
+def write_log(path, data, **frames):
+    log = BinLogWriter(path, COLUMNS, SOURCE)
+    for row in data:
+        log.append(*row)
+    if "meta" in frames:
+        log.write_meta(frames["meta"])
+    if "stats" in frames:
+        log.write_stats(frames["stats"])
+    if "markers" in frames:
+        log.write_markers(frames["markers"])
+    log.close()
+    return os.path.getsize(path)
+
+
+def truncate(path, size):
+    with open(path, "r+b") as f:
+        f.truncate(size)
+
+
+def stored_rows(store):
+    return [row[:-1] for row in store]
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "run.pmlog")
+    data = rows(500)
+    stats = SessionStats()
+    for row in data:
+        stats.add(*row)
+    markers = [(1.5, "epoch", "epoch 1", 1.0), (3.0, "scalar", "loss", 0.25)]
+    write_log(path, data, meta={"Sampling:": "0.1 s"}, stats=stats, markers=markers)
+
+    store = read_log(path)
+    assert store.columns == COLUMNS
+    assert store.source == SOURCE
+    assert stored_rows(store) == data
+    assert store.meta["Sampling:"] == "0.1 s"
+    assert store.markers == markers
+    assert store.stats.summary() == stats.summary()
+
+
+def test_multi_pid_sources(tmp_path):
+    path = str(tmp_path / "multi.pmlog")
+    log = BinLogWriter(path, MULTI_COLUMNS, "multi")
+    log.register_source(101, "Python: a.py")
+    log.register_source(101, "Python: a.py")     # ครั้งเดียวต่อ PID
+    log.register_source(202, "Python: b.py")
+    for i in range(10):
+        log.append(i * 0.1, 101, 1.0, 10.0)
+        log.append(i * 0.1, 202, 2.0, 20.0)
+    log.close()
+
+    store = read_log(path)
+    assert len(store) == 20
+    assert store.sources == {101: "Python: a.py", 202: "Python: b.py"}
+    assert store.row_source(1) == "Python: b.py"
+
+
+@pytest.mark.parametrize("cut", [1, WIDTH // 2, WIDTH - 1])
+def test_truncated_mid_record(tmp_path, cut):
+    path = str(tmp_path / "run.pmlog")
+    data = rows(200)
+    size = write_log(path, data)
+    truncate(path, size - cut)
+
+    assert stored_rows(read_log(path)) == data[:-1]
+    assert recover(path) == WIDTH - cut
+    assert os.path.getsize(path) == size - WIDTH
+
+
+@pytest.mark.parametrize("keep", [WIDTH // 2, WIDTH, WIDTH + 3])
+def test_truncated_mid_frame(tmp_path, keep):
+    path = str(tmp_path / "run.pmlog")
+    data = rows(200)
+    log = BinLogWriter(path, COLUMNS, SOURCE)
+    for row in data:
+        log.append(*row)
+    log.flush()
+    frame_start = os.path.getsize(path)
+    log.write_meta({"note": "x" * 200})     # frame ยาวหลาย record -> ตัดในหัว frame / ใน payload
+    log.close()
+    assert os.path.getsize(path) > frame_start + keep
+    truncate(path, frame_start + keep)
+
+    store = read_log(path)
+    assert stored_rows(store) == data
+    assert "note" not in store.meta
+    recover(path)
+    assert os.path.getsize(path) == frame_start
+
+
+def test_zero_filled_tail(tmp_path):
+    # ไฟล์ที่ระบบจองพื้นที่ไว้แต่ยังไม่ได้เขียน (ศูนย์ทั้งแถว) -> ไม่ใช่ข้อมูล
+    path = str(tmp_path / "run.pmlog")
+    data = rows(50, start=1.0)
+    size = write_log(path, data)
+    with open(path, "ab") as f:
+        f.write(b"\0" * WIDTH * 3)
+
+    assert stored_rows(read_log(path)) == data
+    assert recover(path) == WIDTH * 3
+    assert os.path.getsize(path) == size
+
+
+def test_append_second_session(tmp_path):
+    path = str(tmp_path / "run.pmlog")
+    first, second = rows(100), rows(60)     # session ใหม่เริ่มนับเวลาจาก 0
+    stats_first, stats_second = SessionStats(), SessionStats()
+    for row in first:
+        stats_first.add(*row)
+    for row in second:
+        stats_second.add(*row)
+    write_log(path, first, stats=stats_first)
+    with open(path, "ab") as f:
+        f.write(b"\x01" * 5)               # record ที่เขียนไม่ครบตอนล่ม
+
+    log = BinLogWriter(path, COLUMNS, SOURCE)
+    assert log.dropped_bytes == 5
+    for row in second:
+        log.append(*row)
+    log.write_stats(stats_second)
+    log.close()
+
+    store = read_log(path)
+    assert stored_rows(store) == first + second
+    assert store.stats.summary() == SessionStats().merge(stats_first).merge(stats_second).summary()
+
+
+def test_append_rejects_other_columns(tmp_path):
+    path = str(tmp_path / "run.pmlog")
+    write_log(path, rows(5))
+    with pytest.raises(ValueError):
+        BinLogWriter(path, MULTI_COLUMNS, SOURCE)
+
+
+def test_read_arrays_matches_read_log(tmp_path):
+    np = pytest.importorskip("numpy")
+    path = str(tmp_path / "run.pmlog")
+    write_log(path, rows(100), meta={"a": "1"})
+    log = BinLogWriter(path, COLUMNS, SOURCE)
+    for row in rows(40):
+        log.append(*row)
+    log.close()
+    truncate(path, os.path.getsize(path) - 3)
+
+    store = read_log(path)
+    header, arrays, sources, meta, stats, markers = read_arrays(path)
+    assert header["columns"] == list(COLUMNS)
+    for name in COLUMNS:
+        assert np.array_equal(arrays[name], np.frombuffer(store.column(name), dtype=np.float64))
+    assert meta["a"] == "1"
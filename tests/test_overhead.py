@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+perfmon.overhead: run ที่สั้นกว่า window ต้องไม่รายงาน CPU/RSS สูงสุดเป็น 0 ที่ดูเหมือนวัดได้จริง
+"""
+
+from perfmon.overhead import Overhead
+
+
+def run_ticks(overhead, ticks, interval=0.1):
+    for i in range(ticks):
+        start = overhead.begin()
+        overhead.end(i * interval, start)
+
+
+def test_short_run_closes_partial_window():
+    overhead = Overhead(window=10.0)
+    run_ticks(overhead, 40)             # 4 วินาที < window
+    assert not overhead.series
+    assert "max n/a of one core" in overhead.summary()
+    assert "RSS max n/a" in overhead.summary()
+
+    overhead.close()
+    assert len(overhead.series) == 1
+    assert overhead.series.value("elapsed", 0) == 39 * 0.1
+    assert overhead.ram_max > 0
+    assert "n/a" not in overhead.summary()
+    assert overhead.level == 0          # window สุดท้ายไม่เปลี่ยนระดับ
+
+
+def test_close_without_open_window():
+    overhead = Overhead(window=1.0)
+    run_ticks(overhead, 11)             # window ปิดพอดีที่ tick สุดท้าย
+    assert len(overhead.series) == 1
+    overhead.close()
+    assert len(overhead.series) == 1
+
+
+def test_close_without_ticks():
+    overhead = Overhead()
+    overhead.close()
+    assert not overhead.series
+    assert "max n/a" in overhead.summary()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+perfmon.rollup: ค่าที่ได้จากการต่อกันแบบ cascade (1 วิ -> 1 นาที -> 1 ชม.) ต้องเท่ากับการคำนวณตรงจากข้อมูลดิบ
+"""
+
+import pytest
+
+from perfmon.rollup import Rollup, tier_index
+from perfmon.store import SampleStore
+
+
+def raw_store(seconds, interval=0.5):
+    store = SampleStore("Python: train.py")
+    for i in range(int(seconds / interval)):
+        t = i * interval
+        store.append(t, (i * 7) % 100 + 0.25, 2048.0 + (i * 13) % 512)
+    return store
+
+
+def expected_buckets(store, width):
+    buckets = {}
+    for t, cpu, ram, _ in store:
+        buckets.setdefault(int(t // width), []).append((cpu, ram))
+    return buckets
+
+
+def tier_rows(rollup, level):
+    tier = rollup.stores[level]
+    return [{c: tier.value(c, i) for c in tier.columns} for i in range(len(tier))]
+
+
+@pytest.mark.parametrize("level, width", [(0, 1.0), (1, 60.0), (2, 3600.0)])
+def test_cascade_matches_raw(level, width):
+    store = raw_store(2 * 3600 + 90)
+    rollup = Rollup.from_store(store)
+    buckets = expected_buckets(store, width)
+
+    rows = tier_rows(rollup, level)
+    assert [row["elapsed"] for row in rows] == [b * width for b in sorted(buckets)]
+    for row in rows:
+        values = buckets[int(row["elapsed"] // width)]
+        assert row["count"] == len(values)
+        for i, metric in enumerate(("cpu", "ram")):
+            column = [v[i] for v in values]
+            assert row[f"{metric}_min"] == min(column)
+            assert row[f"{metric}_max"] == max(column)
+            assert row[f"{metric}_mean"] == pytest.approx(sum(column) / len(column))
+
+
+def test_view_includes_open_buckets():
+    store = raw_store(150)
+    rollup = Rollup.for_store(store)
+    for row in store:
+        rollup.add(*row[:-1])
+
+    assert len(rollup.stores[1]) == 2           # นาทีที่ 0, 1 ปิดแล้ว, นาทีที่ 2 ยังเปิด
+    view = rollup.view(1)
+    assert len(view) == 3
+    # วินาทีสุดท้าย (2 sample) ยังเปิดอยู่ที่ชั้น 1 วิ -> ยังไม่ถูกรวมขึ้นชั้น 1 นาที
+    assert view.value("count", 2) == 58
+    assert rollup.view(0).value("count", -1) == 2
+    assert sum(view.value("count", i) for i in range(len(view))) == len(store) - 2
+
+
+def test_per_pid_buckets():
+    store = SampleStore("multi", ("elapsed", "pid", "cpu", "ram"))
+    for i in range(240):
+        store.append(i * 0.5, 101, 10.0, 100.0)
+        store.append(i * 0.5, 202, 90.0, 900.0)
+    rollup = Rollup.from_store(store)
+
+    rows = tier_rows(rollup, tier_index("1m"))
+    assert sorted((row["elapsed"], row["pid"]) for row in rows) == [(t, pid) for t in (0.0, 60.0) for pid in (101, 202)]
+    for row in rows:
+        assert row["count"] == 120
+        assert row["cpu_mean"] == (10.0 if row["pid"] == 101 else 90.0)
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+perfmon.segments: manifest ของ Auto-Save แบบหมุนไฟล์ และ select_segments ตามช่วงเวลา
+"""
+
+import os
+
+from perfmon.segments import SegmentSet, select_segments
+from perfmon.store import SampleStore
+
+STARTED_AT = 1_700_000_000.0
+
+
+def batch(start, rows=600, interval=1.0):
+    store = SampleStore("Python: train.py")
+    store.started_at = STARTED_AT
+    for i in range(rows):
+        store.append(start + i * interval, 10.0, 100.0)
+    return store
+
+
+def write_segments(tmp_path, count):
+    """segment ละ 1 batch (600 วินาที) -> รายชื่อไฟล์ตามลำดับ"""
+    segments = SegmentSet(str(tmp_path / "run.csv"))
+    names = []
+    for k in range(count):
+        path = segments.active()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("x\n")
+        segments.record(path, batch(k * 600.0))
+        names.append(os.path.basename(segments.close(path)))
+    return segments, names
+
+
+def selected(manifest, *args, **kwargs):
+    return [os.path.basename(p) for p in select_segments(manifest, *args, **kwargs)]
+
+
+def test_select_by_elapsed(tmp_path):
+    segments, names = write_segments(tmp_path, 4)
+    assert names == ["run_part001.csv", "run_part002.csv", "run_part003.csv", "run_part004.csv"]
+    manifest = segments.manifest_path
+
+    assert selected(manifest) == names
+    assert selected(manifest, 700.0, 800.0) == names[1:2]
+    assert selected(manifest, 599.0, 600.0) == names[0:2]      # ขอบช่วงทับทั้งสอง segment
+    assert selected(manifest, 1500.0) == names[2:]
+    assert selected(manifest, None, 100.0) == names[:1]
+    assert selected(manifest, 5000.0, 6000.0) == []
+
+
+def test_select_by_wall_clock(tmp_path):
+    segments, names = write_segments(tmp_path, 3)
+    manifest = segments.manifest_path
+    assert selected(manifest, STARTED_AT + 1250.0, STARTED_AT + 1300.0, wall=True) == names[2:]
+    assert selected(manifest, 1250.0, 1300.0, wall=True) == []
+
+
+def test_open_segment_accumulates(tmp_path):
+    segments = SegmentSet(str(tmp_path / "run.csv"), rotate_bytes=10)
+    path = segments.active()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("x\n")
+    segments.record(path, batch(0.0))
+    segments.record(path, batch(600.0))
+    assert segments.active() == path            # ยังไม่ปิด -> เขียนต่อไฟล์เดิม
+    assert not segments.full(path)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("y" * 20)
+    assert segments.full(path)
+    assert selected(segments.manifest_path, 900.0, 950.0) == [os.path.basename(path)]
+    segments.close(path)
+    assert segments.active().endswith("run_part002.csv")
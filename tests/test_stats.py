@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+perfmon.stats: merge ของหลาย segment ต้องเท่ากับการคำนวณรอบเดียวบนข้อมูลทั้งหมด
+และ quantile จาก DDSketch คลาดไม่เกิน RELATIVE_ACCURACY
+"""
+
+import json
+import random
+
+import pytest
+
+from perfmon.stats import QUANTILES, RELATIVE_ACCURACY, DDSketch, SessionStats
+from perfmon.store import SampleStore
+
+INTERVAL = 0.1
+
+
+def samples(n, seed=0):
+    rng = random.Random(seed)
+    return [(i * INTERVAL, min(rng.lognormvariate(3.5, 0.6), 100.0), 2048.0 + rng.gauss(0, 64))
+            for i in range(n)]
+
+
+def collect(rows, **kwargs):
+    stats = SessionStats(**kwargs)
+    for row in rows:
+        stats.add(*row)
+    return stats
+
+
+def exact_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def test_merge_matches_single_pass():
+    data = samples(5000)
+    whole = collect(data).summary()
+    merged = collect(data[:1800]).merge(collect(data[1800:])).summary()
+
+    for m in ("cpu", "ram"):
+        for key in ("count", "min", "max") + tuple(f"p{round(q * 100)}" for q in QUANTILES):
+            assert merged[m][key] == whole[m][key], (m, key)
+        assert merged[m]["mean"] == pytest.approx(whole[m]["mean"], rel=1e-12)
+        assert merged[m]["std"] == pytest.approx(whole[m]["std"], rel=1e-9)
+    # ช่วงเวลาระหว่าง 2 segment (sample สุดท้ายของอันแรก -> sample แรกของอันหลัง) ไม่ถูกนับ
+    assert merged["duration"] == pytest.approx(whole["duration"] - INTERVAL)
+    above = sum(INTERVAL for i in range(1, len(data)) if data[i][1] >= 90.0 and i != 1800)
+    assert merged["cpu"]["above"][90.0] == pytest.approx(above)
+
+
+def test_merge_survives_json_round_trip():
+    data = samples(3000, seed=1)
+    parts = [collect(data[i:i + 1000]) for i in range(0, len(data), 1000)]
+    merged = SessionStats()
+    for part in parts:
+        merged.merge(SessionStats.from_dict(json.loads(json.dumps(part.to_dict()))))
+
+    expected = collect(data[:1000]).merge(parts[1]).merge(parts[2])
+    assert merged.summary() == expected.summary()
+    assert merged.meta() == expected.meta()
+
+
+def test_merge_per_pid():
+    store = SampleStore("multi", ("elapsed", "pid", "cpu", "ram"))
+    rows = []
+    for i in range(200):
+        rows += [(i * INTERVAL, 101, 10.0 + i % 7, 100.0), (i * INTERVAL, 202, 50.0 + i % 3, 200.0)]
+    for row in rows:
+        store.append(*row)
+    whole = SessionStats.from_store(store)
+    first, second = collect(rows[:150], pid=True), collect(rows[150:], pid=True)
+    first.merge(second)
+
+    assert sorted(first.series) == [101, 202]
+    for pid in (101, 202):
+        assert first.summary(pid)["cpu"]["count"] == whole.summary(pid)["cpu"]["count"] == 200
+        assert first.summary(pid)["cpu"]["p95"] == whole.summary(pid)["cpu"]["p95"]
+        assert first.summary(pid)["ram"]["mean"] == pytest.approx(whole.summary(pid)["ram"]["mean"])
+
+
+def test_merge_rejects_different_thresholds():
+    with pytest.raises(ValueError):
+        SessionStats().merge(SessionStats(thresholds={"cpu": (50.0,)}))
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_quantile_error_bound(seed):
+    data = samples(20000, seed)
+    summary = collect(data).summary()
+    for m, column in (("cpu", 1), ("ram", 2)):
+        values = [row[column] for row in data]
+        for q in QUANTILES:
+            exact = exact_quantile(values, q)
+            assert abs(summary[m][f"p{round(q * 100)}"] - exact) <= RELATIVE_ACCURACY * exact + 1e-9, (m, q)
+
+
+def test_sketch_zero_and_empty():
+    sketch = DDSketch()
+    assert sketch.quantile(0.5) is None
+    for x in (0.0, 0.0, 0.0, 5.0):
+        sketch.add(x)
+    assert sketch.quantile(0.5) == 0.0
+    assert sketch.quantile(1.0) == pytest.approx(5.0, rel=RELATIVE_ACCURACY)
+
+
+def test_interval_weighting():
+    # sample ถี่ 10 เท่าในช่วง CPU สูง -> ค่าเฉลี่ยตามเวลายังเป็น 50%
+    stats = SessionStats(("cpu", "ram", "interval"))
+    t = 0.0
+    for _ in range(10):
+        t += 1.0
+        stats.add(t, 10.0, 1.0, 1.0)
+    for _ in range(100):
+        t += 0.1
+        stats.add(t, 90.0, 1.0, 0.1)
+    assert stats.summary()["cpu"]["mean"] == pytest.approx(50.0)